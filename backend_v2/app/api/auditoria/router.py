@@ -1,20 +1,22 @@
 """API de consulta de auditoría de acciones de usuario."""
 
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, Literal, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.auth.profile_router import obtener_usuario_actual_db
-from app.database import obtener_db
+from app.database import AsyncSessionLocal, obtener_db
 from app.models.auditoria.accion_usuario import (
     AuditoriaAccionPublica,
+    AuditoriaEventosCursor,
     AuditoriaEventosPaginados,
     AuditoriaEstadisticas,
 )
 from app.models.auth.usuario import Usuario
-from app.services.auditoria.servicio import ServicioAuditoria
+from app.services.auditoria.servicio import FORMATOS_EXPORTACION, ServicioAuditoria
 from app.services.auditoria.servicio_estadisticas import ServicioAuditoriaEstadisticas
 from app.services.auth.servicio import ServicioAuth
 
@@ -35,8 +37,7 @@ async def requiere_permiso_auditoria(
     return usuario
 
 
-@router.get("/eventos", response_model=AuditoriaEventosPaginados)
-async def listar_eventos_auditoria(
+def filtros_eventos(
     usuario_id: Optional[str] = Query(None),
     usuario_nombre: Optional[str] = Query(None),
     rol: Optional[str] = Query(None),
@@ -51,29 +52,36 @@ async def listar_eventos_auditoria(
     resultado: Optional[str] = Query(None),
     fecha_desde: Optional[datetime] = Query(None),
     fecha_hasta: Optional[datetime] = Query(None),
+) -> Dict[str, Any]:
+    """Filtros comunes del listado, el listado por cursor y la exportación."""
+    return {
+        "usuario_id": usuario_id,
+        "usuario_nombre": usuario_nombre,
+        "rol": rol,
+        "modulo": modulo,
+        "accion": accion,
+        "entidad_tipo": entidad_tipo,
+        "entidad_id": entidad_id,
+        "metodo_http": metodo_http,
+        "ruta": ruta,
+        "codigo_respuesta": codigo_respuesta,
+        "direccion_ip": direccion_ip,
+        "resultado": resultado,
+        "fecha_desde": fecha_desde,
+        "fecha_hasta": fecha_hasta,
+    }
+
+
+@router.get("/eventos", response_model=AuditoriaEventosPaginados)
+async def listar_eventos_auditoria(
+    filtros: Dict[str, Any] = Depends(filtros_eventos),
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=200),
     db: AsyncSession = Depends(obtener_db),
     _: Usuario = Depends(requiere_permiso_auditoria),
 ):
     items, total = await ServicioAuditoria.listar_eventos(
-        db,
-        usuario_id=usuario_id,
-        usuario_nombre=usuario_nombre,
-        rol=rol,
-        modulo=modulo,
-        accion=accion,
-        entidad_tipo=entidad_tipo,
-        entidad_id=entidad_id,
-        metodo_http=metodo_http,
-        ruta=ruta,
-        codigo_respuesta=codigo_respuesta,
-        direccion_ip=direccion_ip,
-        resultado=resultado,
-        fecha_desde=fecha_desde,
-        fecha_hasta=fecha_hasta,
-        page=page,
-        page_size=page_size,
+        db, **filtros, page=page, page_size=page_size
     )
     return AuditoriaEventosPaginados(
         items=[AuditoriaAccionPublica.model_validate(i) for i in items],
@@ -83,6 +91,51 @@ async def listar_eventos_auditoria(
     )
 
 
+@router.get("/eventos/cursor", response_model=AuditoriaEventosCursor)
+async def listar_eventos_auditoria_cursor(
+    filtros: Dict[str, Any] = Depends(filtros_eventos),
+    cursor: Optional[str] = Query(None, description="siguiente_cursor de la página anterior"),
+    limite: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(obtener_db),
+    _: Usuario = Depends(requiere_permiso_auditoria),
+):
+    """Listado por keyset: costo constante en cualquier página (sin OFFSET ni total)."""
+    try:
+        items, siguiente = await ServicioAuditoria.listar_eventos_cursor(
+            db, cursor=cursor, limite=limite, **filtros
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return AuditoriaEventosCursor(
+        items=[AuditoriaAccionPublica.model_validate(i) for i in items],
+        siguiente_cursor=siguiente,
+        limite=limite,
+    )
+
+
+@router.get("/eventos/exportar")
+async def exportar_eventos_auditoria(
+    filtros: Dict[str, Any] = Depends(filtros_eventos),
+    formato: Literal["csv", "ndjson"] = Query("csv"),
+    _: Usuario = Depends(requiere_permiso_auditoria),
+):
+    """Descarga en streaming los eventos filtrados (CSV o NDJSON), en memoria constante."""
+
+    async def contenido():
+        # Sesión propia: la de Depends(obtener_db) se cierra antes de que se
+        # envíe el cuerpo de una StreamingResponse.
+        async with AsyncSessionLocal() as db:
+            async for bloque in ServicioAuditoria.exportar_eventos(db, formato, **filtros):
+                yield bloque
+
+    nombre = f"auditoria_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{formato}"
+    return StreamingResponse(
+        contenido(),
+        media_type=FORMATOS_EXPORTACION[formato],
+        headers={"Content-Disposition": f"attachment; filename={nombre}"},
+    )
+
+
 @router.get("/eventos/{evento_id}", response_model=AuditoriaAccionPublica)
 async def obtener_evento_auditoria(
     evento_id: int,
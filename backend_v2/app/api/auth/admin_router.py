@@ -1,9 +1,9 @@
-import json
 import logging
 from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_
 from sqlmodel import select
 
 from app.database import obtener_db, obtener_erp_db
@@ -17,6 +17,7 @@ from app.models.auth.usuario import (
     RolPublico,
     ModuloSistema,
 )
+from app.services.auth.asignaciones_service import comparte_especialidad, guardar_asignaciones
 from app.services.auth.servicio import ServicioAuth
 from app.services.notifications.email_service import EmailService
 from .profile_router import obtener_usuario_actual_db
@@ -65,33 +66,15 @@ async def listar_analistas(
         # Si no es solo_asignables, se eliminó el filtro estático de roles para que sea dinámico
         # El administrador podrá ver todos los usuarios registrados independientemente de su rol
 
+        # admin_sistemas / admin_mejoramiento: solo su rama (especialidad en común)
+        if actual.rol != "admin":
+            stmt = stmt.where(or_(
+                Usuario.id == actual.id,
+                comparte_especialidad(Usuario.id, actual.id),
+            ))
 
         result = await db.execute(stmt)
-        usuarios = result.scalars().all()
-
-        if actual.rol == "admin":
-            return usuarios
-
-        # Lógica de filtrado para admin_sistemas (por especialidad)
-        try:
-            mis_especialidades = set(json.loads(actual.especialidades or "[]"))
-        except Exception:
-            mis_especialidades = set()
-
-        if not mis_especialidades:
-            return [u for u in usuarios if u.id == actual.id]
-
-        filtrados = []
-        for u in usuarios:
-            try:
-                sus_especialidades = set(json.loads(u.especialidades or "[]"))
-            except Exception:
-                sus_especialidades = set()
-
-            if mis_especialidades.intersection(sus_especialidades) or u.id == actual.id:
-                filtrados.append(u)
-
-        return filtrados
+        return result.scalars().all()
     except HTTPException:
         raise
     except Exception as e:
@@ -158,10 +141,10 @@ async def actualizar_analista(
         # Aplicar cambios
         if "rol" in datos:
             usuario.rol = datos["rol"]
-        if "especialidades" in datos:
-            usuario.especialidades = json.dumps(datos["especialidades"])
-        if "areas_asignadas" in datos:
-            usuario.areas_asignadas = json.dumps(datos["areas_asignadas"])
+        # Tablas relacionales + campos JSON durante la transición
+        await guardar_asignaciones(
+            db, usuario, datos.get("especialidades"), datos.get("areas_asignadas")
+        )
         if "esta_activo" in datos:
             usuario.esta_activo = datos["esta_activo"]
 
@@ -376,28 +359,10 @@ async def desbloquear_rate_limit(
         if not usuario:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
-        from app.core.rate_limiter import limiter
-        storage = limiter.limiter.storage
-        cedula_patron = f":{usuario.cedula.strip().lower()}"
-        eliminadas = 0
-
-        # 1. Caso MemoryStorage (Desarrollo y Tests)
-        if hasattr(storage, "storage") and hasattr(storage, "expirations"):
-            keys_to_delete = [k for k in storage.storage.keys() if cedula_patron in k.lower()]
-            for k in keys_to_delete:
-                storage.storage.pop(k, None)
-                storage.expirations.pop(k, None)
-                if hasattr(storage, "events") and k in storage.events:
-                    storage.events.pop(k, None)
-            eliminadas = len(keys_to_delete)
-
-        # 2. Caso RedisStorage / RedisClusterStorage / RedisSentinelStorage (Producción con Redis)
-        elif hasattr(storage, "storage") and hasattr(storage.storage, "keys") and hasattr(storage.storage, "delete"):
-            patron_busqueda = f"*login*:{usuario.cedula.strip().lower()}*"
-            keys_to_delete = storage.storage.keys(patron_busqueda)
-            if keys_to_delete:
-                storage.storage.delete(*keys_to_delete)
-            eliminadas = len(keys_to_delete)
+        from app.core.rate_limiter import desbloquear_cedula
+
+        # Contadores de login (slowapi), fallos y lockout por cédula.
+        eliminadas = await desbloquear_cedula(usuario.cedula)
 
         return {
             "mensaje": f"Se eliminaron {eliminadas} registros de bloqueo temporal para el usuario.",
@@ -80,7 +80,7 @@ async def login(
 
         # Lockout por cuenta: defense-in-depth sobre el rate limit por IP.
         # Si la cuenta esta lockeada en Redis, rechazamos con 429 sin tocar DB.
-        lockout_segundos = _verificar_lockout_cedula(cedula_normalizada)
+        lockout_segundos = await _verificar_lockout_cedula(cedula_normalizada)
         if lockout_segundos:
             raise HTTPException(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
@@ -148,7 +148,7 @@ async def login(
                 )
             if not usuario:
                 # Cedula no existe: contar como fallo para lockout per-cuenta.
-                _registrar_fallo_cedula(cedula_normalizada)
+                await _registrar_fallo_cedula(cedula_normalizada)
                 await _auditar_login(
                     usuario_id="desconocido",
                     usuario_nombre=None,
@@ -180,7 +180,7 @@ async def login(
             password_normalizada, usuario.hash_contrasena  # @audit-ok
         ):
             # Password incorrecto: contar como fallo para lockout per-cuenta.
-            _registrar_fallo_cedula(cedula_normalizada)
+            await _registrar_fallo_cedula(cedula_normalizada)
             await _auditar_login(
                 usuario_id=usuario.id,
                 usuario_nombre=usuario.nombre,
@@ -6,7 +6,6 @@ from types import SimpleNamespace
 from pathlib import Path
 
 from fastapi import APIRouter, Depends, HTTPException, Request, Response
-from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
@@ -29,10 +28,12 @@ from app.services.desarrollos.actividad_archivo_service import (
     ArchivoActividadGuardado,
     ArchivoActividadInvalido,
     eliminar_archivo_interno,
-    es_archivo_interno_actividad,
+    es_archivo_legado_actividad,
     guardar_archivo_actividad,
     resolver_archivo_actividad,
+    sha256_archivo_actividad,
 )
+from app.services.almacenamiento import liberar, respuesta_archivo
 
 
 router = APIRouter()
@@ -133,7 +134,7 @@ async def subir_archivo_actividad(
             if not isinstance(archivo, UploadFile):
                 raise ArchivoActividadInvalido("El campo archivo no es válido")
             guardado = await guardar_archivo_actividad(
-                actividad_id, archivo, raiz, _limite_bytes()
+                db, actividad_id, archivo, raiz, _limite_bytes()
             )
 
         actividad = await _obtener_actividad(db, actividad_id, bloquear=True)
@@ -144,9 +145,10 @@ async def subir_archivo_actividad(
 
         ruta_anterior = actividad.archivo_url
         actividad.archivo_url = guardado.ruta_relativa
+        await liberar(db, sha256_archivo_actividad(actividad_id, ruta_anterior))
         await db.commit()
         persistido = True
-        if es_archivo_interno_actividad(actividad_id, ruta_anterior):
+        if es_archivo_legado_actividad(actividad_id, ruta_anterior):
             eliminado = await asyncio.to_thread(
                 eliminar_archivo_interno, actividad_id, ruta_anterior, raiz
             )
@@ -189,6 +191,7 @@ async def subir_archivo_actividad(
 
 @router.get("/{actividad_id}/archivo")
 async def descargar_archivo_actividad(
+    request: Request,
     actividad_id: int,
     db: AsyncSession = Depends(obtener_db),
     usuario: Usuario = Depends(requiere_permiso_desarrollos),
@@ -206,10 +209,12 @@ async def descargar_archivo_actividad(
     except ArchivoActividadInvalido as exc:
         raise HTTPException(status_code=404, detail="Archivo no encontrado") from exc
 
-    return FileResponse(
-        path=ruta,
-        filename=nombre,
-        media_type=tipo_mime,
+    return await respuesta_archivo(
+        request,
+        ruta,
+        nombre,
+        tipo_mime,
+        sha256=sha256_archivo_actividad(actividad_id, actividad.archivo_url),
         headers={
             "Cache-Control": "private, no-store",
             "X-Content-Type-Options": "nosniff",
@@ -233,13 +238,14 @@ async def eliminar_archivo_actividad(
     ruta_anterior = actividad.archivo_url
     actividad.archivo_url = None
     try:
+        await liberar(db, sha256_archivo_actividad(actividad_id, ruta_anterior))
         await db.commit()
     except Exception as exc:
         await db.rollback()
         logger.exception("No se pudo desvincular evidencia de actividad %s", actividad_id)
         raise HTTPException(status_code=500, detail="No se pudo eliminar el archivo") from exc
 
-    if es_archivo_interno_actividad(actividad_id, ruta_anterior):
+    if es_archivo_legado_actividad(actividad_id, ruta_anterior):
         eliminado = await asyncio.to_thread(
             eliminar_archivo_interno,
             actividad_id,
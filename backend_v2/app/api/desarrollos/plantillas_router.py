@@ -15,8 +15,8 @@ from app.models.desarrollo.plantilla_actividad import (
     PlantillaActividadArbol,
     AplicarPlantillaRequest,
 )
-from app.models.desarrollo.actividad import Actividad
 from app.models.desarrollo.desarrollo import Desarrollo
+from app.services.desarrollos.plantilla_service import aplicar_plantilla
 
 router = APIRouter()
 
@@ -154,57 +154,22 @@ async def aplicar_plantilla_a_desarrollo(
         if not raiz:
             raise HTTPException(status_code=404, detail="Plantilla no encontrada")
 
-        stmt_todos = select(PlantillaActividad).where(
-            PlantillaActividad.nombre_plantilla == raiz.nombre_plantilla
+        stmt_todos = (
+            select(PlantillaActividad)
+            .where(PlantillaActividad.nombre_plantilla == raiz.nombre_plantilla)
+            .order_by(PlantillaActividad.id)
         )
         todos_plantilla = (await db.execute(stmt_todos)).scalars().all()
 
         if not todos_plantilla:
             return {"message": "Plantilla vacía"}
 
-        # Diccionario para mapear ID antiguo -> Nivel en arbol/nodo original (para reconstruir)
-        # Insertaremos en orden asegurando que los padres se inserten primero.
-        # Orden topológico o por jerarquía:
-        nodos_por_id = {p.id: p for p in todos_plantilla}
-        id_map = {}  # old_id -> new_actividad_id
-
-        # Encontrar la raíz
-        def recursividad_crear_actividad(plantilla_nodo, parent_id_nuevo=None):
-            # Crear nueva actividad
-            nueva_act = Actividad(
-                desarrollo_id=request.desarrollo_id,
-                parent_id=parent_id_nuevo,
-                titulo=plantilla_nodo.titulo,
-                descripcion=plantilla_nodo.descripcion,
-                horas_estimadas=plantilla_nodo.horas_estimadas,
-                estado="Pendiente",
-                porcentaje_avance=0,
-            )
-            return nueva_act
-
-        # Vamos a simular un grafo para insertar padres primero
-        pendientes = [p for p in todos_plantilla if p.parent_id is None]
-        nuevas_actividades = []
-
-        while pendientes:
-            nodo = pendientes.pop(0)
-            nuevo_padre_id = id_map.get(nodo.parent_id) if nodo.parent_id else None
-
-            nueva_act = recursividad_crear_actividad(nodo, nuevo_padre_id)
-            db.add(nueva_act)
-            await db.flush()  # Para generar el ID inmediatamente
-
-            id_map[nodo.id] = nueva_act.id
-            nuevas_actividades.append(nueva_act)
-
-            # Agregar hijos a pendientes
-            hijos = [p for p in todos_plantilla if p.parent_id == nodo.id]
-            pendientes.extend(hijos)
+        creadas = await aplicar_plantilla(db, request.desarrollo_id, todos_plantilla)
 
         await db.commit()
         return {
             "success": True,
-            "message": f"{len(nuevas_actividades)} actividades creadas.",
+            "message": f"{creadas} actividades creadas.",
         }
 
     except HTTPException:
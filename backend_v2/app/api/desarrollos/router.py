@@ -7,7 +7,7 @@ from decimal import Decimal
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, delete, or_, func, case
-from app.database import obtener_db
+from app.database import AsyncSessionLocal, obtener_db
 from app.models.desarrollo.desarrollo import (
     Desarrollo,
     DesarrolloActualizar,
@@ -19,6 +19,7 @@ from app.models.desarrollo.actividad import Actividad
 from app.models.auth.usuario import Usuario
 from app.api.auth.profile_router import obtener_usuario_actual_opcional, obtener_usuario_actual_db
 from app.services.jerarquia.service import JerarquiaService
+from app.services.cache import cache
 from app.services.auditoria.snapshots import (
     asignar_actualizacion_segura,
     asignar_creacion_segura,
@@ -174,6 +175,7 @@ async def crear_desarrollo(
         nuevo_desarrollo = Desarrollo(**nueva_data)
         db.add(nuevo_desarrollo)
         await db.commit()
+        await cache.invalidar("desarrollos")
         await db.refresh(nuevo_desarrollo)
 
         request.state.auditoria_entidad_tipo = "desarrollo"
@@ -221,17 +223,23 @@ async def informe_detallado_casos_portal(
 @router.get("/tipos", response_model=List[TipoDesarrollo])
 async def listar_tipos_desarrollo(
     incluir_inactivos: bool = False,
-    db: AsyncSession = Depends(obtener_db),
 ):
     """Lista los tipos de desarrollo configurados"""
-    try:
+    # La carga es compartida y puede sobrevivir a este request: usa su propia sesión.
+    async def _cargar():
         query = select(TipoDesarrollo).order_by(TipoDesarrollo.orden, TipoDesarrollo.etiqueta)
 
         if not incluir_inactivos:
             query = query.where(TipoDesarrollo.esta_activo.is_(True))
 
-        result = await db.execute(query)
-        return result.scalars().all()
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(query)
+            return result.scalars().all()
+
+    try:
+        return await cache.obtener_o_cargar(
+            f"desarrollo_tipos_{incluir_inactivos}", _cargar, ttl=300, etiquetas=("catalogo_tipos_desarrollo",)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al listar tipos de desarrollo: {str(e)}")
 
@@ -323,6 +331,7 @@ async def eliminar_desarrollo(
         )
         
         await db.commit()
+        await cache.invalidar("desarrollos")
 
         request.state.auditoria_entidad_tipo = "desarrollo"
         request.state.auditoria_entidad_id = desarrollo_id
@@ -383,6 +392,7 @@ async def actualizar_desarrollo(
                     db.add(actividad)
 
         await db.commit()
+        await cache.invalidar("desarrollos")
         await db.refresh(db_desarrollo)
         asignar_actualizacion_segura(request, snapshot_antes, db_desarrollo)
         return db_desarrollo
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from typing import List, Optional, Any
 
@@ -10,6 +10,7 @@ from app.models.erp.requisiciones import (
     CatalogoProducto,
     SolicitudMaterialCrear,
 )
+from app.services.erp.catalogo_replica_service import CatalogoReplicaService, encabezados_origen
 from app.services.erp.requisiciones_service import RequisicionesService
 
 router = APIRouter()
@@ -37,19 +38,31 @@ def obtener_ots(
 
 @router.get("/catalogo", response_model=List[CatalogoProducto])
 def obtener_catalogo(
+    response: Response,
     busqueda: Optional[str] = None,
     limit: int = 50,
     offset: int = 0,
+    despues: Optional[str] = None,
     db_erp: Optional[Session] = Depends(obtener_erp_db_opcional),
 ):
-    """Busca productos en el catálogo del ERP"""
+    """
+    Busca productos en el catálogo (réplica local; ERP si la réplica está vencida).
+    `despues` = última referencia recibida (X-Siguiente-Cursor) para paginar por llave.
+    """
+    replica = CatalogoReplicaService.buscar_catalogo(busqueda, limit, offset, despues)
+    if replica is not None:
+        resultados, antiguedad = replica
+        response.headers.update(encabezados_origen(antiguedad, resultados, limit, "referencia"))
+        return resultados
+
     if db_erp is None:
         raise HTTPException(status_code=503, detail="Servicio ERP no disponible")
 
     try:
         resultados = RequisicionesService.obtener_catalogo_producto(
-            db_erp, busqueda, limit, offset
+            db_erp, busqueda, limit, offset, despues
         )
+        response.headers.update(encabezados_origen(None, resultados, limit, "referencia"))
         return resultados
     except Exception as e:
         print(f"ERROR ERP catalogo: {e}")
@@ -2,11 +2,14 @@
 API de Endpoint ERP - Backend V2
 """
 
+import logging
+
 from fastapi import APIRouter, Depends, HTTPException, status
 import httpx
 from sqlalchemy.orm import Session
-from app.database import obtener_db, obtener_erp_db_opcional
-from app.services.erp import EmpleadosService
+from app.database import obtener_db, obtener_db_sync, obtener_erp_db_opcional
+from app.services.erp import EmpleadosService, DirectorioEmpleadosService
+from app.api.novedades_nomina.dependencies import requiere_permiso_nomina_novedades
 from typing import Optional
 from app.config import config
 from app.api.erp.requisiciones_router import router as requisiciones_router
@@ -68,6 +71,33 @@ async def sincronizar_erp(db: Session = Depends(obtener_db)):
     return {"mensaje": "Sincronizacion iniciada"}
 
 
+@router.post("/directorio-empleados/sincronizar")
+async def sincronizar_directorio_empleados(
+    _usuario=Depends(requiere_permiso_nomina_novedades),
+):
+    """
+    Fuerza una sincronización incremental de la réplica local del directorio
+    de empleados (solo escribe las filas que cambiaron en el ERP).
+    """
+    try:
+        return await DirectorioEmpleadosService.sincronizar_async()
+    except Exception as e:
+        logging.getLogger(__name__).error(f"Error sincronizando directorio ERP: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="No fue posible sincronizar el directorio de empleados con el ERP.",
+        )
+
+
+@router.get("/directorio-empleados/estado")
+def estado_directorio_empleados(
+    db: Session = Depends(obtener_db_sync),
+    _usuario=Depends(requiere_permiso_nomina_novedades),
+):
+    """Última sincronización de la réplica y si está vigente para consultas."""
+    return DirectorioEmpleadosService.obtener_estado(db)
+
+
 @router.post("/sync-external")
 async def sincronizar_externo():
     """
@@ -1,14 +1,14 @@
 from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
-from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
 from sqlmodel import select, func, update, or_
-from ...database import obtener_db
+from ...database import obtener_db, SessionLocal
 from ..auth.profile_router import obtener_usuario_actual_db
 from ...services.inventario.servicio import ServicioInventario
 from ...services.inventario.excel_servicio import ServicioExcelInventario
 from ...services.inventario.analytics_servicio import ServicioAnalyticsInventario
+from ...services.exportacion import respuesta_xlsx
 from ...models.inventario.conteo import (
     ConteoInventario,
     AsignacionInventario,
@@ -442,29 +442,39 @@ async def habilitar_conteo2(
 @router.get("/plantilla-maestra")
 async def descargar_plantilla_maestra():
     """Genera y descarga la plantilla Excel para la carga maestra de inventario."""
-    buf = ServicioExcelInventario.generar_plantilla_maestra()
-    return StreamingResponse(
-        buf,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={
-            "Content-Disposition": "attachment; filename=plantilla_inventario_maestra.xlsx"
-        },
+    return await respuesta_xlsx(
+        ServicioExcelInventario.generar_plantilla_maestra, "plantilla_inventario_maestra.xlsx"
     )
 
 
 @router.get("/plantilla-transito")
 async def descargar_plantilla_transito():
     """Genera y descarga la plantilla Excel para la carga de tránsito detallado."""
-    buf = ServicioExcelInventario.generar_plantilla_transito()
-    return StreamingResponse(
-        buf,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={
-            "Content-Disposition": "attachment; filename=plantilla_transito_detallado.xlsx"
-        },
+    return await respuesta_xlsx(
+        ServicioExcelInventario.generar_plantilla_transito, "plantilla_transito_detallado.xlsx"
     )
 
 
+@router.get("/exportar")
+async def exportar_inventario(
+    bodega: Optional[str] = None,
+    estado: Optional[str] = None,
+):
+    """Descarga en Excel los conteos con los mismos filtros de /lista."""
+
+    def _generar() -> str:
+        # Sesión síncrona propia del hilo: el cursor de servidor no cruza el event loop.
+        with SessionLocal() as db_sync:
+            return ServicioExcelInventario.exportar_conteos_xlsx(db_sync, bodega, estado)
+
+    try:
+        fecha = datetime.now().strftime("%Y%m%d")
+        return await respuesta_xlsx(_generar, f"inventario_conteo_{fecha}.xlsx")
+    except SQLAlchemyError as e:
+        print(f"Error DB en exportar_inventario: {e}")
+        raise HTTPException(status_code=503, detail="Error al exportar el inventario")
+
+
 @router.get("/health")
 async def health_check():
     return {"status": "ok", "module": "inventario_2026"}
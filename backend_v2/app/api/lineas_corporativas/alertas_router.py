@@ -1,6 +1,8 @@
 import logging
+from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
@@ -8,20 +10,49 @@ from sqlmodel import select
 
 from app.database import obtener_db, obtener_erp_db_opcional
 from app.models.linea_corporativa import EmpleadoLinea
+from app.services.erp.directorio_empleados_service import DirectorioEmpleadosService
 
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+_QUERY_ESTADOS_ERP = text("""
+    SELECT DISTINCT ON (E.nrocedula)
+        E.nrocedula AS nrocedula,
+        C.estado AS estado,
+        C.fecharetiro AS fecharetiro
+    FROM establecimiento E
+    LEFT JOIN contrato C ON TRIM(CAST(C.establecimiento AS TEXT)) = TRIM(CAST(E.nrocedula AS TEXT))
+    WHERE TRIM(CAST(E.nrocedula AS TEXT)) IN :cedulas
+    ORDER BY E.nrocedula, C.fechainicio DESC NULLS LAST
+""")
+
+
+def _consultar_estados(db_erp: Optional[Session], cedulas: List[str]) -> Optional[List[tuple]]:
+    """(cedula, estado, fecharetiro) por cédula; None si el ERP no está disponible."""
+    # Réplica local del directorio: evita ir al ERP mientras esté vigente.
+    mapa_replica = DirectorioEmpleadosService.consultar_bulk(cedulas)
+    if mapa_replica is not None:
+        return [
+            (cedula, datos["estado"], datos["fecharetiro"])
+            for cedula, datos in mapa_replica.items()
+        ]
+    if db_erp is None:
+        return None
+    try:
+        erp_result = db_erp.execute(_QUERY_ESTADOS_ERP, {"cedulas": tuple(cedulas)}).fetchall()
+    except Exception:
+        logger.error("Error al consultar alertas en ERP")
+        return None
+    return [(str(row.nrocedula).strip(), row.estado, row.fecharetiro) for row in erp_result]
+
+
 @router.get("/alertas-empleados")
 async def obtener_alertas_empleados(
     db_erp: Session = Depends(obtener_erp_db_opcional),
     db_local: AsyncSession = Depends(obtener_db),
 ):
-    if db_erp is None:
-        return {"error": "ERP no disponible", "alertas": {}}
-
     try:
         result = await db_local.execute(select(EmpleadoLinea.documento))
         cedulas = [str(cedula) for cedula in result.scalars().all() if cedula]
@@ -32,27 +63,14 @@ async def obtener_alertas_empleados(
     if not cedulas:
         return {"alertas": {}}
 
-    query = text("""
-        SELECT DISTINCT ON (E.nrocedula)
-            E.nrocedula AS nrocedula,
-            C.estado AS estado,
-            C.fecharetiro AS fecharetiro
-        FROM establecimiento E
-        LEFT JOIN contrato C ON TRIM(CAST(C.establecimiento AS TEXT)) = TRIM(CAST(E.nrocedula AS TEXT))
-        WHERE TRIM(CAST(E.nrocedula AS TEXT)) IN :cedulas
-        ORDER BY E.nrocedula, C.fechainicio DESC NULLS LAST
-    """)
-    try:
-        erp_result = db_erp.execute(query, {"cedulas": tuple(cedulas)}).fetchall()
-    except Exception:
-        logger.error("Error al consultar alertas en ERP")
+    # Réplica y ERP usan sesiones sync: se consultan fuera del event loop.
+    filas = await run_in_threadpool(_consultar_estados, db_erp, cedulas)
+    if filas is None:
         return {"error": "ERP no disponible", "alertas": {}}
 
     alertas = {}
-    for row in erp_result:
-        cedula = str(row.nrocedula).strip()
-        estado = str(row.estado).strip()
-        fecha_retiro = row.fecharetiro
+    for cedula, estado_erp, fecha_retiro in filas:
+        estado = str(estado_erp).strip()
         motivos = []
         if estado.lower() != "activo":
             severidad = "CRITICAL"
@@ -1,12 +1,11 @@
 import os
-import hashlib
 import logging
 import traceback
 from datetime import datetime
 
 from typing import List, Optional
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Query
-from fastapi.responses import FileResponse
+from pathlib import Path
+from fastapi import APIRouter, Depends, Request, UploadFile, File, Form, HTTPException, Query
 from sqlmodel import select, func, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 from ...database import obtener_db, obtener_erp_db_opcional
@@ -17,6 +16,12 @@ from ...models.novedades_nomina.nomina import (
 )
 from ...services.novedades_nomina.extractor import NominaExtractor
 from ...services.novedades_nomina.processor import NominaProcessor
+from ...services.novedades_nomina.ejecutor_extraccion import ejecutar_extractor
+from ...services.almacenamiento import (
+    ArchivoBlobInvalido, BlobDemasiadoGrande, guardar_stream, liberar,
+    respuesta_archivo, sha256_de_ruta
+)
+from ...core.config import obtener_configuracion
 from .routers import (
     cooperativas_router, libranzas_router, funebres_router, otros_router,
     descuentos_router, excepciones_router, novedades_router,
@@ -38,8 +43,11 @@ router.include_router(novedades_router)
 router.include_router(tabla_maestra_router)
 
 
-STORAGE_DIR = "uploads/nomina"
-os.makedirs(STORAGE_DIR, exist_ok=True)
+def _ruta_fisica(ruta_almacenamiento: str) -> Path:
+    """Blobs del almacén (relativos a storage_path) o rutas legadas uploads/nomina/..."""
+    if sha256_de_ruta(ruta_almacenamiento):
+        return Path(obtener_configuracion().storage_path) / ruta_almacenamiento
+    return Path(ruta_almacenamiento)
 
 
 @router.get("/catalogo")
@@ -64,25 +72,27 @@ async def cargar_archivo(
     session: AsyncSession = Depends(obtener_db)
 ):
     """Carga un archivo y guarda sus metadatos"""
-    content = await file.read()
-    file_hash = hashlib.sha256(content).hexdigest()
-    
-    # Guardar en disco (siempre, por si se perdió físicamente)
+    # Copia por bloques al almacén por contenido (SHA-256); si el contenido ya
+    # existe no se vuelve a escribir, y si se perdió físicamente se repone.
     ext = file.filename.split('.')[-1].lower()
-    filename = f"{file_hash}.{ext}"
-    path = os.path.join(STORAGE_DIR, filename)
     try:
-        with open(path, "wb") as f_out:
-            f_out.write(content)
-    except Exception as e:
-        logger.error(f"Error guardando archivo físico: {str(e)}")
-        # Continuamos, el error real saltará en la descarga si falla
+        blob = await guardar_stream(
+            session, file, obtener_configuracion().storage_max_size_mb * 1024 * 1024
+        )
+    except BlobDemasiadoGrande as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ArchivoBlobInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    file_hash, path = blob.sha256, blob.ruta_relativa
 
     # Verificar si ya existe en DB para actualizar metadatos
     try:
         result = await session.execute(select(NominaArchivo).where(NominaArchivo.hash_archivo == file_hash))
         existing = result.scalars().first()
         if existing:
+            if existing.ruta_almacenamiento == path:
+                # La fila ya referenciaba este blob: no cuenta como referencia nueva.
+                await liberar(session, file_hash)
             # Si ya existe, actualizamos su fecha de creación y ruta por si acaso
             existing.creado_en = datetime.now()
             existing.mes_fact = mes
@@ -99,7 +109,7 @@ async def cargar_archivo(
         archivo = NominaArchivo(
             nombre_archivo=file.filename,
             hash_archivo=file_hash,
-            tamaño_bytes=len(content),
+            tamaño_bytes=blob.tamano_bytes,
             tipo_archivo=ext,
             ruta_almacenamiento=path,
             mes_fact=mes,
@@ -142,7 +152,7 @@ async def procesar_archivo(
         raise HTTPException(status_code=500, detail=f"Error al limpiar registros previos: {str(e)}")
     
     try:
-        with open(archivo.ruta_almacenamiento, "rb") as f:
+        with open(_ruta_fisica(archivo.ruta_almacenamiento), "rb") as f:
             content = f.read()
         
         registros_normalizados = []
@@ -152,7 +162,9 @@ async def procesar_archivo(
         logger.info(f"Procesando archivo ID {archivo.id} con subcategoria limpia: '{subcat_clean}'")
 
         # FLUJO GENÉRICO
-        raw_records = NominaExtractor.extract_from_binary(content, archivo.tipo_archivo)
+        raw_records = await ejecutar_extractor(
+            NominaExtractor.extract_from_binary, content, archivo.tipo_archivo
+        )
         raw_count = len(raw_records)
         processor = NominaProcessor(session)
         
@@ -197,9 +209,10 @@ async def obtener_preview(
 @router.get("/archivos/{archivo_id}/descargar")
 async def descargar_archivo(
     archivo_id: int, 
+    request: Request,
     session: AsyncSession = Depends(obtener_db)
 ):
-    """Descarga el archivo original cargado"""
+    """Descarga el archivo original cargado (con ETag/304 y Range)"""
     try:
         archivo = await session.get(NominaArchivo, archivo_id)
     except Exception as e:
@@ -208,13 +221,17 @@ async def descargar_archivo(
     if not archivo:
         raise HTTPException(status_code=404, detail="Archivo no encontrado en base de datos")
     
-    if not os.path.exists(archivo.ruta_almacenamiento):
+    ruta = _ruta_fisica(archivo.ruta_almacenamiento)
+    if not os.path.exists(ruta):
         raise HTTPException(status_code=404, detail="El archivo físico no se encuentra en el servidor")
     
-    return FileResponse(
-        path=archivo.ruta_almacenamiento,
-        filename=archivo.nombre_archivo,
-        media_type='application/octet-stream'
+    return await respuesta_archivo(
+        request,
+        ruta,
+        archivo.nombre_archivo,
+        'application/octet-stream',
+        sha256=sha256_de_ruta(archivo.ruta_almacenamiento),
+        headers={"Cache-Control": "private, no-cache"},
     )
 
 @router.get("/subcategorias/resumen", response_model=List[NominaResumenSubcat])
@@ -1,10 +1,8 @@
-import hashlib
 import asyncio
 import logging
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from fastapi import APIRouter, Depends, UploadFile, File, Form, Query, HTTPException, Request
-from anyio import to_process
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import Session, select, delete
 from ....database import obtener_db, obtener_erp_db_opcional
@@ -14,7 +12,9 @@ from ....models.novedades_nomina.nomina import (
 from ....services.erp.empleados_service import EmpleadosService
 from ....services.novedades_nomina.beneficiar_extractor import extraer_beneficiar
 from ....services.novedades_nomina.excepcion_service import ExcepcionService
+from ....services.novedades_nomina.ejecutor_extraccion import ejecutar_extractor
 from ....services.novedades_nomina.validacion_archivos_cooperativas import leer_archivos_beneficiar
+from ....services.novedades_nomina.nomina_service import NominaService
 from ..dependencies import requiere_permiso_nomina_novedades
 from ....core.rate_limiter import limiter
 
@@ -43,11 +43,8 @@ async def preview_beneficiar(
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
     try:
-        rows, summary, warnings_txt = await asyncio.wait_for(
-            to_process.run_sync(
-                extraer_beneficiar, archivos_binarios, cancellable=True
-            ),
-            timeout=60,
+        rows, summary, warnings_txt = await ejecutar_extractor(
+            extraer_beneficiar, archivos_binarios, timeout=60
         )
     except asyncio.TimeoutError as exc:
         raise HTTPException(status_code=422, detail="El procesamiento del Excel excedió el tiempo permitido") from exc
@@ -177,14 +174,9 @@ async def preview_beneficiar(
 
     try:
         # Guardar archivo físico en disco para permitir descargas posteriores
-        import os, hashlib
-        STORAGE_DIR = "uploads/nomina"
-        os.makedirs(STORAGE_DIR, exist_ok=True)
         contenido = archivos_binarios[0] if archivos_binarios else b""
-        file_hash = hashlib.sha256(contenido).hexdigest()
-        filename = f"{file_hash}.xls"
-        path = os.path.join(STORAGE_DIR, filename)
-        with open(path, "wb") as f_out: f_out.write(contenido)
+        blob = await NominaService.reemplazar_archivo_original(session, "BENEFICIAR", mes, anio, contenido)
+        file_hash, path = blob.sha256, blob.ruta_relativa
 
         await session.execute(delete(NominaRegistroNormalizado).where(NominaRegistroNormalizado.subcategoria_final == "BENEFICIAR", NominaRegistroNormalizado.mes_fact == mes, NominaRegistroNormalizado.año_fact == anio))
         archivo = NominaArchivo(nombre_archivo=f"beneficiar_{mes}_{anio}.xls", hash_archivo=file_hash, tamaño_bytes=sum(len(b) for b in archivos_binarios), tipo_archivo="xls", ruta_almacenamiento=path, mes_fact=mes, año_fact=anio, categoria="COOPERATIVAS", subcategoria="BENEFICIAR", estado="Procesado")
@@ -1,10 +1,9 @@
-import hashlib
 import asyncio
 import logging
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from fastapi import APIRouter, Depends, UploadFile, File, Form, Query, HTTPException, Request
-from anyio import to_process
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import Session, select, delete
 from ....database import obtener_db, obtener_erp_db_opcional
@@ -17,7 +16,9 @@ from ....services.novedades_nomina.grancoop_extractor import (
     extraer_grancoop,
 )
 from ....services.novedades_nomina.excepcion_service import ExcepcionService
+from ....services.novedades_nomina.ejecutor_extraccion import ejecutar_extractor
 from ....services.novedades_nomina.validacion_archivos_cooperativas import leer_archivos_grancoop
+from ....services.novedades_nomina.nomina_service import NominaService
 from ..dependencies import requiere_permiso_nomina_novedades
 from ....core.rate_limiter import limiter
 
@@ -46,14 +47,8 @@ async def preview_grancoop(
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
     try:
-        rows, summary, warnings_txt = await asyncio.wait_for(
-            to_process.run_sync(
-                extraer_grancoop,
-                archivos_binarios,
-                archivos_nombres,
-                cancellable=True,
-            ),
-            timeout=60,
+        rows, summary, warnings_txt = await ejecutar_extractor(
+            extraer_grancoop, archivos_binarios, archivos_nombres, timeout=60
         )
     except LimiteExtraccionGrancoopError as exc:
         raise HTTPException(status_code=422, detail="El PDF supera los límites permitidos") from exc
@@ -93,17 +88,20 @@ async def preview_grancoop(
 
     warnings_detalle = []
     if db_erp is not None:
-        from ....services.novedades_nomina.nomina_helper import NominaHelper
+        from ....services.novedades_nomina.indice_nombres import IndiceNombres
         import logging
         logger_route = logging.getLogger(__name__)
 
         # 1. Resolver cédulas vacías por coincidencia de nombre
-        empleados_activos = EmpleadosService.obtener_todos_los_empleados_activos(db_erp)
+        empleados_activos = await run_in_threadpool(
+            EmpleadosService.obtener_todos_los_empleados_activos, db_erp
+        )
+        indice_nombres = IndiceNombres.para(empleados_activos)
         nombres_resueltos = set()
         for row in rows:
             if not row.get("cedula"):
                 nombre_asoc = row.get("nombre_asociado", "")
-                cedula_resuelta = NominaHelper.buscar_cedula_por_nombre(nombre_asoc, empleados_activos)
+                cedula_resuelta = indice_nombres.resolver(nombre_asoc)
                 if cedula_resuelta:
                     row["cedula"] = cedula_resuelta
                     row["observaciones"] = "Cédula resuelta por coincidencia de nombre en ERP."
@@ -220,14 +218,9 @@ async def preview_grancoop(
 
     try:
         # Guardar archivo físico en disco para permitir descargas posteriores
-        import os, hashlib
-        STORAGE_DIR = "uploads/nomina"
-        os.makedirs(STORAGE_DIR, exist_ok=True)
         contenido = archivos_binarios[0] if archivos_binarios else b""
-        file_hash = hashlib.sha256(contenido).hexdigest()
-        filename = f"{file_hash}.pdf"
-        path = os.path.join(STORAGE_DIR, filename)
-        with open(path, "wb") as f_out: f_out.write(contenido)
+        blob = await NominaService.reemplazar_archivo_original(session, "GRANCOOP", mes, anio, contenido)
+        file_hash, path = blob.sha256, blob.ruta_relativa
 
         await session.execute(delete(NominaRegistroNormalizado).where(NominaRegistroNormalizado.subcategoria_final == "GRANCOOP", NominaRegistroNormalizado.mes_fact == mes, NominaRegistroNormalizado.año_fact == anio))
         archivo = NominaArchivo(nombre_archivo=f"grancoop_{mes}_{anio}.pdf", hash_archivo=file_hash, tamaño_bytes=sum(len(b) for b in archivos_binarios), tipo_archivo="pdf", ruta_almacenamiento=path, mes_fact=mes, año_fact=anio, categoria="COOPERATIVAS", subcategoria="GRANCOOP", estado="Procesado")
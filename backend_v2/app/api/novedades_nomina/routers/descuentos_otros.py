@@ -1,4 +1,3 @@
-import hashlib
 from datetime import datetime
 from typing import List, Optional, Dict, Any
 from fastapi import APIRouter, Depends, UploadFile, File, Form, Query, HTTPException
@@ -12,6 +11,7 @@ from ....services.erp.empleados_service import EmpleadosService
 from ....services.novedades_nomina.celulares_extractor import extraer_celulares
 from ....services.novedades_nomina.retenciones_extractor import extraer_retenciones
 from ....services.novedades_nomina.embargos_extractor import extraer_embargos
+from ....services.novedades_nomina.ejecutor_extraccion import ejecutar_extractor
 from ....services.novedades_nomina.nomina_service import NominaService
 from ....services.novedades_nomina.excepcion_service import ExcepcionService
 from ....services.novedades_nomina.nomina_manual_service import NominaManualService
@@ -30,7 +30,7 @@ async def datos_celulares(mes: int, anio: int, session: AsyncSession = Depends(o
 @router.post("/celulares/preview")
 async def preview_celulares(mes: int = Form(...), anio: int = Form(...), files: List[UploadFile] = File(...), session: AsyncSession = Depends(obtener_db), db_erp = Depends(obtener_erp_db_opcional)):
     archivos_binarios = [await f.read() for f in files]
-    rows, summary, warnings_txt = extraer_celulares(archivos_binarios)
+    rows, summary, warnings_txt = await ejecutar_extractor(extraer_celulares, archivos_binarios)
     summary.update({"mes": mes, "anio": anio})
     
     stmt_exc = select(NominaExcepcion).where(
@@ -94,14 +94,9 @@ async def preview_celulares(mes: int = Form(...), anio: int = Form(...), files:
 
     try:
         # Guardar archivo físico en disco para permitir descargas posteriores
-        import os, hashlib
-        STORAGE_DIR = "uploads/nomina"
-        os.makedirs(STORAGE_DIR, exist_ok=True)
         contenido = archivos_binarios[0] if archivos_binarios else b""
-        file_hash = hashlib.sha256(contenido).hexdigest()
-        filename = f"{file_hash}.xlsx"
-        path = os.path.join(STORAGE_DIR, filename)
-        with open(path, "wb") as f_out: f_out.write(contenido)
+        blob = await NominaService.reemplazar_archivo_original(session, "CELULARES", mes, anio, contenido)
+        file_hash, path = blob.sha256, blob.ruta_relativa
 
         await session.execute(delete(NominaRegistroNormalizado).where(NominaRegistroNormalizado.subcategoria_final == "CELULARES", NominaRegistroNormalizado.mes_fact == mes, NominaRegistroNormalizado.año_fact == anio))
         archivo = NominaArchivo(nombre_archivo=f"celulares_{mes}_{anio}.xlsx", hash_archivo=file_hash, tamaño_bytes=sum(len(b) for b in archivos_binarios), tipo_archivo="xlsx", ruta_almacenamiento=path, mes_fact=mes, año_fact=anio, categoria="DESCUENTOS", subcategoria="CELULARES", estado="Procesado")
@@ -126,7 +121,7 @@ async def datos_retenciones(mes: int, anio: int, session: AsyncSession = Depends
 @router.post("/retenciones/preview")
 async def preview_retenciones(mes: int = Form(...), anio: int = Form(...), files: List[UploadFile] = File(...), session: AsyncSession = Depends(obtener_db), db_erp = Depends(obtener_erp_db_opcional)):
     archivos_binarios = [await f.read() for f in files]
-    rows, summary, warnings_txt = extraer_retenciones(archivos_binarios)
+    rows, summary, warnings_txt = await ejecutar_extractor(extraer_retenciones, archivos_binarios)
     summary.update({"mes": mes, "anio": anio})
     
     stmt_exc = select(NominaExcepcion).where(
@@ -180,14 +175,9 @@ async def preview_retenciones(mes: int = Form(...), anio: int = Form(...), files
 
     try:
         # Guardar archivo físico en disco para permitir descargas posteriores
-        import os, hashlib
-        STORAGE_DIR = "uploads/nomina"
-        os.makedirs(STORAGE_DIR, exist_ok=True)
         contenido = archivos_binarios[0] if archivos_binarios else b""
-        file_hash = hashlib.sha256(contenido).hexdigest()
-        filename = f"{file_hash}.xlsx"
-        path = os.path.join(STORAGE_DIR, filename)
-        with open(path, "wb") as f_out: f_out.write(contenido)
+        blob = await NominaService.reemplazar_archivo_original(session, "RETENCIONES", mes, anio, contenido)
+        file_hash, path = blob.sha256, blob.ruta_relativa
 
         await session.execute(delete(NominaRegistroNormalizado).where(NominaRegistroNormalizado.subcategoria_final == "RETENCIONES", NominaRegistroNormalizado.mes_fact == mes, NominaRegistroNormalizado.año_fact == anio))
         archivo = NominaArchivo(nombre_archivo=f"retenciones_{mes}_{anio}.xlsx", hash_archivo=file_hash, tamaño_bytes=sum(len(b) for b in archivos_binarios), tipo_archivo="xlsx", ruta_almacenamiento=path, mes_fact=mes, año_fact=anio, categoria="DESCUENTOS", subcategoria="RETENCIONES", estado="Procesado")
@@ -212,7 +202,7 @@ async def datos_embargos(mes: int, anio: int, session: AsyncSession = Depends(ob
 @router.post("/embargos/preview")
 async def preview_embargos(mes: int = Form(...), anio: int = Form(...), files: List[UploadFile] = File(...), session: AsyncSession = Depends(obtener_db), db_erp = Depends(obtener_erp_db_opcional)):
     archivos_binarios = [await f.read() for f in files]
-    rows, summary, warnings_txt = extraer_embargos(archivos_binarios)
+    rows, summary, warnings_txt = await ejecutar_extractor(extraer_embargos, archivos_binarios)
     summary.update({"mes": mes, "anio": anio})
     
     stmt_exc = select(NominaExcepcion).where(
@@ -266,14 +256,9 @@ async def preview_embargos(mes: int = Form(...), anio: int = Form(...), files: L
 
     try:
         # Guardar archivo físico en disco para permitir descargas posteriores
-        import os, hashlib
-        STORAGE_DIR = "uploads/nomina"
-        os.makedirs(STORAGE_DIR, exist_ok=True)
         contenido = archivos_binarios[0] if archivos_binarios else b""
-        file_hash = hashlib.sha256(contenido).hexdigest()
-        filename = f"{file_hash}.xlsx"
-        path = os.path.join(STORAGE_DIR, filename)
-        with open(path, "wb") as f_out: f_out.write(contenido)
+        blob = await NominaService.reemplazar_archivo_original(session, "EMBARGOS", mes, anio, contenido)
+        file_hash, path = blob.sha256, blob.ruta_relativa
 
         await session.execute(delete(NominaRegistroNormalizado).where(NominaRegistroNormalizado.subcategoria_final == "EMBARGOS", NominaRegistroNormalizado.mes_fact == mes, NominaRegistroNormalizado.año_fact == anio))
         archivo = NominaArchivo(nombre_archivo=f"embargos_{mes}_{anio}.xlsx", hash_archivo=file_hash, tamaño_bytes=sum(len(b) for b in archivos_binarios), tipo_archivo="xlsx", ruta_almacenamiento=path, mes_fact=mes, año_fact=anio, categoria="DESCUENTOS", subcategoria="EMBARGOS", estado="Procesado")
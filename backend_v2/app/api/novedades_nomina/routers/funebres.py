@@ -1,4 +1,3 @@
-import hashlib
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from fastapi import APIRouter, Depends, UploadFile, File, Form, Query, HTTPException
@@ -11,7 +10,9 @@ from ....models.novedades_nomina.nomina import (
 from ....services.erp.empleados_service import EmpleadosService
 from ....services.novedades_nomina.camposanto_extractor import extraer_camposanto
 from ....services.novedades_nomina.recordar_extractor import extraer_recordar
+from ....services.novedades_nomina.ejecutor_extraccion import ejecutar_extractor
 from ....services.novedades_nomina.excepcion_service import ExcepcionService
+from ....services.novedades_nomina.nomina_service import NominaService
 
 router = APIRouter(tags=["Funebres"])
 
@@ -55,7 +56,7 @@ async def preview_camposanto(
         } for e in excepciones_db
     }
 
-    rows, summary, warnings_txt = extraer_camposanto(archivos_binarios)
+    rows, summary, warnings_txt = await ejecutar_extractor(extraer_camposanto, archivos_binarios)
     summary["mes"] = mes
     summary["anio"] = anio
 
@@ -165,14 +166,9 @@ async def preview_camposanto(
 
     try:
         # Guardar archivo físico en disco para permitir descargas posteriores
-        import os, hashlib
-        STORAGE_DIR = "uploads/nomina"
-        os.makedirs(STORAGE_DIR, exist_ok=True)
         contenido = archivos_binarios[0] if archivos_binarios else b""
-        file_hash = hashlib.sha256(contenido).hexdigest()
-        filename = f"{file_hash}.pdf"
-        path = os.path.join(STORAGE_DIR, filename)
-        with open(path, "wb") as f_out: f_out.write(contenido)
+        blob = await NominaService.reemplazar_archivo_original(session, "CAMPOSANTO", mes, anio, contenido)
+        file_hash, path = blob.sha256, blob.ruta_relativa
 
         stmt_del = delete(NominaRegistroNormalizado).where(NominaRegistroNormalizado.subcategoria_final == "CAMPOSANTO", NominaRegistroNormalizado.mes_fact == mes, NominaRegistroNormalizado.año_fact == anio)
         await session.execute(stmt_del)
@@ -272,7 +268,7 @@ async def preview_recordar(
         } for e in excepciones_db
     }
 
-    rows, summary, warnings_txt = extraer_recordar(archivos_binarios)
+    rows, summary, warnings_txt = await ejecutar_extractor(extraer_recordar, archivos_binarios)
     summary["mes"] = mes
     summary["anio"] = anio
 
@@ -379,14 +375,9 @@ async def preview_recordar(
 
     try:
         # Guardar archivo físico en disco para permitir descargas posteriores
-        import os, hashlib
-        STORAGE_DIR = "uploads/nomina"
-        os.makedirs(STORAGE_DIR, exist_ok=True)
         contenido = archivos_binarios[0] if archivos_binarios else b""
-        file_hash = hashlib.sha256(contenido).hexdigest()
-        filename = f"{file_hash}.xlsx"
-        path = os.path.join(STORAGE_DIR, filename)
-        with open(path, "wb") as f_out: f_out.write(contenido)
+        blob = await NominaService.reemplazar_archivo_original(session, "RECORDAR", mes, anio, contenido)
+        file_hash, path = blob.sha256, blob.ruta_relativa
 
         stmt_del = delete(NominaRegistroNormalizado).where(NominaRegistroNormalizado.subcategoria_final == "RECORDAR", NominaRegistroNormalizado.mes_fact == mes, NominaRegistroNormalizado.año_fact == anio)
         await session.execute(stmt_del)
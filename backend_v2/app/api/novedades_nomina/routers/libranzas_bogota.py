@@ -1,4 +1,3 @@
-import hashlib
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from fastapi import APIRouter, Depends, UploadFile, File, Form, Query, HTTPException
@@ -10,7 +9,9 @@ from ....models.novedades_nomina.nomina import (
 )
 from ....services.erp.empleados_service import EmpleadosService
 from ....services.novedades_nomina.bogota_extractor import extraer_bogota_libranza
+from ....services.novedades_nomina.ejecutor_extraccion import ejecutar_extractor
 from ....services.novedades_nomina.excepcion_service import ExcepcionService
+from ....services.novedades_nomina.nomina_service import NominaService
 
 router = APIRouter(tags=["Libranzas - Bogotá"])
 
@@ -28,7 +29,7 @@ async def preview_bogota_libranza(
         contenido = await f.read()
         archivos_binarios.append(contenido)
 
-    rows, summary, warnings_txt = extraer_bogota_libranza(archivos_binarios)
+    rows, summary, warnings_txt = await ejecutar_extractor(extraer_bogota_libranza, archivos_binarios)
     summary["mes"] = mes
     summary["anio"] = anio
 
@@ -146,17 +147,9 @@ async def preview_bogota_libranza(
 
     try:
         # Guardar archivo físico en disco para permitir descargas posteriores
-        import os
-        STORAGE_DIR = "uploads/nomina"
-        os.makedirs(STORAGE_DIR, exist_ok=True)
-        
         contenido = archivos_binarios[0] if archivos_binarios else b""
-        file_hash = hashlib.sha256(contenido).hexdigest()
-        filename = f"{file_hash}.xlsx"
-        path = os.path.join(STORAGE_DIR, filename)
-        
-        with open(path, "wb") as f_out:
-            f_out.write(contenido)
+        blob = await NominaService.reemplazar_archivo_original(session, "BOGOTA LIBRANZA", mes, anio, contenido)
+        file_hash, path = blob.sha256, blob.ruta_relativa
 
         await session.execute(delete(NominaRegistroNormalizado).where(NominaRegistroNormalizado.subcategoria_final == "BOGOTA LIBRANZA", NominaRegistroNormalizado.mes_fact == mes, NominaRegistroNormalizado.año_fact == anio))
         archivo = NominaArchivo(
@@ -1,4 +1,3 @@
-import hashlib
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from fastapi import APIRouter, Depends, UploadFile, File, Form, Query, HTTPException
@@ -10,7 +9,9 @@ from ....models.novedades_nomina.nomina import (
 )
 from ....services.erp.empleados_service import EmpleadosService
 from ....services.novedades_nomina.occidente_extractor import extraer_occidente_libranza
+from ....services.novedades_nomina.ejecutor_extraccion import ejecutar_extractor
 from ....services.novedades_nomina.excepcion_service import ExcepcionService
+from ....services.novedades_nomina.nomina_service import NominaService
 
 router = APIRouter(tags=["Libranzas - Occidente"])
 
@@ -18,7 +19,7 @@ router = APIRouter(tags=["Libranzas - Occidente"])
 async def preview_occidente_libranza(mes: int = Form(...), anio: int = Form(...), files: List[UploadFile] = File(...), session: AsyncSession = Depends(obtener_db), db_erp = Depends(obtener_erp_db_opcional)):
     """Procesa Excel de LIBRANZA OCCIDENTE, enriquece con ERP, guarda en BD."""
     archivos_binarios = [await f.read() for f in files]
-    rows, summary, warnings_txt = extraer_occidente_libranza(archivos_binarios)
+    rows, summary, warnings_txt = await ejecutar_extractor(extraer_occidente_libranza, archivos_binarios)
     summary.update({"mes": mes, "anio": anio})
 
     stmt_exc = select(NominaExcepcion).where(
@@ -134,14 +135,9 @@ async def preview_occidente_libranza(mes: int = Form(...), anio: int = Form(...)
 
     try:
         # Guardar archivo físico en disco para permitir descargas posteriores
-        import os, hashlib
-        STORAGE_DIR = "uploads/nomina"
-        os.makedirs(STORAGE_DIR, exist_ok=True)
         contenido = archivos_binarios[0] if archivos_binarios else b""
-        file_hash = hashlib.sha256(contenido).hexdigest()
-        filename = f"{file_hash}.xlsx"
-        path = os.path.join(STORAGE_DIR, filename)
-        with open(path, "wb") as f_out: f_out.write(contenido)
+        blob = await NominaService.reemplazar_archivo_original(session, "OCCIDENTE LIBRANZA", mes, anio, contenido)
+        file_hash, path = blob.sha256, blob.ruta_relativa
 
         await session.execute(delete(NominaRegistroNormalizado).where(NominaRegistroNormalizado.subcategoria_final == "OCCIDENTE LIBRANZA", NominaRegistroNormalizado.mes_fact == mes, NominaRegistroNormalizado.año_fact == anio))
         archivo = NominaArchivo(nombre_archivo=f"occidente_libranza_{mes}_{anio}.xlsx", hash_archivo=file_hash, tamaño_bytes=sum(len(b) for b in archivos_binarios), tipo_archivo="xlsx", ruta_almacenamiento=path, mes_fact=mes, año_fact=anio, categoria="LIBRANZAS", subcategoria="OCCIDENTE LIBRANZA", estado="Procesado")
@@ -3,6 +3,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from ....database import obtener_db
 from ....services.novedades_nomina.tabla_maestra_service import TablaMaestraService
+from ....services.exportacion import respuesta_xlsx
 
 logger = logging.getLogger(__name__)
 
@@ -61,3 +62,40 @@ async def generar_tabla_maestra(
             status_code=500,
             detail="Error al generar la tabla maestra",
         )
+
+
+@router.get("/exportar")
+async def exportar_tabla_maestra(
+    mes: int = Query(..., ge=1, le=12),
+    anio: int = Query(..., ge=2020, le=2099),
+    quincena: str = Query(..., pattern="^(Q1|Q2)$"),
+    session: AsyncSession = Depends(obtener_db),
+):
+    """Genera la tabla maestra del período y la descarga en Excel."""
+    try:
+        resultado = await TablaMaestraService.generar_tabla_maestra(
+            session, mes, anio, quincena
+        )
+
+        if resultado.get("error"):
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "mensaje": resultado["mensaje"],
+                    "faltantes": resultado["faltantes"],
+                },
+            )
+
+        filas = resultado["filas"]
+        return await respuesta_xlsx(
+            lambda: TablaMaestraService.exportar_xlsx(filas, quincena),
+            f"Tabla_Maestra_{anio}_{mes:02d}_{quincena}.xlsx",
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error exportando tabla maestra: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error al exportar la tabla maestra",
+        )
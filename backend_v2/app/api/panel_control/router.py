@@ -9,10 +9,15 @@ from sqlmodel import select
 from sqlalchemy import func
 
 from datetime import timedelta
-from app.database import obtener_db
-from app.utils_cache import global_cache
+from app.core.agregados import Conteos, contar
+from app.database import AsyncSessionLocal, obtener_db
+from app.services.cache import cache
 from app.utils_date import get_bogota_now
 from app.services.ticket.mantenimiento_service import ServicioMantenimientoTicket
+from app.services.novedades_nomina.ejecutor_extraccion import obtener_metricas_extraccion
+from app.services.realtime.hub import hub as hub_tiempo_real
+from app.services.panel_control.presencia_service import PresenciaService
+from app.services.panel_control.tablero_service import TableroService
 
 router = APIRouter()
 
@@ -33,50 +38,40 @@ async def ejecutar_limpieza_tickets(db: AsyncSession = Depends(obtener_db)):
 
 
 @router.get("/metricas")
-async def obtener_metricas(db: AsyncSession = Depends(obtener_db)):
+async def obtener_metricas():
     """Retorna métricas generales del dashboard con caché"""
     cache_key = "panel_metricas_generales"
-    cached = global_cache.get(cache_key)
-    if cached:
-        return cached
 
-    try:
+    async def _cargar():
         from app.models.ticket.ticket import Ticket as TicketModel
         from app.models.desarrollo.desarrollo import Desarrollo as DesarrolloModel
 
-        # Consultas asíncronas usando select
-        res_total_des = await db.execute(select(func.count(DesarrolloModel.id)))
-        total_desarrollos = res_total_des.scalar() or 0
-
-        res_activos = await db.execute(
-            select(func.count(DesarrolloModel.id)).where(
-                DesarrolloModel.estado_general.in_(
-                    ["En Progreso", "Activo", "activo", "En curso", "En proceso"]
-                )
-            )
-        )
-        desarrollos_activos = res_activos.scalar() or 0
-
-        res_total_tk = await db.execute(select(func.count(TicketModel.id)))
-        total_tickets = res_total_tk.scalar() or 0
-
-        res_pend_tk = await db.execute(
-            select(func.count(TicketModel.id)).where(
-                TicketModel.estado.in_(
-                    ["Abierto", "Asignado", "En Proceso", "Pendiente Info", "Escalado"]
-                )
-            )
-        )
-        tickets_pendientes = res_pend_tk.scalar() or 0
-
-        res_comp = await db.execute(
-            select(func.count(DesarrolloModel.id)).where(
-                DesarrolloModel.estado_general.in_(
-                    ["Completado", "Terminado", "completado"]
-                )
+        # Un solo viaje: conteos con FILTER de desarrollos y tickets. La carga es
+        # compartida y puede sobrevivir a este request: usa su propia sesión.
+        async with AsyncSessionLocal() as db:
+            conteos = await contar(
+                db,
+                Conteos(DesarrolloModel, {
+                    "total_desarrollos": None,
+                    "desarrollos_activos": DesarrolloModel.estado_general.in_(
+                        ["En Progreso", "Activo", "activo", "En curso", "En proceso"]
+                    ),
+                    "completados": DesarrolloModel.estado_general.in_(
+                        ["Completado", "Terminado", "completado"]
+                    ),
+                }),
+                Conteos(TicketModel, {
+                    "total_tickets": None,
+                    "tickets_pendientes": TicketModel.estado.in_(
+                        ["Abierto", "Asignado", "En Proceso", "Pendiente Info", "Escalado"]
+                    ),
+                }),
             )
-        )
-        completados = res_comp.scalar() or 0
+        total_desarrollos = conteos["total_desarrollos"]
+        desarrollos_activos = conteos["desarrollos_activos"]
+        total_tickets = conteos["total_tickets"]
+        tickets_pendientes = conteos["tickets_pendientes"]
+        completados = conteos["completados"]
 
         porcentaje = round(
             (completados / total_desarrollos * 100) if total_desarrollos > 0 else 0, 1
@@ -90,8 +85,10 @@ async def obtener_metricas(db: AsyncSession = Depends(obtener_db)):
             "porcentaje_completado": porcentaje,
             "desarrollos_completados": completados,
         }
-        global_cache.set(cache_key, data)
         return data
+
+    try:
+        return await cache.obtener_o_cargar(cache_key, _cargar, etiquetas=("tickets", "desarrollos"))
     except Exception as e:
         import logging
 
@@ -110,15 +107,11 @@ async def obtener_metricas(db: AsyncSession = Depends(obtener_db)):
 async def obtener_actividades_pendientes(
     limit: int = 10,
     status: str = "pendientes_en_curso",
-    db: AsyncSession = Depends(obtener_db),
 ):
     """Retorna lista de actividades pendientes con caché"""
     cache_key = f"panel_actividades_{status}_{limit}"
-    cached = global_cache.get(cache_key)
-    if cached:
-        return cached
 
-    try:
+    async def _cargar():
         from app.models.ticket.ticket import Ticket as TicketModel
 
         st = select(TicketModel)
@@ -136,8 +129,9 @@ async def obtener_actividades_pendientes(
             }
             st = st.where(TicketModel.estado == estado_map.get(status, status))
 
-        res = await db.execute(st.order_by(TicketModel.creado_en.desc()).limit(limit))
-        tickets = res.scalars().all()
+        async with AsyncSessionLocal() as db:
+            res = await db.execute(st.order_by(TicketModel.creado_en.desc()).limit(limit))
+            tickets = res.scalars().all()
 
         actividades = []
         for t in tickets:
@@ -163,8 +157,10 @@ async def obtener_actividades_pendientes(
                 }
             )
 
-        global_cache.set(cache_key, actividades)
         return actividades
+
+    try:
+        return await cache.obtener_o_cargar(cache_key, _cargar, etiquetas=("tickets",))
     except Exception as e:
         import logging
 
@@ -173,51 +169,16 @@ async def obtener_actividades_pendientes(
 
 
 @router.get("/progreso-semanal")
-async def obtener_progreso_semanal(db: AsyncSession = Depends(obtener_db)):
+async def obtener_progreso_semanal():
     """Retorna datos de progreso semanal con caché"""
     cache_key = "panel_progreso_semanal"
-    cached = global_cache.get(cache_key)
-    if cached:
-        return cached
-
-    try:
-        from app.models.ticket.ticket import Ticket as TicketModel
-
-        hoy = get_bogota_now()
-        semanas = []
-
-        for i in range(4):
-            inicio = hoy - timedelta(weeks=i + 1)
-            fin = hoy - timedelta(weeks=i)
-
-            res_comp = await db.execute(
-                select(func.count(TicketModel.id)).where(
-                    TicketModel.estado == "Cerrado",
-                    TicketModel.fecha_cierre.between(inicio, fin),
-                )
-            )
-            completados = res_comp.scalar() or 0
 
-            res_crea = await db.execute(
-                select(func.count(TicketModel.id)).where(
-                    TicketModel.creado_en.between(inicio, fin)
-                )
-            )
-            creados = res_crea.scalar() or 0
+    async def _cargar():
+        async with AsyncSessionLocal() as db:
+            return await TableroService.progreso_semanal(db)
 
-            semanas.insert(
-                0,
-                {
-                    "semana": f"S{4 - i}",
-                    "nombre": f"Semana {4 - i}",
-                    "completados": completados,
-                    "creados": creados,
-                    "pendientes": max(0, creados - completados),
-                },
-            )
-
-        global_cache.set(cache_key, semanas)
-        return semanas
+    try:
+        return await cache.obtener_o_cargar(cache_key, _cargar, etiquetas=("tickets",))
     except Exception as e:
         import logging
 
@@ -235,22 +196,20 @@ async def obtener_progreso_semanal(db: AsyncSession = Depends(obtener_db)):
 
 
 @router.get("/distribucion-prioridad")
-async def obtener_distribucion_prioridad(db: AsyncSession = Depends(obtener_db)):
+async def obtener_distribucion_prioridad():
     """Retorna distribución de tickets por prioridad con caché"""
     cache_key = "panel_distribucion_prioridad"
-    cached = global_cache.get(cache_key)
-    if cached:
-        return cached
 
-    try:
+    async def _cargar():
         from app.models.ticket.ticket import Ticket as TicketModel
 
-        res = await db.execute(
-            select(
-                TicketModel.prioridad, func.count(TicketModel.id).label("cantidad")
-            ).group_by(TicketModel.prioridad)
-        )
-        prioridades = res.all()
+        async with AsyncSessionLocal() as db:
+            res = await db.execute(
+                select(
+                    TicketModel.prioridad, func.count(TicketModel.id).label("cantidad")
+                ).group_by(TicketModel.prioridad)
+            )
+            prioridades = res.all()
 
         colores = {
             "Alta": "#ef4444",
@@ -271,8 +230,10 @@ async def obtener_distribucion_prioridad(db: AsyncSession = Depends(obtener_db))
         if not result:
             result = [{"prioridad": "Sin asignar", "cantidad": 0, "color": "#6b7280"}]
 
-        global_cache.set(cache_key, result)
         return result
+
+    try:
+        return await cache.obtener_o_cargar(cache_key, _cargar, etiquetas=("tickets",))
     except Exception as e:
         import logging
 
@@ -289,6 +250,10 @@ async def registrar_actividad(
         from app.models.auth.usuario import Sesion
         from sqlalchemy import update
 
+        # Presencia en Redis (volcado a Postgres en lote); UPDATE directo sin Redis.
+        if await PresenciaService.registrar_latido(db, token_sesion):
+            return {"status": "ok"}
+
         await db.execute(
             update(Sesion)
             .where(Sesion.token_sesion == token_sesion)
@@ -304,67 +269,17 @@ async def registrar_actividad(
 async def obtener_estado_sistema(db: AsyncSession = Depends(obtener_db)):
     """Retorna el estado detallado de salud y actividad del sistema"""
     try:
-        from app.models.auth.usuario import Sesion, Usuario
-        from app.models.ticket.ticket import Ticket as TicketModel
-
         ahora = get_bogota_now()
-        hace_1_hora = ahora - timedelta(hours=1)
-
-        # 1. Usuarios en línea (Únicos, sin Logout, actividad < 1h o nueva)
-        # Usamos func.count(distinct(Sesion.usuario_id)) para obtener el número real de personas
-        from sqlalchemy import or_, distinct
-
-        res_online = await db.execute(
-            select(func.count(distinct(Sesion.usuario_id))).where(
-                Sesion.fin_sesion.is_(None),
-                or_(
-                    Sesion.ultima_actividad_en.is_(None),
-                    Sesion.ultima_actividad_en >= hace_1_hora,
-                ),
-            )
-        )
-        usuarios_online = res_online.scalar() or 0
 
-        # 2. Usuarios totales activos
-        res_total_usr = await db.execute(
-            select(func.count(Usuario.id)).where(Usuario.esta_activo)
-        )
-        total_usuarios = res_total_usr.scalar() or 0
-
-        # 3. Métricas de servidor (Linux/Docker)
-        import os
-
-        def get_mem_usage():
-            try:
-                # Leer /proc/meminfo de forma economica
-                with open("/proc/meminfo", "r") as f:
-                    lines = f.readlines()
-                total = int(lines[0].split()[1]) / 1024  # MB
-                # available se prefiere sobre free para saber la memoria real usable
-                available = (
-                    int(
-                        [line for line in lines if "MemAvailable" in line][0].split()[1]
-                    )
-                    / 1024
-                )
-                return round(total - available, 1), round(total, 1)
-            except Exception:
-                return 0.0, 0.0
-
-        def get_cpu_load():
-            try:
-                # Carga promedio del sistema (1 min)
-                return round(os.getloadavg()[0], 2)
-            except Exception:
-                return 0.0
-
-        mem_used, mem_total = get_mem_usage()
-
-        # 4. Tickets criticos/pendientes
-        res_pend = await db.execute(
-            select(func.count(TicketModel.id)).where(TicketModel.estado != "Cerrado")
-        )
-        tickets_pendientes = res_pend.scalar() or 0
+        # 1. Usuarios en línea (únicos, sin logout, actividad < 1h o nueva)
+        usuarios_online = await PresenciaService.contar_usuarios_en_linea(timedelta(hours=1))
+        if usuarios_online is None:
+            usuarios_online = await TableroService.contar_usuarios_en_linea(db, ahora - timedelta(hours=1))
+
+        # 2. Usuarios totales activos, 3. servidor (Linux/Docker) y 4. tickets pendientes
+        total_usuarios = await TableroService.contar_usuarios_activos(db)
+        mem_used, mem_total = TableroService.uso_memoria()
+        tickets_pendientes = await TableroService.contar_tickets_abiertos(db)
 
         return {
             "usuarios": {
@@ -372,7 +287,7 @@ async def obtener_estado_sistema(db: AsyncSession = Depends(obtener_db)):
                 "total_registrados": total_usuarios,
             },
             "servidor": {
-                "cpu_load": get_cpu_load(),
+                "cpu_load": TableroService.carga_cpu(),
                 "ram_uso_mb": mem_used,
                 "ram_total_mb": mem_total,
                 "uptime": "Normal",
@@ -380,6 +295,9 @@ async def obtener_estado_sistema(db: AsyncSession = Depends(obtener_db)):
             "operacion": {
                 "tickets_pendientes": tickets_pendientes,
                 "db_status": "online",
+                "extraccion_nomina": obtener_metricas_extraccion(),
+                "tiempo_real": hub_tiempo_real.obtener_metricas(),
+                "cache": cache.obtener_metricas(),
             },
             "timestamp": ahora.isoformat(),
         }
@@ -429,29 +347,8 @@ async def obtener_historial_metricas(
 async def obtener_sesiones_activas(db: AsyncSession = Depends(obtener_db)):
     """Retorna lista de sesiones ÚNICAS por usuario que no han cerrado sesion"""
     try:
-        from app.models.auth.usuario import Sesion
-        from sqlalchemy import or_
-
         ahora = get_bogota_now()
-        hace_1_hora = ahora - timedelta(hours=1)
-
-        # Usamos DISTINCT ON (usuario_id) de PostgreSQL para obtener solo la mas reciente
-        # Nota: En SQLAlchemy/PostgreSQL, si usas DISTINCT ON, el primer ORDER BY debe ser la columna del DISTINCT
-        stmt = (
-            select(Sesion)
-            .distinct(Sesion.usuario_id)
-            .where(
-                Sesion.fin_sesion.is_(None),
-                or_(
-                    Sesion.ultima_actividad_en.is_(None),
-                    Sesion.ultima_actividad_en >= hace_1_hora,
-                ),
-            )
-            .order_by(Sesion.usuario_id, Sesion.creado_en.desc())
-        )
-
-        result = await db.execute(stmt)
-        sesiones = result.scalars().all()
+        sesiones = await TableroService.sesiones_activas(db, ahora - timedelta(hours=1))
 
         respuesta = []
         for s in sesiones:
@@ -5,26 +5,26 @@ from sqlmodel import select, SQLModel
 from typing import List
 from ...models.solid.solid import ModuloSolid, ComponenteSolid
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import obtener_db, async_engine
+from app.database import AsyncSessionLocal, obtener_db, async_engine
 
-from app.utils_cache import global_cache
+from app.services.cache import cache
 
 router = APIRouter()
 
 
 @router.get("/modulos", response_model=List[ModuloSolid])
-async def listar_modulos(sesion: AsyncSession = Depends(obtener_db)):
+async def listar_modulos():
     """Lista todos los modulos de SOLID con cache"""
-    cache_key = "solid_modulos"
-    cached_data = global_cache.get(cache_key)
-    if cached_data:
-        return cached_data
+    # La carga es compartida y puede sobrevivir a este request: usa su propia sesión.
+    async def _cargar():
+        st = select(ModuloSolid)
+        async with AsyncSessionLocal() as sesion:
+            return (await sesion.execute(st)).scalars().all()
 
     try:
-        st = select(ModuloSolid)
-        resultado = (await sesion.execute(st)).scalars().all()
-        global_cache.set(cache_key, resultado)
-        return resultado
+        return await cache.obtener_o_cargar(
+            "solid_modulos", _cargar, ttl=300, etiquetas=("catalogo_solid",)
+        )
     except Exception as e:
         logging.error(f"Error en GET /solid/modulos: {e}")
         raise HTTPException(status_code=500, detail="Error al consultar módulos SOLID")
@@ -79,6 +79,7 @@ async def seed_solid(sesion: AsyncSession = Depends(obtener_db)):
                 mensajes.append(f"Modulo {mod_data['nombre']} ya existe")
 
         await sesion.commit()
+        await cache.invalidar("catalogo_solid")
         return {"resultado": mensajes}
     except Exception as e:
         await sesion.rollback()
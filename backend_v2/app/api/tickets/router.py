@@ -2,15 +2,17 @@
 Router de Tickets - Backend V2 (Async + SQLModel)
 """
 
+from datetime import date
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect, BackgroundTasks
 from pathlib import Path
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 from sqlalchemy import func as sa_func
+from starlette.datastructures import UploadFile
+from starlette.exceptions import HTTPException as StarletteHTTPException
 
-from app.database import obtener_db
+from app.database import AsyncSessionLocal, obtener_db
 from app.api.auth.router import obtener_usuario_actual_db, obtener_usuario_actual_opcional
 from app.models.auth.usuario import Usuario
 from app.models.ticket.ticket import (
@@ -28,8 +30,11 @@ from app.models.ticket.ticket import (
     ComentarioPublico,
 )
 from app.services.ticket.servicio import ServicioTicket
+from app.services.ticket.attachment_service import AdjuntoDemasiadoGrande, AdjuntoInvalido
+from app.core.middleware.limite_carga_actividad import CargaActividadExcedida
 from app.services.ticket.bi_service import TicketBIService
-from app.utils_cache import global_cache
+from app.services.cache import cache
+from app.services.almacenamiento import respuesta_archivo, sha256_de_ruta
 from app.core.config import obtener_configuracion
 from app.services.ticket.ws_manager import manager
 
@@ -38,17 +43,20 @@ config = obtener_configuracion()
 
 
 @router.get("/categorias", response_model=List[CategoriaTicket])
-async def listar_categorias(db: AsyncSession = Depends(obtener_db)):
+async def listar_categorias():
     """Retorna lista de categorias de soporte con cache"""
-    cache_key = "ticket_categorias"
-    cached_data = global_cache.get(cache_key)
-    if cached_data:
-        return cached_data
+    # La carga es compartida y puede sobrevivir a este request: usa su propia sesión.
+    async def _cargar():
+        async with AsyncSessionLocal() as db:
+            return await ServicioTicket.listar_categorias(db)
 
     try:
-        data = await ServicioTicket.listar_categorias(db)
-        global_cache.set(cache_key, data)
-        return data
+        return await cache.obtener_o_cargar(
+            "ticket_categorias",
+            _cargar,
+            ttl=300,
+            etiquetas=("catalogo_tickets",),
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error al obtener categorias: {str(e)}"
@@ -56,17 +64,18 @@ async def listar_categorias(db: AsyncSession = Depends(obtener_db)):
 
 
 @router.get("/estadisticas/resumen")
-async def obtener_resumen_estadisticas(db: AsyncSession = Depends(obtener_db)):
+async def obtener_resumen_estadisticas():
     """Retorna resumen de estadisticas de tickets con cache"""
-    cache_key = "ticket_stats_resumen"
-    cached_data = global_cache.get(cache_key)
-    if cached_data:
-        return cached_data
+    async def _cargar():
+        async with AsyncSessionLocal() as db:
+            return await ServicioTicket.obtener_estadisticas_resumen(db)
 
     try:
-        data = await ServicioTicket.obtener_estadisticas_resumen(db)
-        global_cache.set(cache_key, data)
-        return data
+        return await cache.obtener_o_cargar(
+            "ticket_stats_resumen",
+            _cargar,
+            etiquetas=("tickets",),
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -93,82 +102,17 @@ async def obtener_data_bi(db: AsyncSession = Depends(obtener_db)):
 
 
 @router.get("/estadisticas/rendimiento")
-async def obtener_rendimiento(db: AsyncSession = Depends(obtener_db)):
-    """Retorna metricas de rendimiento por analista"""
+async def obtener_rendimiento(
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    area: Optional[str] = None,
+    db: AsyncSession = Depends(obtener_db),
+):
+    """Retorna metricas de rendimiento por analista (rango de creacion y area opcionales)"""
     try:
-        # Obtener lista de analistas unicos que tienen tickets asignados
-        result = await db.execute(
-            select(Ticket.asignado_a).where(Ticket.asignado_a.is_not(None)).distinct()
+        return await ServicioTicket.obtener_rendimiento_analistas(
+            db, fecha_desde=fecha_desde, fecha_hasta=fecha_hasta, area=area
         )
-        analistas = [a[0] for a in result.all()]
-
-        ranking = []
-        for nombre in analistas:
-            # Tickets finalizados para cálculo de tiempo real
-            result_resueltos = await db.execute(
-                select(Ticket.creado_en, Ticket.resuelto_en).where(
-                    Ticket.asignado_a == nombre,
-                    Ticket.estado.in_(["Resuelto", "Cerrado"]),
-                    Ticket.resuelto_en.is_not(None),
-                )
-            )
-            data_resueltos = result_resueltos.all()
-            resueltos_analista = len(data_resueltos)
-
-            avg_h = 0
-            if data_resueltos:
-                tiempos = [
-                    (t.resuelto_en - t.creado_en).total_seconds() / 3600
-                    for t in data_resueltos
-                    if t.resuelto_en and t.creado_en
-                ]
-                avg_h = round(sum(tiempos) / len(tiempos), 1) if tiempos else 0
-
-            # Carga activa actual (Operational Load)
-            active_res = await db.execute(
-                select(sa_func.count(Ticket.id)).where(
-                    Ticket.asignado_a == nombre,
-                    Ticket.estado.in_(
-                        [
-                            "Abierto",
-                            "Asignado",
-                            "En Proceso",
-                            "Pendiente Info",
-                            "Escalado",
-                        ]
-                    ),
-                )
-            )
-            carga_activa = active_res.scalar() or 0
-
-            # Conteo específico de tickets en proceso
-            proceso_res = await db.execute(
-                select(sa_func.count(Ticket.id)).where(
-                    Ticket.asignado_a == nombre, Ticket.estado == "En Proceso"
-                )
-            )
-            en_proceso = proceso_res.scalar() or 0
-
-            # Score de desempeño histórico
-            total_hist_res = await db.execute(
-                select(sa_func.count(Ticket.id)).where(Ticket.asignado_a == nombre)
-            )
-            total_hist = total_hist_res.scalar() or 1
-            score = resueltos_analista / total_hist * 100
-
-            ranking.append(
-                {
-                    "name": nombre,
-                    "total": carga_activa,
-                    "cerrados": resueltos_analista,
-                    "en_proceso": en_proceso,
-                    "avg_time": avg_h,
-                    "performance_score": round(score, 1),
-                }
-            )
-
-        ranking.sort(key=lambda x: x["total"], reverse=True)
-        return ranking
     except Exception:
         return []
 
@@ -396,13 +340,73 @@ async def listar_adjuntos(ticket_id: str, db: AsyncSession = Depends(obtener_db)
 async def subir_adjunto(
     ticket_id: str, adjunto: AdjuntoCrear, db: AsyncSession = Depends(obtener_db)
 ):
-    """Guarda un archivo adjunto delegando al servicio"""
+    """
+    [LEGADO] Guarda un adjunto enviado como Base64 en JSON.
+    Usar POST /{ticket_id}/adjuntos/archivo (multipart) en clientes nuevos.
+    """
     try:
         return await ServicioTicket.subir_adjunto(db, ticket_id, adjunto)
+    except AdjuntoDemasiadoGrande as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except AdjuntoInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post(
+    "/{ticket_id}/adjuntos/archivo",
+    response_model=AdjuntoTicket,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["archivo"],
+                        "properties": {"archivo": {"type": "string", "format": "binary"}},
+                    }
+                }
+            },
+        }
+    },
+)
+async def subir_adjunto_archivo(
+    ticket_id: str, request: Request, db: AsyncSession = Depends(obtener_db)
+):
+    """
+    Carga multipart de un adjunto en streaming. El tamaño del cuerpo lo
+    limita el middleware antes del parser (Content-Length o conteo de bytes)
+    y el servicio lo vuelve a verificar mientras copia el archivo al disco.
+    """
+    try:
+        existe = await db.scalar(select(Ticket.id).where(Ticket.id == ticket_id))
+        if not existe:
+            raise HTTPException(status_code=404, detail="Ticket no encontrado")
+        # Libera la transacción de solo lectura antes de recibir el cuerpo multipart.
+        await db.rollback()
+
+        async with request.form(max_files=1, max_fields=0) as formulario:
+            elementos = formulario.multi_items()
+            if len(elementos) != 1 or elementos[0][0] != "archivo":
+                raise AdjuntoInvalido("Debe enviar un único archivo")
+            archivo = elementos[0][1]
+            if not isinstance(archivo, UploadFile):
+                raise AdjuntoInvalido("El campo archivo no es válido")
+            return await ServicioTicket.subir_adjunto_archivo(db, ticket_id, archivo)
+    except (StarletteHTTPException, CargaActividadExcedida):
+        # Incluye los 400 del parser multipart; el 413 lo responde el middleware.
+        raise
+    except AdjuntoDemasiadoGrande as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except AdjuntoInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error al guardar adjunto: {str(e)}")
+
+
 @router.get("/adjuntos/{adjunto_id}", response_model=AdjuntoTicket)
 async def obtener_adjunto(adjunto_id: int, db: AsyncSession = Depends(obtener_db)):
     """
@@ -427,10 +431,13 @@ async def obtener_adjunto(adjunto_id: int, db: AsyncSession = Depends(obtener_db
 
 
 @router.get("/adjuntos/{adjunto_id}/archivo")
-async def descargar_archivo_adjunto(adjunto_id: int, db: AsyncSession = Depends(obtener_db)):
+async def descargar_archivo_adjunto(
+    adjunto_id: int, request: Request, db: AsyncSession = Depends(obtener_db)
+):
     """
     Sirve el archivo físico desde el disco. 
     Solo funciona para archivos guardados con el nuevo sistema (ruta_archivo).
+    Responde 304 si el cliente ya tiene la versión (ETag) y admite Range.
     """
     try:
         result = await db.execute(
@@ -444,10 +451,13 @@ async def descargar_archivo_adjunto(adjunto_id: int, db: AsyncSession = Depends(
         if not abs_path.exists():
             raise HTTPException(status_code=404, detail="El archivo no existe en el servidor")
 
-        return FileResponse(
-            path=abs_path,
-            filename=adjunto.nombre_archivo,
-            media_type=adjunto.tipo_mime or "application/octet-stream"
+        return await respuesta_archivo(
+            request,
+            abs_path,
+            adjunto.nombre_archivo,
+            adjunto.tipo_mime or "application/octet-stream",
+            sha256=sha256_de_ruta(adjunto.ruta_archivo),
+            headers={"Cache-Control": "private, no-cache"},
         )
     except HTTPException:
         raise
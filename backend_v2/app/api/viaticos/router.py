@@ -1,15 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional, Union
 from datetime import date
 from pydantic import BaseModel
 
-from ...database import obtener_erp_db
+from ...database import SessionErp, obtener_erp_db
 from ...services.erp import ViaticosService, ViaticosQueryService
+from ...services.erp.catalogo_replica_service import CatalogoReplicaService, encabezados_origen
+from ...services.exportacion import respuesta_xlsx
 
 router = APIRouter(prefix="/viaticos")
 
+# OTs por página en la búsqueda por tecla
+LIMITE_OTS = 50
+
 # --- Schemas ---
 
 
@@ -65,10 +69,25 @@ def obtener_categorias_legalizacion(db_erp: Session = Depends(obtener_erp_db)):
 
 
 @router.get("/ots", response_model=List[OTResponse])
-def buscar_ots(query: Optional[str] = None, db_erp: Session = Depends(obtener_erp_db)):
-    """Busca OTs en la tabla otviaticos del ERP"""
+def buscar_ots(
+    response: Response,
+    query: Optional[str] = None,
+    despues: Optional[str] = None,
+    db_erp: Session = Depends(obtener_erp_db),
+):
+    """
+    Busca OTs (réplica local de otviaticos; ERP si la réplica está vencida).
+    `despues` = último número recibido (X-Siguiente-Cursor) para paginar por llave.
+    """
+    replica = CatalogoReplicaService.buscar_ots(query, LIMITE_OTS, despues)
+    if replica is not None:
+        resultado, antiguedad = replica
+        response.headers.update(encabezados_origen(antiguedad, resultado, LIMITE_OTS, "numero"))
+        return [OTResponse(**row) for row in resultado]
+
     try:
-        resultado = ViaticosQueryService.buscar_ots(db_erp, query)
+        resultado = ViaticosQueryService.buscar_ots(db_erp, query, LIMITE_OTS, despues)
+        response.headers.update(encabezados_origen(None, resultado, LIMITE_OTS, "numero"))
         return [OTResponse(**row) for row in resultado]
     except Exception as e:
         print(f"ERROR ERP: {e}")
@@ -78,10 +97,19 @@ def buscar_ots(query: Optional[str] = None, db_erp: Session = Depends(obtener_er
 
 
 @router.get("/ot/{numero}/combinaciones", response_model=List[OTResponse])
-def obtener_combinaciones_ot(numero: str, db_erp: Session = Depends(obtener_erp_db)):
+def obtener_combinaciones_ot(
+    numero: str, response: Response, db_erp: Session = Depends(obtener_erp_db)
+):
     """Obtiene todas las combinaciones de CC/SCC para una OT específica"""
+    replica = CatalogoReplicaService.obtener_combinaciones_ot(numero)
+    if replica is not None:
+        resultado, antiguedad = replica
+        response.headers.update(encabezados_origen(antiguedad))
+        return [OTResponse(**row) for row in resultado]
+
     try:
         resultado = ViaticosQueryService.obtener_combinaciones_ot(db_erp, numero)
+        response.headers.update(encabezados_origen(None))
         return [OTResponse(**row) for row in resultado]
     except Exception as e:
         print(f"ERROR ERP combinaciones: {e}")
@@ -105,6 +133,9 @@ async def enviar_reporte(
             "count": len(reporte.gastos),
             "mensaje": "Reporte enviado correctamente a la tabla de tránsito del ERP",
         }
+    except ValueError as e:
+        # Líneas inválidas: se rechazan antes de escribir en el ERP
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"ERROR ENVIAR ERP: {e}")
         raise HTTPException(
@@ -144,22 +175,20 @@ def obtener_estado_cuenta(
 
 
 @router.get("/estado-cuenta/xlsx")
-def exportar_estado_cuenta_xlsx(
+async def exportar_estado_cuenta_xlsx(
     cedula: str,
     desde: Optional[date] = None,
     hasta: Optional[date] = None,
-    db_erp: Session = Depends(obtener_erp_db),
 ):
-    """Genera y descarga el estado de cuenta en formato XLSX"""
+    """Genera y descarga el estado de cuenta en formato XLSX (consulta y escritura en un hilo)"""
+
+    def _generar() -> str:
+        with SessionErp() as db_erp:
+            return ViaticosService.exportar_estado_cuenta_xlsx(db_erp, cedula, desde, hasta)
+
     try:
-        buffer = ViaticosService.exportar_estado_cuenta_xlsx(db_erp, cedula, desde, hasta)
         filename = f"Estado_Cuenta_{cedula}_{date.today().strftime('%Y%m%d')}.xlsx"
-
-        return StreamingResponse(
-            buffer,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename={filename}"},
-        )
+        return await respuesta_xlsx(_generar, filename)
     except Exception as e:
         print(f"ERROR ERP Export XLSX: {e}")
         raise HTTPException(
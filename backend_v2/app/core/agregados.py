@@ -0,0 +1,60 @@
+"""
+Conteos agregados con `COUNT(*) FILTER (WHERE ...)` a partir de una especificación.
+
+Cada tablero pedía un COUNT por indicador (un viaje a la base por número).
+Aquí los indicadores se declaran como {nombre: condición} y se resuelven en
+una sola sentencia; varias tablas se combinan como subconsultas de una fila.
+
+    resumen = await contar(db, Conteos(Ticket, {
+        "total": None,
+        "cerrados": Ticket.estado == "Cerrado",
+    }))
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional
+
+from sqlalchemy import func, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import ColumnElement, Select
+
+
+@dataclass(frozen=True)
+class Conteos:
+    """Indicadores de una tabla: condición por nombre (None = todas las filas)."""
+
+    tabla: Any
+    columnas: Mapping[str, Optional[ColumnElement]]
+    filtro: Optional[ColumnElement] = None
+
+
+def columnas_conteo(columnas: Mapping[str, Optional[ColumnElement]]) -> List[ColumnElement]:
+    """Una columna `COUNT(*) [FILTER (WHERE condición)]` etiquetada por indicador."""
+    return [
+        (func.count() if condicion is None else func.count().filter(condicion)).label(nombre)
+        for nombre, condicion in columnas.items()
+    ]
+
+
+def consulta_conteos(*grupos: Conteos) -> Select:
+    """SELECT único con los indicadores de todos los grupos (una fila)."""
+    consultas = []
+    for grupo in grupos:
+        consulta = select(*columnas_conteo(grupo.columnas)).select_from(grupo.tabla)
+        if grupo.filtro is not None:
+            consulta = consulta.where(grupo.filtro)
+        consultas.append(consulta)
+    if len(consultas) == 1:
+        return consultas[0]
+    # Cada subconsulta devuelve una fila; el JOIN ON true explícito evita el aviso de producto cartesiano.
+    subconsultas = [consulta.subquery() for consulta in consultas]
+    origen = subconsultas[0]
+    for sub in subconsultas[1:]:
+        origen = origen.join(sub, true())
+    return select(*(columna for sub in subconsultas for columna in sub.c)).select_from(origen)
+
+
+async def contar(db: AsyncSession, *grupos: Conteos) -> Dict[str, int]:
+    """Ejecuta los conteos en un solo viaje y los devuelve por nombre."""
+    fila = (await db.execute(consulta_conteos(*grupos))).mappings().one()
+    return {nombre: valor or 0 for nombre, valor in fila.items()}
@@ -28,6 +28,22 @@ class Settings(BaseSettings):
 
     auditoria_evento_limpiar_dias: int = 365
 
+    # Auditoría de acciones (particiones mensuales): meses que se crean por
+    # adelantado, meses retenidos (0 = sin retención), directorio donde se
+    # vuelcan en CSV comprimido las particiones antes de eliminarlas (vacío =
+    # no se vuelcan) y filas por lote al copiar el histórico sin particionar.
+    auditoria_particiones_meses_adelante: int = Field(default=3, gt=0)
+    auditoria_retencion_meses: int = Field(default=0, ge=0)
+    auditoria_volcado_dir: str = ""
+    auditoria_migracion_lote: int = Field(default=5000, gt=0)
+
+    # Rollup por hora de auditoría para el tablero de estadísticas: cada cuánto
+    # corre, minutos de espera tras cerrar una hora antes de agregarla y horas
+    # ya agregadas que se revisan en busca de filas tardías (0 = no revisar).
+    auditoria_rollup_intervalo_minutos: int = Field(default=15, gt=0)
+    auditoria_rollup_gracia_minutos: int = Field(default=5, ge=0)
+    auditoria_rollup_reconciliar_horas: int = Field(default=48, ge=0)
+
     base_datos_url_async: str = ""
 
     jwt_secreto: str = "cambiar-en-produccion"
@@ -50,6 +66,60 @@ class Settings(BaseSettings):
 
     storage_path: str = "/app/storage/attachments"
     storage_max_size_mb: int = Field(default=25, gt=0, le=100)
+    # Almacén por contenido (SHA-256) bajo storage_path/blobs: cada cuánto se
+    # recolectan los blobs sin referencias y cuánto tiempo se respetan antes.
+    blobs_gc_intervalo_minutos: int = Field(default=360, gt=0)
+    blobs_gc_gracia_minutos: int = Field(default=60, gt=0)
+
+    # Extractores de nómina (PDF/Excel): procesos concurrentes del pool
+    # compartido por worker y plazo máximo por trabajo (cola + ejecución).
+    extraccion_max_procesos: int = Field(default=2, gt=0, le=16)
+    extraccion_timeout_segundos: int = Field(default=120, gt=0)
+
+    # Réplica local del directorio de empleados del ERP: cada cuánto se
+    # sincroniza y cuánta antigüedad se tolera antes de volver al ERP en vivo.
+    directorio_empleados_intervalo_minutos: int = Field(default=30, gt=0)
+    directorio_empleados_max_antiguedad_minutos: int = Field(default=120, gt=0)
+
+    # Réplicas locales del catálogo de productos y de las OTs de viáticos del
+    # ERP: intervalo de sincronización y antigüedad máxima antes de volver al ERP.
+    replica_catalogos_erp_intervalo_minutos: int = Field(default=15, gt=0)
+    replica_catalogos_erp_max_antiguedad_minutos: int = Field(default=60, gt=0)
+
+    # Bandeja de salida de correos: sondeo del enviador, correos por lote
+    # (una sola conexión SMTP), intentos máximos y base del backoff exponencial.
+    correo_envio_intervalo_segundos: int = Field(default=5, gt=0)
+    correo_lote_maximo: int = Field(default=50, gt=0, le=500)
+    correo_max_intentos: int = Field(default=6, gt=0)
+    correo_reintento_base_segundos: int = Field(default=30, gt=0)
+
+    # Planificador de tareas periódicas: cada cuánto el líder verifica su
+    # conexión (y los demás workers intentan tomar el liderazgo).
+    planificador_latido_segundos: int = Field(default=15, gt=0)
+
+    # Métricas Prometheus (/metrics): bearer token exigido al scraper.
+    # Vacío = sin token (el endpoint no se publica vía nginx).
+    metricas_token: str = ""
+
+    # Consultas SQL por request: presupuesto y repeticiones de una misma
+    # consulta (N+1) a partir de las cuales se deja un log de advertencia.
+    sql_presupuesto_por_request: int = Field(default=50, gt=0)
+    sql_umbral_repeticiones: int = Field(default=10, gt=1)
+
+    # Transición de especialidades/áreas a usuario_especialidad/usuario_area:
+    # mientras esté activo se siguen escribiendo los campos JSON de usuarios
+    # (lectura retrocompatible) y el arranque reconcilia las tablas desde ellos.
+    # Retirar junto con las columnas JSON.
+    asignaciones_json_activo: bool = True
+
+    # Presencia (heartbeat de la Torre de Control) en Redis: cada cuánto se
+    # vuelcan en lote los latidos a sesiones.ultima_actividad_en.
+    presencia_volcado_segundos: int = Field(default=60, gt=0)
+
+    # Caché de la aplicación (dashboard y catálogos): máximo de entradas del
+    # nivel local por worker (LRU) y TTL por defecto; Redis es el nivel compartido.
+    cache_max_entradas: int = Field(default=2000, gt=0)
+    cache_ttl_segundos: int = Field(default=30, gt=0)
 
     # IPs (separadas por coma) de proxies en los que se confía el header
     # X-Forwarded-For. Vacío = no se confía en ningún proxy (cae al IP de
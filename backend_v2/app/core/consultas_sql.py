@@ -0,0 +1,181 @@
+"""
+Presupuesto de consultas SQL por request y detector de N+1.
+
+Los eventos de cursor de SQLAlchemy se escuchan a nivel de la clase Engine,
+así cubren el motor async (vía su sync_engine), el síncrono, el del ERP y
+los motores que crean los tests. Cada consulta se atribuye al registro del
+request en curso (ContextVar, que también viaja a run_in_threadpool) y a
+los bloques `medir_consultas()` activos.
+
+Una "huella" es la sentencia normalizada (literales y parámetros como `?`):
+la misma huella repetida muchas veces en un request es el síntoma clásico de
+una consulta por fila dentro de un ciclo.
+"""
+
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_PATRONES_HUELLA = (
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\$\d+|%\(\w+\)s|%s|(?<![:\w]):\w+"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)"), "(?...)"),
+    (re.compile(r"\s+"), " "),
+)
+
+
+def huella(sentencia: str) -> str:
+    """Normaliza una sentencia para agrupar las que solo difieren en valores."""
+    for patron, reemplazo in _PATRONES_HUELLA:
+        sentencia = patron.sub(reemplazo, sentencia)
+    return sentencia.strip()
+
+
+@dataclass
+class RegistroConsultas:
+    """Consultas ejecutadas dentro de un request o de un bloque medido."""
+
+    consultas: int = 0
+    tiempo_ms: float = 0.0
+    huellas: Counter = field(default_factory=Counter)
+
+    def registrar(self, sentencia: str, duracion_ms: float) -> None:
+        self.consultas += 1
+        self.tiempo_ms += duracion_ms
+        self.huellas[huella(sentencia)] += 1
+
+    def mas_repetida(self) -> Tuple[Optional[str], int]:
+        if not self.huellas:
+            return None, 0
+        return self.huellas.most_common(1)[0]
+
+    def resumen(self, maximo_huellas: int = 5) -> str:
+        lineas = [f"{self.consultas} consultas SQL en {self.tiempo_ms:.1f} ms"]
+        for sentencia, veces in self.huellas.most_common(maximo_huellas):
+            lineas.append(f"  {veces}x {sentencia[:300]}")
+        return "\n".join(lineas)
+
+
+_registro_actual: ContextVar[Optional[RegistroConsultas]] = ContextVar(
+    "registro_consultas_sql", default=None
+)
+# Bloques medir_consultas() activos: se leen desde cualquier hilo porque el
+# TestClient atiende el request en un hilo con su propio contexto.
+_observadores: list = []
+_instalado = False
+
+
+def _antes_de_ejecutar(conexion, _cursor, _sentencia, _parametros, _contexto, _executemany):
+    conexion.info.setdefault("consultas_sql_inicio", []).append(time.perf_counter())
+
+
+def _despues_de_ejecutar(conexion, _cursor, sentencia, _parametros, _contexto, _executemany):
+    pila = conexion.info.get("consultas_sql_inicio")
+    if not pila:
+        return
+    duracion_ms = (time.perf_counter() - pila.pop()) * 1000
+    registro = _registro_actual.get()
+    if registro is not None:
+        registro.registrar(sentencia, duracion_ms)
+    for observador in tuple(_observadores):
+        if observador is not registro:
+            observador.registrar(sentencia, duracion_ms)
+
+
+def _al_fallar(contexto) -> None:
+    """Una sentencia que falla no pasa por after_cursor_execute: se descarta su inicio."""
+    if contexto.connection is None or contexto.execution_context is None:
+        return
+    pila = contexto.connection.info.get("consultas_sql_inicio")
+    if pila:
+        pila.pop()
+
+
+def instalar() -> None:
+    """Engancha los eventos de cursor (idempotente)."""
+    global _instalado
+    if _instalado:
+        return
+    event.listen(Engine, "before_cursor_execute", _antes_de_ejecutar)
+    event.listen(Engine, "after_cursor_execute", _despues_de_ejecutar)
+    event.listen(Engine, "handle_error", _al_fallar)
+    _instalado = True
+
+
+def iniciar_registro():
+    """Abre el registro del request actual; devuelve el token para cerrarlo."""
+    registro = RegistroConsultas()
+    return registro, _registro_actual.set(registro)
+
+
+def cerrar_registro(token) -> None:
+    _registro_actual.reset(token)
+
+
+@contextmanager
+def medir_consultas() -> Iterator[RegistroConsultas]:
+    """Registra todas las consultas ejecutadas (en cualquier hilo) durante el bloque."""
+    instalar()
+    registro = RegistroConsultas()
+    _observadores.append(registro)
+    try:
+        yield registro
+    finally:
+        _observadores.remove(registro)
+
+
+class PresupuestoConsultasExcedido(AssertionError):
+    pass
+
+
+@contextmanager
+def presupuesto_consultas(maximo: int, max_repeticiones: Optional[int] = None) -> Iterator[RegistroConsultas]:
+    """
+    Falla si el bloque ejecuta más de `maximo` consultas o si una misma huella
+    se repite más de `max_repeticiones` veces (N+1).
+    """
+    with medir_consultas() as registro:
+        yield registro
+    if registro.consultas > maximo:
+        raise PresupuestoConsultasExcedido(
+            f"Presupuesto de {maximo} consultas excedido: {registro.resumen()}"
+        )
+    sentencia, veces = registro.mas_repetida()
+    if max_repeticiones is not None and veces > max_repeticiones:
+        raise PresupuestoConsultasExcedido(
+            f"Posible N+1: {veces} ejecuciones de la misma consulta "
+            f"(máximo {max_repeticiones}): {sentencia[:300]}"
+        )
+
+
+def reportar(registro: RegistroConsultas, metodo: str, ruta: str, presupuesto: int, umbral_repeticiones: int) -> None:
+    """Log estructurado del request si excede el presupuesto o parece un N+1."""
+    sentencia, veces = registro.mas_repetida()
+    sospechoso = registro.consultas > presupuesto or veces >= umbral_repeticiones
+    if not sospechoso and not logger.isEnabledFor(logging.DEBUG):
+        return
+    datos = {
+        "evento": "consultas_sql_request",
+        "metodo": metodo,
+        "ruta": ruta,
+        "consultas": registro.consultas,
+        "tiempo_ms": round(registro.tiempo_ms, 1),
+        "max_repeticiones": veces,
+        "consulta_repetida": sentencia[:300] if veces >= umbral_repeticiones else None,
+    }
+    if sospechoso:
+        logger.warning(json.dumps(datos, ensure_ascii=False))
+    else:
+        logger.debug(json.dumps(datos, ensure_ascii=False))
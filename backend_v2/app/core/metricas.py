@@ -0,0 +1,243 @@
+"""
+Métricas Prometheus del backend (exposición en /metrics).
+
+Con varios workers de uvicorn cada proceso lleva sus propios contadores. Si
+la variable PROMETHEUS_MULTIPROC_DIR apunta a un directorio vacío al
+arrancar el contenedor, prometheus_client escribe allí los valores de cada
+proceso y /metrics los agrega, sin importar qué worker atienda el scrape.
+Sin esa variable (desarrollo) se expone solo el registro del proceso.
+
+Los gauges se actualizan en el momento del cambio (checkout del pool,
+conexión de un WebSocket) y no al hacer scrape: en modo multiproceso un
+collector solo vería los valores del worker que responde.
+"""
+
+import asyncio
+import hmac
+import logging
+import os
+import time
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from starlette.responses import Response
+
+from app.core.config import obtener_configuracion
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO_MULTIPROCESO = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+BUCKETS_HTTP = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BUCKETS_POOL = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 5, 10, 30, 60)
+BUCKETS_REDIS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+BUCKETS_TAREAS = (0.1, 0.5, 1, 5, 15, 30, 60, 300, 900, 3600)
+
+# Ruta usada cuando el request no coincide con ninguna (404): evita una
+# serie por cada URL inventada.
+RUTA_DESCONOCIDA = "sin_ruta"
+
+# --- HTTP ----------------------------------------------------------------
+HTTP_SOLICITUDES = Counter(
+    "http_requests_total",
+    "Solicitudes HTTP atendidas, por plantilla de ruta y código de estado",
+    ["method", "route", "status"],
+)
+HTTP_DURACION = Histogram(
+    "http_request_duration_seconds",
+    "Latencia de las solicitudes HTTP por plantilla de ruta",
+    ["method", "route"],
+    buckets=BUCKETS_HTTP,
+)
+HTTP_EN_CURSO = Gauge(
+    "http_requests_in_progress",
+    "Solicitudes HTTP en curso",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+
+# --- Pools de SQLAlchemy -------------------------------------------------
+POOL_ESPERA = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Tiempo esperando una conexión del pool (incluye abrir conexiones nuevas)",
+    ["pool"],
+    buckets=BUCKETS_POOL,
+)
+POOL_USO = Histogram(
+    "db_pool_connection_hold_seconds",
+    "Tiempo que una conexión permanece fuera del pool",
+    ["pool"],
+    buckets=BUCKETS_POOL,
+)
+POOL_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts que agotaron pool_timeout sin obtener conexión",
+    ["pool"],
+)
+POOL_EN_USO = Gauge(
+    "db_pool_checked_out_connections",
+    "Conexiones prestadas por el pool",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+POOL_OVERFLOW = Gauge(
+    "db_pool_overflow_connections",
+    "Conexiones abiertas por encima de pool_size",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+POOL_TAMANO = Gauge(
+    "db_pool_size",
+    "Tamaño base (pool_size) de los pools de todos los workers",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+
+# --- Redis, WebSockets y tareas programadas -------------------------------
+REDIS_LATENCIA = Histogram(
+    "redis_ping_seconds",
+    "Latencia de PING a Redis medida en cada scrape",
+    buckets=BUCKETS_REDIS,
+)
+REDIS_DISPONIBLE = Gauge(
+    "redis_up",
+    "1 si Redis respondió el último PING",
+    multiprocess_mode="mostrecent",
+)
+WS_CONEXIONES = Gauge(
+    "websocket_connections",
+    "WebSockets abiertos en el hub de tiempo real",
+    multiprocess_mode="livesum",
+)
+TAREAS_DURACION = Histogram(
+    "scheduled_job_duration_seconds",
+    "Duración de las tareas del planificador",
+    ["job", "result"],
+    buckets=BUCKETS_TAREAS,
+)
+TAREAS_ULTIMO_EXITO = Gauge(
+    "scheduled_job_last_success_timestamp_seconds",
+    "Epoch de la última ejecución exitosa de cada tarea",
+    ["job"],
+    multiprocess_mode="max",
+)
+
+
+def instrumentar_pool(motor, nombre: str) -> None:
+    """
+    Mide espera de checkout, tiempo de uso y ocupación del pool de `motor`
+    (Engine o AsyncEngine). Solo aplica a QueuePool; NullPool no tiene cola.
+    """
+    pool = getattr(motor, "sync_engine", motor).pool
+    if not isinstance(pool, QueuePool) or getattr(pool, "_metricas_instrumentado", False):
+        return
+    pool._metricas_instrumentado = True
+    POOL_TAMANO.labels(nombre).set(pool.size())
+
+    # SQLAlchemy no emite evento antes del checkout ni después de devolver la
+    # conexión: se envuelven la obtención (cola + apertura) y la devolución
+    # para medir la espera y publicar la ocupación ya actualizada.
+    obtener_conexion = pool._do_get
+    devolver_conexion = pool._do_return_conn
+
+    def _ocupacion():
+        POOL_EN_USO.labels(nombre).set(pool.checkedout())
+        POOL_OVERFLOW.labels(nombre).set(max(pool.overflow(), 0))
+
+    def _do_get_medido():
+        inicio = time.perf_counter()
+        try:
+            return obtener_conexion()
+        except PoolTimeoutError:
+            POOL_TIMEOUTS.labels(nombre).inc()
+            raise
+        finally:
+            POOL_ESPERA.labels(nombre).observe(time.perf_counter() - inicio)
+            _ocupacion()
+
+    def _do_return_conn_medido(registro):
+        try:
+            return devolver_conexion(registro)
+        finally:
+            _ocupacion()
+
+    pool._do_get = _do_get_medido
+    pool._do_return_conn = _do_return_conn_medido
+
+    @event.listens_for(pool, "checkout")
+    def _al_prestar(_conexion_dbapi, registro, _proxy):
+        registro.info["metricas_prestada_en"] = time.perf_counter()
+
+    @event.listens_for(pool, "checkin")
+    def _al_devolver(_conexion_dbapi, registro):
+        prestada_en = registro.info.pop("metricas_prestada_en", None) if registro else None
+        if prestada_en is not None:
+            POOL_USO.labels(nombre).observe(time.perf_counter() - prestada_en)
+
+
+def registrar_tarea(nombre: str, duracion_segundos: float, exito: bool) -> None:
+    TAREAS_DURACION.labels(nombre, "ok" if exito else "error").observe(duracion_segundos)
+    if exito:
+        TAREAS_ULTIMO_EXITO.labels(nombre).set(time.time())
+
+
+_cliente_redis = None
+
+
+async def _medir_redis() -> None:
+    global _cliente_redis
+    try:
+        if _cliente_redis is None:
+            import redis.asyncio as redis
+
+            _cliente_redis = redis.from_url(
+                obtener_configuracion().redis_url, socket_connect_timeout=0.5
+            )
+        inicio = time.perf_counter()
+        await asyncio.wait_for(_cliente_redis.ping(), timeout=0.5)
+        REDIS_LATENCIA.observe(time.perf_counter() - inicio)
+        REDIS_DISPONIBLE.set(1)
+    except Exception:
+        REDIS_DISPONIBLE.set(0)
+
+
+def _exposicion() -> bytes:
+    if DIRECTORIO_MULTIPROCESO:
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+        return generate_latest(registro)
+    return generate_latest(REGISTRY)
+
+
+def token_valido(authorization: Optional[str]) -> bool:
+    """Sin `metricas_token` configurado /metrics es abierto (no se publica vía nginx)."""
+    esperado = obtener_configuracion().metricas_token
+    if not esperado:
+        return True
+    recibido = (authorization or "").removeprefix("Bearer ").strip()
+    return hmac.compare_digest(recibido.encode(), esperado.encode())
+
+
+async def respuesta_metricas() -> Response:
+    """Texto de exposición Prometheus, agregado entre workers si aplica."""
+    await _medir_redis()
+    contenido = await asyncio.to_thread(_exposicion)
+    return Response(contenido, media_type=CONTENT_TYPE_LATEST)
+
+
+def marcar_proceso_terminado() -> None:
+    """Descarta los gauges `live*` de este worker al apagarse (modo multiproceso)."""
+    if DIRECTORIO_MULTIPROCESO:
+        multiprocess.mark_process_dead(os.getpid())
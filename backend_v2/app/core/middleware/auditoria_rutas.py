@@ -8,7 +8,8 @@ from starlette.requests import Request
 # - novedades_nomina/nomina_router.py  GET /archivos/{id}/descargar
 # - tickets/router.py                  GET /adjuntos/{id}/archivo
 # - impuestos.py                       GET /template, GET /certificado-220/{ano}
-# - inventario/router.py               GET /plantilla-maestra, /plantilla-transito
+# - inventario/router.py               GET /plantilla-maestra, /plantilla-transito, /exportar
+# - novedades_nomina/tabla_maestra.py  GET /tabla-maestra/exportar
 # - viaticos/router.py                 GET /estado-cuenta/xlsx
 
 _PATRONES_DESCARGA = (
@@ -18,6 +19,8 @@ _PATRONES_DESCARGA = (
     re.compile(r"^/api/v2/impuestos/certificado-220/\d+$"),
     re.compile(r"^/api/v2/inventario/plantilla-maestra$"),
     re.compile(r"^/api/v2/inventario/plantilla-transito$"),
+    re.compile(r"^/api/v2/inventario/exportar$"),
+    re.compile(r"^/api/v2/novedades-nomina/tabla-maestra/exportar$"),
     re.compile(r"^/api/v2/viaticos/estado-cuenta/xlsx$"),
     re.compile(r"^/api/v2/actividades/\d+/archivo$"),
 )
@@ -29,6 +32,8 @@ _ENTIDAD_DESCARGA = (
     (re.compile(r"^/api/v2/impuestos/template$"), "plantilla_impuestos", None),
     (re.compile(r"^/api/v2/inventario/plantilla-maestra$"), "plantilla_inventario", "maestra"),
     (re.compile(r"^/api/v2/inventario/plantilla-transito$"), "plantilla_inventario", "transito"),
+    (re.compile(r"^/api/v2/inventario/exportar$"), "exportacion_inventario", None),
+    (re.compile(r"^/api/v2/novedades-nomina/tabla-maestra/exportar$"), "exportacion_tabla_maestra", None),
     (re.compile(r"^/api/v2/viaticos/estado-cuenta/xlsx$"), "exportacion_viaticos", None),
     (re.compile(r"^/api/v2/actividades/(\d+)/archivo$"), "archivo_actividad", 1),
 )
@@ -40,6 +45,11 @@ _PARAMS_DESCARGA = frozenset({
     "hasta",
     "ano",
     "ano_gravable",
+    "bodega",
+    "estado",
+    "mes",
+    "anio",
+    "quincena",
 })
 
 # Consultas GET sensibles del módulo comisiones (nómina)
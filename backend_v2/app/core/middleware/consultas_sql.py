@@ -0,0 +1,48 @@
+"""Middleware ASGI que mide las consultas SQL de cada request (presupuesto y N+1)."""
+
+from app.core import consultas_sql
+from app.core.config import obtener_configuracion
+from app.core.metricas import RUTA_DESCONOCIDA
+
+
+class ConsultasSqlMiddleware:
+    """
+    Fuera de producción agrega a la respuesta X-SQL-Consultas, X-SQL-Tiempo-Ms
+    y X-SQL-Max-Repeticiones. En todos los entornos deja un log estructurado
+    cuando el request excede el presupuesto o repite una consulta (N+1).
+    """
+
+    def __init__(self, app):
+        self.app = app
+        configuracion = obtener_configuracion()
+        self.exponer_headers = not configuracion.es_produccion
+        self.presupuesto = configuracion.sql_presupuesto_por_request
+        self.umbral_repeticiones = configuracion.sql_umbral_repeticiones
+        consultas_sql.instalar()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        registro, token = consultas_sql.iniciar_registro()
+
+        async def send_con_headers(mensaje):
+            if self.exponer_headers and mensaje["type"] == "http.response.start":
+                _, veces = registro.mas_repetida()
+                mensaje["headers"] = list(mensaje.get("headers", [])) + [
+                    (b"x-sql-consultas", str(registro.consultas).encode()),
+                    (b"x-sql-tiempo-ms", f"{registro.tiempo_ms:.1f}".encode()),
+                    (b"x-sql-max-repeticiones", str(veces).encode()),
+                ]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, send_con_headers)
+        finally:
+            consultas_sql.cerrar_registro(token)
+            ruta = getattr(scope.get("route"), "path", None) or RUTA_DESCONOCIDA
+            consultas_sql.reportar(
+                registro, scope.get("method", "GET"), ruta,
+                self.presupuesto, self.umbral_repeticiones,
+            )
@@ -1,4 +1,4 @@
-"""Límite ASGI previo al parser multipart para evidencias WBS."""
+"""Límite ASGI previo al parser multipart para evidencias WBS y adjuntos de tickets."""
 
 import re
 
@@ -6,6 +6,8 @@ from starlette.responses import JSONResponse
 
 
 PATRON_CARGA_ACTIVIDAD = re.compile(r"^/api/v2/actividades/[^/]+/archivo$")
+PATRON_CARGA_ADJUNTO_TICKET = re.compile(r"^/api/v2/soporte/[^/]+/adjuntos/archivo$")
+RUTAS_CON_LIMITE = (PATRON_CARGA_ACTIVIDAD, PATRON_CARGA_ADJUNTO_TICKET)
 
 
 class CargaActividadExcedida(Exception):
@@ -21,7 +23,7 @@ class LimiteCargaActividadMiddleware:
         if (
             scope["type"] != "http"
             or scope.get("method") != "POST"
-            or not PATRON_CARGA_ACTIVIDAD.fullmatch(scope.get("path", ""))
+            or not any(patron.fullmatch(scope.get("path", "")) for patron in RUTAS_CON_LIMITE)
         ):
             await self.app(scope, receive, send)
             return
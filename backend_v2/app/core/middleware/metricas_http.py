@@ -0,0 +1,46 @@
+"""Middleware ASGI de métricas HTTP: conteo, latencia y solicitudes en curso por ruta."""
+
+import time
+
+from app.core.metricas import (
+    HTTP_DURACION,
+    HTTP_EN_CURSO,
+    HTTP_SOLICITUDES,
+    RUTA_DESCONOCIDA,
+)
+
+
+class MetricasHttpMiddleware:
+    """
+    Se registra como el middleware más externo para medir el tiempo total.
+    La ruta se etiqueta con su plantilla (`/api/v2/soporte/{ticket_id}`), que
+    el router de Starlette deja en `scope["route"]` al resolver el request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        metodo = scope.get("method", "GET")
+        estado = 500
+        inicio = time.perf_counter()
+
+        async def send_medido(mensaje):
+            nonlocal estado
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+            await send(mensaje)
+
+        en_curso = HTTP_EN_CURSO.labels(metodo)
+        en_curso.inc()
+        try:
+            await self.app(scope, receive, send_medido)
+        finally:
+            en_curso.dec()
+            ruta = getattr(scope.get("route"), "path", None) or RUTA_DESCONOCIDA
+            HTTP_DURACION.labels(metodo, ruta).observe(time.perf_counter() - inicio)
+            HTTP_SOLICITUDES.labels(metodo, ruta, str(estado)).inc()
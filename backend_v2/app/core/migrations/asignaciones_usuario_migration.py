@@ -0,0 +1,50 @@
+"""
+Backfill de usuario_especialidad / usuario_area desde los campos JSON de usuarios.
+
+Las tablas las crea `create_all`. Mientras dure la transición
+(`asignaciones_json_activo`), el JSON es la fuente: en cada arranque se
+insertan las filas que falten y se borran las que ya no estén, de modo que
+una escritura hecha por un worker anterior al dual-write queda reflejada.
+"""
+import logging
+from sqlalchemy import text
+
+from app.core.config import obtener_configuracion
+from app.services.auth.asignaciones_service import lista_json
+
+logger = logging.getLogger(__name__)
+
+TABLAS = (
+    # (tabla, columna de valor, campo JSON en usuarios)
+    ("usuario_especialidad", "especialidad", "especialidades"),
+    ("usuario_area", "area", "areas_asignadas"),
+)
+
+
+async def reconciliar_asignaciones_usuario(conn) -> None:
+    if not obtener_configuracion().asignaciones_json_activo:
+        return
+
+    usuarios = (await conn.execute(
+        text("SELECT id, especialidades, areas_asignadas FROM usuarios")
+    )).mappings().all()
+
+    for tabla, columna, campo in TABLAS:
+        esperadas = {(u["id"], valor) for u in usuarios for valor in lista_json(u[campo])}
+        actuales = set((await conn.execute(
+            text(f"SELECT usuario_id, {columna} FROM {tabla}")
+        )).all())
+
+        sobrantes = [{"u": u, "v": v} for u, v in actuales - esperadas]
+        faltantes = [{"u": u, "v": v} for u, v in esperadas - actuales]
+        if sobrantes:
+            await conn.execute(
+                text(f"DELETE FROM {tabla} WHERE usuario_id = :u AND {columna} = :v"), sobrantes
+            )
+        if faltantes:
+            await conn.execute(
+                text(f"INSERT INTO {tabla} (usuario_id, {columna}) VALUES (:u, :v) ON CONFLICT DO NOTHING"),
+                faltantes,
+            )
+        if sobrantes or faltantes:
+            logger.info(f"{tabla}: {len(faltantes)} filas insertadas, {len(sobrantes)} eliminadas desde JSON.")
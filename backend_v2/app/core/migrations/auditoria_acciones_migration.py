@@ -1,9 +1,59 @@
-"""Migración idempotente para auditoria_acciones_usuario."""
+"""Migración idempotente para auditoria_acciones_usuario (particionada por mes).
+
+La tabla se particiona por RANGE sobre `timestamp`. Si existe la versión
+previa sin particiones, se renombra a `auditoria_acciones_usuario_legado` y en
+su lugar se crea la particionada, en una sola transacción corta: las
+inserciones siguen funcionando de inmediato y el histórico se copia por lotes
+desde el planificador (services/auditoria/particiones_service.py).
+"""
 import logging
 from sqlalchemy import text
 
+from app.core.config import obtener_configuracion
+from app.services.auditoria.particiones_service import (
+    TABLA,
+    TABLA_LEGADO,
+    crear_particiones,
+    inicio_mes,
+)
+
 logger = logging.getLogger(__name__)
 
+DDL_TABLA = f"""
+    CREATE TABLE IF NOT EXISTS {TABLA} (
+        id {{tipo_id}},
+        timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        usuario_id VARCHAR(50) NOT NULL,
+        usuario_nombre VARCHAR(255),
+        rol VARCHAR(50),
+        modulo VARCHAR(80) NOT NULL,
+        accion VARCHAR(50) NOT NULL,
+        entidad_tipo VARCHAR(80),
+        entidad_id VARCHAR(100),
+        metodo_http VARCHAR(10),
+        ruta VARCHAR(255),
+        codigo_respuesta SMALLINT,
+        resultado VARCHAR(20) NOT NULL DEFAULT 'exito',
+        direccion_ip VARCHAR(45),
+        agente_usuario TEXT,
+        correlacion_id VARCHAR(36),
+        datos_anteriores JSONB,
+        datos_nuevos JSONB,
+        metadatos JSONB,
+        PRIMARY KEY (id, timestamp)
+    ) PARTITION BY RANGE (timestamp)
+"""
+
+INDICES = (
+    f"CREATE INDEX IF NOT EXISTS idx_aud_acc_usuario_ts ON {TABLA} (usuario_id, timestamp DESC)",
+    f"CREATE INDEX IF NOT EXISTS idx_aud_acc_modulo_ts ON {TABLA} (modulo, timestamp DESC)",
+    f"CREATE INDEX IF NOT EXISTS idx_aud_acc_entidad ON {TABLA} (entidad_tipo, entidad_id)",
+    f"CREATE INDEX IF NOT EXISTS idx_aud_acc_ts_id ON {TABLA} (timestamp DESC, id DESC)",
+)
+
+# Reemplazados por idx_aud_acc_ts_id (mismo prefijo, sirve también al keyset).
+INDICES_OBSOLETOS = ("idx_aud_acc_timestamp",)
+
 
 async def safe_execute(conn, query: str) -> None:
     try:
@@ -16,40 +66,67 @@ async def safe_execute(conn, query: str) -> None:
         )
 
 
+async def tipo_tabla(conn, nombre: str):
+    """'p' particionada, 'r' tabla normal, None si no existe (según search_path)."""
+    return (await conn.execute(text(
+        "SELECT relkind::text FROM pg_class WHERE oid = to_regclass(:nombre)"
+    ), {"nombre": nombre})).scalar()
+
+
+async def convertir_a_particionada(conn) -> None:
+    """Renombra la tabla sin particiones a *_legado y crea la particionada en su lugar.
+
+    Conserva la secuencia de `id` (los ids nuevos siguen siendo mayores que los
+    del histórico) y crea particiones desde el mes más antiguo del legado.
+    """
+    legado_desde = (await conn.execute(text(f"SELECT min(timestamp) FROM {TABLA}"))).scalar()
+    secuencia = (await conn.execute(text(
+        "SELECT pg_get_serial_sequence(:tabla, 'id')"
+    ), {"tabla": TABLA})).scalar()
+
+    await conn.execute(text(f"ALTER TABLE {TABLA} RENAME TO {TABLA_LEGADO}"))
+    await conn.execute(text(
+        f"ALTER TABLE {TABLA_LEGADO} RENAME CONSTRAINT {TABLA}_pkey TO {TABLA_LEGADO}_pkey"
+    ))
+    # Los índices secundarios del legado solo estorban (y sus nombres se reutilizan).
+    indices_legado = (await conn.execute(text("""
+        SELECT indexrelid::regclass::text FROM pg_index
+        WHERE indrelid = to_regclass(:tabla) AND NOT indisprimary
+    """), {"tabla": TABLA_LEGADO})).scalars().all()
+    for indice in indices_legado:
+        await conn.execute(text(f"DROP INDEX {indice}"))
+
+    await conn.execute(text(DDL_TABLA.format(tipo_id=f"INTEGER NOT NULL DEFAULT nextval('{secuencia}')")))
+    await conn.execute(text(f"ALTER SEQUENCE {secuencia} OWNED BY {TABLA}.id"))
+    for idx_sql in INDICES:
+        await conn.execute(text(idx_sql))
+    if legado_desde is not None:
+        await crear_particiones(conn, desde=inicio_mes(legado_desde))
+    logger.info(f"{TABLA} convertida a particionada; histórico pendiente de copia en {TABLA_LEGADO}.")
+
+
 async def crear_tabla_auditoria_acciones(conn) -> None:
     logger.info("Iniciando migración: crear tabla auditoria_acciones_usuario...")
 
-    await safe_execute(
-        conn,
-        """
-        CREATE TABLE IF NOT EXISTS auditoria_acciones_usuario (
-            id SERIAL PRIMARY KEY,
-            timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-            usuario_id VARCHAR(50) NOT NULL,
-            usuario_nombre VARCHAR(255),
-            rol VARCHAR(50),
-            modulo VARCHAR(80) NOT NULL,
-            accion VARCHAR(50) NOT NULL,
-            entidad_tipo VARCHAR(80),
-            entidad_id VARCHAR(100),
-            metodo_http VARCHAR(10),
-            ruta VARCHAR(255),
-            codigo_respuesta SMALLINT,
-            resultado VARCHAR(20) NOT NULL DEFAULT 'exito',
-            direccion_ip VARCHAR(45),
-            agente_usuario TEXT,
-            correlacion_id VARCHAR(36),
-            datos_anteriores JSONB,
-            datos_nuevos JSONB,
-            metadatos JSONB
-        )
-        """,
-    )
-
-    for idx_sql in (
-        "CREATE INDEX IF NOT EXISTS idx_aud_acc_usuario_ts ON auditoria_acciones_usuario (usuario_id, timestamp DESC)",
-        "CREATE INDEX IF NOT EXISTS idx_aud_acc_modulo_ts ON auditoria_acciones_usuario (modulo, timestamp DESC)",
-        "CREATE INDEX IF NOT EXISTS idx_aud_acc_entidad ON auditoria_acciones_usuario (entidad_tipo, entidad_id)",
-        "CREATE INDEX IF NOT EXISTS idx_aud_acc_timestamp ON auditoria_acciones_usuario (timestamp DESC)",
-    ):
+    if await tipo_tabla(conn, TABLA) == "r":
+        try:
+            async with conn.begin_nested():
+                await convertir_a_particionada(conn)
+        except Exception as exc:
+            logger.error(f"No se pudo particionar {TABLA} (se mantiene sin particiones): {exc}")
+            return
+
+    await safe_execute(conn, DDL_TABLA.format(tipo_id="SERIAL"))
+
+    for idx_sql in INDICES:
         await safe_execute(conn, idx_sql)
+    for indice in INDICES_OBSOLETOS:
+        await safe_execute(conn, f"DROP INDEX IF EXISTS {indice}")
+
+    try:
+        async with conn.begin_nested():
+            await crear_particiones(
+                conn, meses_adelante=obtener_configuracion().auditoria_particiones_meses_adelante
+            )
+    except Exception as exc:
+        logger.warning(f"Error (ignorado) creando particiones de {TABLA}: {exc}")
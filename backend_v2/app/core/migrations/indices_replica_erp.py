@@ -0,0 +1,30 @@
+"""
+Índices trigram de las réplicas locales de catálogos del ERP.
+
+Las búsquedas por tecla usan ILIKE/LIKE '%texto%', que solo aprovechan un
+índice GIN con gin_trgm_ops. Si la extensión pg_trgm no está disponible en
+el servidor (o falta el permiso para crearla) las réplicas siguen
+funcionando con búsqueda secuencial: se deja una advertencia y se omiten.
+"""
+import logging
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+INDICES_TRGM_REPLICA_ERP = (
+    ("idx_erp_catalogo_referencia_trgm", "erp_catalogo_productos USING gin (referencia gin_trgm_ops)"),
+    ("idx_erp_catalogo_descripcion_trgm", "erp_catalogo_productos USING gin (descripcion gin_trgm_ops)"),
+    ("idx_erp_ots_numero_trgm", "erp_ots_viaticos USING gin (numero gin_trgm_ops)"),
+    ("idx_erp_ots_cliente_trgm", "erp_ots_viaticos USING gin (cliente gin_trgm_ops)"),
+)
+
+
+async def crear_indices_replica_erp(conn) -> None:
+    try:
+        async with conn.begin_nested():
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    except Exception as e:
+        logger.warning(f"pg_trgm no disponible; réplicas ERP sin índices trigram: {e}")
+        return
+    for nombre, definicion in INDICES_TRGM_REPLICA_ERP:
+        await conn.execute(text(f"CREATE INDEX IF NOT EXISTS {nombre} ON {definicion}"))
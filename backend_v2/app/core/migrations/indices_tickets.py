@@ -0,0 +1,77 @@
+"""
+Índices de tickets y de sus tablas hijas, según los filtros reales de la app.
+
+Se crean con CREATE INDEX CONCURRENTLY para no bloquear escrituras en tablas
+ya pobladas; por eso van fuera de transacción (AUTOCOMMIT) y un advisory
+lock evita que varios workers los construyan a la vez. Un build concurrente
+interrumpido deja el índice INVALID: se elimina y se vuelve a crear.
+"""
+import logging
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+CLAVE_LOCK = "migracion_indices_tickets"
+
+ESTADOS_ABIERTOS = "('Abierto', 'Asignado', 'En Proceso', 'Pendiente Info', 'Escalado')"
+ESTADOS_PENDIENTES_PANEL = "('Nuevo', 'En Proceso', 'Pendiente Info', 'Escalado')"
+
+INDICES_TICKETS = (
+    # Listado general: filtro por estado, orden por fecha de creación.
+    ("idx_tickets_estado_creado", "tickets (estado, creado_en DESC)"),
+    # Bandeja del analista y ranking de rendimiento.
+    ("idx_tickets_asignado_estado", "tickets (asignado_a, estado)"),
+    # "Mis tickets" del solicitante.
+    ("idx_tickets_creador_creado", "tickets (creador_id, creado_en DESC)"),
+    ("idx_tickets_categoria", "tickets (categoria_id)"),
+    # Rangos de fecha (progreso semanal, filtros de rendimiento).
+    ("idx_tickets_creado_en", "tickets (creado_en DESC)"),
+    ("idx_tickets_cierre_cerrados", "tickets (fecha_cierre) WHERE estado = 'Cerrado'"),
+    # Parciales: los tickets abiertos son una fracción pequeña de la tabla.
+    ("idx_tickets_abiertos_asignado",
+     f"tickets (asignado_a, creado_en DESC) WHERE estado IN {ESTADOS_ABIERTOS}"),
+    ("idx_tickets_pendientes_creado",
+     f"tickets (creado_en DESC) WHERE estado IN {ESTADOS_PENDIENTES_PANEL}"),
+    # Claves foráneas de las tablas hijas (detalle del ticket).
+    ("idx_comentarios_ticket_ticket", "comentarios_ticket (ticket_id, creado_en)"),
+    ("idx_historial_ticket_ticket", "historial_ticket (ticket_id, creado_en)"),
+    ("idx_adjuntos_ticket_ticket", "adjuntos_ticket (ticket_id)"),
+    ("idx_solicitudes_desarrollo_ticket", "solicitudes_desarrollo (ticket_id)"),
+    ("idx_control_cambios_ticket", "control_cambios (ticket_id)"),
+    ("idx_solicitudes_activo_ticket", "solicitudes_activo (ticket_id)"),
+)
+
+
+async def _crear_indice(conn, nombre: str, definicion: str) -> None:
+    valido = (await conn.execute(text("""
+        SELECT i.indisvalid FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE c.relname = :nombre
+    """), {"nombre": nombre})).scalar()
+    if valido is False:
+        logger.warning(f"Índice {nombre} inválido (build interrumpido); se recrea.")
+        await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {nombre}"))
+    elif valido:
+        return
+    await conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {nombre} ON {definicion}"))
+    logger.info(f"Índice {nombre} creado.")
+
+
+async def crear_indices_tickets(async_engine) -> None:
+    async with async_engine.connect() as conexion:
+        conn = await conexion.execution_options(isolation_level="AUTOCOMMIT")
+        tomado = (await conn.execute(
+            text("SELECT pg_try_advisory_lock(hashtext(:clave))"), {"clave": CLAVE_LOCK}
+        )).scalar()
+        if not tomado:
+            logger.info("Otro worker está creando los índices de tickets; se omite.")
+            return
+        try:
+            for nombre, definicion in INDICES_TICKETS:
+                try:
+                    await _crear_indice(conn, nombre, definicion)
+                except Exception as e:
+                    logger.warning(f"Error (ignorado) creando índice {nombre}: {e}")
+        finally:
+            await conn.execute(
+                text("SELECT pg_advisory_unlock(hashtext(:clave))"), {"clave": CLAVE_LOCK}
+            )
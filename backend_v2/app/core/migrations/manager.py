@@ -5,6 +5,9 @@ from app.core.migrations.structural_blindaje import ejecutar_blindaje_estructura
 from app.core.migrations.saneamiento_secuencias import reparar_todas_las_secuencias
 from app.core.migrations.auditoria_evento_migration import crear_tabla_auditoria_evento
 from app.core.migrations.auditoria_acciones_migration import crear_tabla_auditoria_acciones
+from app.core.migrations.indices_tickets import crear_indices_tickets
+from app.core.migrations.asignaciones_usuario_migration import reconciliar_asignaciones_usuario
+from app.core.migrations.indices_replica_erp import crear_indices_replica_erp
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +51,26 @@ async def init_db_process(async_engine, AsyncSessionLocal):
         except Exception as e:
             logger.error(f"Error en migración auditoria_acciones_usuario: {e}")
 
+    # 3.7 Índices de tickets y tablas hijas (CONCURRENTLY: fuera de transacción)
+    try:
+        await crear_indices_tickets(async_engine)
+    except Exception as e:
+        logger.error(f"Error en migración de índices de tickets: {e}")
+
+    # 3.8 Especialidades/áreas de usuarios: tablas relacionales desde el JSON
+    async with async_engine.begin() as conn:
+        try:
+            await reconciliar_asignaciones_usuario(conn)
+        except Exception as e:
+            logger.error(f"Error en migración de asignaciones de usuarios: {e}")
+
+    # 3.9 Índices trigram de las réplicas de catálogo y OTs del ERP
+    async with async_engine.begin() as conn:
+        try:
+            await crear_indices_replica_erp(conn)
+        except Exception as e:
+            logger.error(f"Error en índices de réplicas ERP: {e}")
+
     # 4. Saneamiento de Datos (Inventario y otros)
     saneamientos = [
         "UPDATE conteoinventario SET estado = 'PENDIENTE' WHERE estado IS NULL;",
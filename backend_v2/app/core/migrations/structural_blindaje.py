@@ -172,6 +172,17 @@ async def ejecutar_blindaje_estructural(conn):
         conn,
         "CREATE INDEX IF NOT EXISTS idx_notificaciones_usuario_leido ON notificaciones_usuario(usuario_id, leido)"
     )
+    # Anti-join del verificador de compromisos (¿ya se notificó este umbral?)
+    await safe_execute(
+        conn,
+        "CREATE INDEX IF NOT EXISTS idx_notificaciones_usuario_referencia ON notificaciones_usuario(usuario_id, referencia_id)"
+    )
+    # Solo los compromisos abiertos entran al índice: el verificador busca por rango de fecha
+    await safe_execute(
+        conn,
+        "CREATE INDEX IF NOT EXISTS idx_actividades_compromiso_abierto ON actividades(compromiso_fecha) "
+        "WHERE compromiso_cumplido = FALSE AND compromiso_fecha IS NOT NULL"
+    )
 
     # 10. Migración de estados de actividades y desarrollos
     await migrar_estados_actividades(conn)
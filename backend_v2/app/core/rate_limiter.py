@@ -10,21 +10,32 @@ para los paths con rate limit, poblando `request._body`. El key func
 luego lee `request._body` sync y parsea segun Content-Type.
 
 IMPORTANTE (async-safety): SlowAPI 0.1.9 invoca `self.limiter.hit()`
-sincrónicamente desde el async_wrapper. Con `limits.storage.RedisStorage`
-la llamada a redis-py bloquea el event loop 1-5ms por request. Para
-herramientas admin con tráfico bajo es aceptable; en alta concurrencia
-migrar a `limits.aio.storage.AsyncRedisStorage` (strategy="async") o
-usar un solo worker de uvicorn.
+sincrónicamente desde su async_wrapper, lo que con un storage Redis sync
+bloquea el event loop 1-5ms por request. `LimiterAsync` arma los límites
+con las clases públicas de SlowAPI pero usa su propio decorador, que hace
+`await` sobre `limits.aio` (storage `async+redis://`, INCR + EXPIRE
+atómico en un solo round-trip). El lockout por cédula usa el mismo
+storage async. Errores de storage se envuelven en `StorageError`
+(fail-closed: main.py responde 503).
 """
+import asyncio
+import functools
 import hashlib
+import inspect
 import json
 import logging
-from typing import Optional
+import time
+from typing import Callable, Optional
 from urllib.parse import parse_qs
 
 from fastapi import Request
+from limits.aio.storage import MemoryStorage as MemoryStorageAsync
+from limits.aio.strategies import FixedWindowRateLimiter
+from limits.storage import storage_from_string
 from slowapi import Limiter
+from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
+from slowapi.wrappers import LimitGroup
 from app.core.config import obtener_configuracion
 
 logger = logging.getLogger(__name__)
@@ -232,53 +243,160 @@ def _mcp_tokens_revoke_key_func(request: Request) -> str:
     return f"mcp_tokens_revoke:{jti}:{sub}:{ip}"
 
 
+# --- Limiter con storage async --------------------------------------------
+
+
+def _uri_async(uri: str) -> str:
+    """`redis://...` -> `async+redis://...` (limits.aio)."""
+    return uri if uri.startswith("async+") else f"async+{uri}"
+
+
+class LimiterAsync(Limiter):
+    """Limiter de SlowAPI cuyo conteo se hace con `limits.aio` (sin bloquear el loop).
+
+    Solo se usa la API pública de SlowAPI: los límites de cada ruta se
+    arman con `LimitGroup` (igual que `Limiter.limit`) y quedan en el
+    decorador; el conteo usa la misma clave `(key_func(request), path)` que
+    SlowAPI con su `key_style="url"` por defecto. Se hereda de `Limiter`
+    porque `_rate_limit_exceeded_handler` lo espera en `app.state.limiter`. Soporta lo que usa el backend: límites fijos
+    (str), `key_func` por ruta y endpoints async.
+    """
+
+    def __init__(self, *, storage_uri: str, **kwargs):
+        # El storage sync que SlowAPI crea en su __init__ no se usa.
+        super().__init__(storage_uri="memory://", **kwargs)
+        self._storage_uri = storage_uri
+        self._key_func_defecto = kwargs["key_func"]
+        self.storage_async = storage_from_string(_uri_async(storage_uri), wrap_exceptions=True)
+        self.estrategia_async = FixedWindowRateLimiter(self.storage_async)
+
+    def limit(self, limit_value: str, key_func: Optional[Callable[..., str]] = None) -> Callable:
+        def decorador(func):
+            if not asyncio.iscoroutinefunction(func):
+                raise TypeError(f"LimiterAsync solo soporta endpoints async: {func.__name__}")
+            parametros = list(inspect.signature(func).parameters)
+            if "request" not in parametros:
+                raise TypeError(f'Falta el parámetro "request" en {func.__name__}')
+            idx = parametros.index("request")
+            limites = list(LimitGroup(
+                limit_value, key_func or self._key_func_defecto, None, False, None, None, None, 1, True
+            ))
+
+            @functools.wraps(func)
+            async def envoltura(*args, **kw):
+                if self.enabled:
+                    request = kw.get("request", args[idx] if len(args) > idx else None)
+                    if not getattr(request.state, "_rate_limiting_complete", False):
+                        await self._verificar_limites(request, limites)
+                        request.state._rate_limiting_complete = True
+                return await func(*args, **kw)
+
+            return envoltura
+
+        return decorador
+
+    async def _verificar_limites(self, request: Request, limites: list) -> None:
+        alcance = request["path"] or ""
+        request.state.view_rate_limit = None
+        for lim in limites:
+            clave = lim.key_func(request)
+            if not (clave and alcance):
+                logger.error("Rate limit omitido: %s. Clave o alcance vacio.", lim.limit)
+                continue
+            request.state.view_rate_limit = (lim.limit, [clave, alcance])
+            # StorageError (Redis caido) se propaga: fail-closed.
+            if not await self.estrategia_async.hit(lim.limit, clave, alcance):
+                logger.warning("ratelimit %s (%s) excedido en: %s", lim.limit, clave, alcance)
+                raise RateLimitExceeded(lim)
+
+    def reset(self) -> None:
+        """Limpia todos los contadores (tests/admin).
+
+        Sincrono por compatibilidad con los llamadores: con Redis usa un
+        cliente redis-py puntual; no se usa en el camino de las requests.
+        """
+        if isinstance(self.storage_async, MemoryStorageAsync):
+            self.storage_async.storage.clear()
+            self.storage_async.expirations.clear()
+            self.storage_async.events.clear()
+            return
+        import redis
+
+        cliente = redis.Redis.from_url(self._storage_uri)
+        try:
+            claves = list(cliente.scan_iter(self.storage_async.prefixed_key("*")))
+            if claves:
+                cliente.delete(*claves)
+        finally:
+            cliente.close()
+
+
 # --- Lockout per-cuenta (defense-in-depth sobre el rate limit por IP) ---
 
 
-def _verificar_lockout_cedula(cedula: str) -> Optional[int]:
-    """Si la cedula esta lockeada en Redis, retorna segundos restantes.
-    Retorna None si no hay lockout activo o si Redis no esta disponible."""
+def _clave_lockout(cedula: str) -> str:
+    return f"lockout:{cedula}"
+
+
+def _clave_fallos(cedula: str) -> str:
+    return f"login_fallos:{cedula}"
+
+
+async def _verificar_lockout_cedula(cedula: str) -> Optional[int]:
+    """Si la cedula esta lockeada, retorna los segundos restantes (un solo
+    round-trip). Retorna None si no hay lockout activo o si el storage no
+    esta disponible (el rate limit del endpoint ya es fail-closed)."""
     if not cedula:
         return None
     try:
-        from limits.storage import RedisStorage
-        storage = limiter._storage
-        if not isinstance(storage, RedisStorage):
-            return None
-        key = f"LIMITER/lockout:{cedula}///{_settings.lockout_duracion_minutos * 60}/1/second"
-        remaining = storage.get(key)
-        if remaining and int(remaining) > 0:
-            return _settings.lockout_duracion_minutos * 60
-        return None
+        expira_en = await limiter.storage_async.get_expiry(_clave_lockout(cedula))
+        restante = int(expira_en - time.time())
+        return restante if restante > 0 else None
     except Exception as e:
         logger.warning("No se pudo consultar lockout para cedula=%s: %s", cedula, e)
         return None
 
 
-def _registrar_fallo_cedula(cedula: str) -> None:
-    """Incrementa el contador de fallos. Si supera el umbral, activa
-    lockout durante `lockout_duracion_minutos`."""
+async def _registrar_fallo_cedula(cedula: str) -> None:
+    """Incrementa el contador de fallos (INCR + EXPIRE atomico). Si supera
+    el umbral, activa lockout durante `lockout_duracion_minutos`."""
     if not cedula:
         return
     try:
-        from limits.storage import RedisStorage
-        storage = limiter._storage
-        if not isinstance(storage, RedisStorage):
-            return
+        storage = limiter.storage_async
         ventana = _settings.lockout_ventana_minutos * 60
-        fail_key = f"LIMITER/login_fallos:{cedula}///{ventana}/1/second"
-        current = storage.incr(fail_key, ventana)
-        if current and int(current) >= _settings.lockout_umbral_fallos:
-            lockout_ttl = _settings.lockout_duracion_minutos * 60
-            lockout_key = f"LIMITER/lockout:{cedula}///{lockout_ttl}/1/second"
-            storage.set(lockout_key, lockout_ttl, lockout_ttl)
-            storage.delete(fail_key)
-            logger.warning("Lockout activado para cedula=%s tras %d fallos", cedula, current)
+        fallos = await storage.incr(_clave_fallos(cedula), ventana)
+        if fallos >= _settings.lockout_umbral_fallos:
+            await asyncio.gather(
+                storage.incr(_clave_lockout(cedula), _settings.lockout_duracion_minutos * 60),
+                storage.clear(_clave_fallos(cedula)),
+            )
+            logger.warning("Lockout activado para cedula=%s tras %d fallos", cedula, fallos)
     except Exception as e:
         logger.warning("No se pudo registrar fallo de lockout para cedula=%s: %s", cedula, e)
 
 
-limiter = Limiter(
+async def desbloquear_cedula(cedula: str) -> int:
+    """Elimina contadores de login, fallos y lockout de una cedula.
+    Retorna la cantidad de claves eliminadas."""
+    cedula = cedula.strip().lower()
+    storage = limiter.storage_async
+    if isinstance(storage, MemoryStorageAsync):
+        claves = [
+            k for k in list(storage.storage)
+            if f"login:{cedula}" in k.lower() or k in (_clave_fallos(cedula), _clave_lockout(cedula))
+        ]
+        for k in claves:
+            await storage.clear(k)
+        return len(claves)
+
+    cliente = storage.storage
+    claves = {k async for k in cliente.scan_iter(match=storage.prefixed_key(f"*login*:{cedula}*"))}
+    claves |= {storage.prefixed_key(_clave_fallos(cedula)), storage.prefixed_key(_clave_lockout(cedula))}
+    return await cliente.delete(list(claves))
+
+
+limiter = LimiterAsync(
     key_func=_verify_admin_key_func,
     default_limits=[],
     headers_enabled=False,
@@ -7,12 +7,16 @@ import asyncio
 import logging
 import os
 import subprocess
-from fastapi import FastAPI
+from typing import Optional
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 
 # Importaciones locales (Base de Datos y Servicios)
-from .database import init_db, AsyncSessionLocal
+from .database import init_db, AsyncSessionLocal, async_engine, erp_engine
 from .services.panel_control.metrica_service import MetricaService
+from .services.planificador import planificador
+from .services.erp.catalogo_replica_service import ENCABEZADOS_ORIGEN
+from .services.novedades_nomina.ejecutor_extraccion import TiempoExtraccionExcedidoError
 from .services.auth.rbac_discovery import sincronizar_manifiesto_rbac
 
 # Importar routers
@@ -45,6 +49,9 @@ from .api.notificaciones.router import router as notificaciones_router
 from .api.auditoria import router as auditoria_router
 from .core.middleware.auditoria_middleware import auditoria_http_middleware
 from .core.middleware.limite_carga_actividad import LimiteCargaActividadMiddleware
+from .core.middleware.metricas_http import MetricasHttpMiddleware
+from .core.middleware.consultas_sql import ConsultasSqlMiddleware
+from .core import metricas
 from .core.config import obtener_configuracion as obtener_configuracion_core
 
 # Configurar logging centralizado
@@ -125,6 +132,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=list(ENCABEZADOS_ORIGEN),
 )
 
 # Rate limiting para /config/verify-admin (5 intentos / 5 minutos por usuario+IP)
@@ -188,6 +196,21 @@ async def cache_request_body_for_rate_limit(request, call_next):
     return await call_next(request)
 
 
+@app.exception_handler(TiempoExtraccionExcedidoError)
+async def _tiempo_extraccion_excedido_handler(request, exc: TiempoExtraccionExcedidoError):
+    """Un timeout de extracción es un 504, no un 500; así ningún router que
+    llame a `ejecutar_extractor` tiene que capturarlo."""
+    logger.warning("EXTRACCION_TIMEOUT_HTTP | path=%s | %s", request.url.path, exc)
+    from fastapi.responses import JSONResponse
+    return JSONResponse(
+        status_code=504,
+        content={
+            "detail": "El procesamiento del archivo excedió el tiempo permitido. "
+            "Intente con un archivo más pequeño o divídalo en varios.",
+        },
+    )
+
+
 @app.exception_handler(StorageError)
 async def _storage_error_handler(request, exc: StorageError):
     """Fail-closed: si Redis (storage del rate limiter) esta caido,
@@ -219,18 +242,79 @@ async def startup_event():
     async with AsyncSessionLocal() as db:
         await sincronizar_manifiesto_rbac(db)
 
-    # 3. Iniciar recolector de metricas en segundo plano (cada 15 min)
-    asyncio.create_task(
-        MetricaService.iniciar_recolector_automatico(intervalo_minutos=15)
-    )
+    # 3. Tareas periódicas: todos los workers arrancan el planificador, pero
+    #    solo el líder del clúster (advisory lock en Postgres) las ejecuta.
+    from app.services.almacenamiento.blob_service import ejecutar_recoleccion_blobs
+    from app.services.auditoria.particiones_service import mantener_particiones
+    from app.services.auditoria.rollup_service import ejecutar_rollup_auditoria
+    from app.services.desarrollo.compromiso_notificacion import ejecutar_verificador_compromisos
+    from app.services.erp.catalogo_replica_service import CatalogoReplicaService
+    from app.services.erp.directorio_empleados_service import DirectorioEmpleadosService
+    from app.services.panel_control.presencia_service import PresenciaService
+    config_core = obtener_configuracion_core()
+    if not planificador.tareas:
+        # Snapshot de métricas del sistema (cada 15 min)
+        planificador.registrar(
+            "metricas_snapshot", MetricaService.capturar_snapshot, intervalo_segundos=15 * 60
+        )
+        # Verificador de compromisos de actividades (cada 12 horas)
+        planificador.registrar(
+            "compromisos_actividades", ejecutar_verificador_compromisos,
+            intervalo_segundos=12 * 3600, retraso_inicial_segundos=30,
+        )
+        # Réplica local del directorio de empleados del ERP
+        planificador.registrar(
+            "directorio_empleados_erp", DirectorioEmpleadosService.sincronizar_async,
+            intervalo_segundos=config_core.directorio_empleados_intervalo_minutos * 60,
+            retraso_inicial_segundos=10,
+        )
+        # Réplicas locales del catálogo de productos y de las OTs de viáticos
+        planificador.registrar(
+            "catalogos_erp", CatalogoReplicaService.sincronizar_async,
+            intervalo_segundos=config_core.replica_catalogos_erp_intervalo_minutos * 60,
+            retraso_inicial_segundos=20,
+        )
+        # Volcado a Postgres de la presencia (heartbeats) registrada en Redis
+        planificador.registrar(
+            "presencia_volcado", PresenciaService.volcar_actividad,
+            intervalo_segundos=config_core.presencia_volcado_segundos,
+            retraso_inicial_segundos=config_core.presencia_volcado_segundos,
+        )
+        # Particiones mensuales de auditoría: próximas, histórico y retención
+        planificador.registrar(
+            "auditoria_particiones", mantener_particiones,
+            intervalo_segundos=24 * 3600, retraso_inicial_segundos=120,
+        )
+        # Rollup por hora de auditoría (estadísticas): horas cerradas y filas tardías
+        planificador.registrar(
+            "auditoria_rollup", ejecutar_rollup_auditoria,
+            intervalo_segundos=config_core.auditoria_rollup_intervalo_minutos * 60,
+            retraso_inicial_segundos=90,
+        )
+        # Recolección de blobs sin referencias del almacén de archivos
+        planificador.registrar(
+            "blobs_recoleccion", ejecutar_recoleccion_blobs,
+            intervalo_segundos=config_core.blobs_gc_intervalo_minutos * 60,
+            retraso_inicial_segundos=60,
+        )
+    asyncio.create_task(planificador.iniciar())
 
-    # 4. Iniciar verificador de compromisos de actividades en segundo plano (cada 12 horas)
-    from app.services.desarrollo.compromiso_notificacion import iniciar_loop_verificador_compromisos
+    # 4. Drenar la bandeja de salida de correos (SMTP fuera del request).
+    #    Corre en cada worker: reclama lotes con SKIP LOCKED y despierta al encolar.
+    from app.services.notifications.email_outbox import iniciar_loop_envio_correos
     asyncio.create_task(
-        iniciar_loop_verificador_compromisos(intervalo_horas=12)
+        iniciar_loop_envio_correos(
+            intervalo_segundos=config_core.correo_envio_intervalo_segundos
+        )
     )
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Acciones al detener el worker"""
+    metricas.marcar_proceso_terminado()
+
+
 @app.get("/")
 async def raiz():
     """Endpoint raiz"""
@@ -248,6 +332,14 @@ async def verificar_salud():
     return {"estado": "saludable", "version": VERSION_SISTEMA}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def exponer_metricas(authorization: Optional[str] = Header(default=None)):
+    """Métricas Prometheus (agregadas entre workers). Fuera de /api/v2: nginx no lo publica."""
+    if not metricas.token_valido(authorization):
+        raise HTTPException(status_code=401, detail="Token de métricas inválido")
+    return await metricas.respuesta_metricas()
+
+
 
 api_prefix = "/api/v2"
 
@@ -321,3 +413,10 @@ app.include_router(
 # Consolidated developments-activities endpoint and number-mapped endpoint
 app.include_router(desarrollos_actividades_router, prefix=api_prefix)
 app.include_router(development_by_number_router, prefix=api_prefix)
+
+# Métricas: pools de SQLAlchemy y middleware HTTP (el último agregado es el
+# más externo, así mide también al resto de middlewares).
+metricas.instrumentar_pool(async_engine, "principal")
+metricas.instrumentar_pool(erp_engine, "erp")
+app.add_middleware(ConsultasSqlMiddleware)
+app.add_middleware(MetricasHttpMiddleware)
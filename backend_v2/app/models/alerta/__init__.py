@@ -12,6 +12,7 @@ from .notificacion import (
     NotificacionUsuarioCrear,
     NotificacionUsuarioActualizar
 )
+from .correo_saliente import CorreoSaliente
 
 __all__ = [
     "ActividadProxima",
@@ -20,5 +21,6 @@ __all__ = [
     "RegistroActividadCrear",
     "NotificacionUsuario",
     "NotificacionUsuarioCrear",
-    "NotificacionUsuarioActualizar"
+    "NotificacionUsuarioActualizar",
+    "CorreoSaliente"
 ]
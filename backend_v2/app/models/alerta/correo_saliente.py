@@ -0,0 +1,44 @@
+"""
+Bandeja de salida de correos (outbox) - Backend V2 (SQLModel)
+"""
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, DateTime, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+class CorreoSaliente(SQLModel, table=True):
+    """Correo encolado por `EmailService.enviar_correo` y despachado por el enviador en segundo plano"""
+
+    __tablename__ = "correos_salientes"
+    __table_args__ = (
+        Index(
+            "idx_correos_salientes_pendientes",
+            "proximo_intento_en",
+            postgresql_where=text("estado = 'pendiente'"),
+        ),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    asunto: str = Field(max_length=500)
+    destinatarios: List[str] = Field(sa_column=Column(JSONB, nullable=False))
+    contenido_html: str
+    contenido_texto: Optional[str] = None
+    adjuntos: Optional[List[Dict[str, Any]]] = Field(default=None, sa_column=Column(JSONB))
+    message_id: Optional[str] = Field(default=None, max_length=255)
+    in_reply_to: Optional[str] = Field(default=None, max_length=255)
+    # pendiente | enviando | enviado | fallido
+    estado: str = Field(default="pendiente", max_length=20)
+    intentos: int = Field(default=0)
+    ultimo_error: Optional[str] = None
+    proximo_intento_en: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), server_default=text("now()"), nullable=False),
+    )
+    bloqueado_en: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True)))
+    enviado_en: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True)))
+    creado_en: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), server_default=text("now()")),
+    )
@@ -0,0 +1,6 @@
+"""
+Modelos del almacén de archivos - Backend V2 (SQLModel)
+"""
+from .blob_archivo import BlobArchivo
+
+__all__ = ["BlobArchivo"]
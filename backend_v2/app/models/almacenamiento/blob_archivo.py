@@ -0,0 +1,41 @@
+"""
+Almacén de archivos direccionado por contenido.
+
+Cada archivo físico se guarda una sola vez bajo su SHA-256
+(`<storage_path>/blobs/ab/cd/<sha256>`). Esta tabla lleva cuántas filas
+(adjuntos de tickets, evidencias de actividades, archivos de nómina) lo
+referencian; los blobs sin referencias los borra la recolección periódica.
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Column, DateTime, Index
+from sqlmodel import Field, SQLModel, text
+
+
+class BlobArchivo(SQLModel, table=True):
+    """Blob físico único y su contador de referencias."""
+
+    __tablename__ = "blobs_archivo"
+    __table_args__ = (
+        # Solo los candidatos a recolección (sin referencias) entran al índice.
+        Index(
+            "idx_blobs_archivo_sin_referencias",
+            "actualizado_en",
+            postgresql_where=text("referencias = 0"),
+        ),
+    )
+
+    sha256: str = Field(primary_key=True, max_length=64)
+    tamano_bytes: int = Field(default=0)
+    referencias: int = Field(default=0)
+    creado_en: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), server_default=text("now()")),
+    )
+    # Última vez que cambió el contador: la recolección respeta un periodo de gracia.
+    actualizado_en: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), server_default=text("now()")),
+    )
@@ -2,12 +2,18 @@ from .accion_usuario import (
     AccionAuditoria,
     AuditoriaAccionPublica,
     AuditoriaAccionUsuario,
+    AuditoriaEventosCursor,
     AuditoriaEventosPaginados,
 )
+from .rollup import AuditoriaRollupEstado, AuditoriaRollupHora, AuditoriaRollupRutaHora
 
 __all__ = [
     "AccionAuditoria",
     "AuditoriaAccionPublica",
     "AuditoriaAccionUsuario",
+    "AuditoriaEventosCursor",
     "AuditoriaEventosPaginados",
+    "AuditoriaRollupEstado",
+    "AuditoriaRollupHora",
+    "AuditoriaRollupRutaHora",
 ]
@@ -4,7 +4,7 @@ from datetime import datetime
 from enum import Enum
 from typing import Any, Dict, List, Optional
 
-from sqlalchemy import Column, Index, SmallInteger, Text
+from sqlalchemy import Column, DateTime, Index, SmallInteger, Text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlmodel import Field, SQLModel, text
 
@@ -28,12 +28,20 @@ class AuditoriaAccionUsuario(SQLModel, table=True):
         Index("idx_aud_acc_usuario_ts", "usuario_id", "timestamp"),
         Index("idx_aud_acc_modulo_ts", "modulo", "timestamp"),
         Index("idx_aud_acc_entidad", "entidad_tipo", "entidad_id"),
-        Index("idx_aud_acc_timestamp", "timestamp"),
+        # También ordena el keyset (timestamp, id) del listado por cursor y la exportación.
+        Index("idx_aud_acc_ts_id", "timestamp", "id"),
+        # Particiones mensuales: core/migrations/auditoria_acciones_migration.py
+        {"postgresql_partition_by": "RANGE (timestamp)"},
     )
 
-    id: Optional[int] = Field(default=None, primary_key=True)
+    # La clave de partición debe formar parte de la PK.
+    id: Optional[int] = Field(
+        default=None, primary_key=True, sa_column_kwargs={"autoincrement": True}
+    )
     timestamp: Optional[datetime] = Field(
         default=None,
+        primary_key=True,
+        sa_type=DateTime(timezone=True),
         sa_column_kwargs={"server_default": text("now()")},
     )
     usuario_id: str = Field(max_length=50, index=True)
@@ -92,6 +100,14 @@ class AuditoriaEventosPaginados(SQLModel):
     page_size: int
 
 
+class AuditoriaEventosCursor(SQLModel):
+    """Página por keyset: `siguiente_cursor` es None en la última página."""
+
+    items: List[AuditoriaAccionPublica]
+    siguiente_cursor: Optional[str] = None
+    limite: int
+
+
 class AuditoriaEventoResumen(SQLModel):
     id: int
     timestamp: Optional[datetime] = None
@@ -0,0 +1,69 @@
+"""
+Agregados por hora de auditoria_acciones_usuario.
+
+Los llena `services/auditoria/rollup_service.py` (planificador) y los lee
+`ServicioAuditoriaEstadisticas`: las horas cerradas salen de aquí y solo la
+hora en curso (y los bordes del rango que no caen en hora exacta) se
+agregan desde los eventos crudos.
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Column, DateTime, Index, SmallInteger
+from sqlmodel import Field, SQLModel
+
+
+class AuditoriaRollupHora(SQLModel, table=True):
+    """Conteos por (hora, módulo, acción, usuario)."""
+
+    __tablename__ = "auditoria_rollup_hora"
+
+    hora: datetime = Field(primary_key=True, sa_type=DateTime(timezone=True))
+    modulo: str = Field(primary_key=True, max_length=80)
+    accion: str = Field(primary_key=True, max_length=50)
+    usuario_id: str = Field(primary_key=True, max_length=50)
+    usuario_nombre: Optional[str] = Field(default=None, max_length=255)
+    total: int = Field(default=0)
+    exitos: int = Field(default=0)
+    denegados: int = Field(default=0)
+    fallos_auth: int = Field(default=0)
+    fallos_sistema: int = Field(default=0)
+    # Dispositivo según agente_usuario; escritorio = total - movil - api_script.
+    movil: int = Field(default=0)
+    api_script: int = Field(default=0)
+    ultimo_evento: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True))
+    )
+
+
+class AuditoriaRollupRutaHora(SQLModel, table=True):
+    """Conteos por (hora, módulo, acción, ruta, código, resultado) para fallos y rutas."""
+
+    __tablename__ = "auditoria_rollup_ruta_hora"
+    __table_args__ = (Index("idx_aud_rollup_ruta_hora", "hora"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    hora: datetime = Field(sa_type=DateTime(timezone=True))
+    modulo: str = Field(max_length=80)
+    accion: str = Field(max_length=50)
+    ruta: Optional[str] = Field(default=None, max_length=255)
+    codigo_respuesta: Optional[int] = Field(
+        default=None, sa_column=Column(SmallInteger, nullable=True)
+    )
+    resultado: str = Field(max_length=20)
+    total: int = Field(default=0)
+
+
+class AuditoriaRollupEstado(SQLModel, table=True):
+    """Marca de avance del rollup (fila única id=1): horas < procesado_hasta ya agregadas."""
+
+    __tablename__ = "auditoria_rollup_estado"
+
+    id: int = Field(default=1, primary_key=True)
+    procesado_hasta: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True))
+    )
+    actualizado_en: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True))
+    )
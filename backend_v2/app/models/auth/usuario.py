@@ -7,7 +7,7 @@ from typing import Optional, List
 from datetime import datetime
 from pydantic import field_validator
 from sqlmodel import SQLModel, Field, Relationship
-from sqlalchemy import text
+from sqlalchemy import Column, ForeignKey, String, text
 
 
 # --- Modelos de Base de Datos (table=True) ---
@@ -59,6 +59,28 @@ class Usuario(SQLModel, table=True):
     )
 
 
+class UsuarioEspecialidad(SQLModel, table=True):
+    """Especialidad (categoría de ticket) de un usuario; reemplaza Usuario.especialidades."""
+
+    __tablename__ = "usuario_especialidad"
+
+    usuario_id: str = Field(
+        sa_column=Column(String(50), ForeignKey("usuarios.id", ondelete="CASCADE"), primary_key=True)
+    )
+    especialidad: str = Field(primary_key=True, index=True, max_length=100)
+
+
+class UsuarioArea(SQLModel, table=True):
+    """Área asignada a un usuario; reemplaza Usuario.areas_asignadas."""
+
+    __tablename__ = "usuario_area"
+
+    usuario_id: str = Field(
+        sa_column=Column(String(50), ForeignKey("usuarios.id", ondelete="CASCADE"), primary_key=True)
+    )
+    area: str = Field(primary_key=True, index=True, max_length=255)
+
+
 class RelacionUsuario(SQLModel, table=True):
     """Relación jerárquica directa entre usuario y superior."""
 
@@ -0,0 +1,79 @@
+"""
+Réplica local del catálogo de productos y del índice de OTs de viáticos del ERP.
+
+Vive en la base de datos de la aplicación (no en el ERP). La llena
+`CatalogoReplicaService.sincronizar` y atiende las búsquedas por tecla de
+requisiciones y viáticos con índices trigram (pg_trgm) en lugar de ILIKE/LIKE
+contra el ERP.
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Column, DateTime
+from sqlmodel import Field, SQLModel, text
+
+
+class CatalogoProductoReplica(SQLModel, table=True):
+    """Fila de catalogoproducto del ERP (todas las columnas como texto)."""
+
+    __tablename__ = "erp_catalogo_productos"
+
+    referencia: str = Field(primary_key=True, max_length=100)
+    fecha: Optional[str] = Field(default=None, max_length=50)
+    hora: Optional[str] = Field(default=None, max_length=50)
+    codigolinea: Optional[str] = Field(default=None, max_length=100)
+    codigogrupo: Optional[str] = Field(default=None, max_length=100)
+    elemento: Optional[str] = Field(default=None, max_length=255)
+    descripcion: Optional[str] = Field(default=None)
+    unidadmedida: Optional[str] = Field(default=None, max_length=50)
+    linea: Optional[str] = Field(default=None, max_length=255)
+    grupo: Optional[str] = Field(default=None, max_length=255)
+    tipo: Optional[str] = Field(default=None, max_length=100)
+    clasificacion: Optional[str] = Field(default=None, max_length=100)
+    rotacion: Optional[str] = Field(default=None, max_length=50)
+    periodo: Optional[str] = Field(default=None, max_length=50)
+    proveedorfrecuente: Optional[str] = Field(default=None, max_length=255)
+    clasificacioncompras: Optional[str] = Field(default=None, max_length=100)
+    formato: Optional[str] = Field(default=None, max_length=100)
+    # md5 de los campos replicados: permite escribir solo filas que cambiaron.
+    huella: str = Field(max_length=32)
+    actualizado_en: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), server_default=text("now()")),
+    )
+
+
+class OtViaticoReplica(SQLModel, table=True):
+    """Combinación OT / centro de costo / subcentro de otviaticos del ERP."""
+
+    __tablename__ = "erp_ots_viaticos"
+
+    # numero|centrocosto|subcentrocosto: en el ERP no hay clave propia.
+    clave: str = Field(primary_key=True, max_length=255)
+    numero: str = Field(index=True, max_length=100)
+    centrocosto: Optional[str] = Field(default=None, max_length=100)
+    subcentrocosto: Optional[str] = Field(default=None, max_length=100)
+    especialidad: Optional[str] = Field(default=None, max_length=255)
+    cliente: Optional[str] = Field(default=None, max_length=255)
+    ciudad: Optional[str] = Field(default=None, max_length=255)
+    huella: str = Field(max_length=32)
+    actualizado_en: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), server_default=text("now()")),
+    )
+
+
+class CatalogoReplicaSincronizacion(SQLModel, table=True):
+    """Última sincronización exitosa de cada réplica ('catalogo_productos', 'ots_viaticos')."""
+
+    __tablename__ = "erp_catalogos_sincronizacion"
+
+    replica: str = Field(primary_key=True, max_length=50)
+    ultima_sincronizacion: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True))
+    )
+    total_filas: int = Field(default=0)
+    filas_actualizadas: int = Field(default=0)
+    filas_eliminadas: int = Field(default=0)
+    duracion_ms: int = Field(default=0)
@@ -0,0 +1,51 @@
+"""
+Réplica local del directorio de empleados del ERP.
+
+Vive en la base de datos de la aplicación (no en el ERP). Se llena con
+`DirectorioEmpleadosService.sincronizar` y permite resolver cédulas en
+bloque con un índice propio en lugar de consultar el ERP por request.
+"""
+
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import Column, DateTime, Index
+from sqlmodel import Field, SQLModel, text
+
+
+class DirectorioEmpleado(SQLModel, table=True):
+    """Último contrato conocido de cada establecimiento (empleado) del ERP."""
+
+    __tablename__ = "erp_directorio_empleados"
+    __table_args__ = (Index("idx_erp_dir_emp_estado", "estado"),)
+
+    cedula: str = Field(primary_key=True, max_length=50)
+    nombre: Optional[str] = Field(default=None, max_length=255)
+    estado: Optional[str] = Field(default=None, max_length=50)
+    empresa: Optional[str] = Field(default=None, max_length=255)
+    centrocosto: Optional[str] = Field(default=None, max_length=255)
+    area: Optional[str] = Field(default=None, max_length=255)
+    cargo: Optional[str] = Field(default=None, max_length=255)
+    ciudadcontratacion: Optional[str] = Field(default=None, max_length=255)
+    fecharetiro: Optional[date] = Field(default=None)
+    # md5 de los campos replicados: permite escribir solo filas que cambiaron.
+    huella: str = Field(max_length=32)
+    actualizado_en: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), server_default=text("now()")),
+    )
+
+
+class DirectorioSincronizacion(SQLModel, table=True):
+    """Estado de la última sincronización exitosa (fila única id=1)."""
+
+    __tablename__ = "erp_directorio_sincronizacion"
+
+    id: int = Field(default=1, primary_key=True)
+    ultima_sincronizacion: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True))
+    )
+    total_empleados: int = Field(default=0)
+    filas_actualizadas: int = Field(default=0)
+    filas_eliminadas: int = Field(default=0)
+    duracion_ms: int = Field(default=0)
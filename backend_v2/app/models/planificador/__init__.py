@@ -0,0 +1,6 @@
+"""
+Modelos del planificador de tareas periódicas - Backend V2 (SQLModel)
+"""
+from .tarea_programada import EjecucionTareaProgramada
+
+__all__ = ["EjecucionTareaProgramada"]
@@ -0,0 +1,33 @@
+"""
+Última ejecución de cada tarea periódica del planificador.
+
+Solo el worker líder ejecuta las tareas; esta tabla guarda cuándo corrió
+cada una, cuánto tardó y con qué resultado. Un líder nuevo la lee para
+continuar el calendario en vez de repetir de inmediato lo que el anterior
+ya ejecutó.
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Column, DateTime, Text
+from sqlmodel import Field, SQLModel
+
+
+class EjecucionTareaProgramada(SQLModel, table=True):
+    """Estado de la última ejecución de una tarea periódica."""
+
+    __tablename__ = "planificador_tareas"
+
+    nombre: str = Field(primary_key=True, max_length=100)
+    ultimo_inicio: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True))
+    )
+    ultimo_fin: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True))
+    )
+    duracion_ms: Optional[int] = Field(default=None)
+    exito: Optional[bool] = Field(default=None)
+    ultimo_error: Optional[str] = Field(default=None, sa_column=Column(Text))
+    ejecutado_por: Optional[str] = Field(default=None, max_length=200)
+    ejecuciones: int = Field(default=0)
@@ -34,7 +34,7 @@ class CategoriaTicket(SQLModel, table=True):
 
 
 class Ticket(SQLModel, table=True):
-    """Tickets de soporte"""
+    """Tickets de soporte (índices en core/migrations/indices_tickets.py)"""
 
     __tablename__ = "tickets"
 
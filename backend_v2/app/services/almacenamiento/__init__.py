@@ -0,0 +1,25 @@
+from .blob_service import (
+    ArchivoBlobInvalido,
+    BlobDemasiadoGrande,
+    BlobGuardado,
+    guardar_bytes,
+    guardar_stream,
+    liberar,
+    recolectar_huerfanos,
+    ruta_blob,
+    sha256_de_ruta,
+)
+from .respuesta_archivo import respuesta_archivo
+
+__all__ = [
+    "ArchivoBlobInvalido",
+    "BlobDemasiadoGrande",
+    "BlobGuardado",
+    "guardar_bytes",
+    "guardar_stream",
+    "liberar",
+    "recolectar_huerfanos",
+    "ruta_blob",
+    "sha256_de_ruta",
+    "respuesta_archivo",
+]
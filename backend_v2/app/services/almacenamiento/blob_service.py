@@ -0,0 +1,317 @@
+"""
+Almacén de archivos direccionado por contenido (SHA-256) - Backend V2
+
+- Un mismo contenido se guarda una sola vez: la ruta física es su hash
+  (`<storage_path>/blobs/ab/cd/<sha256>`), sin importar cuántos tickets,
+  actividades o cargas de nómina lo referencien.
+- Escritura atómica: el archivo se copia a un temporal calculando el hash
+  por bloques y se publica con `os.replace`.
+- Conteo de referencias en `blobs_archivo` dentro de la transacción de quien
+  guarda: si esa transacción hace rollback, la referencia desaparece con ella.
+- `recolectar_huerfanos` borra los blobs sin referencias pasado un periodo de
+  gracia. Los archivos que quedaron en disco sin fila (cargas abortadas) se
+  registran con cero referencias y se borran en una corrida posterior, así
+  el borrado siempre ocurre con la fila bloqueada.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from uuid import uuid4
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import obtener_configuracion
+from app.models.almacenamiento import BlobArchivo  # noqa: F401  (registra la tabla para create_all)
+
+logger = logging.getLogger(__name__)
+
+config = obtener_configuracion()
+
+CHUNK_SIZE = 1024 * 1024
+DIRECTORIO_BLOBS = "blobs"
+DIRECTORIO_TEMPORAL = "tmp"
+LOTE_RECOLECCION = 500
+PATRON_RUTA_BLOB = re.compile(r"^blobs/[0-9a-f]{2}/[0-9a-f]{2}/(?P<sha256>[0-9a-f]{64})$")
+PATRON_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+_QUERY_REFERENCIAR = text("""
+    INSERT INTO blobs_archivo (sha256, tamano_bytes, referencias)
+    VALUES (:sha256, :tamano, 1)
+    ON CONFLICT (sha256) DO UPDATE
+    SET referencias = blobs_archivo.referencias + 1, actualizado_en = now()
+""")
+
+_QUERY_LIBERAR = text("""
+    UPDATE blobs_archivo
+    SET referencias = GREATEST(referencias - 1, 0), actualizado_en = now()
+    WHERE sha256 = :sha256
+""")
+
+_QUERY_ADOPTAR_SUELTOS = text("""
+    INSERT INTO blobs_archivo (sha256, tamano_bytes, referencias)
+    SELECT s.sha256, s.tamano, 0
+    FROM unnest(CAST(:shas AS text[]), CAST(:tamanos AS bigint[])) AS s(sha256, tamano)
+    ON CONFLICT (sha256) DO NOTHING
+    RETURNING sha256
+""")
+
+# SKIP LOCKED: un blob que otra transacción está referenciando en este momento
+# no se espera ni se toca; se reevalúa en la siguiente corrida.
+_QUERY_BORRAR_SIN_REFERENCIAS = text("""
+    DELETE FROM blobs_archivo
+    WHERE sha256 IN (
+        SELECT sha256 FROM blobs_archivo
+        WHERE referencias = 0
+          AND actualizado_en < now() - make_interval(mins => :gracia)
+        ORDER BY actualizado_en
+        LIMIT :lote
+        FOR UPDATE SKIP LOCKED
+    )
+    AND referencias = 0
+    RETURNING sha256, tamano_bytes
+""")
+
+
+class ArchivoBlobInvalido(ValueError):
+    """El contenido no puede guardarse en el almacén."""
+
+
+class BlobDemasiadoGrande(ArchivoBlobInvalido):
+    """El contenido supera el tamaño máximo permitido."""
+
+
+@dataclass(frozen=True)
+class BlobGuardado:
+    sha256: str
+    tamano_bytes: int
+    # Relativa a storage_path; es lo que se persiste en la fila que referencia.
+    ruta_relativa: str
+    # False si el contenido ya estaba en disco (deduplicado).
+    nuevo: bool
+
+
+def _raiz(raiz: Optional[Path]) -> Path:
+    return Path(raiz) if raiz is not None else Path(config.storage_path)
+
+
+def ruta_relativa_blob(sha256: str) -> str:
+    return f"{DIRECTORIO_BLOBS}/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+def ruta_blob(sha256: str, raiz: Optional[Path] = None) -> Path:
+    return _raiz(raiz) / ruta_relativa_blob(sha256)
+
+
+def sha256_de_ruta(ruta_relativa: Optional[str]) -> Optional[str]:
+    """SHA-256 de una ruta del almacén, o None si es una ruta legada."""
+    coincidencia = PATRON_RUTA_BLOB.fullmatch(ruta_relativa or "")
+    return coincidencia.group("sha256") if coincidencia else None
+
+
+def _directorio_temporal(raiz: Optional[Path]) -> Path:
+    directorio = _raiz(raiz) / DIRECTORIO_BLOBS / DIRECTORIO_TEMPORAL
+    directorio.mkdir(parents=True, exist_ok=True)
+    return directorio
+
+
+def _escribir_bloque(destino, hasher, bloque: bytes) -> None:
+    hasher.update(bloque)
+    destino.write(bloque)
+
+
+def _publicar(temporal: Path, destino: Path) -> bool:
+    """Mueve el temporal a su ruta final; si el contenido ya existía, lo descarta."""
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    if destino.is_file():
+        temporal.unlink(missing_ok=True)
+        return False
+    os.replace(temporal, destino)
+    return True
+
+
+def _escribir_y_publicar(contenido: bytes, destino: Path, directorio_temporal: Path) -> bool:
+    if destino.is_file():
+        return False
+    temporal = directorio_temporal / f"{uuid4().hex}.tmp"
+    try:
+        with temporal.open("xb") as archivo:
+            archivo.write(contenido)
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        return _publicar(temporal, destino)
+    except BaseException:
+        temporal.unlink(missing_ok=True)
+        raise
+
+
+async def _referenciar(db: AsyncSession, sha256: str, tamano: int) -> None:
+    await db.execute(_QUERY_REFERENCIAR, {"sha256": sha256, "tamano": tamano})
+
+
+async def guardar_stream(
+    db: AsyncSession,
+    archivo,
+    maximo_bytes: int,
+    validar: Optional[Callable[[Path], None]] = None,
+    raiz: Optional[Path] = None,
+) -> BlobGuardado:
+    """
+    Copia `archivo` (cualquier objeto con `async read(n)`, p. ej. UploadFile)
+    por bloques a un temporal mientras calcula su SHA-256, sin cargarlo
+    completo en memoria. `validar(ruta_temporal)` se ejecuta en un hilo antes
+    de publicar (firmas de tipo, etc.). Suma una referencia al blob en `db`;
+    no hace commit.
+    """
+    directorio_temporal = await asyncio.to_thread(_directorio_temporal, raiz)
+    temporal = directorio_temporal / f"{uuid4().hex}.tmp"
+    hasher = hashlib.sha256()
+    tamano = 0
+    try:
+        with temporal.open("xb") as destino:
+            while bloque := await archivo.read(CHUNK_SIZE):
+                tamano += len(bloque)
+                if tamano > maximo_bytes:
+                    raise BlobDemasiadoGrande(f"El archivo supera el límite de {maximo_bytes} bytes")
+                await asyncio.to_thread(_escribir_bloque, destino, hasher, bloque)
+            if tamano == 0:
+                raise ArchivoBlobInvalido("El archivo está vacío")
+            await asyncio.to_thread(destino.flush)
+            await asyncio.to_thread(os.fsync, destino.fileno())
+        if validar is not None:
+            await asyncio.to_thread(validar, temporal)
+
+        sha256 = hasher.hexdigest()
+        # Primero la referencia (bloquea la fila frente a la recolección), luego el archivo.
+        await _referenciar(db, sha256, tamano)
+        nuevo = await asyncio.to_thread(_publicar, temporal, ruta_blob(sha256, raiz))
+    except BaseException:
+        temporal.unlink(missing_ok=True)
+        raise
+    return BlobGuardado(sha256, tamano, ruta_relativa_blob(sha256), nuevo)
+
+
+async def guardar_bytes(
+    db: AsyncSession, contenido: bytes, raiz: Optional[Path] = None
+) -> BlobGuardado:
+    """Guarda un contenido que ya está en memoria. Suma una referencia; no hace commit."""
+    sha256 = await asyncio.to_thread(lambda: hashlib.sha256(contenido).hexdigest())
+    await _referenciar(db, sha256, len(contenido))
+    directorio_temporal = await asyncio.to_thread(_directorio_temporal, raiz)
+    nuevo = await asyncio.to_thread(
+        _escribir_y_publicar, contenido, ruta_blob(sha256, raiz), directorio_temporal
+    )
+    return BlobGuardado(sha256, len(contenido), ruta_relativa_blob(sha256), nuevo)
+
+
+async def liberar(db: AsyncSession, sha256: Optional[str]) -> None:
+    """Resta una referencia. El archivo se borra después, en la recolección. No hace commit."""
+    if sha256:
+        await db.execute(_QUERY_LIBERAR, {"sha256": sha256})
+
+
+def _listar_sueltos(raiz: Optional[Path], gracia_segundos: int) -> tuple:
+    """Blobs y temporales en disco con más antigüedad que la gracia."""
+    base = _raiz(raiz) / DIRECTORIO_BLOBS
+    limite = time.time() - gracia_segundos
+    blobs: Dict[str, int] = {}
+    temporales: List[Path] = []
+    if not base.is_dir():
+        return blobs, temporales
+    for ruta in base.rglob("*"):
+        try:
+            estado = ruta.stat()
+        except FileNotFoundError:
+            continue
+        if not ruta.is_file() or estado.st_mtime >= limite:
+            continue
+        if ruta.parent.name == DIRECTORIO_TEMPORAL:
+            temporales.append(ruta)
+        elif PATRON_SHA256.fullmatch(ruta.name) and ruta == ruta_blob(ruta.name, raiz):
+            blobs[ruta.name] = estado.st_size
+    return blobs, temporales
+
+
+def _borrar_archivos(rutas: List[Path]) -> None:
+    for ruta in rutas:
+        try:
+            ruta.unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"Almacén: no se pudo borrar {ruta}: {e}")
+
+
+async def recolectar_huerfanos(
+    db: AsyncSession, gracia_minutos: Optional[int] = None, raiz: Optional[Path] = None
+) -> dict:
+    """
+    Una corrida de recolección:
+    1. Borra los temporales viejos y registra con cero referencias los blobs
+       en disco que no tienen fila (quedarán elegibles en otra corrida).
+    2. Borra las filas sin referencias más viejas que la gracia y sus archivos,
+       antes del commit (con las filas aún bloqueadas).
+    Usa un advisory lock transaccional: si otro worker ya está recolectando,
+    retorna `{"omitida": True}`. Hace commit.
+    """
+    gracia = config.blobs_gc_gracia_minutos if gracia_minutos is None else gracia_minutos
+    adquirido = (await db.execute(
+        text("SELECT pg_try_advisory_xact_lock(hashtext('blobs_archivo_gc'))")
+    )).scalar()
+    if not adquirido:
+        await db.rollback()
+        return {"omitida": True}
+
+    try:
+        sueltos, temporales = await asyncio.to_thread(_listar_sueltos, raiz, gracia * 60)
+        await asyncio.to_thread(_borrar_archivos, temporales)
+        adoptados = 0
+        if sueltos:
+            resultado = await db.execute(
+                _QUERY_ADOPTAR_SUELTOS,
+                {"shas": list(sueltos), "tamanos": list(sueltos.values())},
+            )
+            adoptados = len(resultado.fetchall())
+
+        eliminados = 0
+        bytes_liberados = 0
+        while True:
+            filas = (await db.execute(
+                _QUERY_BORRAR_SIN_REFERENCIAS, {"gracia": gracia, "lote": LOTE_RECOLECCION}
+            )).fetchall()
+            if not filas:
+                break
+            await asyncio.to_thread(_borrar_archivos, [ruta_blob(f.sha256, raiz) for f in filas])
+            eliminados += len(filas)
+            bytes_liberados += sum(f.tamano_bytes or 0 for f in filas)
+            if len(filas) < LOTE_RECOLECCION:
+                break
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+    if eliminados or adoptados or temporales:
+        logger.info(
+            f"Almacén: {eliminados} blobs borrados ({bytes_liberados} bytes), "
+            f"{adoptados} sueltos registrados, {len(temporales)} temporales borrados"
+        )
+    return {
+        "blobs_eliminados": eliminados,
+        "bytes_liberados": bytes_liberados,
+        "sueltos_registrados": adoptados,
+        "temporales_eliminados": len(temporales),
+    }
+
+
+async def ejecutar_recoleccion_blobs() -> dict:
+    """Una corrida de `recolectar_huerfanos` con sesión propia (la agenda el planificador)"""
+    from app.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        return await recolectar_huerfanos(db)
@@ -0,0 +1,128 @@
+"""
+Descarga de archivos con validadores HTTP - Backend V2
+
+Reemplaza a `FileResponse` (Starlette 0.35 no responde 304 ni rangos):
+- ETag fuerte: el SHA-256 para blobs del almacén; para archivos legados,
+  un hash de mtime y tamaño.
+- If-None-Match -> 304 sin cuerpo.
+- Range (un solo rango `bytes=`) -> 206 con Content-Range; If-Range
+  distinto del ETag actual ignora el rango y envía el archivo completo.
+"""
+
+import asyncio
+import hashlib
+import os
+from email.utils import formatdate
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+BLOQUE_LECTURA = 64 * 1024
+
+
+def _disposicion(nombre: str) -> str:
+    nombre_codificado = quote(nombre)
+    if nombre_codificado != nombre:
+        return f"attachment; filename*=utf-8''{nombre_codificado}"
+    return f'attachment; filename="{nombre}"'
+
+
+def _coincide_etag(encabezado: Optional[str], etag: str) -> bool:
+    if not encabezado:
+        return False
+    candidatos = [c.strip() for c in encabezado.split(",")]
+    return "*" in candidatos or etag in (c.removeprefix("W/") for c in candidatos)
+
+
+def _parsear_rango(encabezado: str, tamano: int) -> Optional[Tuple[int, int]]:
+    """
+    (inicio, fin) inclusivo del único rango pedido, None si el encabezado no
+    se entiende o pide varios rangos (se responde el archivo completo).
+    Lanza ValueError si el rango es insatisfacible.
+    """
+    unidad, _, especificacion = encabezado.partition("=")
+    if unidad.strip().lower() != "bytes" or "," in especificacion:
+        return None
+    inicio_txt, guion, fin_txt = (p.strip() for p in especificacion.partition("-"))
+    if not guion or not (inicio_txt or fin_txt):
+        return None
+    if not all(p.isdigit() for p in (inicio_txt, fin_txt) if p):
+        return None
+    if not inicio_txt:
+        # Sufijo: los últimos N bytes.
+        sufijo = int(fin_txt)
+        if sufijo == 0 or tamano == 0:
+            raise ValueError("Rango insatisfacible")
+        return max(tamano - sufijo, 0), tamano - 1
+    inicio = int(inicio_txt)
+    fin = int(fin_txt) if fin_txt else tamano - 1
+    if inicio >= tamano or fin < inicio:
+        raise ValueError("Rango insatisfacible")
+    return inicio, min(fin, tamano - 1)
+
+
+async def _leer(ruta: Path, inicio: int, longitud: int) -> AsyncIterator[bytes]:
+    archivo = await asyncio.to_thread(ruta.open, "rb")
+    try:
+        await asyncio.to_thread(archivo.seek, inicio)
+        restante = longitud
+        while restante > 0:
+            bloque = await asyncio.to_thread(archivo.read, min(BLOQUE_LECTURA, restante))
+            if not bloque:
+                break
+            restante -= len(bloque)
+            yield bloque
+    finally:
+        await asyncio.to_thread(archivo.close)
+
+
+async def respuesta_archivo(
+    request: Request,
+    ruta: Path,
+    nombre: str,
+    tipo_mime: str,
+    sha256: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """Respuesta de descarga de `ruta` con ETag, 304 y rangos de bytes."""
+    estado = await asyncio.to_thread(os.stat, ruta)
+    tamano = estado.st_size
+    if sha256:
+        etag = f'"{sha256}"'
+    else:
+        etag = '"' + hashlib.md5(f"{estado.st_mtime}-{tamano}".encode()).hexdigest() + '"'
+
+    encabezados = {
+        "ETag": etag,
+        "Last-Modified": formatdate(estado.st_mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+        **(headers or {}),
+    }
+    if _coincide_etag(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=encabezados)
+
+    encabezados["Content-Disposition"] = _disposicion(nombre)
+    rango = None
+    encabezado_rango = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if encabezado_rango and (not if_range or if_range.strip() == etag):
+        try:
+            rango = _parsear_rango(encabezado_rango, tamano)
+        except ValueError:
+            encabezados["Content-Range"] = f"bytes */{tamano}"
+            return Response(status_code=416, headers=encabezados)
+
+    inicio, fin = rango if rango else (0, tamano - 1)
+    longitud = fin - inicio + 1 if tamano else 0
+    encabezados["Content-Length"] = str(longitud)
+    if rango:
+        encabezados["Content-Range"] = f"bytes {inicio}-{fin}/{tamano}"
+    return StreamingResponse(
+        _leer(ruta, inicio, longitud),
+        status_code=206 if rango else 200,
+        media_type=tipo_mime,
+        headers=encabezados,
+    )
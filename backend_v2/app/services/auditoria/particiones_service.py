@@ -0,0 +1,208 @@
+"""
+Particiones mensuales de auditoria_acciones_usuario.
+
+Mantenimiento diario (planificador, solo en el líder):
+  1. Crea por adelantado las particiones de los próximos meses. La partición
+     DEFAULT solo recibe filas si faltara alguna; crear una partición cuyo
+     rango ya tenga filas en DEFAULT falla y queda en el log.
+  2. Copia por lotes el histórico de `auditoria_acciones_usuario_legado`
+     (tabla previa a la partición) y la elimina al terminar.
+  3. Retención (desactivada por defecto): vuelca a CSV comprimido en
+     `auditoria_volcado_dir` las particiones más antiguas que
+     `auditoria_retencion_meses` y solo entonces las desprende y elimina, una
+     transacción por partición. Sin directorio de volcado no se elimina nada.
+"""
+
+import asyncio
+import gzip
+import logging
+import os
+import re
+from datetime import date, datetime, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+
+from app.core.config import obtener_configuracion
+
+logger = logging.getLogger(__name__)
+
+TABLA = "auditoria_acciones_usuario"
+TABLA_LEGADO = f"{TABLA}_legado"
+PARTICION_DEFAULT = f"{TABLA}_default"
+_PATRON_PARTICION = re.compile(rf"^{TABLA}_p(\d{{4}})_(\d{{2}})$")
+
+COLUMNAS = (
+    "id, timestamp, usuario_id, usuario_nombre, rol, modulo, accion, entidad_tipo, "
+    "entidad_id, metodo_http, ruta, codigo_respuesta, resultado, direccion_ip, "
+    "agente_usuario, correlacion_id, datos_anteriores, datos_nuevos, metadatos"
+)
+
+
+def inicio_mes(fecha) -> date:
+    return date(fecha.year, fecha.month, 1)
+
+
+def sumar_meses(mes: date, meses: int) -> date:
+    total = mes.year * 12 + mes.month - 1 + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def nombre_particion(mes: date) -> str:
+    return f"{TABLA}_p{mes:%Y_%m}"
+
+
+def _limite(mes: date) -> str:
+    return f"{mes.isoformat()} 00:00:00+00"
+
+
+def mes_actual() -> date:
+    return inicio_mes(datetime.now(timezone.utc))
+
+
+async def crear_particiones(conn, meses_adelante: int = 3, desde: Optional[date] = None) -> List[str]:
+    """Crea (si faltan) las particiones desde `desde` (o el mes actual) hasta N meses adelante."""
+    actual = mes_actual()
+    mes = min(desde or actual, actual)
+    hasta = sumar_meses(actual, meses_adelante)
+    creadas = []
+    while mes <= hasta:
+        nombre = nombre_particion(mes)
+        existe = (await conn.execute(text("SELECT to_regclass(:n)"), {"n": nombre})).scalar()
+        if existe is None:
+            await conn.execute(text(
+                f"CREATE TABLE {nombre} PARTITION OF {TABLA} "
+                f"FOR VALUES FROM ('{_limite(mes)}') TO ('{_limite(sumar_meses(mes, 1))}')"
+            ))
+            creadas.append(nombre)
+        mes = sumar_meses(mes, 1)
+    await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {PARTICION_DEFAULT} PARTITION OF {TABLA} DEFAULT"))
+    if creadas:
+        logger.info(f"Particiones de auditoría creadas: {', '.join(creadas)}")
+    return creadas
+
+
+async def listar_particiones(conn) -> List[Tuple[str, date]]:
+    """Particiones mensuales (nombre, mes) ordenadas de la más antigua a la más reciente."""
+    nombres = (await conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:tabla)
+    """), {"tabla": TABLA})).scalars().all()
+    particiones = []
+    for nombre in nombres:
+        coincide = _PATRON_PARTICION.match(nombre)
+        if coincide:
+            particiones.append((nombre, date(int(coincide[1]), int(coincide[2]), 1)))
+    return sorted(particiones, key=lambda p: p[1])
+
+
+async def volcar_particion(conn, nombre: str, directorio: str) -> str:
+    """COPY de la partición a `<directorio>/<nombre>.csv.gz` (con encabezado).
+
+    La compresión y la escritura corren en hilos para no bloquear el event
+    loop; si el COPY falla se borra el archivo parcial.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    ruta = os.path.join(directorio, f"{nombre}.csv.gz")
+    temporal = f"{ruta}.parcial"
+    crudo = await conn.get_raw_connection()
+    archivo = await asyncio.to_thread(gzip.open, temporal, "wb")
+    try:
+        async def escribir(bloque: bytes) -> None:
+            await asyncio.to_thread(archivo.write, bloque)
+
+        await crudo.driver_connection.copy_from_table(
+            nombre, output=escribir, format="csv", header=True
+        )
+        await asyncio.to_thread(archivo.close)
+    except BaseException:
+        await asyncio.to_thread(archivo.close)
+        os.remove(temporal)
+        raise
+    os.replace(temporal, ruta)
+    return ruta
+
+
+async def aplicar_retencion(motor, meses_retencion: int, directorio_volcado: str = "") -> List[str]:
+    """Vuelca, desprende y elimina las particiones fuera de la retención.
+
+    `meses_retencion` = 0 desactiva la retención. Una partición solo se elimina
+    después de escribir su volcado; sin `directorio_volcado` no se toca nada.
+    Cada partición va en su propia transacción: el DETACH toma un bloqueo
+    ACCESS EXCLUSIVE sobre la tabla padre que se libera al confirmar, antes de
+    volcar la siguiente. (DETACH ... CONCURRENTLY no es posible porque la
+    tabla tiene partición DEFAULT.)
+    """
+    if meses_retencion <= 0:
+        return []
+    if not directorio_volcado:
+        logger.warning(
+            "Retención de auditoría configurada sin AUDITORIA_VOLCADO_DIR: no se eliminan particiones."
+        )
+        return []
+    corte = sumar_meses(mes_actual(), -meses_retencion)
+    async with motor.connect() as conn:
+        vencidas = [nombre for nombre, mes in await listar_particiones(conn) if mes < corte]
+    eliminadas = []
+    for nombre in vencidas:
+        async with motor.begin() as conn:
+            ruta = await volcar_particion(conn, nombre, directorio_volcado)
+            if not os.path.getsize(ruta):
+                raise RuntimeError(f"Volcado vacío de {nombre} en {ruta}; la partición no se elimina.")
+            logger.info(f"Partición {nombre} volcada en {ruta}")
+            await conn.execute(text(f"ALTER TABLE {TABLA} DETACH PARTITION {nombre}"))
+            await conn.execute(text(f"DROP TABLE {nombre}"))
+        eliminadas.append(nombre)
+    if eliminadas:
+        logger.info(f"Retención de auditoría ({meses_retencion} meses): eliminadas {', '.join(eliminadas)}")
+    return eliminadas
+
+
+async def copiar_lote_legado(conn, lote: int) -> Optional[int]:
+    """Copia el siguiente lote (por id) del legado. None si no hay tabla legado.
+
+    Se copian todas las filas, también las más antiguas que la retención: de
+    esas se encarga `aplicar_retencion`, que las vuelca antes de eliminarlas.
+
+    Reanudable: la marca es el mayor id ya copiado que no supera el máximo del
+    legado (los ids nuevos salen de la misma secuencia y son mayores).
+    """
+    if (await conn.execute(text("SELECT to_regclass(:t)"), {"t": TABLA_LEGADO})).scalar() is None:
+        return None
+    resultado = await conn.execute(text(f"""
+        INSERT INTO {TABLA} ({COLUMNAS})
+        SELECT {COLUMNAS} FROM {TABLA_LEGADO}
+        WHERE id > (
+            SELECT coalesce(max(id), 0) FROM {TABLA}
+            WHERE id <= (SELECT coalesce(max(id), 0) FROM {TABLA_LEGADO})
+        )
+        ORDER BY id
+        LIMIT :lote
+    """), {"lote": lote})
+    return resultado.rowcount
+
+
+async def migrar_legado(motor, lote: int) -> int:
+    """Copia el legado completo en transacciones de un lote y luego lo elimina."""
+    total = 0
+    while True:
+        async with motor.begin() as conn:
+            copiadas = await copiar_lote_legado(conn, lote)
+            if copiadas is None:
+                return total
+            if copiadas == 0:
+                await conn.execute(text(f"DROP TABLE {TABLA_LEGADO}"))
+                logger.info(f"Histórico de auditoría migrado ({total} filas); {TABLA_LEGADO} eliminada.")
+                return total
+        total += copiadas
+
+
+async def mantener_particiones() -> None:
+    """Tarea del planificador: particiones futuras, copia del legado y retención."""
+    from app.database import async_engine
+
+    config = obtener_configuracion()
+    async with async_engine.begin() as conn:
+        await crear_particiones(conn, meses_adelante=config.auditoria_particiones_meses_adelante)
+    await migrar_legado(async_engine, config.auditoria_migracion_lote)
+    await aplicar_retencion(async_engine, config.auditoria_retencion_meses, config.auditoria_volcado_dir)
@@ -0,0 +1,219 @@
+"""
+Rollup por hora de auditoria_acciones_usuario (planificador, solo en el líder).
+
+Cada ejecución:
+  1. Agrega las horas cerradas nuevas, desde la marca `procesado_hasta` hasta
+     la hora en curso (menos `auditoria_rollup_gracia_minutos`), en lotes de
+     una semana. Cada lote escribe los agregados y avanza la marca en la
+     misma transacción, con la fila de estado bloqueada: cada hora se procesa
+     una sola vez.
+  2. Filas tardías: en las últimas `auditoria_rollup_reconciliar_horas` horas
+     ya procesadas compara el conteo crudo por hora con el del rollup y vuelve
+     a agregar las horas que difieran (transacciones largas que confirmaron
+     después del corte, relojes desfasados). La tabla es append-only, así que
+     conteos iguales implican las mismas filas.
+  3. Borra los agregados más antiguos que `auditoria_retencion_meses`.
+
+Mientras exista la tabla legado (copia del histórico en curso) no procesa:
+las horas antiguas todavía están incompletas.
+
+Las expresiones de agregación se comparten con ServicioAuditoriaEstadisticas,
+que agrega con ellas las horas que el rollup aún no cubre.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from sqlalchemy import delete, func, insert, not_, or_, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.sql import Select
+
+from app.core.config import obtener_configuracion
+from app.models.auditoria.accion_usuario import AuditoriaAccionUsuario
+from app.models.auditoria.rollup import (
+    AuditoriaRollupEstado,
+    AuditoriaRollupHora,
+    AuditoriaRollupRutaHora,
+)
+from app.services.auditoria.particiones_service import TABLA_LEGADO, mes_actual, sumar_meses
+
+logger = logging.getLogger(__name__)
+
+HORAS_POR_LOTE = 24 * 7
+UNA_HORA = timedelta(hours=1)
+
+_A = AuditoriaAccionUsuario
+_agente = func.lower(_A.agente_usuario)
+ES_MOVIL = or_(
+    _agente.ilike("%iphone%"), _agente.ilike("%android%"), _agente.ilike("%mobile%")
+)
+ES_API = or_(
+    _agente.ilike("%postman%"),
+    _agente.ilike("%insomnia%"),
+    _agente.ilike("%python%"),
+    _agente.ilike("%curl%"),
+)
+ES_RUTA_AUTH = _A.ruta.ilike("%/auth/%")
+
+COLUMNAS_HORA = (
+    "hora", "modulo", "accion", "usuario_id", "usuario_nombre", "total", "exitos",
+    "denegados", "fallos_auth", "fallos_sistema", "movil", "api_script", "ultimo_evento",
+)
+COLUMNAS_RUTA = ("hora", "modulo", "accion", "ruta", "codigo_respuesta", "resultado", "total")
+
+
+def agregado_por_hora(*condiciones) -> Select:
+    """Eventos crudos agregados con las columnas (y el orden) de COLUMNAS_HORA."""
+    hora = func.date_trunc("hour", _A.timestamp)
+    fallo = _A.resultado == "fallo"
+    return (
+        select(
+            hora.label("hora"),
+            _A.modulo,
+            _A.accion,
+            _A.usuario_id,
+            func.max(_A.usuario_nombre).label("usuario_nombre"),
+            func.count().label("total"),
+            func.count().filter(_A.resultado == "exito").label("exitos"),
+            func.count().filter(_A.resultado == "denegado").label("denegados"),
+            func.count().filter(fallo, ES_RUTA_AUTH).label("fallos_auth"),
+            func.count().filter(
+                fallo, or_(not_(ES_RUTA_AUTH), _A.ruta.is_(None))
+            ).label("fallos_sistema"),
+            # Mismo orden que la clasificación previa: primero móvil, luego API.
+            func.count().filter(ES_MOVIL).label("movil"),
+            func.count().filter(ES_API, not_(ES_MOVIL)).label("api_script"),
+            func.max(_A.timestamp).label("ultimo_evento"),
+        )
+        .where(*condiciones)
+        .group_by(hora, _A.modulo, _A.accion, _A.usuario_id)
+    )
+
+
+def agregado_rutas_por_hora(*condiciones) -> Select:
+    """Eventos crudos agregados con las columnas (y el orden) de COLUMNAS_RUTA."""
+    hora = func.date_trunc("hour", _A.timestamp)
+    dimensiones = (_A.modulo, _A.accion, _A.ruta, _A.codigo_respuesta, _A.resultado)
+    return (
+        select(hora.label("hora"), *dimensiones, func.count().label("total"))
+        .where(*condiciones)
+        .group_by(hora, *dimensiones)
+    )
+
+
+async def agregar_horas(conn, desde: datetime, hasta: datetime) -> int:
+    """Reemplaza los agregados de las horas [desde, hasta). Devuelve eventos agregados."""
+    R, RR = AuditoriaRollupHora, AuditoriaRollupRutaHora
+    rango = (_A.timestamp >= desde, _A.timestamp < hasta)
+    await conn.execute(delete(R).where(R.hora >= desde, R.hora < hasta))
+    await conn.execute(delete(RR).where(RR.hora >= desde, RR.hora < hasta))
+    await conn.execute(insert(R).from_select(COLUMNAS_HORA, agregado_por_hora(*rango)))
+    await conn.execute(insert(RR).from_select(COLUMNAS_RUTA, agregado_rutas_por_hora(*rango)))
+    return (await conn.execute(
+        select(func.coalesce(func.sum(R.total), 0)).where(R.hora >= desde, R.hora < hasta)
+    )).scalar()
+
+
+async def procesar_horas_cerradas(
+    conn, gracia_minutos: int = 5, max_horas: int = HORAS_POR_LOTE
+) -> bool:
+    """Agrega el siguiente lote de horas cerradas y avanza la marca.
+
+    Devuelve True si quedan horas cerradas pendientes.
+    """
+    E = AuditoriaRollupEstado
+    await conn.execute(pg_insert(E).values(id=1).on_conflict_do_nothing())
+    marca = (await conn.execute(
+        select(E.procesado_hasta).where(E.id == 1).with_for_update()
+    )).scalar()
+    limite = (await conn.execute(
+        select(func.date_trunc("hour", func.now() - timedelta(minutes=gracia_minutos)))
+    )).scalar()
+    if marca is None:
+        primera = (await conn.execute(
+            select(func.date_trunc("hour", func.min(_A.timestamp)))
+        )).scalar()
+        marca = min(primera or limite, limite)
+
+    hasta = min(limite, marca + timedelta(hours=max_horas))
+    if marca < hasta:
+        eventos = await agregar_horas(conn, marca, hasta)
+        logger.info(f"Rollup de auditoría: {eventos} eventos agregados en [{marca}, {hasta}).")
+    await conn.execute(
+        update(E).where(E.id == 1).values(
+            procesado_hasta=max(hasta, marca), actualizado_en=func.now()
+        )
+    )
+    return hasta < limite
+
+
+async def horas_desfasadas(conn, desde: datetime, hasta: datetime) -> List[datetime]:
+    """Horas de [desde, hasta) cuyo conteo crudo no coincide con el del rollup."""
+    R = AuditoriaRollupHora
+    hora = func.date_trunc("hour", _A.timestamp)
+    crudo = (
+        select(hora.label("hora"), func.count().label("total"))
+        .where(_A.timestamp >= desde, _A.timestamp < hasta)
+        .group_by(hora)
+        .subquery()
+    )
+    rollup = (
+        select(R.hora, func.sum(R.total).label("total"))
+        .where(R.hora >= desde, R.hora < hasta)
+        .group_by(R.hora)
+        .subquery()
+    )
+    hora_desfasada = func.coalesce(crudo.c.hora, rollup.c.hora)
+    stmt = (
+        select(hora_desfasada)
+        .select_from(crudo.join(rollup, crudo.c.hora == rollup.c.hora, full=True))
+        .where(func.coalesce(crudo.c.total, 0) != func.coalesce(rollup.c.total, 0))
+        .order_by(hora_desfasada)
+    )
+    return list((await conn.execute(stmt)).scalars().all())
+
+
+async def reconciliar_horas_tardias(conn, ventana_horas: int) -> List[datetime]:
+    """Vuelve a agregar las horas ya procesadas de la ventana que recibieron filas tardías."""
+    E = AuditoriaRollupEstado
+    marca = (await conn.execute(
+        select(E.procesado_hasta).where(E.id == 1).with_for_update()
+    )).scalar()
+    if marca is None or ventana_horas <= 0:
+        return []
+    horas = await horas_desfasadas(conn, marca - timedelta(hours=ventana_horas), marca)
+    for hora in horas:
+        await agregar_horas(conn, hora, hora + UNA_HORA)
+    if horas:
+        logger.info(f"Rollup de auditoría: {len(horas)} horas reconciliadas por filas tardías.")
+    return horas
+
+
+async def podar_rollup(conn, meses_retencion: int) -> None:
+    if meses_retencion <= 0:
+        return
+    mes = sumar_meses(mes_actual(), -meses_retencion)
+    corte = datetime(mes.year, mes.month, 1, tzinfo=timezone.utc)
+    await conn.execute(delete(AuditoriaRollupHora).where(AuditoriaRollupHora.hora < corte))
+    await conn.execute(delete(AuditoriaRollupRutaHora).where(AuditoriaRollupRutaHora.hora < corte))
+
+
+async def ejecutar_rollup_auditoria() -> None:
+    """Tarea del planificador: horas cerradas nuevas, filas tardías y retención."""
+    from app.database import async_engine
+
+    config = obtener_configuracion()
+    async with async_engine.connect() as conn:
+        legado = (await conn.execute(text("SELECT to_regclass(:t)"), {"t": TABLA_LEGADO})).scalar()
+    if legado is not None:
+        logger.info(f"Rollup de auditoría en espera: {TABLA_LEGADO} aún se está copiando.")
+        return
+
+    pendiente = True
+    while pendiente:
+        async with async_engine.begin() as conn:
+            pendiente = await procesar_horas_cerradas(conn, config.auditoria_rollup_gracia_minutos)
+    async with async_engine.begin() as conn:
+        await reconciliar_horas_tardias(conn, config.auditoria_rollup_reconciliar_horas)
+        await podar_rollup(conn, config.auditoria_retencion_meses)
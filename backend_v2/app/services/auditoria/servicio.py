@@ -1,18 +1,28 @@
 """Servicio central de auditoría de acciones de usuario."""
+import base64
+import csv
+import io
+import json
 import logging
 import re
-from typing import Any, Dict, Optional
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Optional, Sequence
 
-from sqlalchemy import func, insert, select
+from sqlalchemy import func, insert, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.auditoria.accion_usuario import (
     AccionAuditoria,
+    AuditoriaAccionPublica,
     AuditoriaAccionUsuario,
 )
 
 logger = logging.getLogger(__name__)
 
+FORMATOS_EXPORTACION = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+COLUMNAS_EXPORTACION = tuple(AuditoriaAccionPublica.model_fields)
+EXPORTACION_LOTE = 5000
+
 _CLAVES_SENSIBLES = frozenset({
     "password",
     "contrasena",
@@ -107,6 +117,100 @@ def inferir_resultado_desde_codigo(codigo: int) -> str:
     return "fallo"
 
 
+def _filtros_eventos(
+    *,
+    usuario_id: Optional[str] = None,
+    usuario_nombre: Optional[str] = None,
+    rol: Optional[str] = None,
+    modulo: Optional[str] = None,
+    accion: Optional[str] = None,
+    entidad_tipo: Optional[str] = None,
+    entidad_id: Optional[str] = None,
+    metodo_http: Optional[str] = None,
+    ruta: Optional[str] = None,
+    codigo_respuesta: Optional[int] = None,
+    direccion_ip: Optional[str] = None,
+    resultado: Optional[str] = None,
+    fecha_desde: Optional[Any] = None,
+    fecha_hasta: Optional[Any] = None,
+) -> list:
+    filtros = []
+    if usuario_id:
+        filtros.append(AuditoriaAccionUsuario.usuario_id == usuario_id)
+    if usuario_nombre:
+        filtros.append(AuditoriaAccionUsuario.usuario_nombre == usuario_nombre)
+    if rol:
+        filtros.append(AuditoriaAccionUsuario.rol == rol)
+    if modulo:
+        filtros.append(AuditoriaAccionUsuario.modulo == modulo)
+    if accion:
+        filtros.append(AuditoriaAccionUsuario.accion == accion)
+    if entidad_tipo:
+        filtros.append(AuditoriaAccionUsuario.entidad_tipo == entidad_tipo)
+    if entidad_id:
+        filtros.append(AuditoriaAccionUsuario.entidad_id == entidad_id)
+    if metodo_http:
+        filtros.append(AuditoriaAccionUsuario.metodo_http == metodo_http)
+    if ruta:
+        filtros.append(AuditoriaAccionUsuario.ruta == ruta)
+    if codigo_respuesta is not None:
+        filtros.append(AuditoriaAccionUsuario.codigo_respuesta == codigo_respuesta)
+    if direccion_ip:
+        filtros.append(AuditoriaAccionUsuario.direccion_ip == direccion_ip)
+    if resultado:
+        filtros.append(AuditoriaAccionUsuario.resultado == resultado)
+    if fecha_desde:
+        filtros.append(AuditoriaAccionUsuario.timestamp >= fecha_desde)
+    if fecha_hasta:
+        filtros.append(AuditoriaAccionUsuario.timestamp <= fecha_hasta)
+    return filtros
+
+
+def codificar_cursor(timestamp: datetime, evento_id: int) -> str:
+    """Cursor opaco con la clave (timestamp, id) del último evento entregado."""
+    crudo = json.dumps([timestamp.isoformat(), evento_id]).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> tuple[datetime, int]:
+    """Inverso de codificar_cursor; ValueError si el cursor no es válido."""
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        timestamp, evento_id = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        return datetime.fromisoformat(timestamp), int(evento_id)
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Cursor de auditoría inválido") from exc
+
+
+def _celda_csv(valor: Any) -> Any:
+    if valor is None:
+        return ""
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, ensure_ascii=False)
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return valor
+
+
+def _json_default(valor: Any) -> str:
+    return valor.isoformat() if isinstance(valor, datetime) else str(valor)
+
+
+def _serializar_lote(filas: Sequence[Sequence[Any]], formato: str) -> bytes:
+    buffer = io.StringIO()
+    if formato == "csv":
+        escritor = csv.writer(buffer)
+        for fila in filas:
+            escritor.writerow([_celda_csv(valor) for valor in fila])
+    else:
+        for fila in filas:
+            buffer.write(json.dumps(
+                dict(zip(COLUMNAS_EXPORTACION, fila)), ensure_ascii=False, default=_json_default
+            ))
+            buffer.write("\n")
+    return buffer.getvalue().encode("utf-8")
+
+
 class ServicioAuditoria:
     @staticmethod
     async def registrar(
@@ -185,35 +289,22 @@ class ServicioAuditoria:
         page: int = 1,
         page_size: int = 50,
     ) -> tuple[list[AuditoriaAccionUsuario], int]:
-        filtros = []
-        if usuario_id:
-            filtros.append(AuditoriaAccionUsuario.usuario_id == usuario_id)
-        if usuario_nombre:
-            filtros.append(AuditoriaAccionUsuario.usuario_nombre == usuario_nombre)
-        if rol:
-            filtros.append(AuditoriaAccionUsuario.rol == rol)
-        if modulo:
-            filtros.append(AuditoriaAccionUsuario.modulo == modulo)
-        if accion:
-            filtros.append(AuditoriaAccionUsuario.accion == accion)
-        if entidad_tipo:
-            filtros.append(AuditoriaAccionUsuario.entidad_tipo == entidad_tipo)
-        if entidad_id:
-            filtros.append(AuditoriaAccionUsuario.entidad_id == entidad_id)
-        if metodo_http:
-            filtros.append(AuditoriaAccionUsuario.metodo_http == metodo_http)
-        if ruta:
-            filtros.append(AuditoriaAccionUsuario.ruta == ruta)
-        if codigo_respuesta is not None:
-            filtros.append(AuditoriaAccionUsuario.codigo_respuesta == codigo_respuesta)
-        if direccion_ip:
-            filtros.append(AuditoriaAccionUsuario.direccion_ip == direccion_ip)
-        if resultado:
-            filtros.append(AuditoriaAccionUsuario.resultado == resultado)
-        if fecha_desde:
-            filtros.append(AuditoriaAccionUsuario.timestamp >= fecha_desde)
-        if fecha_hasta:
-            filtros.append(AuditoriaAccionUsuario.timestamp <= fecha_hasta)
+        filtros = _filtros_eventos(
+            usuario_id=usuario_id,
+            usuario_nombre=usuario_nombre,
+            rol=rol,
+            modulo=modulo,
+            accion=accion,
+            entidad_tipo=entidad_tipo,
+            entidad_id=entidad_id,
+            metodo_http=metodo_http,
+            ruta=ruta,
+            codigo_respuesta=codigo_respuesta,
+            direccion_ip=direccion_ip,
+            resultado=resultado,
+            fecha_desde=fecha_desde,
+            fecha_hasta=fecha_hasta,
+        )
 
         count_stmt = select(func.count()).select_from(AuditoriaAccionUsuario)
         if filtros:
@@ -233,6 +324,75 @@ class ServicioAuditoria:
         rows = (await db.execute(query)).scalars().all()
         return list(rows), int(total)
 
+    @staticmethod
+    async def listar_eventos_cursor(
+        db: AsyncSession,
+        *,
+        cursor: Optional[str] = None,
+        limite: int = 50,
+        **criterios: Any,
+    ) -> tuple[list[AuditoriaAccionUsuario], Optional[str]]:
+        """Página por keyset sobre (timestamp, id) descendente, sin OFFSET ni COUNT.
+
+        Acepta los mismos filtros que listar_eventos. Devuelve los eventos y el
+        cursor de la página siguiente (None si no hay más).
+        """
+        query = (
+            select(AuditoriaAccionUsuario)
+            .where(*_filtros_eventos(**criterios))
+            .order_by(AuditoriaAccionUsuario.timestamp.desc(), AuditoriaAccionUsuario.id.desc())
+            .limit(limite + 1)
+        )
+        if cursor:
+            query = query.where(
+                tuple_(AuditoriaAccionUsuario.timestamp, AuditoriaAccionUsuario.id)
+                < tuple_(*decodificar_cursor(cursor))
+            )
+        rows = list((await db.execute(query)).scalars().all())
+        if len(rows) <= limite:
+            return rows, None
+        ultimo = rows[limite - 1]
+        return rows[:limite], codificar_cursor(ultimo.timestamp, ultimo.id)
+
+    @staticmethod
+    async def exportar_eventos(
+        db: AsyncSession,
+        formato: str = "csv",
+        *,
+        lote: int = EXPORTACION_LOTE,
+        **criterios: Any,
+    ) -> AsyncIterator[bytes]:
+        """Genera la exportación (CSV con encabezado o NDJSON) por bloques.
+
+        Recorre los eventos filtrados por keyset (timestamp, id) descendente
+        en lotes de `lote` filas: en memoria solo vive un lote a la vez, sin
+        importar cuántas filas tenga la exportación.
+        """
+        if formato not in FORMATOS_EXPORTACION:
+            raise ValueError(f"Formato de exportación no soportado: {formato}")
+        filtros = _filtros_eventos(**criterios)
+        columnas = [getattr(AuditoriaAccionUsuario, c) for c in COLUMNAS_EXPORTACION]
+        if formato == "csv":
+            yield _serializar_lote([COLUMNAS_EXPORTACION], formato)
+
+        clave = tuple_(AuditoriaAccionUsuario.timestamp, AuditoriaAccionUsuario.id)
+        ultimo = None
+        while True:
+            query = (
+                select(*columnas)
+                .where(*filtros)
+                .order_by(AuditoriaAccionUsuario.timestamp.desc(), AuditoriaAccionUsuario.id.desc())
+                .limit(lote)
+            )
+            if ultimo is not None:
+                query = query.where(clave < tuple_(*ultimo))
+            filas = (await db.execute(query)).all()
+            if filas:
+                yield _serializar_lote(filas, formato)
+            if len(filas) < lote:
+                return
+            ultimo = (filas[-1].timestamp, filas[-1].id)
+
     @staticmethod
     async def obtener_por_id(
         db: AsyncSession, evento_id: int
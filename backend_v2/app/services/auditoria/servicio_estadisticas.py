@@ -2,10 +2,35 @@ from collections import defaultdict
 from datetime import datetime, timedelta
 from typing import Any, Dict, Optional
 
-from sqlalchemy import Integer, cast, desc, func, select
+from sqlalchemy import (
+    ARRAY,
+    DateTime,
+    Integer,
+    String,
+    cast,
+    desc,
+    extract,
+    func,
+    literal,
+    or_,
+    select,
+    true,
+    union_all,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.auditoria.accion_usuario import AuditoriaAccionUsuario
+from app.models.auditoria.rollup import (
+    AuditoriaRollupEstado,
+    AuditoriaRollupHora,
+    AuditoriaRollupRutaHora,
+)
 from app.services.auditoria.clasificador_fallos import humanizar_modulo
+from app.services.auditoria.rollup_service import (
+    COLUMNAS_HORA,
+    COLUMNAS_RUTA,
+    agregado_por_hora,
+    agregado_rutas_por_hora,
+)
 
 
 class ServicioAuditoriaEstadisticas:
@@ -45,81 +70,101 @@ class ServicioAuditoriaEstadisticas:
         ServicioAuditoriaEstadisticas.validar_rango(fecha_desde, fecha_hasta)
         return fecha_desde, fecha_hasta
 
+    @staticmethod
+    async def _horas_en_rollup(
+        db: AsyncSession,
+        fecha_desde: datetime,
+        fecha_hasta: datetime,
+        usar_rollup: bool,
+    ) -> tuple[datetime, datetime]:
+        """Horas completas del rango que ya están en el rollup (inicio == fin si ninguna)."""
+        desde = literal(fecha_desde, DateTime(timezone=True))
+        hasta = literal(fecha_hasta, DateTime(timezone=True))
+        marca = (
+            select(AuditoriaRollupEstado.procesado_hasta)
+            .where(AuditoriaRollupEstado.id == 1)
+            .scalar_subquery()
+        )
+        fila = (await db.execute(select(
+            func.date_trunc(
+                "hour", desde + timedelta(hours=1) - timedelta(microseconds=1)
+            ).label("inicio"),
+            func.date_trunc("hour", hasta + timedelta(microseconds=1)).label("fin"),
+            marca.label("marca"),
+        ))).one()
+        fin = min(fila.fin, fila.marca) if usar_rollup and fila.marca else fila.inicio
+        return fila.inicio, max(fila.inicio, fin)
+
     @staticmethod
     async def obtener_estadisticas(
         db: AsyncSession,
         fecha_desde: Optional[datetime] = None,
         fecha_hasta: Optional[datetime] = None,
+        usar_rollup: bool = True,
     ) -> Dict[str, Any]:
         fecha_desde, fecha_hasta = ServicioAuditoriaEstadisticas.normalizar_rango(
             fecha_desde,
             fecha_hasta,
         )
 
-        # Filtros base
+        # Horas completas del rango ya agregadas en el rollup: [inicio, fin).
+        # Lo demás (bordes que no caen en hora exacta, hora en curso y horas
+        # que el job aún no procesa) se agrega desde los eventos crudos.
+        inicio_rollup, fin_rollup = await ServicioAuditoriaEstadisticas._horas_en_rollup(
+            db, fecha_desde, fecha_hasta, usar_rollup
+        )
         filtros = [
             AuditoriaAccionUsuario.timestamp >= fecha_desde,
             AuditoriaAccionUsuario.timestamp <= fecha_hasta,
         ]
-
-        count_stmt = select(func.count()).select_from(AuditoriaAccionUsuario)
-        if filtros:
-            count_stmt = count_stmt.where(*filtros)
-        total_eventos = (await db.execute(count_stmt)).scalar() or 0
-
-        usuarios_unicos_stmt = select(
-            func.count(func.distinct(AuditoriaAccionUsuario.usuario_id))
-        ).select_from(AuditoriaAccionUsuario)
-        if filtros:
-            usuarios_unicos_stmt = usuarios_unicos_stmt.where(*filtros)
-        usuarios_unicos = (await db.execute(usuarios_unicos_stmt)).scalar() or 0
-
-        exitos_stmt = (
-            select(func.count())
-            .select_from(AuditoriaAccionUsuario)
-            .where(AuditoriaAccionUsuario.resultado == "exito")
-        )
-        if filtros:
-            exitos_stmt = exitos_stmt.where(*filtros)
-        total_exitos = (await db.execute(exitos_stmt)).scalar() or 0
-
-        denegados_stmt = (
-            select(func.count())
-            .select_from(AuditoriaAccionUsuario)
-            .where(AuditoriaAccionUsuario.resultado == "denegado")
-        )
-        if filtros:
-            denegados_stmt = denegados_stmt.where(*filtros)
-        total_denegados = (await db.execute(denegados_stmt)).scalar() or 0
-
-        auth_fallos_stmt = (
-            select(func.count())
-            .select_from(AuditoriaAccionUsuario)
-            .where(
-                AuditoriaAccionUsuario.resultado == "fallo",
-                AuditoriaAccionUsuario.ruta.ilike("%/auth/%"),
-            )
-        )
-        if filtros:
-            auth_fallos_stmt = auth_fallos_stmt.where(*filtros)
-        total_fallos_auth = (await db.execute(auth_fallos_stmt)).scalar() or 0
-
-        from sqlalchemy import or_
-
-        sistema_fallos_stmt = (
-            select(func.count())
-            .select_from(AuditoriaAccionUsuario)
-            .where(
-                AuditoriaAccionUsuario.resultado == "fallo",
-                or_(
-                    AuditoriaAccionUsuario.ruta.not_ilike("%/auth/%"),
-                    AuditoriaAccionUsuario.ruta.is_(None),
-                ),
-            )
-        )
-        if filtros:
-            sistema_fallos_stmt = sistema_fallos_stmt.where(*filtros)
-        total_fallidos = (await db.execute(sistema_fallos_stmt)).scalar() or 0
+        filtros_crudo = [
+            *filtros,
+            or_(
+                AuditoriaAccionUsuario.timestamp < inicio_rollup,
+                AuditoriaAccionUsuario.timestamp >= fin_rollup,
+            ),
+        ]
+        partes_hora = [agregado_por_hora(*filtros_crudo)]
+        partes_ruta = [agregado_rutas_por_hora(*filtros_crudo)]
+        if fin_rollup > inicio_rollup:
+            R, RR = AuditoriaRollupHora, AuditoriaRollupRutaHora
+            partes_hora.insert(0, select(*(getattr(R, c) for c in COLUMNAS_HORA)).where(
+                R.hora >= inicio_rollup, R.hora < fin_rollup
+            ))
+            partes_ruta.insert(0, select(*(getattr(RR, c) for c in COLUMNAS_RUTA)).where(
+                RR.hora >= inicio_rollup, RR.hora < fin_rollup
+            ))
+        fuente = union_all(*partes_hora).subquery("fuente")
+        fuente_rutas = union_all(*partes_ruta).subquery("fuente_rutas")
+        f, fr = fuente.c, fuente_rutas.c
+
+        def suma(columna, *condiciones):
+            agregado = func.sum(columna)
+            if condiciones:
+                agregado = agregado.filter(*condiciones)
+            return cast(func.coalesce(agregado, 0), Integer)
+
+        # Totales, horarios de actividad y dispositivos en una sola pasada
+        hora_local = extract("hour", f.hora)
+        totales = (await db.execute(select(
+            suma(f.total).label("eventos"),
+            func.count(func.distinct(f.usuario_id)).label("usuarios_unicos"),
+            suma(f.exitos).label("exitos"),
+            suma(f.denegados).label("denegados"),
+            suma(f.fallos_auth).label("fallos_auth"),
+            suma(f.fallos_sistema).label("fallos_sistema"),
+            suma(f.movil).label("movil"),
+            suma(f.api_script).label("api_script"),
+            suma(f.total, hora_local.between(8, 17)).label("laboral"),
+            suma(f.total, hora_local.between(18, 23)).label("tarde"),
+            suma(f.total, hora_local < 8).label("madrugada"),
+        ))).one()
+        total_eventos = totales.eventos
+        usuarios_unicos = totales.usuarios_unicos
+        total_exitos = totales.exitos
+        total_denegados = totales.denegados
+        total_fallos_auth = totales.fallos_auth
+        total_fallidos = totales.fallos_sistema
 
         tasa_exito = (
             round((total_exitos / total_eventos * 100), 1) if total_eventos > 0 else 0.0
@@ -127,41 +172,29 @@ class ServicioAuditoriaEstadisticas:
 
         modulo_stmt = (
             select(
-                AuditoriaAccionUsuario.modulo.label("modulo_nombre"),
-                func.count().label("total"),
-                func.count(func.distinct(AuditoriaAccionUsuario.usuario_id)).label(
-                    "usuarios_unicos"
-                ),
+                f.modulo.label("modulo_nombre"),
+                suma(f.total).label("total"),
+                func.count(func.distinct(f.usuario_id)).label("usuarios_unicos"),
             )
-            .select_from(AuditoriaAccionUsuario)
-            .group_by(AuditoriaAccionUsuario.modulo)
+            .group_by(f.modulo)
             .order_by(desc("total"))
             .limit(50)
         )
 
-        if filtros:
-            modulo_stmt = modulo_stmt.where(*filtros)
-
         modulos_rows = (await db.execute(modulo_stmt)).all()
         nombres_modulos = [row.modulo_nombre for row in modulos_rows]
         ultimos_por_modulo: Dict[Optional[str], list[Dict[str, Any]]] = defaultdict(
             list
         )
         if nombres_modulos:
-            eventos_ranked = select(
-                AuditoriaAccionUsuario.id.label("evento_id"),
-                AuditoriaAccionUsuario.modulo.label("modulo"),
-                func.row_number()
-                .over(
-                    partition_by=AuditoriaAccionUsuario.modulo,
-                    order_by=AuditoriaAccionUsuario.timestamp.desc(),
-                )
-                .label("fila"),
-            ).where(AuditoriaAccionUsuario.modulo.in_(nombres_modulos))
-            if filtros:
-                eventos_ranked = eventos_ranked.where(*filtros)
-            eventos_ranked_subquery = eventos_ranked.subquery()
-            eventos_stmt = (
+            # Últimos 5 por módulo: un LIMIT por módulo sobre idx_aud_acc_modulo_ts
+            # en vez de numerar todos los eventos del rango.
+            modulos = (
+                func.unnest(literal(nombres_modulos, ARRAY(String)))
+                .table_valued("modulo")
+                .render_derived(name="modulos")
+            )
+            ultimos = (
                 select(
                     AuditoriaAccionUsuario.id,
                     AuditoriaAccionUsuario.timestamp,
@@ -171,15 +204,16 @@ class ServicioAuditoriaEstadisticas:
                     AuditoriaAccionUsuario.accion,
                     AuditoriaAccionUsuario.resultado,
                 )
-                .join(
-                    eventos_ranked_subquery,
-                    AuditoriaAccionUsuario.id == eventos_ranked_subquery.c.evento_id,
-                )
-                .where(eventos_ranked_subquery.c.fila <= 5)
-                .order_by(
-                    eventos_ranked_subquery.c.modulo,
-                    AuditoriaAccionUsuario.timestamp.desc(),
-                )
+                .where(AuditoriaAccionUsuario.modulo == modulos.c.modulo, *filtros)
+                .order_by(AuditoriaAccionUsuario.timestamp.desc())
+                .limit(5)
+                .lateral("ultimos")
+            )
+            eventos_stmt = (
+                select(ultimos)
+                .select_from(modulos)
+                .join(ultimos, true())
+                .order_by(ultimos.c.modulo, ultimos.c.timestamp.desc())
             )
             for evento in (await db.execute(eventos_stmt)).mappings().all():
                 ultimos_por_modulo[evento["modulo"]].append(dict(evento))
@@ -200,27 +234,17 @@ class ServicioAuditoriaEstadisticas:
 
         fallos_stmt = (
             select(
-                AuditoriaAccionUsuario.modulo,
-                AuditoriaAccionUsuario.ruta,
-                AuditoriaAccionUsuario.codigo_respuesta,
-                AuditoriaAccionUsuario.accion,
-                AuditoriaAccionUsuario.resultado,
-                func.count().label("total"),
-            )
-            .select_from(AuditoriaAccionUsuario)
-            .where(AuditoriaAccionUsuario.resultado != "exito")
-            .group_by(
-                AuditoriaAccionUsuario.modulo,
-                AuditoriaAccionUsuario.ruta,
-                AuditoriaAccionUsuario.codigo_respuesta,
-                AuditoriaAccionUsuario.accion,
-                AuditoriaAccionUsuario.resultado,
+                fr.modulo,
+                fr.ruta,
+                fr.codigo_respuesta,
+                fr.accion,
+                fr.resultado,
+                suma(fr.total).label("total"),
             )
+            .where(fr.resultado != "exito")
+            .group_by(fr.modulo, fr.ruta, fr.codigo_respuesta, fr.accion, fr.resultado)
         )
 
-        if filtros:
-            fallos_stmt = fallos_stmt.where(*filtros)
-
         fallos_rows = (await db.execute(fallos_stmt)).all()
 
         def clasificar_fallo(row) -> str:
@@ -311,23 +335,17 @@ class ServicioAuditoriaEstadisticas:
                 es_mismo_dia = True
 
         if es_mismo_dia:
-            # Agrupar por hora usando date_trunc de postgres y to_char
-            expresion_fecha = func.to_char(
-                func.date_trunc("hour", AuditoriaAccionUsuario.timestamp),
-                "YYYY-MM-DD HH24:00",
-            ).label("fecha")
+            # Agrupar por hora usando to_char
+            expresion_fecha = func.to_char(f.hora, "YYYY-MM-DD HH24:00").label("fecha")
         else:
             # Agrupar por día
-            expresion_fecha = func.date(AuditoriaAccionUsuario.timestamp).label("fecha")
+            expresion_fecha = func.date(f.hora).label("fecha")
 
         dia_stmt = (
-            select(expresion_fecha, func.count().label("total"))
-            .select_from(AuditoriaAccionUsuario)
+            select(expresion_fecha, suma(f.total).label("total"))
             .group_by("fecha")
             .order_by("fecha")
         )
-        if filtros:
-            dia_stmt = dia_stmt.where(*filtros)
 
         dia_rows = (await db.execute(dia_stmt)).all()
         por_dia_dict = {str(row.fecha): row.total for row in dia_rows if row.fecha}
@@ -363,20 +381,15 @@ class ServicioAuditoriaEstadisticas:
         # 5. Top Usuarios
         usuarios_stmt = (
             select(
-                AuditoriaAccionUsuario.usuario_id,
-                AuditoriaAccionUsuario.usuario_nombre,
-                func.count().label("total"),
-                func.max(AuditoriaAccionUsuario.timestamp).label("ultimo_evento"),
-            )
-            .select_from(AuditoriaAccionUsuario)
-            .group_by(
-                AuditoriaAccionUsuario.usuario_id, AuditoriaAccionUsuario.usuario_nombre
+                f.usuario_id,
+                func.max(f.usuario_nombre).label("usuario_nombre"),
+                suma(f.total).label("total"),
+                func.max(f.ultimo_evento).label("ultimo_evento"),
             )
+            .group_by(f.usuario_id)
             .order_by(desc("total"))
             .limit(10)
         )
-        if filtros:
-            usuarios_stmt = usuarios_stmt.where(*filtros)
 
         usuarios_rows = (await db.execute(usuarios_stmt)).all()
         top_usuarios = [
@@ -392,23 +405,17 @@ class ServicioAuditoriaEstadisticas:
         # 6. Top Rutas
         rutas_stmt = (
             select(
-                AuditoriaAccionUsuario.ruta,
-                AuditoriaAccionUsuario.accion,
-                func.count().label("total"),
-                func.sum(
-                    cast(AuditoriaAccionUsuario.resultado != "exito", Integer)
-                ).label("fallos"),
+                fr.ruta,
+                fr.accion,
+                suma(fr.total).label("total"),
+                suma(fr.total, fr.resultado != "exito").label("fallos"),
             )
-            .select_from(AuditoriaAccionUsuario)
-            .where(AuditoriaAccionUsuario.ruta.isnot(None))
-            .group_by(AuditoriaAccionUsuario.ruta, AuditoriaAccionUsuario.accion)
+            .where(fr.ruta.isnot(None))
+            .group_by(fr.ruta, fr.accion)
             .order_by(desc("total"))
             .limit(10)
         )
 
-        if filtros:
-            rutas_stmt = rutas_stmt.where(*filtros)
-
         rutas_rows = (await db.execute(rutas_stmt)).all()
         top_rutas = [
             {
@@ -420,64 +427,24 @@ class ServicioAuditoriaEstadisticas:
             for row in rutas_rows
         ]
 
-        # 7. Por Hora (Horarios de Actividad)
-        from sqlalchemy import extract, case, or_
-
-        hora_extract = extract("hour", AuditoriaAccionUsuario.timestamp)
-        rango_hora_expr = case(
-            (hora_extract.between(8, 17), "Horario Laboral (8am - 6pm)"),
-            (hora_extract.between(18, 23), "Tarde / Noche (6pm - 12am)"),
-            else_="Madrugada (12am - 8am)",
-        ).label("rango")
-
-        hora_stmt = (
-            select(rango_hora_expr, func.count().label("total"))
-            .select_from(AuditoriaAccionUsuario)
-            .group_by("rango")
-        )
-
-        if filtros:
-            hora_stmt = hora_stmt.where(*filtros)
-
-        hora_rows = (await db.execute(hora_stmt)).all()
-        por_hora = [{"rango": row.rango, "total": row.total} for row in hora_rows]
-
-        # 8. Por Dispositivo
-        ua_lower = func.lower(AuditoriaAccionUsuario.agente_usuario)
-        dispositivo_expr = case(
-            (
-                or_(
-                    ua_lower.ilike("%iphone%"),
-                    ua_lower.ilike("%android%"),
-                    ua_lower.ilike("%mobile%"),
-                ),
-                "Móvil",
-            ),
-            (
-                or_(
-                    ua_lower.ilike("%postman%"),
-                    ua_lower.ilike("%insomnia%"),
-                    ua_lower.ilike("%python%"),
-                    ua_lower.ilike("%curl%"),
-                ),
-                "API / Script",
-            ),
-            else_="Escritorio",
-        ).label("dispositivo")
-
-        dispositivo_stmt = (
-            select(dispositivo_expr, func.count().label("total"))
-            .select_from(AuditoriaAccionUsuario)
-            .group_by("dispositivo")
-        )
-
-        if filtros:
-            dispositivo_stmt = dispositivo_stmt.where(*filtros)
-
-        dispositivo_rows = (await db.execute(dispositivo_stmt)).all()
+        # 7. Por Hora (Horarios de Actividad) y 8. Por Dispositivo: de los totales
+        por_hora = [
+            {"rango": rango, "total": total}
+            for rango, total in (
+                ("Horario Laboral (8am - 6pm)", totales.laboral),
+                ("Tarde / Noche (6pm - 12am)", totales.tarde),
+                ("Madrugada (12am - 8am)", totales.madrugada),
+            )
+            if total
+        ]
         por_dispositivo = [
-            {"dispositivo": row.dispositivo, "total": row.total}
-            for row in dispositivo_rows
+            {"dispositivo": dispositivo, "total": total}
+            for dispositivo, total in (
+                ("Escritorio", total_eventos - totales.movil - totales.api_script),
+                ("Móvil", totales.movil),
+                ("API / Script", totales.api_script),
+            )
+            if total
         ]
 
         return {
@@ -0,0 +1,92 @@
+"""
+Especialidades y áreas asignadas de usuarios - Backend V2
+
+Viven en las tablas `usuario_especialidad` y `usuario_area`, de modo que los
+filtros de visibilidad y de asignación de tickets se resuelven en SQL (EXISTS)
+y usan índices. Mientras `asignaciones_json_activo` siga activo, los campos
+JSON de `usuarios` se escriben en paralelo y se reconcilian al arranque
+(ver core/migrations/asignaciones_usuario_migration.py).
+"""
+
+import json
+from typing import Iterable, List, Optional
+
+from sqlalchemy import and_, delete, exists, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.config import obtener_configuracion
+from app.models.auth.usuario import Usuario, UsuarioArea, UsuarioEspecialidad
+
+
+def lista_json(valor: Optional[str]) -> List[str]:
+    """Lista de strings a partir del campo JSON legado (tolerante a basura)."""
+    try:
+        datos = json.loads(valor or "[]")
+    except (TypeError, ValueError):
+        return []
+    if not isinstance(datos, list):
+        return []
+    return normalizar(datos)
+
+
+def normalizar(valores: Iterable) -> List[str]:
+    """Strings no vacíos, sin duplicados y en el orden recibido."""
+    vistos = []
+    for valor in valores:
+        if isinstance(valor, str) and valor.strip() and valor.strip() not in vistos:
+            vistos.append(valor.strip())
+    return vistos
+
+
+def tiene_especialidad(usuario_id, especialidad):
+    """EXISTS: el usuario tiene la especialidad (valores o columnas)."""
+    return exists().where(
+        UsuarioEspecialidad.usuario_id == usuario_id,
+        UsuarioEspecialidad.especialidad == especialidad,
+    )
+
+
+def tiene_area(usuario_id, area):
+    """EXISTS: el usuario tiene asignada el área (valores o columnas)."""
+    return exists().where(UsuarioArea.usuario_id == usuario_id, UsuarioArea.area == area)
+
+
+def comparte_especialidad(usuario_id, otro_usuario_id):
+    """EXISTS: ambos usuarios tienen al menos una especialidad en común."""
+    propia = aliased(UsuarioEspecialidad)
+    ajena = aliased(UsuarioEspecialidad)
+    return exists().where(and_(
+        ajena.usuario_id == usuario_id,
+        propia.usuario_id == otro_usuario_id,
+        propia.especialidad == ajena.especialidad,
+    ))
+
+
+async def reemplazar_filas(db: AsyncSession, modelo, columna: str, usuario_id: str, valores: List[str]) -> None:
+    await db.execute(delete(modelo).where(modelo.usuario_id == usuario_id))
+    if valores:
+        await db.execute(insert(modelo), [{"usuario_id": usuario_id, columna: v} for v in valores])
+
+
+async def guardar_asignaciones(
+    db: AsyncSession,
+    usuario: Usuario,
+    especialidades: Optional[Iterable[str]] = None,
+    areas: Optional[Iterable[str]] = None,
+) -> None:
+    """Reemplaza especialidades y/o áreas del usuario (None = sin cambios).
+
+    No hace commit: se confirma junto con el resto de cambios del usuario.
+    """
+    escribir_json = obtener_configuracion().asignaciones_json_activo
+    if especialidades is not None:
+        especialidades = normalizar(especialidades)
+        await reemplazar_filas(db, UsuarioEspecialidad, "especialidad", usuario.id, especialidades)
+        if escribir_json:
+            usuario.especialidades = json.dumps(especialidades)
+    if areas is not None:
+        areas = normalizar(areas)
+        await reemplazar_filas(db, UsuarioArea, "area", usuario.id, areas)
+        if escribir_json:
+            usuario.areas_asignadas = json.dumps(areas)
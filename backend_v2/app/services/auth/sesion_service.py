@@ -10,6 +10,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
 from app.config import config
+from app.services.panel_control.presencia_service import PresenciaService
 from app.utils_date import get_bogota_now
 
 
@@ -60,6 +61,7 @@ async def registrar_sesion(
             )
             session.add(nueva_sesion)
             await session.commit()
+        await PresenciaService.registrar_sesion(token_jwt, nueva_sesion.id, usuario_id)
     except Exception as e:
         import logging
 
@@ -76,7 +78,9 @@ async def marcar_fin_sesion(db: AsyncSession, token_jwt: str) -> bool:
         sesion = result.scalars().first()
         if sesion:
             sesion.fin_sesion = get_bogota_now()
+            sesion_id, usuario_id = sesion.id, sesion.usuario_id
             await db.commit()
+            await PresenciaService.retirar_sesiones([(sesion_id, token_jwt)], usuario_id)
             return True
         return False
     except Exception as e:
@@ -97,10 +101,12 @@ async def invalidar_sesiones_usuario(db: AsyncSession, usuario_id: str) -> int:
             update(Sesion)
             .where(Sesion.usuario_id == usuario_id, Sesion.fin_sesion.is_(None))
             .values(fin_sesion=ahora)
+            .returning(Sesion.id, Sesion.token_sesion)
         )
-        result = await db.execute(stmt)
+        cerradas = (await db.execute(stmt)).all()
         await db.commit()
-        return result.rowcount
+        await PresenciaService.retirar_sesiones(cerradas, usuario_id)
+        return len(cerradas)
     except Exception as e:
         import logging
 
@@ -0,0 +1,6 @@
+"""
+Caché de la aplicación (local + Redis) - Backend V2
+"""
+from .escalonado import CacheEscalonado, cache
+
+__all__ = ["CacheEscalonado", "cache"]
@@ -0,0 +1,322 @@
+"""
+Caché escalonada de la aplicación - Backend V2
+
+- Nivel local: LRU acotado por cantidad de entradas; las expiradas se
+  desalojan al leerlas o al necesitar espacio.
+- Nivel Redis (opcional): compartido entre workers, valores en JSON con TTL.
+  Sin Redis la caché opera solo con el nivel local.
+- Un solo códec: todo valor cacheado pasa por JSON (`jsonable_encoder`), así
+  que el llamador recibe lo mismo sin importar qué nivel respondió. Lo que no
+  es serializable se devuelve tal cual y no se cachea.
+- Single-flight: los misses concurrentes de una clave esperan una sola
+  carga en el worker, que corre en su propia tarea (cancelar a un llamador
+  no aborta a los demás); entre workers un candado corto en Redis evita que
+  todos recalculen a la vez (stampede).
+- Etiquetas: `invalidar("tickets")` borra las claves etiquetadas en ambos
+  niveles y avisa a los demás workers por pub/sub.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+import redis.asyncio as redis
+from fastapi.encoders import jsonable_encoder
+
+from app.config import config
+from app.core.config import obtener_configuracion
+
+logger = logging.getLogger(__name__)
+
+PREFIJO_CLAVE = "cache:v:"
+PREFIJO_ETIQUETA = "cache:etiqueta:"
+PREFIJO_CANDADO = "cache:candado:"
+CANAL_INVALIDACIONES = "cache:invalidaciones"
+REINTENTO_REDIS_SEGUNDOS = 30
+CANDADO_SEGUNDOS = 10
+# Un worker que no obtuvo el candado espera a que otro publique el valor.
+ESPERA_CANDADO_SEGUNDOS = 2.0
+SONDEO_CANDADO_SEGUNDOS = 0.05
+
+_NO_ENCONTRADO = object()
+
+
+def _codificar(valor: Any) -> str:
+    return json.dumps(jsonable_encoder(valor))
+
+
+class CacheEscalonado:
+    """Caché LRU local + Redis compartido, con single-flight y etiquetas."""
+
+    def __init__(self, redis_url: Optional[str] = None, max_entradas: int = 2000, ttl_defecto: int = 30):
+        self.redis_url = redis_url
+        self.max_entradas = max_entradas
+        self.ttl_defecto = ttl_defecto
+        # clave -> (expira_en, valor, etiquetas)
+        self._local: "OrderedDict[str, Tuple[float, Any, frozenset]]" = OrderedDict()
+        self._en_vuelo: Dict[str, asyncio.Task] = {}
+        # Aumenta con cada invalidación: una carga iniciada antes no se guarda.
+        self._generacion = 0
+        self._redis = None
+        self._tarea_escucha: Optional[asyncio.Task] = None
+        self._redis_reintento_en = 0.0
+        self._lock = asyncio.Lock()
+        self._metricas = dict.fromkeys(
+            ("aciertos_local", "aciertos_redis", "fallos", "cargas", "esperas", "desalojos", "invalidaciones"), 0
+        )
+
+    # --- Nivel local -------------------------------------------------------
+
+    def _leer_local(self, clave: str) -> Any:
+        item = self._local.get(clave)
+        if item is None:
+            return _NO_ENCONTRADO
+        if item[0] <= time.monotonic():
+            del self._local[clave]
+            return _NO_ENCONTRADO
+        self._local.move_to_end(clave)
+        return item[1]
+
+    def _guardar_local(self, clave: str, valor: Any, ttl: int, etiquetas: frozenset):
+        self._local[clave] = (time.monotonic() + ttl, valor, etiquetas)
+        self._local.move_to_end(clave)
+        if len(self._local) > self.max_entradas:
+            ahora = time.monotonic()
+            for vencida in [k for k, (expira, _, _) in self._local.items() if expira <= ahora]:
+                del self._local[vencida]
+            while len(self._local) > self.max_entradas:
+                self._local.popitem(last=False)
+                self._metricas["desalojos"] += 1
+
+    def _invalidar_local(self, etiquetas: Iterable[str]):
+        etiquetas = set(etiquetas)
+        for clave in [k for k, (_, _, ets) in self._local.items() if ets & etiquetas]:
+            del self._local[clave]
+        self._generacion += 1
+
+    # API síncrona (solo nivel local) para código no async, p. ej. throttles.
+
+    def get(self, clave: str) -> Optional[Any]:
+        valor = self._leer_local(clave)
+        return None if valor is _NO_ENCONTRADO else valor
+
+    def set(self, clave: str, valor: Any, ttl: Optional[int] = None):
+        self._guardar_local(clave, valor, ttl if ttl is not None else self.ttl_defecto, frozenset())
+
+    def clear(self):
+        self._local.clear()
+
+    # --- Redis -------------------------------------------------------------
+
+    async def _asegurar_redis(self) -> bool:
+        if self._redis is not None:
+            return True
+        if not self.redis_url or time.monotonic() < self._redis_reintento_en:
+            return False
+        async with self._lock:
+            if self._redis is not None:
+                return True
+            try:
+                cliente = redis.from_url(self.redis_url, decode_responses=True)
+                await cliente.ping()
+                pubsub = cliente.pubsub()
+                await pubsub.subscribe(CANAL_INVALIDACIONES)
+                self._redis = cliente
+                self._tarea_escucha = asyncio.create_task(self._escuchar(pubsub))
+                return True
+            except Exception as e:
+                self._redis_reintento_en = time.monotonic() + REINTENTO_REDIS_SEGUNDOS
+                logger.warning(f"Caché: Redis no disponible, solo nivel local: {e}")
+                return False
+
+    async def _escuchar(self, pubsub):
+        """Aplica localmente las invalidaciones publicadas por otros workers"""
+        try:
+            async for mensaje in pubsub.listen():
+                if mensaje["type"] == "message":
+                    self._invalidar_local(json.loads(mensaje["data"]))
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Caché: error en listener de invalidaciones: {e}")
+            await self._descartar_redis(e)
+
+    async def _descartar_redis(self, error: Exception):
+        logger.warning(f"Caché: error de Redis, solo nivel local: {error}")
+        cliente, self._redis = self._redis, None
+        self._redis_reintento_en = time.monotonic() + 5
+        # Sin listener no llegan invalidaciones ajenas: el nivel local podría quedar viejo.
+        self._local.clear()
+        if cliente is not None:
+            try:
+                await cliente.aclose()
+            except Exception:
+                pass
+
+    async def _leer_redis(self, clave: str) -> Optional[str]:
+        return await self._redis.get(PREFIJO_CLAVE + clave)
+
+    async def _guardar_redis(self, clave: str, texto: str, ttl: int, etiquetas: frozenset):
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.set(PREFIJO_CLAVE + clave, texto, ex=ttl)
+        for etiqueta in etiquetas:
+            pipe.sadd(PREFIJO_ETIQUETA + etiqueta, clave)
+            pipe.expire(PREFIJO_ETIQUETA + etiqueta, max(ttl, 3600))
+        pipe.delete(PREFIJO_CANDADO + clave)
+        await pipe.execute()
+
+    async def _esperar_otro_worker(self, clave: str) -> Tuple[bool, Optional[str]]:
+        """Toma el candado de carga o, si otro worker lo tiene, espera su resultado un momento.
+
+        Retorna (candado_tomado, texto publicado por el otro worker o None).
+        """
+        if await self._redis.set(PREFIJO_CANDADO + clave, "1", nx=True, ex=CANDADO_SEGUNDOS):
+            return True, None
+        limite = time.monotonic() + ESPERA_CANDADO_SEGUNDOS
+        while time.monotonic() < limite:
+            await asyncio.sleep(SONDEO_CANDADO_SEGUNDOS)
+            texto = await self._leer_redis(clave)
+            if texto is not None:
+                return False, texto
+        return False, None
+
+    async def _liberar_candado(self, clave: str):
+        if self._redis is None:
+            return
+        try:
+            await self._redis.delete(PREFIJO_CANDADO + clave)
+        except Exception as e:
+            await self._descartar_redis(e)
+
+    # --- API ---------------------------------------------------------------
+
+    async def obtener_o_cargar(
+        self,
+        clave: str,
+        cargador: Callable[[], Awaitable[Any]],
+        ttl: Optional[int] = None,
+        etiquetas: Iterable[str] = (),
+    ) -> Any:
+        """
+        Retorna el valor cacheado de `clave` o lo calcula con `cargador()`.
+        Misses concurrentes en el worker comparten una sola carga, que corre en
+        su propia tarea: si un llamador se cancela (cliente desconectado) los
+        demás siguen esperándola. Si la carga falla, la excepción llega a todos
+        los que esperaban y no se cachea nada. Por eso `cargador` no debe usar
+        recursos del request que lo origina (p. ej. la sesión de `obtener_db`):
+        debe abrir su propia sesión.
+        """
+        valor = self._leer_local(clave)
+        if valor is not _NO_ENCONTRADO:
+            self._metricas["aciertos_local"] += 1
+            return valor
+
+        tarea = self._en_vuelo.get(clave)
+        if tarea is not None:
+            self._metricas["esperas"] += 1
+        else:
+            tarea = asyncio.ensure_future(
+                self._cargar(clave, cargador, ttl or self.ttl_defecto, frozenset(etiquetas))
+            )
+            self._en_vuelo[clave] = tarea
+            tarea.add_done_callback(lambda t: self._terminar_carga(clave, t))
+        return await asyncio.shield(tarea)
+
+    def _terminar_carga(self, clave: str, tarea: asyncio.Task):
+        if self._en_vuelo.get(clave) is tarea:
+            del self._en_vuelo[clave]
+        if not tarea.cancelled():
+            # Marca la excepción como recuperada si ya nadie esperaba la carga.
+            tarea.exception()
+
+    async def _cargar(self, clave: str, cargador, ttl: int, etiquetas: frozenset) -> Any:
+        generacion = self._generacion
+        con_redis = await self._asegurar_redis()
+        candado = False
+        if con_redis:
+            try:
+                texto = await self._leer_redis(clave)
+                if texto is None:
+                    candado, texto = await self._esperar_otro_worker(clave)
+                if texto is not None:
+                    self._metricas["aciertos_redis"] += 1
+                    valor = json.loads(texto)
+                    if generacion == self._generacion:
+                        self._guardar_local(clave, valor, ttl, etiquetas)
+                    return valor
+            except Exception as e:
+                await self._descartar_redis(e)
+                con_redis = candado = False
+
+        try:
+            self._metricas["fallos"] += 1
+            self._metricas["cargas"] += 1
+            valor = await cargador()
+            try:
+                texto = _codificar(valor)
+            except Exception as e:
+                logger.warning(f"Caché: '{clave}' no es serializable, no se cachea: {e}")
+                return valor
+            valor = json.loads(texto)
+            if generacion != self._generacion:
+                return valor  # Se invalidó durante la carga: el valor puede estar viejo.
+            self._guardar_local(clave, valor, ttl, etiquetas)
+            if con_redis and self._redis is not None:
+                try:
+                    # El pipeline también borra el candado.
+                    await self._guardar_redis(clave, texto, ttl, etiquetas)
+                    candado = False
+                except Exception as e:
+                    await self._descartar_redis(e)
+            return valor
+        finally:
+            if candado:
+                await self._liberar_candado(clave)
+
+    async def invalidar(self, *etiquetas: str):
+        """
+        Borra las entradas con alguna de las etiquetas en este worker, en Redis
+        y (vía pub/sub) en los demás workers. Nunca lanza: se llama tras escrituras.
+        """
+        if not etiquetas:
+            return
+        self._metricas["invalidaciones"] += 1
+        self._invalidar_local(etiquetas)
+        if not await self._asegurar_redis():
+            return
+        try:
+            claves_etiqueta = [PREFIJO_ETIQUETA + e for e in etiquetas]
+            claves = await self._redis.sunion(*claves_etiqueta)
+            pipe = self._redis.pipeline(transaction=False)
+            if claves:
+                pipe.delete(*(PREFIJO_CLAVE + c for c in claves))
+            pipe.delete(*claves_etiqueta)
+            pipe.publish(CANAL_INVALIDACIONES, json.dumps(list(etiquetas)))
+            await pipe.execute()
+        except Exception as e:
+            await self._descartar_redis(e)
+
+    # --- Métricas ----------------------------------------------------------
+
+    def obtener_metricas(self) -> dict:
+        consultas = self._metricas["aciertos_local"] + self._metricas["aciertos_redis"] + self._metricas["fallos"]
+        aciertos = consultas - self._metricas["fallos"]
+        return {
+            "redis_conectado": self._redis is not None,
+            "entradas_locales": len(self._local),
+            "max_entradas": self.max_entradas,
+            "cargas_en_vuelo": len(self._en_vuelo),
+            **self._metricas,
+            "tasa_aciertos": round(aciertos / consultas, 4) if consultas else 0.0,
+        }
+
+
+# Instancia global de la caché (una por worker)
+cache = CacheEscalonado(
+    config.redis_url,
+    max_entradas=obtener_configuracion().cache_max_entradas,
+    ttl_defecto=obtener_configuracion().cache_ttl_segundos,
+)
@@ -1,20 +1,75 @@
 """
 Servicio y Tarea de Notificación de Compromisos - Backend V2
+
+Una sola sentencia selecciona las actividades cuyo compromiso vence en 0-3
+días, las cruza con sus usuarios (asignado y responsable), descarta los que
+ya fueron notificados para ese umbral e inserta todas las notificaciones
+nuevas. Los correos se encolan en la bandeja de salida en la misma
+transacción; el costo depende de los compromisos por vencer, no de todos
+los abiertos.
 """
 import logging
-import asyncio
 from datetime import date
-from sqlalchemy import select
+from typing import Optional
+
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import AsyncSessionLocal
-from app.models.desarrollo.actividad import Actividad
-from app.models.auth.usuario import Usuario
-from app.services.notificacion.servicio import ServicioNotificacion
-from app.models.alerta.notificacion import NotificacionUsuarioCrear, NotificacionUsuario
+from app.services.notifications.email_outbox import notificar_pendientes
 from app.services.notifications.email_service import EmailService
 
 logger = logging.getLogger(__name__)
 
+# Días antes del vencimiento en que se avisa (3, 2, 1 y el mismo día).
+DIAS_AVISO = 3
+
+_QUERY_NOTIFICAR_VENCIMIENTOS = text("""
+    WITH vencimientos AS (
+        SELECT a.id AS actividad_id,
+               a.titulo AS actividad_titulo,
+               a.compromiso,
+               a.compromiso_fecha,
+               a.desarrollo_id,
+               a.compromiso_fecha - CAST(:hoy AS date) AS dias,
+               u.id AS usuario_id,
+               u.nombre,
+               u.correo
+        FROM actividades a
+        JOIN usuarios u ON u.id IN (a.asignado_a_id, a.responsable_id)
+        WHERE a.compromiso_cumplido = FALSE
+          AND a.compromiso_fecha BETWEEN CAST(:hoy AS date) AND CAST(:hoy AS date) + CAST(:dias_aviso AS integer)
+    ),
+    nuevas AS (
+        SELECT v.*, 'compromiso_' || v.actividad_id || '_' || v.dias || 'd' AS referencia_id
+        FROM vencimientos v
+        WHERE NOT EXISTS (
+            SELECT 1 FROM notificaciones_usuario n
+            WHERE n.usuario_id = v.usuario_id
+              AND n.referencia_id = 'compromiso_' || v.actividad_id || '_' || v.dias || 'd'
+        )
+    ),
+    insertadas AS (
+        INSERT INTO notificaciones_usuario (usuario_id, titulo, mensaje, tipo_evento, referencia_id, leido)
+        SELECT usuario_id,
+               'Recordatorio de Compromiso',
+               CASE WHEN dias = 0
+                    THEN 'Tu compromiso en la actividad ''' || actividad_titulo || ''' vence hoy.'
+                    ELSE 'Tu compromiso en la actividad ''' || actividad_titulo || ''' vence en '
+                         || dias || ' días (' || to_char(compromiso_fecha, 'DD/MM/YYYY') || ').'
+               END,
+               'compromiso_vence_' || dias || 'd',
+               referencia_id,
+               FALSE
+        FROM nuevas
+        RETURNING id, usuario_id, titulo, mensaje, tipo_evento, referencia_id, leido, creado_en
+    )
+    SELECT i.id, i.usuario_id, i.titulo, i.mensaje, i.tipo_evento, i.referencia_id,
+           i.leido, i.creado_en, n.nombre, n.correo, n.actividad_id, n.actividad_titulo,
+           n.compromiso, n.compromiso_fecha, n.desarrollo_id, n.dias
+    FROM insertadas i
+    JOIN nuevas n ON n.usuario_id = i.usuario_id AND n.referencia_id = i.referencia_id
+""")
+
 
 def es_correo_valido(email: str) -> bool:
     if not email:
@@ -22,125 +77,89 @@ def es_correo_valido(email: str) -> bool:
     return "@" in email and "." in email
 
 
-async def verificar_y_notificar_compromisos(db: AsyncSession):
+def _correo_recordatorio(fila) -> str:
+    fecha = fila.compromiso_fecha.strftime('%d/%m/%Y')
+    cuerpo_html = f"""
+    <p style="color: #4a5568; font-size: 16px; line-height: 1.6; margin-bottom: 20px;">
+        Hola <strong>{fila.nombre}</strong>,
+    </p>
+    <p style="color: #4a5568; font-size: 16px; line-height: 1.6; margin-bottom: 25px;">
+        Te recordamos que tienes un compromiso pendiente en la actividad <strong>{fila.actividad_titulo}</strong>.
+    </p>
+    <p style="color: #4a5568; font-size: 16px; line-height: 1.6; margin-bottom: 25px;">
+        <strong>Detalle del Compromiso:</strong> {fila.compromiso or 'Sin detalles adicionales.'}
+    </p>
+    <p style="color: #4a5568; font-size: 16px; line-height: 1.6; margin-bottom: 25px;">
+        <strong>Fecha límite:</strong> {fecha} ({'Vence hoy' if fila.dias == 0 else f'Faltan {fila.dias} días'})
+    </p>
+    <div style="text-align: center; margin-bottom: 30px;">
+        <a href="{EmailService.get_frontend_url()}/desarrollo/{fila.desarrollo_id}" style="background-color: #002060; color: #ffffff; padding: 14px 28px; text-decoration: none; border-radius: 6px; font-weight: 600; font-size: 15px; display: inline-block;">
+            Ver Detalles de Actividades
+        </a>
+    </div>
+    """
+    return EmailService._get_base_layout("Recordatorio de Compromiso", cuerpo_html)
+
+
+async def _difundir(filas) -> None:
+    """Envía por WebSocket las notificaciones creadas (si el usuario está conectado)."""
+    try:
+        from app.services.notificacion.ws_manager import notification_manager
+
+        for fila in filas:
+            await notification_manager.broadcast_to_user(
+                fila.usuario_id,
+                {
+                    "id": fila.id,
+                    "titulo": fila.titulo,
+                    "mensaje": fila.mensaje,
+                    "tipo_evento": fila.tipo_evento,
+                    "referencia_id": fila.referencia_id,
+                    "leido": fila.leido,
+                    "creado_en": fila.creado_en.isoformat() if fila.creado_en else None,
+                },
+            )
+    except Exception as e:
+        logger.warning(f"Error enviando websocket de notificaciones de compromisos: {e}")
+
+
+async def verificar_y_notificar_compromisos(db: AsyncSession, hoy: Optional[date] = None) -> dict:
+    """
+    Crea las notificaciones de compromisos por vencer y encola sus correos.
+    Retorna cuántas notificaciones y correos se generaron.
+    """
     logger.info("Iniciando verificación de compromisos de actividades...")
+    hoy = hoy or date.today()
     try:
-        # 1. Obtener actividades con compromiso_fecha y compromiso_cumplido = False
-        stmt = select(Actividad).where(
-            Actividad.compromiso_fecha != None,
-            Actividad.compromiso_cumplido == False
-        )
-        res = await db.execute(stmt)
-        actividades = res.scalars().all()
-        
-        hoy = date.today()
-        logger.info(f"Se encontraron {len(actividades)} actividades con compromisos pendientes.")
-
-        for act in actividades:
-            # Calcular días restantes
-            dias_restantes = (act.compromiso_fecha - hoy).days
-            
-            # Los días que nos interesan son: 3, 2, 1 y 0
-            if dias_restantes not in (0, 1, 2, 3):
-                continue
-                
-            # Identificar usuarios a notificar
-            usuarios_a_notificar = set()
-            if act.asignado_a_id:
-                usuarios_a_notificar.add(act.asignado_a_id)
-            if act.responsable_id:
-                usuarios_a_notificar.add(act.responsable_id)
-                
-            if not usuarios_a_notificar:
-                continue
-
-            # Consultar los datos de estos usuarios
-            usuarios_stmt = select(Usuario).where(Usuario.id.in_(list(usuarios_a_notificar)))
-            usuarios_res = await db.execute(usuarios_stmt)
-            usuarios = usuarios_res.scalars().all()
-
-            for usuario in usuarios:
-                ref_id_evento = f"compromiso_{act.id}_{dias_restantes}d"
-                tipo_evento = f"compromiso_vence_{dias_restantes}d"
-                
-                # Verificar si ya existe una notificación de este tipo para el usuario
-                notif_existente_stmt = select(NotificacionUsuario).where(
-                    NotificacionUsuario.usuario_id == usuario.id,
-                    NotificacionUsuario.referencia_id == ref_id_evento
-                )
-                notif_res = await db.execute(notif_existente_stmt)
-                if notif_res.scalar_one_or_none() is not None:
-                    # Ya fue notificado para este umbral de días
-                    continue
-
-                # Determinar mensaje
-                if dias_restantes == 0:
-                    mensaje = f"Tu compromiso en la actividad '{act.titulo}' vence hoy."
-                else:
-                    mensaje = f"Tu compromiso en la actividad '{act.titulo}' vence en {dias_restantes} días ({act.compromiso_fecha.strftime('%d/%m/%Y')})."
-
-                logger.info(f"Notificando a usuario {usuario.nombre} ({usuario.id}) sobre vencimiento de compromiso de actividad {act.id} ({dias_restantes}d).")
-                
-                # Crear notificación en la app/WebSocket
-                notif_in = NotificacionUsuarioCrear(
-                    usuario_id=usuario.id,
-                    titulo="Recordatorio de Compromiso",
-                    mensaje=mensaje,
-                    tipo_evento=tipo_evento,
-                    referencia_id=ref_id_evento
-                )
-                await ServicioNotificacion.crear_notificacion(db, notif_in)
-
-                # Si posee un correo electrónico válido, enviar correo
-                if es_correo_valido(usuario.correo):
-                    asunto = f"Aviso de Vencimiento de Compromiso: {act.titulo}"
-                    cuerpo_html = f"""
-                    <p style="color: #4a5568; font-size: 16px; line-height: 1.6; margin-bottom: 20px;">
-                        Hola <strong>{usuario.nombre}</strong>,
-                    </p>
-                    <p style="color: #4a5568; font-size: 16px; line-height: 1.6; margin-bottom: 25px;">
-                        Te recordamos que tienes un compromiso pendiente en la actividad <strong>{act.titulo}</strong>.
-                    </p>
-                    <p style="color: #4a5568; font-size: 16px; line-height: 1.6; margin-bottom: 25px;">
-                        <strong>Detalle del Compromiso:</strong> {act.compromiso or 'Sin detalles adicionales.'}
-                    </p>
-                    <p style="color: #4a5568; font-size: 16px; line-height: 1.6; margin-bottom: 25px;">
-                        <strong>Fecha límite:</strong> {act.compromiso_fecha.strftime('%d/%m/%Y')} ({'Vence hoy' if dias_restantes == 0 else f'Faltan {dias_restantes} días'})
-                    </p>
-                    <div style="text-align: center; margin-bottom: 30px;">
-                        <a href="{EmailService.get_frontend_url()}/desarrollo/{act.desarrollo_id}" style="background-color: #002060; color: #ffffff; padding: 14px 28px; text-decoration: none; border-radius: 6px; font-weight: 600; font-size: 15px; display: inline-block;">
-                            Ver Detalles de Actividades
-                        </a>
-                    </div>
-                    """
-                    html_final = EmailService._get_base_layout("Recordatorio de Compromiso", cuerpo_html)
-                    try:
-                        await EmailService.enviar_correo(
-                            asunto=asunto,
-                            destinatarios=[usuario.correo],
-                            contenido_html=html_final,
-                            attachments=EmailService._get_attachments()
-                        )
-                        logger.info(f"Correo de recordatorio enviado a {usuario.correo}.")
-                    except Exception as e:
-                        logger.error(f"Error al enviar correo de recordatorio a {usuario.correo}: {e}")
+        filas = (await db.execute(
+            _QUERY_NOTIFICAR_VENCIMIENTOS, {"hoy": hoy, "dias_aviso": DIAS_AVISO}
+        )).fetchall()
 
+        correos = 0
+        adjuntos = EmailService._get_attachments() if filas else None
+        for fila in filas:
+            if es_correo_valido(fila.correo) and EmailService.encolar_en_sesion(
+                db,
+                asunto=f"Aviso de Vencimiento de Compromiso: {fila.actividad_titulo}",
+                destinatarios=[fila.correo],
+                contenido_html=_correo_recordatorio(fila),
+                attachments=adjuntos,
+            ):
+                correos += 1
+        await db.commit()
     except Exception as e:
+        await db.rollback()
         logger.error(f"Error general en verificar_y_notificar_compromisos: {e}", exc_info=True)
+        return {"notificaciones": 0, "correos": 0}
+
+    if correos:
+        notificar_pendientes()
+    await _difundir(filas)
+    logger.info(f"Compromisos por vencer: {len(filas)} notificaciones nuevas, {correos} correos encolados.")
+    return {"notificaciones": len(filas), "correos": correos}
 
 
-async def iniciar_loop_verificador_compromisos(intervalo_horas: int = 12):
-    """Loop asíncrono para verificar compromisos periódicamente"""
-    logger.info(f"Iniciando loop verificador de compromisos (cada {intervalo_horas} horas)...")
-    # Esperar un momento en el arranque inicial para no saturar al levantar el servicio
-    await asyncio.sleep(30)
-    
-    while True:
-        try:
-            async with AsyncSessionLocal() as db:
-                await verificar_y_notificar_compromisos(db)
-        except Exception as e:
-            logger.error(f"Error en el ciclo del verificador de compromisos: {e}")
-            
-        # Dormir el intervalo configurado
-        await asyncio.sleep(intervalo_horas * 3600)
+async def ejecutar_verificador_compromisos():
+    """Una corrida del verificador de compromisos (la agenda el planificador)"""
+    async with AsyncSessionLocal() as db:
+        await verificar_y_notificar_compromisos(db)
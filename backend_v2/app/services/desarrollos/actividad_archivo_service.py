@@ -1,18 +1,27 @@
-"""Almacenamiento local seguro de evidencias para actividades WBS."""
+"""
+Almacenamiento local seguro de evidencias para actividades WBS.
+
+Las evidencias nuevas se guardan en el almacén por contenido y se referencian
+como `actividades/<id>/<sha256>_<nombre>`; las legadas
+(`actividades/<id>/<uuid>_<nombre>`) siguen siendo archivos propios de la actividad.
+"""
 
-import asyncio
-import os
 import re
 import unicodedata
 import zipfile
 from dataclasses import dataclass
 from pathlib import Path, PurePosixPath
-from uuid import uuid4
 
 from fastapi import UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services.almacenamiento import (
+    ArchivoBlobInvalido,
+    guardar_stream,
+    ruta_blob,
+)
 
 
-CHUNK_SIZE = 1024 * 1024
 TIPOS_PERMITIDOS = {
     ".pdf": ("application/pdf",),
     ".png": ("image/png",),
@@ -34,7 +43,8 @@ ARCHIVOS_OFFICE = {
     ".pptx": "ppt/presentation.xml",
 }
 PATRON_RUTA = re.compile(
-    r"^actividades/(?P<actividad_id>\d+)/(?P<archivo>[0-9a-f]{32}_[^/\\]+)$"
+    r"^actividades/(?P<actividad_id>\d+)/"
+    r"(?P<archivo>(?P<clave>[0-9a-f]{32}|[0-9a-f]{64})_[^/\\]+)$"
 )
 
 
@@ -96,11 +106,16 @@ def _validar_firma(ruta: Path, extension: str) -> None:
 
 
 async def guardar_archivo_actividad(
+    db: AsyncSession,
     actividad_id: int,
     archivo: UploadFile,
     almacenamiento_raiz: Path,
     maximo_bytes: int,
 ) -> ArchivoActividadGuardado:
+    """
+    Valida nombre, tipo y firma y guarda el contenido en el almacén por
+    contenido (suma una referencia en `db`, sin commit).
+    """
     if maximo_bytes <= 0:
         raise ArchivoActividadInvalido("El límite de almacenamiento no es válido")
 
@@ -110,49 +125,37 @@ async def guardar_archivo_actividad(
     if tipo_mime not in TIPOS_PERMITIDOS[extension]:
         raise ArchivoActividadInvalido("El tipo MIME no coincide con el archivo")
 
-    directorio = almacenamiento_raiz / "actividades" / str(actividad_id)
-    await asyncio.to_thread(directorio.mkdir, parents=True, exist_ok=True)
-    nombre_fisico = f"{uuid4().hex}_{nombre}"
-    ruta_final = directorio / nombre_fisico
-    ruta_temporal = directorio / f".{uuid4().hex}.tmp"
-    tamano = 0
-    archivo_cerrado = False
-
     try:
-        with ruta_temporal.open("xb") as destino:
-            while bloque := await archivo.read(CHUNK_SIZE):
-                tamano += len(bloque)
-                if tamano > maximo_bytes:
-                    raise ArchivoActividadInvalido(
-                        f"El archivo supera el límite de {maximo_bytes} bytes"
-                    )
-                await asyncio.to_thread(destino.write, bloque)
-            if tamano == 0:
-                raise ArchivoActividadInvalido("El archivo está vacío")
-            await asyncio.to_thread(destino.flush)
-            await asyncio.to_thread(os.fsync, destino.fileno())
-
-        await asyncio.to_thread(_validar_firma, ruta_temporal, extension)
-        await archivo.close()
-        archivo_cerrado = True
-        reemplazo = asyncio.create_task(
-            asyncio.to_thread(os.replace, ruta_temporal, ruta_final)
+        blob = await guardar_stream(
+            db,
+            archivo,
+            maximo_bytes,
+            validar=lambda ruta: _validar_firma(ruta, extension),
+            raiz=almacenamiento_raiz,
         )
-        try:
-            await asyncio.shield(reemplazo)
-        except asyncio.CancelledError:
-            await reemplazo
-            raise
-    except BaseException:
-        ruta_temporal.unlink(missing_ok=True)
-        ruta_final.unlink(missing_ok=True)
-        raise
+    except ArchivoBlobInvalido as exc:
+        raise ArchivoActividadInvalido(str(exc)) from exc
     finally:
-        if not archivo_cerrado:
-            await archivo.close()
+        await archivo.close()
 
-    ruta_relativa = PurePosixPath("actividades", str(actividad_id), nombre_fisico).as_posix()
-    return ArchivoActividadGuardado(ruta_relativa, nombre, TIPOS_PERMITIDOS[extension][0], tamano)
+    ruta_relativa = PurePosixPath(
+        "actividades", str(actividad_id), f"{blob.sha256}_{nombre}"
+    ).as_posix()
+    return ArchivoActividadGuardado(
+        ruta_relativa, nombre, TIPOS_PERMITIDOS[extension][0], blob.tamano_bytes
+    )
+
+
+def sha256_archivo_actividad(actividad_id: int, ruta_relativa: str | None) -> str | None:
+    """SHA-256 del blob al que apunta la evidencia, o None si es legada o externa."""
+    coincidencia = PATRON_RUTA.fullmatch(ruta_relativa or "")
+    if (
+        not coincidencia
+        or int(coincidencia.group("actividad_id")) != actividad_id
+        or len(coincidencia.group("clave")) != 64
+    ):
+        return None
+    return coincidencia.group("clave")
 
 
 def resolver_archivo_actividad(
@@ -165,8 +168,13 @@ def resolver_archivo_actividad(
         raise ArchivoActividadInvalido("La referencia del archivo no es válida")
 
     raiz = almacenamiento_raiz.resolve()
-    directorio_esperado = (raiz / "actividades" / str(actividad_id)).resolve()
-    candidata = raiz / PurePosixPath(ruta_relativa or "")
+    sha256 = sha256_archivo_actividad(actividad_id, ruta_relativa)
+    if sha256:
+        candidata = ruta_blob(sha256, raiz)
+        directorio_esperado = candidata.parent
+    else:
+        directorio_esperado = (raiz / "actividades" / str(actividad_id)).resolve()
+        candidata = raiz / PurePosixPath(ruta_relativa or "")
     if candidata.is_symlink() or candidata.parent.is_symlink():
         raise ArchivoActividadInvalido("La referencia del archivo no es válida")
     ruta = candidata.resolve()
@@ -186,6 +194,13 @@ def eliminar_archivo_interno(
     ruta_relativa: str | None,
     almacenamiento_raiz: Path,
 ) -> bool:
+    """
+    Borra una evidencia legada (archivo propio de la actividad). Las del
+    almacén pueden estar compartidas: se liberan con `liberar` y las borra
+    la recolección, nunca esta función.
+    """
+    if sha256_archivo_actividad(actividad_id, ruta_relativa):
+        return False
     try:
         ruta, _, _ = resolver_archivo_actividad(
             actividad_id, ruta_relativa, almacenamiento_raiz
@@ -209,3 +224,11 @@ def es_archivo_interno_actividad(actividad_id: int, ruta_relativa: str | None) -
         coincidencia
         and int(coincidencia.group("actividad_id")) == actividad_id
     )
+
+
+def es_archivo_legado_actividad(actividad_id: int, ruta_relativa: str | None) -> bool:
+    """Evidencia interna guardada como archivo propio (antes del almacén por contenido)."""
+    return (
+        es_archivo_interno_actividad(actividad_id, ruta_relativa)
+        and sha256_archivo_actividad(actividad_id, ruta_relativa) is None
+    )
@@ -0,0 +1,79 @@
+"""
+Servicio de aplicación de plantillas WBS a desarrollos.
+
+Clona el árbol de una plantilla como actividades en una sola transacción
+corta: los ids se reservan de la secuencia de `actividades` en una consulta,
+los hijos se agrupan en una pasada y las filas se insertan en lote
+(INSERT multi-fila, padres antes que hijos). Al final se recalcula una sola vez el
+progreso del desarrollo.
+"""
+from collections import defaultdict
+from typing import Dict, List, Sequence
+
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.desarrollo.actividad import Actividad
+from app.models.desarrollo.plantilla_actividad import PlantillaActividad
+from app.services.desarrollos.porcentaje_service import recalcular_progreso_desarrollo
+
+_QUERY_RESERVAR_IDS = text("""
+    SELECT nextval(pg_get_serial_sequence('actividades', 'id'))
+    FROM generate_series(1, :n)
+""")
+
+
+def ordenar_por_niveles(nodos: Sequence[PlantillaActividad]) -> List[PlantillaActividad]:
+    """
+    Recorrido por niveles desde las raíces (parent_id nulo): cada padre queda
+    antes que sus hijos. Los nodos cuyo padre no pertenece a la plantilla no
+    son alcanzables y se omiten.
+    """
+    hijos_por_padre: Dict[int, List[PlantillaActividad]] = defaultdict(list)
+    for nodo in nodos:
+        if nodo.parent_id is not None:
+            hijos_por_padre[nodo.parent_id].append(nodo)
+
+    orden = [n for n in nodos if n.parent_id is None]
+    i = 0
+    while i < len(orden):
+        orden.extend(hijos_por_padre.get(orden[i].id, ()))
+        i += 1
+    return orden
+
+
+async def aplicar_plantilla(
+    db: AsyncSession, desarrollo_id: str, nodos: Sequence[PlantillaActividad]
+) -> int:
+    """
+    Crea las actividades del árbol `nodos` en el desarrollo y recalcula su
+    progreso. No hace commit. Retorna la cantidad de actividades creadas.
+    """
+    orden = ordenar_por_niveles(nodos)
+    if not orden:
+        return 0
+
+    ids = (await db.execute(_QUERY_RESERVAR_IDS, {"n": len(orden)})).scalars().all()
+    id_map = {nodo.id: nuevo_id for nodo, nuevo_id in zip(orden, ids)}
+
+    filas = [
+        {
+            "id": id_map[nodo.id],
+            "desarrollo_id": desarrollo_id,
+            "parent_id": id_map.get(nodo.parent_id) if nodo.parent_id else None,
+            "titulo": nodo.titulo,
+            "descripcion": nodo.descripcion,
+            "horas_estimadas": nodo.horas_estimadas,
+            "estado": "Pendiente",
+            "porcentaje_avance": 0,
+        }
+        for nodo in orden
+    ]
+    # executemany -> INSERT ... VALUES multi-fila por lotes; el orden por niveles
+    # garantiza que cada padre exista antes (o en el mismo lote) que sus hijos.
+    await db.execute(insert(Actividad), filas)
+
+    # Todas nacen en 0% (Pendiente): los padres no cambian y basta con el
+    # progreso global del desarrollo.
+    await recalcular_progreso_desarrollo(db, desarrollo_id)
+    return len(filas)
@@ -1,5 +1,7 @@
 from .empleados_service import EmpleadosService
+from .directorio_empleados_service import DirectorioEmpleadosService
+from .catalogo_replica_service import CatalogoReplicaService
 from .viaticos_service import ViaticosService
 from .viaticos_query_service import ViaticosQueryService
 
-__all__ = ["EmpleadosService", "ViaticosService", "ViaticosQueryService"]
+__all__ = ["EmpleadosService", "DirectorioEmpleadosService", "CatalogoReplicaService", "ViaticosService", "ViaticosQueryService"]
@@ -0,0 +1,359 @@
+"""
+Réplica local del catálogo de productos y del índice de OTs de viáticos del ERP.
+
+Cada sincronización lee la tabla del ERP una sola vez y solo escribe en la
+base local las filas cuya huella cambió (igual que el directorio de
+empleados). Las búsquedas por tecla de requisiciones y viáticos resuelven
+contra la réplica con índices trigram y paginación por llave (keyset)
+mientras la última sincronización esté dentro de la antigüedad máxima
+configurada; si no, devuelven None y el router vuelve al ERP.
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import obtener_configuracion
+from app.models.erp.catalogo_replica import (
+    CatalogoProductoReplica,
+    CatalogoReplicaSincronizacion,
+    OtViaticoReplica,
+)
+
+logger = logging.getLogger(__name__)
+
+REPLICA_CATALOGO = "catalogo_productos"
+REPLICA_OTS = "ots_viaticos"
+TAMANO_LOTE = 1000
+
+CAMPOS_CATALOGO = (
+    "fecha", "hora", "codigolinea", "codigogrupo", "elemento", "descripcion",
+    "unidadmedida", "linea", "grupo", "tipo", "clasificacion", "rotacion",
+    "periodo", "proveedorfrecuente", "clasificacioncompras", "formato",
+)
+CAMPOS_OTS = ("numero", "centrocosto", "subcentrocosto", "especialidad", "cliente", "ciudad")
+
+_QUERY_ERP_CATALOGO = text(
+    "SELECT referencia::text AS referencia, "
+    + ", ".join(f"{c}::text AS {c}" for c in CAMPOS_CATALOGO)
+    + " FROM catalogoproducto"
+)
+
+_QUERY_ERP_OTS = text("""
+    SELECT numero::text AS numero,
+           centrocosto::text AS centrocosto,
+           subcentrocosto::text AS subcentrocosto,
+           MAX(especialidad)::text AS especialidad,
+           MAX(cliente)::text AS cliente,
+           MAX(ciudad)::text AS ciudad
+    FROM otviaticos
+    GROUP BY numero, centrocosto, subcentrocosto
+""")
+
+_QUERY_ANTIGUEDAD = text("""
+    SELECT EXTRACT(EPOCH FROM now() - ultima_sincronizacion)
+    FROM erp_catalogos_sincronizacion
+    WHERE replica = :replica
+""")
+
+
+def _texto(valor: Any) -> Optional[str]:
+    if valor is None:
+        return None
+    limpio = str(valor).strip()
+    return limpio or None
+
+
+def _con_huella(registro: Dict[str, Any], campos: Iterable[str]) -> Dict[str, Any]:
+    base = "|".join("" if registro[c] is None else str(registro[c]) for c in campos)
+    registro["huella"] = hashlib.md5(base.encode("utf-8")).hexdigest()
+    return registro
+
+
+def normalizar_producto_erp(fila: Any) -> Dict[str, Any]:
+    registro = {"referencia": _texto(fila.referencia)}
+    registro.update({c: _texto(getattr(fila, c)) for c in CAMPOS_CATALOGO})
+    return _con_huella(registro, CAMPOS_CATALOGO)
+
+
+def normalizar_ot_erp(fila: Any) -> Dict[str, Any]:
+    registro = {c: _texto(getattr(fila, c)) for c in CAMPOS_OTS}
+    # Sin número no hay OT que buscar: calcular_cambios descarta la fila.
+    registro["clave"] = registro["numero"] and "|".join(
+        registro[c] or "" for c in ("numero", "centrocosto", "subcentrocosto")
+    )
+    return _con_huella(registro, CAMPOS_OTS)
+
+
+ENCABEZADOS_ORIGEN = ("X-Datos-Origen", "X-Datos-Antiguedad-Segundos", "X-Siguiente-Cursor")
+
+
+def encabezados_origen(
+    antiguedad: Optional[int],
+    filas: Optional[List[Dict]] = None,
+    limite: Optional[int] = None,
+    campo_cursor: Optional[str] = None,
+) -> Dict[str, str]:
+    """Indicador de frescura para la respuesta: réplica (con su antigüedad) o ERP en vivo.
+
+    `antiguedad` None significa que la respuesta salió del ERP. Si la página
+    viene llena, X-Siguiente-Cursor lleva el valor a enviar en `despues`.
+    """
+    encabezados = {
+        "X-Datos-Origen": "erp" if antiguedad is None else "replica",
+        "X-Datos-Antiguedad-Segundos": str(antiguedad or 0),
+    }
+    if filas and limite and len(filas) >= limite and filas[-1].get(campo_cursor) is not None:
+        encabezados["X-Siguiente-Cursor"] = str(filas[-1][campo_cursor])
+    return encabezados
+
+
+# replica -> (modelo, clave, campos replicados, consulta al ERP, normalizador)
+REPLICAS: Dict[str, Tuple[Any, str, Tuple[str, ...], Any, Callable[[Any], Dict[str, Any]]]] = {
+    REPLICA_CATALOGO: (
+        CatalogoProductoReplica, "referencia", CAMPOS_CATALOGO, _QUERY_ERP_CATALOGO,
+        normalizar_producto_erp,
+    ),
+    REPLICA_OTS: (OtViaticoReplica, "clave", CAMPOS_OTS, _QUERY_ERP_OTS, normalizar_ot_erp),
+}
+
+
+def calcular_cambios(
+    registros: Iterable[Dict[str, Any]], clave: str, huellas_locales: Dict[str, str]
+) -> tuple[List[Dict[str, Any]], List[str], int]:
+    """Devuelve (filas nuevas o modificadas, claves a eliminar, total ERP)."""
+    vistas: Dict[str, Dict[str, Any]] = {}
+    for registro in registros:
+        if registro[clave] and registro[clave] not in vistas:
+            vistas[registro[clave]] = registro
+
+    cambios = [r for c, r in vistas.items() if huellas_locales.get(c) != r["huella"]]
+    eliminadas = [c for c in huellas_locales if c not in vistas]
+    return cambios, eliminadas, len(vistas)
+
+
+class CatalogoReplicaService:
+    """Sincronización y búsquedas de las réplicas locales de catálogos del ERP."""
+
+    @staticmethod
+    def sincronizar_replica(db_erp: Session, db_local: Session, replica: str) -> Dict[str, Any]:
+        """Trae la tabla completa del ERP y aplica solo las diferencias.
+
+        Usa un advisory lock transaccional por réplica: si otro worker ya la
+        está sincronizando, retorna `{"omitida": True}` sin tocar el ERP.
+        """
+        modelo, clave, campos, query_erp, normalizar = REPLICAS[replica]
+        tabla = modelo.__table__
+        inicio = time.perf_counter()
+        adquirido = db_local.execute(
+            text("SELECT pg_try_advisory_xact_lock(hashtext(:clave))"),
+            {"clave": f"erp_catalogos_sync:{replica}"},
+        ).scalar()
+        if not adquirido:
+            db_local.rollback()
+            return {"omitida": True}
+
+        try:
+            registros = (normalizar(f) for f in db_erp.execute(query_erp).fetchall())
+            huellas_locales = dict(
+                db_local.execute(text(f"SELECT {clave}, huella FROM {tabla.name}")).all()
+            )
+            cambios, eliminadas, total = calcular_cambios(registros, clave, huellas_locales)
+
+            for i in range(0, len(cambios), TAMANO_LOTE):
+                stmt = insert(tabla)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[tabla.c[clave]],
+                    set_={
+                        **{c: stmt.excluded[c] for c in campos + ("huella",)},
+                        "actualizado_en": func.now(),
+                    },
+                )
+                db_local.execute(stmt, cambios[i:i + TAMANO_LOTE])
+            if eliminadas:
+                db_local.execute(
+                    text(f"DELETE FROM {tabla.name} WHERE {clave} = ANY(:claves)"),
+                    {"claves": eliminadas},
+                )
+
+            duracion_ms = int((time.perf_counter() - inicio) * 1000)
+            estado = insert(CatalogoReplicaSincronizacion.__table__).values(
+                replica=replica,
+                ultima_sincronizacion=func.now(),
+                total_filas=total,
+                filas_actualizadas=len(cambios),
+                filas_eliminadas=len(eliminadas),
+                duracion_ms=duracion_ms,
+            )
+            db_local.execute(
+                estado.on_conflict_do_update(
+                    index_elements=["replica"],
+                    set_={
+                        c: estado.excluded[c]
+                        for c in (
+                            "ultima_sincronizacion",
+                            "total_filas",
+                            "filas_actualizadas",
+                            "filas_eliminadas",
+                            "duracion_ms",
+                        )
+                    },
+                )
+            )
+            db_local.commit()
+        except Exception:
+            db_local.rollback()
+            raise
+
+        logger.info(
+            "CATALOGO_ERP_SYNC | replica=%s | total=%s | actualizadas=%s | eliminadas=%s | ms=%s",
+            replica, total, len(cambios), len(eliminadas), duracion_ms,
+        )
+        return {
+            "omitida": False,
+            "total_filas": total,
+            "filas_actualizadas": len(cambios),
+            "filas_eliminadas": len(eliminadas),
+            "duracion_ms": duracion_ms,
+        }
+
+    @staticmethod
+    def sincronizar(db_erp: Session, db_local: Session) -> Dict[str, Any]:
+        """Sincroniza todas las réplicas; un fallo en una no detiene las demás."""
+        resultado: Dict[str, Any] = {}
+        for replica in REPLICAS:
+            try:
+                resultado[replica] = CatalogoReplicaService.sincronizar_replica(
+                    db_erp, db_local, replica
+                )
+            except Exception as e:
+                db_erp.rollback()
+                logger.error(f"Error sincronizando la réplica {replica} del ERP: {e}")
+                resultado[replica] = {"omitida": True, "error": str(e)}
+        return resultado
+
+    @staticmethod
+    async def sincronizar_async() -> Dict[str, Any]:
+        """Ejecuta `sincronizar` en un hilo con sesiones propias (ERP + local)."""
+        from app.database import SessionErp, SessionLocal
+
+        def _ejecutar() -> Dict[str, Any]:
+            with SessionErp() as db_erp, SessionLocal() as db_local:
+                return CatalogoReplicaService.sincronizar(db_erp, db_local)
+
+        return await asyncio.to_thread(_ejecutar)
+
+    @staticmethod
+    def antiguedad_segundos(db_local: Session, replica: str) -> Optional[int]:
+        """Segundos desde la última sincronización, o None si nunca se sincronizó."""
+        antiguedad = db_local.execute(_QUERY_ANTIGUEDAD, {"replica": replica}).scalar()
+        return None if antiguedad is None else int(antiguedad)
+
+    @staticmethod
+    def buscar_catalogo(
+        busqueda: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+        despues: Optional[str] = None,
+        db_local: Optional[Session] = None,
+    ) -> Optional[Tuple[List[Dict], int]]:
+        """(productos, antigüedad en segundos) desde la réplica, o None si está vencida.
+
+        Con `despues` (última referencia recibida) pagina por llave e ignora `offset`.
+        """
+        condiciones, params = [], {"limit": limit}
+        if busqueda:
+            condiciones.append("(referencia ILIKE :busqueda OR descripcion ILIKE :busqueda)")
+            params["busqueda"] = f"%{busqueda}%"
+        if despues is not None:
+            condiciones.append("referencia > :despues")
+            params["despues"] = despues
+        else:
+            params["offset"] = offset
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        pagina = "LIMIT :limit" if despues is not None else "LIMIT :limit OFFSET :offset"
+        columnas = ", ".join(("referencia",) + CAMPOS_CATALOGO)
+        return CatalogoReplicaService._consultar(
+            db_local,
+            REPLICA_CATALOGO,
+            text(f"SELECT {columnas} FROM erp_catalogo_productos {where} ORDER BY referencia {pagina}"),
+            params,
+        )
+
+    @staticmethod
+    def buscar_ots(
+        query: Optional[str] = None,
+        limit: int = 50,
+        despues: Optional[str] = None,
+        db_local: Optional[Session] = None,
+    ) -> Optional[Tuple[List[Dict], int]]:
+        """(OTs agrupadas por número, antigüedad) desde la réplica, o None si está vencida."""
+        condiciones, params = [], {"limit": limit}
+        if query:
+            # LIKE (no ILIKE): mismos resultados que la consulta al ERP.
+            condiciones.append("(numero LIKE :query OR cliente LIKE :query)")
+            params["query"] = f"%{query}%"
+        if despues is not None:
+            condiciones.append("numero > :despues")
+            params["despues"] = despues
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        return CatalogoReplicaService._consultar(
+            db_local,
+            REPLICA_OTS,
+            text(f"""
+                SELECT numero, MAX(especialidad) AS especialidad, MAX(cliente) AS cliente,
+                       MAX(ciudad) AS ciudad
+                FROM erp_ots_viaticos {where}
+                GROUP BY numero
+                ORDER BY numero
+                LIMIT :limit
+            """),
+            params,
+        )
+
+    @staticmethod
+    def obtener_combinaciones_ot(
+        numero: str, db_local: Optional[Session] = None
+    ) -> Optional[Tuple[List[Dict], int]]:
+        """(combinaciones CC/SCC de la OT, antigüedad) desde la réplica, o None si está vencida."""
+        return CatalogoReplicaService._consultar(
+            db_local,
+            REPLICA_OTS,
+            text("""
+                SELECT numero,
+                       MAX(especialidad) OVER () AS especialidad,
+                       MAX(cliente) OVER () AS cliente,
+                       MAX(ciudad) OVER () AS ciudad,
+                       centrocosto, subcentrocosto
+                FROM erp_ots_viaticos
+                WHERE numero = :numero
+                ORDER BY centrocosto, subcentrocosto
+            """),
+            {"numero": numero},
+        )
+
+    @staticmethod
+    def _consultar(db_local: Optional[Session], replica: str, query, params: Dict[str, Any]):
+        from app.database import SessionLocal
+
+        propia = db_local is None
+        sesion = SessionLocal() if propia else db_local
+        try:
+            max_minutos = obtener_configuracion().replica_catalogos_erp_max_antiguedad_minutos
+            antiguedad = CatalogoReplicaService.antiguedad_segundos(sesion, replica)
+            if antiguedad is None or antiguedad > max_minutos * 60:
+                return None
+            filas = sesion.execute(query, params).mappings().all()
+            return [dict(f) for f in filas], antiguedad
+        except Exception:
+            logger.warning(f"Réplica {replica} del ERP no disponible; se usará el ERP", exc_info=True)
+            return None
+        finally:
+            if propia:
+                sesion.close()
@@ -0,0 +1,301 @@
+"""
+Réplica local del directorio de empleados del ERP.
+
+El ERP se consulta una sola vez por sincronización (todas las cédulas con su
+último contrato) y solo se escriben en la base local las filas cuya huella
+cambió. Las consultas masivas de nómina, favoritos, fúnebres y alertas de
+líneas resuelven contra la réplica con `cedula = ANY(:cedulas)` mientras la
+última sincronización esté dentro de la antigüedad máxima configurada; si
+no, devuelven None y el llamador vuelve al ERP.
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import obtener_configuracion
+from app.models.erp.directorio_empleado import DirectorioEmpleado, DirectorioSincronizacion
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_REPLICADOS = (
+    "nombre",
+    "estado",
+    "empresa",
+    "centrocosto",
+    "area",
+    "cargo",
+    "ciudadcontratacion",
+    "fecharetiro",
+)
+TAMANO_LOTE = 1000
+
+_QUERY_ERP_DIRECTORIO = text("""
+    SELECT DISTINCT ON (E.nrocedula)
+        E.nrocedula      AS "nrocedula",
+        E.nombre::text   AS "nombre",
+        C.estado::text   AS "estado",
+        C.empresa::text  AS "empresa",
+        C.centrocosto::text AS "centrocosto",
+        C.area::text     AS "area",
+        C.cargo::text    AS "cargo",
+        C.ciudadcontratacion::text AS "ciudadcontratacion",
+        C.fecharetiro    AS "fecharetiro"
+    FROM establecimiento E
+    LEFT JOIN contrato C
+        ON TRIM(CAST(C.establecimiento AS TEXT)) = TRIM(CAST(E.nrocedula AS TEXT))
+    ORDER BY E.nrocedula, C.fechainicio DESC NULLS LAST
+""")
+
+_QUERY_VIGENCIA = text("""
+    SELECT ultima_sincronizacion >= now() - make_interval(mins => :max_minutos)
+    FROM erp_directorio_sincronizacion
+    WHERE id = 1
+""")
+
+
+def _normalizar_fecha(valor: Any) -> Optional[date]:
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    try:
+        return date.fromisoformat(str(valor).strip()[:10])
+    except ValueError:
+        return None
+
+
+def _texto(valor: Any) -> Optional[str]:
+    if valor is None:
+        return None
+    limpio = str(valor).strip()
+    return limpio or None
+
+
+def normalizar_fila_erp(fila: Any) -> Dict[str, Any]:
+    """Convierte una fila del ERP al formato de la réplica, con su huella."""
+    registro: Dict[str, Any] = {
+        "cedula": str(fila.nrocedula).strip(),
+        "nombre": _texto(fila.nombre),
+        "estado": _texto(fila.estado),
+        "empresa": _texto(fila.empresa),
+        "centrocosto": _texto(fila.centrocosto),
+        "area": _texto(fila.area),
+        "cargo": _texto(fila.cargo),
+        "ciudadcontratacion": _texto(fila.ciudadcontratacion),
+        "fecharetiro": _normalizar_fecha(fila.fecharetiro),
+    }
+    base = "|".join("" if registro[c] is None else str(registro[c]) for c in CAMPOS_REPLICADOS)
+    registro["huella"] = hashlib.md5(base.encode("utf-8")).hexdigest()
+    return registro
+
+
+def calcular_cambios(
+    filas_erp: Iterable[Any], huellas_locales: Dict[str, str]
+) -> tuple[List[Dict[str, Any]], List[str], int]:
+    """Devuelve (filas nuevas o modificadas, cédulas a eliminar, total ERP)."""
+    vistas: Dict[str, Dict[str, Any]] = {}
+    for fila in filas_erp:
+        registro = normalizar_fila_erp(fila)
+        if registro["cedula"] and registro["cedula"] not in vistas:
+            vistas[registro["cedula"]] = registro
+
+    cambios = [r for c, r in vistas.items() if huellas_locales.get(c) != r["huella"]]
+    eliminadas = [c for c in huellas_locales if c not in vistas]
+    return cambios, eliminadas, len(vistas)
+
+
+class DirectorioEmpleadosService:
+    """Sincronización y consultas de la réplica local del directorio ERP."""
+
+    @staticmethod
+    def sincronizar(db_erp: Session, db_local: Session) -> Dict[str, Any]:
+        """Trae el directorio completo del ERP y aplica solo las diferencias.
+
+        Usa un advisory lock transaccional: si otro worker ya está
+        sincronizando, retorna `{"omitida": True}` sin tocar el ERP.
+        """
+        inicio = time.perf_counter()
+        adquirido = db_local.execute(
+            text("SELECT pg_try_advisory_xact_lock(hashtext('erp_directorio_empleados_sync'))")
+        ).scalar()
+        if not adquirido:
+            db_local.rollback()
+            return {"omitida": True}
+
+        try:
+            filas_erp = db_erp.execute(_QUERY_ERP_DIRECTORIO).fetchall()
+            huellas_locales = dict(
+                db_local.execute(
+                    text("SELECT cedula, huella FROM erp_directorio_empleados")
+                ).all()
+            )
+            cambios, eliminadas, total = calcular_cambios(filas_erp, huellas_locales)
+
+            tabla = DirectorioEmpleado.__table__
+            for i in range(0, len(cambios), TAMANO_LOTE):
+                stmt = insert(tabla)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[tabla.c.cedula],
+                    set_={
+                        **{c: stmt.excluded[c] for c in CAMPOS_REPLICADOS + ("huella",)},
+                        "actualizado_en": func.now(),
+                    },
+                )
+                db_local.execute(stmt, cambios[i:i + TAMANO_LOTE])
+            if eliminadas:
+                db_local.execute(
+                    text("DELETE FROM erp_directorio_empleados WHERE cedula = ANY(:cedulas)"),
+                    {"cedulas": eliminadas},
+                )
+
+            duracion_ms = int((time.perf_counter() - inicio) * 1000)
+            estado = insert(DirectorioSincronizacion.__table__).values(
+                id=1,
+                ultima_sincronizacion=func.now(),
+                total_empleados=total,
+                filas_actualizadas=len(cambios),
+                filas_eliminadas=len(eliminadas),
+                duracion_ms=duracion_ms,
+            )
+            db_local.execute(
+                estado.on_conflict_do_update(
+                    index_elements=["id"],
+                    set_={
+                        c: estado.excluded[c]
+                        for c in (
+                            "ultima_sincronizacion",
+                            "total_empleados",
+                            "filas_actualizadas",
+                            "filas_eliminadas",
+                            "duracion_ms",
+                        )
+                    },
+                )
+            )
+            db_local.commit()
+        except Exception:
+            db_local.rollback()
+            raise
+
+        logger.info(
+            "DIRECTORIO_ERP_SYNC | total=%s | actualizadas=%s | eliminadas=%s | ms=%s",
+            total, len(cambios), len(eliminadas), duracion_ms,
+        )
+        return {
+            "omitida": False,
+            "total_empleados": total,
+            "filas_actualizadas": len(cambios),
+            "filas_eliminadas": len(eliminadas),
+            "duracion_ms": duracion_ms,
+        }
+
+    @staticmethod
+    async def sincronizar_async() -> Dict[str, Any]:
+        """Ejecuta `sincronizar` en un hilo con sesiones propias (ERP + local)."""
+        from app.database import SessionErp, SessionLocal
+
+        def _ejecutar() -> Dict[str, Any]:
+            with SessionErp() as db_erp, SessionLocal() as db_local:
+                return DirectorioEmpleadosService.sincronizar(db_erp, db_local)
+
+        return await asyncio.to_thread(_ejecutar)
+
+    @staticmethod
+    def esta_vigente(db_local: Session) -> bool:
+        max_minutos = obtener_configuracion().directorio_empleados_max_antiguedad_minutos
+        return bool(db_local.execute(_QUERY_VIGENCIA, {"max_minutos": max_minutos}).scalar())
+
+    @staticmethod
+    def consultar_bulk(
+        cedulas: List[str], db_local: Optional[Session] = None
+    ) -> Optional[Dict[str, Dict]]:
+        """Mapa {cedula: datos} desde la réplica, o None si está vencida/no disponible."""
+        cedulas_limpias = list({str(c).strip() for c in cedulas if c is not None})
+        return DirectorioEmpleadosService._consultar(
+            db_local,
+            text("""
+                SELECT cedula, nombre, estado, empresa, centrocosto, area, cargo,
+                       ciudadcontratacion, fecharetiro
+                FROM erp_directorio_empleados
+                WHERE cedula = ANY(:cedulas)
+            """),
+            {"cedulas": cedulas_limpias},
+            lambda filas: {
+                r.cedula: {
+                    "nombre": r.nombre,
+                    "estado": r.estado or "Desconocido",
+                    "empresa": r.empresa or "",
+                    "ciudadcontratacion": r.ciudadcontratacion or "",
+                    "centrocosto": r.centrocosto or "",
+                    "area": r.area or "",
+                    "cargo": r.cargo or "",
+                    "fecharetiro": r.fecharetiro,
+                }
+                for r in filas
+            },
+        )
+
+    @staticmethod
+    def obtener_activos(db_local: Optional[Session] = None) -> Optional[List[Dict]]:
+        """Empleados con último contrato 'Activo', o None si la réplica está vencida."""
+        return DirectorioEmpleadosService._consultar(
+            db_local,
+            text("""
+                SELECT cedula, nombre, estado, empresa
+                FROM erp_directorio_empleados
+                WHERE estado = 'Activo'
+                ORDER BY cedula
+            """),
+            {},
+            lambda filas: [
+                {
+                    "nrocedula": r.cedula,
+                    "nombre": r.nombre,
+                    "estado": r.estado or "Desconocido",
+                    "empresa": r.empresa or "",
+                }
+                for r in filas
+            ],
+        )
+
+    @staticmethod
+    def obtener_estado(db_local: Session) -> Dict[str, Any]:
+        estado = db_local.get(DirectorioSincronizacion, 1)
+        if estado is None:
+            return {"vigente": False, "ultima_sincronizacion": None}
+        return {
+            "vigente": DirectorioEmpleadosService.esta_vigente(db_local),
+            "ultima_sincronizacion": estado.ultima_sincronizacion,
+            "max_antiguedad_minutos": obtener_configuracion().directorio_empleados_max_antiguedad_minutos,
+            "total_empleados": estado.total_empleados,
+            "filas_actualizadas": estado.filas_actualizadas,
+            "filas_eliminadas": estado.filas_eliminadas,
+            "duracion_ms": estado.duracion_ms,
+        }
+
+    @staticmethod
+    def _consultar(db_local: Optional[Session], query, params: Dict[str, Any], mapear):
+        from app.database import SessionLocal
+
+        propia = db_local is None
+        sesion = SessionLocal() if propia else db_local
+        try:
+            if not DirectorioEmpleadosService.esta_vigente(sesion):
+                return None
+            return mapear(sesion.execute(query, params).fetchall())
+        except Exception:
+            logger.warning("Réplica del directorio ERP no disponible; se usará el ERP", exc_info=True)
+            return None
+        finally:
+            if propia:
+                sesion.close()
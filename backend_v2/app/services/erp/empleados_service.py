@@ -3,6 +3,8 @@ from typing import List, Dict, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
+from app.services.erp.directorio_empleados_service import DirectorioEmpleadosService
+
 
 logger = logging.getLogger(__name__)
 
@@ -106,10 +108,17 @@ class EmpleadosService:
         """
         Consulta masiva al ERP: devuelve {cedula: {nombre, estado, empresa}}
         para todas las cédulas proporcionadas (activos e inactivos).
+
+        Resuelve contra la réplica local del directorio si está vigente;
+        si no, consulta el ERP en vivo.
         """
         if not cedulas:
             return {}
 
+        mapa_replica = DirectorioEmpleadosService.consultar_bulk(cedulas)
+        if mapa_replica is not None:
+            return mapa_replica
+
         # Construir placeholders dinámicos para IN clause
         placeholders = ", ".join(f":c{i}" for i in range(len(cedulas)))
         params = {f"c{i}": ced for i, ced in enumerate(cedulas)}
@@ -171,7 +180,11 @@ class EmpleadosService:
 
     @staticmethod
     def obtener_todos_los_empleados_activos(db_erp: Session) -> List[Dict]:
-        """Consulta todos los empleados activos en la base de datos del ERP"""
+        """Consulta todos los empleados activos (réplica local si está vigente, si no el ERP)"""
+        activos_replica = DirectorioEmpleadosService.obtener_activos()
+        if activos_replica is not None:
+            return activos_replica
+
         query = text("""
             SELECT DISTINCT ON (E.nrocedula)
                 E.nrocedula      AS "nrocedula",
@@ -33,18 +33,28 @@ class RequisicionesService:
         busqueda: Optional[str] = None,
         limit: int = 100,
         offset: int = 0,
+        despues: Optional[str] = None,
     ):
-        """Busca en el catálogo de productos."""
+        """Busca en el catálogo de productos (con `despues`, paginación por referencia)."""
         query = "SELECT * FROM catalogoproducto"
         params: Dict[str, Any] = {}
+        condiciones = []
 
         if busqueda:
-            query += " WHERE referencia ILIKE :busqueda OR descripcion ILIKE :busqueda"
+            condiciones.append("(referencia ILIKE :busqueda OR descripcion ILIKE :busqueda)")
             params["busqueda"] = f"%{busqueda}%"
-
-        query += " LIMIT :limit OFFSET :offset"
+        if despues is not None:
+            condiciones.append("referencia > :despues")
+            params["despues"] = despues
+        if condiciones:
+            query += " WHERE " + " AND ".join(condiciones)
+
+        # Ambas rutas ordenan por referencia: el cursor de la respuesta sale de la última fila.
+        query += " ORDER BY referencia LIMIT :limit"
+        if despues is None:
+            query += " OFFSET :offset"
+            params["offset"] = offset
         params["limit"] = limit
-        params["offset"] = offset
 
         resultado = db_erp.execute(text(query), params).mappings().all()
         return [dict(r) for r in resultado]
@@ -1,4 +1,4 @@
-from typing import List, Dict, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from datetime import date
@@ -7,17 +7,25 @@ class ViaticosQueryService:
     """Consultas relacionadas al ERP (Solid) para viáticos"""
 
     @staticmethod
-    def buscar_ots(db_erp: Session, query: Optional[str] = None) -> List[Dict]:
-        """Busca OTs en la tabla otviaticos del ERP"""
+    def buscar_ots(
+        db_erp: Session, query: Optional[str] = None, limit: int = 50, despues: Optional[str] = None
+    ) -> List[Dict]:
+        """Busca OTs en la tabla otviaticos del ERP (con `despues`, paginación por número)"""
         try:
             sql = "SELECT numero, MAX(especialidad) as especialidad, MAX(cliente) as cliente, MAX(ciudad) as ciudad FROM otviaticos"
-            params = {}
+            params = {"limit": limit}
+            condiciones = []
 
             if query:
-                sql += " WHERE numero LIKE :query OR cliente LIKE :query"
-                params = {"query": f"%{query}%"}
+                condiciones.append("(numero LIKE :query OR cliente LIKE :query)")
+                params["query"] = f"%{query}%"
+            if despues is not None:
+                condiciones.append("numero > :despues")
+                params["despues"] = despues
+            if condiciones:
+                sql += " WHERE " + " AND ".join(condiciones)
 
-            sql += " GROUP BY numero LIMIT 50"
+            sql += " GROUP BY numero ORDER BY numero LIMIT :limit"
 
             resultado = db_erp.execute(text(sql), params).all()
             return [dict(row._mapping) for row in resultado]
@@ -44,6 +52,54 @@ class ViaticosQueryService:
             print(f"ERROR ERP Combinaciones OT: {e}")
             return []
 
+    @staticmethod
+    def _consulta_estado_cuenta(
+        cedula: str, desde: Optional[date], hasta: Optional[date]
+    ) -> Tuple[str, Dict]:
+        sql = """
+        WITH movimientos AS (
+            SELECT 
+                codigo, fechaaplicacion, empleado, nombreempleado, 
+                codigoconsignacion AS radicado, valor::numeric AS valor, 
+                'CONSIGNACION' AS tipo, UPPER(TRIM(estado)) AS estado_limpio, 
+                observaciones 
+            FROM consignacion
+            WHERE UPPER(TRIM(estado)) != 'ANULADO'
+            UNION ALL
+            SELECT 
+                codigo, fechaaplicacion, empleado, nombreempleado, 
+                codigolegalizacion AS radicado, valortotal::numeric AS valor, 
+                'LEGALIZACION' AS tipo, UPPER(TRIM(estado)) AS estado_limpio, 
+                observaciones 
+            FROM legalizacion
+            WHERE UPPER(TRIM(estado)) != 'ANULADO'
+        )
+        SELECT 
+            m.codigo, m.fechaaplicacion, m.empleado, m.nombreempleado, m.radicado, m.tipo,
+            CASE WHEN m.tipo = 'CONSIGNACION' AND m.estado_limpio = 'CONTABILIZADO' THEN m.valor ELSE 0 END AS consignacion_contabilizado,
+            CASE WHEN m.tipo = 'LEGALIZACION' AND m.estado_limpio = 'CONTABILIZADO' THEN m.valor ELSE 0 END AS legalizacion_contabilizado,
+            CASE WHEN m.tipo = 'CONSIGNACION' AND m.estado_limpio = 'EN FIRME' THEN m.valor ELSE 0 END AS consignacion_firmadas,
+            CASE WHEN m.tipo = 'LEGALIZACION' AND m.estado_limpio = 'EN FIRME' THEN m.valor ELSE 0 END AS legalizacion_firmadas,
+            CASE WHEN m.tipo = 'CONSIGNACION' AND m.estado_limpio = 'PENDIENTE' THEN m.valor ELSE 0 END AS consignacion_pendientes,
+            CASE WHEN m.tipo = 'LEGALIZACION' AND m.estado_limpio = 'PENDIENTE' THEN m.valor ELSE 0 END AS legalizacion_pendientes,
+            SUM(CASE WHEN m.tipo = 'CONSIGNACION' THEN m.valor WHEN m.tipo = 'LEGALIZACION' THEN -m.valor ELSE 0 END) 
+                OVER (PARTITION BY m.empleado ORDER BY m.fechaaplicacion ASC, m.codigo ASC) AS saldo,
+            m.observaciones
+        FROM movimientos m
+        WHERE m.empleado = :cedula
+        """
+
+        params = {"cedula": cedula}
+        if desde:
+            sql += " AND m.fechaaplicacion >= :desde"
+            params["desde"] = desde
+        if hasta:
+            sql += " AND m.fechaaplicacion <= :hasta"
+            params["hasta"] = hasta
+
+        sql += " ORDER BY m.fechaaplicacion ASC, m.codigo ASC"
+        return sql, params
+
     @staticmethod
     def obtener_estado_cuenta(
         db_erp: Session,
@@ -53,55 +109,28 @@ class ViaticosQueryService:
     ) -> List[Dict]:
         """Obtiene el estado de cuenta detallado de viáticos desde el ERP"""
         try:
-            sql = """
-            WITH movimientos AS (
-                SELECT 
-                    codigo, fechaaplicacion, empleado, nombreempleado, 
-                    codigoconsignacion AS radicado, valor::numeric AS valor, 
-                    'CONSIGNACION' AS tipo, UPPER(TRIM(estado)) AS estado_limpio, 
-                    observaciones 
-                FROM consignacion
-                WHERE UPPER(TRIM(estado)) != 'ANULADO'
-                UNION ALL
-                SELECT 
-                    codigo, fechaaplicacion, empleado, nombreempleado, 
-                    codigolegalizacion AS radicado, valortotal::numeric AS valor, 
-                    'LEGALIZACION' AS tipo, UPPER(TRIM(estado)) AS estado_limpio, 
-                    observaciones 
-                FROM legalizacion
-                WHERE UPPER(TRIM(estado)) != 'ANULADO'
-            )
-            SELECT 
-                m.codigo, m.fechaaplicacion, m.empleado, m.nombreempleado, m.radicado, m.tipo,
-                CASE WHEN m.tipo = 'CONSIGNACION' AND m.estado_limpio = 'CONTABILIZADO' THEN m.valor ELSE 0 END AS consignacion_contabilizado,
-                CASE WHEN m.tipo = 'LEGALIZACION' AND m.estado_limpio = 'CONTABILIZADO' THEN m.valor ELSE 0 END AS legalizacion_contabilizado,
-                CASE WHEN m.tipo = 'CONSIGNACION' AND m.estado_limpio = 'EN FIRME' THEN m.valor ELSE 0 END AS consignacion_firmadas,
-                CASE WHEN m.tipo = 'LEGALIZACION' AND m.estado_limpio = 'EN FIRME' THEN m.valor ELSE 0 END AS legalizacion_firmadas,
-                CASE WHEN m.tipo = 'CONSIGNACION' AND m.estado_limpio = 'PENDIENTE' THEN m.valor ELSE 0 END AS consignacion_pendientes,
-                CASE WHEN m.tipo = 'LEGALIZACION' AND m.estado_limpio = 'PENDIENTE' THEN m.valor ELSE 0 END AS legalizacion_pendientes,
-                SUM(CASE WHEN m.tipo = 'CONSIGNACION' THEN m.valor WHEN m.tipo = 'LEGALIZACION' THEN -m.valor ELSE 0 END) 
-                    OVER (PARTITION BY m.empleado ORDER BY m.fechaaplicacion ASC, m.codigo ASC) AS saldo,
-                m.observaciones
-            FROM movimientos m
-            WHERE m.empleado = :cedula
-            """
-
-            params = {"cedula": cedula}
-            if desde:
-                sql += " AND m.fechaaplicacion >= :desde"
-                params["desde"] = desde
-            if hasta:
-                sql += " AND m.fechaaplicacion <= :hasta"
-                params["hasta"] = hasta
-
-            sql += " ORDER BY m.fechaaplicacion ASC, m.codigo ASC"
-
+            sql, params = ViaticosQueryService._consulta_estado_cuenta(cedula, desde, hasta)
             resultado = db_erp.execute(text(sql), params).all()
             return [dict(row._mapping) for row in resultado]
         except Exception as e:
             print(f"ERROR ERP Estado Cuenta: {e}")
             return []
 
+    @staticmethod
+    def iterar_estado_cuenta(
+        db_erp: Session,
+        cedula: str,
+        desde: Optional[date] = None,
+        hasta: Optional[date] = None,
+        lote: int = 2000,
+    ) -> Iterator[Dict]:
+        """Como obtener_estado_cuenta, pero con cursor de servidor: trae `lote` filas a la vez"""
+        sql, params = ViaticosQueryService._consulta_estado_cuenta(cedula, desde, hasta)
+        resultado = db_erp.execute(
+            text(sql).execution_options(stream_results=True, yield_per=lote), params
+        )
+        yield from resultado.mappings()
+
     @staticmethod
     def obtener_todas_legalizaciones(db_erp: Session) -> List[Dict]:
         """Consulta todas las legalizaciones del portal (vista director) con valores finales si están procesadas"""
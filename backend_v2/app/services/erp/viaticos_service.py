@@ -1,96 +1,157 @@
 from typing import List, Dict, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import column, func, insert, table, text
+from sqlalchemy.dialects.postgresql import JSONB
 from datetime import date
-import uuid
-import json
-import io
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from openpyxl.utils import get_column_letter
+import re
+from app.services.exportacion import FORMATO_MONEDA, ColumnaXlsx, escribir_xlsx
 from .viaticos_query_service import ViaticosQueryService
 
+# Consecutivo WEB-LXXXX: secuencia propia en el ERP (sql/erp_alineacion_viaticos.sql).
+# Si aún no se ha creado, se serializa la asignación con un advisory lock.
+SECUENCIA_REPORTE_WEB = "legalizaciones_transito_web_seq"
+CAMPOS_LINEA_OBLIGATORIOS = ("categoria", "ot", "cc", "scc")
+# Sin OT la línea se imputa a mano: CC de 4 dígitos y SCC de 2 (igual que el portal).
+PATRON_CC_MANUAL = re.compile(r"\d{4}")
+PATRON_SCC_MANUAL = re.compile(r"\d{2}")
+ESTADO_BORRADOR = "BORRADOR"
+
+COLUMNAS_MONTO_ESTADO_CUENTA = (
+    "consignacion_contabilizado", "legalizacion_contabilizado", "consignacion_firmadas",
+    "legalizacion_firmadas", "consignacion_pendientes", "legalizacion_pendientes", "saldo",
+)
+COLUMNAS_ESTADO_CUENTA = [
+    ColumnaXlsx(titulo, ancho=20)
+    for titulo in ("Fecha Aplicación", "Radicado", "Tipo", "Observaciones")
+] + [
+    ColumnaXlsx(titulo, ancho=20, formato=FORMATO_MONEDA)
+    for titulo in (
+        "Consignaciones (Contab.)", "Legalizaciones (Contab.)", "Consignaciones (Firmas)",
+        "Legalizaciones (Firmas)", "Consignaciones (Pend.)", "Legalizaciones (Pend.)", "Saldo",
+    )
+]
+
+_transito_viaticos = table(
+    "transito_viaticos",
+    column("legalizacion"), column("fecha"), column("fecharealgasto"),
+    column("categoria"), column("ot"), column("centrocosto"), column("subcentrocosto"),
+    column("valorconfactura"), column("valorsinfactura"), column("observaciones"),
+    column("reporte_id"), column("estado"), column("fecha_registro"),
+    column("empleado_cedula"), column("empleado_nombre"), column("area"), column("cargo"),
+    column("ciudad"), column("observaciones_gral"), column("usuario_id"),
+    column("adjuntos", JSONB),
+)
+
+
+def _validar_lineas(gastos: List[Dict], borrador: bool = False) -> List[Dict]:
+    """
+    Valida y normaliza todas las líneas antes de tocar el ERP (ValueError si alguna falla).
+    Un borrador puede estar incompleto: solo se validan fecha y valores.
+    """
+    if not gastos and not borrador:
+        raise ValueError("El reporte no tiene líneas de gasto.")
+    lineas = []
+    for numero, gasto in enumerate(gastos, start=1):
+        campos = {c: str(gasto.get(c) or "").strip() for c in CAMPOS_LINEA_OBLIGATORIOS}
+        imputacion_manual = bool(
+            PATRON_CC_MANUAL.fullmatch(campos["cc"]) and PATRON_SCC_MANUAL.fullmatch(campos["scc"])
+        )
+        faltantes = [
+            c for c, valor in campos.items() if not valor and not (c == "ot" and imputacion_manual)
+        ]
+        if faltantes and not borrador:
+            raise ValueError(f"Línea {numero}: faltan {', '.join(faltantes)}.")
+        try:
+            fecha = gasto["fecha"]
+            fecha = fecha if isinstance(fecha, date) else date.fromisoformat(str(fecha)[:10])
+            con_factura = float(gasto.get("valorConFactura") or 0)
+            sin_factura = float(gasto.get("valorSinFactura") or 0)
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Línea {numero}: fecha o valores inválidos.")
+        if con_factura < 0 or sin_factura < 0:
+            raise ValueError(f"Línea {numero}: los valores no pueden ser negativos.")
+        lineas.append({
+            "fecharealgasto": fecha,
+            "categoria": str(gasto.get("categoria") or ""),
+            "ot": str(gasto.get("ot") or ""),
+            "centrocosto": str(gasto.get("cc") or ""),
+            "subcentrocosto": str(gasto.get("scc") or ""),
+            "valorconfactura": con_factura,
+            "valorsinfactura": sin_factura,
+            "observaciones": str(gasto.get("observaciones") or ""),
+            "adjuntos": gasto.get("adjuntos") or [],
+        })
+    return lineas
+
+
+def _siguiente_consecutivo(db_erp: Session) -> str:
+    """Asigna el siguiente WEB-LXXXX dentro de la transacción en curso."""
+    numero = db_erp.execute(
+        text("SELECT nextval(to_regclass(:secuencia))"), {"secuencia": SECUENCIA_REPORTE_WEB}
+    ).scalar()
+    if numero is None:
+        # Sin secuencia: el lock dura hasta el commit, así el siguiente ve este número.
+        db_erp.execute(text("SELECT pg_advisory_xact_lock(hashtext(:secuencia))"),
+                       {"secuencia": SECUENCIA_REPORTE_WEB})
+        ultimo = db_erp.execute(text("""
+            SELECT reporte_id FROM legalizaciones_transito
+            WHERE reporte_id LIKE 'WEB-L%'
+            ORDER BY length(reporte_id) DESC, reporte_id DESC
+            LIMIT 1
+        """)).scalar()
+        digitos = "".join(filter(str.isdigit, ultimo or ""))
+        numero = int(digitos) + 1 if digitos else 1
+    return f"WEB-L{numero:04d}"
+
+
 class ViaticosService:
     """Lógica de comandos (escritura) para viáticos en el ERP (Solid)"""
 
     @staticmethod
     def enviar_reporte(db_erp: Session, reporte_data: Dict) -> str:
-        """Guarda o actualiza un reporte de viáticos en la tabla de tránsito del ERP"""
+        """Guarda o actualiza un reporte de viáticos en la tabla de tránsito del ERP.
+
+        Cabecera y líneas se escriben en una sola transacción: un INSERT para la
+        cabecera y un único INSERT multi-fila para todas las líneas.
+        """
+        estado = str(reporte_data.get("estado") or "INICIAL")
+        lineas = _validar_lineas(reporte_data.get("gastos") or [], borrador=estado == ESTADO_BORRADOR)
+
+        reporte_id_val = reporte_data.get("reporte_id")
+        es_actualizacion = bool(
+            reporte_id_val
+            and isinstance(reporte_id_val, str)
+            and "WEB-L" in reporte_id_val
+            and reporte_id_val.strip().lower() != "null"
+        )
 
-        # Generar o Recuperar Consecutivo Amigable (Formato WEB-LXXXX)
         try:
-            reporte_id_val = reporte_data.get("reporte_id")
-            es_actualizacion = bool(
-                reporte_id_val
-                and isinstance(reporte_id_val, str)
-                and "WEB-L" in reporte_id_val
-                and reporte_id_val.strip().lower() != "null"
-            )
-
             if es_actualizacion:
-                consecutivo = str(reporte_id_val).strip()
-            else:
-                # Generación robusta: buscar el último número usado
-                sql_max = text("""
-                    SELECT reporte_id FROM legalizaciones_transito 
-                    WHERE reporte_id LIKE 'WEB-L%' 
-                    ORDER BY length(reporte_id) DESC, reporte_id DESC 
-                    LIMIT 1
-                """)
-                max_val = db_erp.execute(sql_max).scalar()
-
-                if max_val:
-                    try:
-                        num_str = "".join(filter(str.isdigit, max_val))
-                        nuevo_num = int(num_str) + 1 if num_str else 1
-                    except Exception:
-                        sql_count = text("SELECT COUNT(*) FROM legalizaciones_transito")
-                        nuevo_num = (db_erp.execute(sql_count).scalar() or 0) + 1
-                else:
-                    nuevo_num = 1
-
-                consecutivo = f"WEB-L{nuevo_num:04d}"
-        except Exception as e:
-            print(f"DEBUG_ID_GEN_ERROR: {e}")
-            consecutivo = f"WEB-L{uuid.uuid4().hex[:6].upper()}"
-
-        # Si es actualización, VALIDAR ESTADO y luego LIMPIAR líneas previas
-        if es_actualizacion:
-            try:
-                # Blindaje: No permitir modificar si ya está PROCESADO
-                sql_check = text(
-                    "SELECT estado FROM legalizaciones_transito WHERE reporte_id = :rid"
-                )
-                estado_actual = db_erp.execute(sql_check, {"rid": reporte_id_val}).scalar()
+                reporte_id = str(reporte_id_val).strip()
+                # Blindaje: No permitir modificar si ya está PROCESADO. El FOR UPDATE
+                # evita que dos envíos simultáneos reemplacen el mismo reporte.
+                estado_actual = db_erp.execute(
+                    text("SELECT estado FROM legalizaciones_transito WHERE reporte_id = :rid FOR UPDATE"),
+                    {"rid": reporte_id},
+                ).scalar()
 
                 if estado_actual and estado_actual not in ["BORRADOR", "INICIAL"]:
-                    print(f"SECURITY_ALERT: Intento de modificar reporte bloqueado {reporte_id_val} en estado {estado_actual}")
+                    print(f"SECURITY_ALERT: Intento de modificar reporte bloqueado {reporte_id} en estado {estado_actual}")
                     raise Exception(f"Este reporte se encuentra bloqueado (Estado: {estado_actual}). Ya no es posible realizar cambios.")
 
-                db_erp.execute(text("DELETE FROM transito_viaticos WHERE reporte_id = :rid"), {"rid": reporte_id_val})
-                db_erp.execute(text("DELETE FROM legalizaciones_transito WHERE reporte_id = :rid"), {"rid": reporte_id_val})
-            except Exception as e:
-                print(f"ERROR ERP Limpieza: {e}")
-                db_erp.rollback()
-                raise e
-
-        reporte_id = consecutivo
-        obs_gral = reporte_data.get("observaciones_gral", "")
+                db_erp.execute(text("DELETE FROM transito_viaticos WHERE reporte_id = :rid"), {"rid": reporte_id})
+                db_erp.execute(text("DELETE FROM legalizaciones_transito WHERE reporte_id = :rid"), {"rid": reporte_id})
+            else:
+                reporte_id = _siguiente_consecutivo(db_erp)
 
-        # Evitar duplicación de etiquetas
-        import re
-        obs_gral = re.sub(r"\[WEB-L\d+\]\s*", "", obs_gral).strip()
+            # Evitar duplicación de etiquetas
+            obs_gral = re.sub(r"\[WEB-L\d+\]\s*", "", reporte_data.get("observaciones_gral") or "").strip()
 
-        # Calcular Totales y Anexos
-        total_acumulado = sum(
-            float(g["valorConFactura"] or 0) + float(g["valorSinFactura"] or 0)
-            for g in reporte_data["gastos"]
-        )
-        tiene_anexos = 1 if any(len(g.get("adjuntos", [])) > 0 for g in reporte_data["gastos"]) else 0
-        cc_empleado = reporte_data.get("centrocosto") or "POR-DEFINIR"
+            # Calcular Totales y Anexos
+            total_acumulado = sum(l["valorconfactura"] + l["valorsinfactura"] for l in lineas)
+            tiene_anexos = 1 if any(l["adjuntos"] for l in lineas) else 0
+            cc_empleado = reporte_data.get("centrocosto") or "POR-DEFINIR"
 
-        # Inserción de cabecera y detalles en una sola transacción
-        try:
             # Limpiar cédula
             clean_uid = "".join(filter(str.isdigit, str(reporte_data.get("usuario_id", "0"))))
             usuario_int = int(clean_uid) if clean_uid else 0
@@ -107,73 +168,45 @@ class ViaticosService:
                 ) RETURNING codigo
             """)
 
-            result_header = db_erp.execute(
+            cabecera_id_numerico = db_erp.execute(
                 sql_header,
                 {
-                    "codigolegalizacion": str(reporte_id),
+                    "codigolegalizacion": reporte_id,
                     "empleado": str(reporte_data["empleado_cedula"]),
                     "nombreempleado": str(reporte_data["empleado_nombre"]),
                     "area": str(reporte_data["area"]),
                     "valortotal": float(total_acumulado),
-                    "estado": str(reporte_data.get("estado", "INICIAL")),
+                    "estado": estado,
                     "usuario": usuario_int,
-                    "observaciones": obs_gral.strip(),
-                    "anexo": int(tiene_anexos),
+                    "observaciones": obs_gral,
+                    "anexo": tiene_anexos,
                     "centrocosto": str(cc_empleado if cc_empleado and cc_empleado != "---" else "POR-DEFINIR"),
                     "cargo": str(reporte_data["cargo"]),
                     "ciudad": str(reporte_data["ciudad"]),
-                    "reporte_id": str(reporte_id),
+                    "reporte_id": reporte_id,
                 },
-            )
-
-            cabecera_id_numerico = result_header.scalar()
-
-            sql_insert = text("""
-                INSERT INTO transito_viaticos (
-                    legalizacion, fecha, fecharealgasto, categoria, ot, 
-                    centrocosto, subcentrocosto, valorconfactura, valorsinfactura, 
-                    observaciones, reporte_id, estado, fecha_registro, 
-                    empleado_cedula, empleado_nombre, area, cargo, ciudad, 
-                    observaciones_gral, usuario_id, adjuntos
-                ) VALUES (
-                    :legalizacion, :fecha, :fecharealgasto, :categoria, :ot, 
-                    :centrocosto, :subcentrocosto, :valorconfactura, :valorsinfactura, 
-                    :observaciones, :reporte_id, :estado, CURRENT_TIMESTAMP, 
-                    :empleado_cedula, :empleado_nombre, :area, :cargo, :ciudad, 
-                    :observaciones_gral, :usuario_id, CAST(:adjuntos AS jsonb)
-                )
-            """)
-
-            for gasto in reporte_data["gastos"]:
-                db_erp.execute(
-                    sql_insert,
-                    {
-                        "legalizacion": cabecera_id_numerico,
-                        "fecha": date.today(),
-                        "fecharealgasto": gasto["fecha"],
-                        "categoria": str(gasto["categoria"]),
-                        "ot": str(gasto["ot"]),
-                        "centrocosto": str(gasto["cc"]),
-                        "subcentrocosto": str(gasto["scc"]),
-                        "valorconfactura": float(gasto["valorConFactura"] or 0),
-                        "valorsinfactura": float(gasto["valorSinFactura"] or 0),
-                        "observaciones": str(gasto.get("observaciones", "")),
-                        "reporte_id": str(reporte_id),
-                        "estado": str(reporte_data.get("estado", "INICIAL")),
-                        "empleado_cedula": str(reporte_data["empleado_cedula"]),
-                        "empleado_nombre": str(reporte_data["empleado_nombre"]),
-                        "area": str(reporte_data["area"]),
-                        "cargo": str(reporte_data["cargo"]),
-                        "ciudad": str(reporte_data["ciudad"]),
-                        "observaciones_gral": str(obs_gral),
-                        "usuario_id": usuario_int,
-                        "adjuntos": json.dumps(gasto.get("adjuntos", [])),
-                    },
-                )
+            ).scalar()
+
+            comunes = {
+                "legalizacion": cabecera_id_numerico,
+                "fecha": date.today(),
+                "reporte_id": reporte_id,
+                "estado": estado,
+                "fecha_registro": func.current_timestamp(),
+                "empleado_cedula": str(reporte_data["empleado_cedula"]),
+                "empleado_nombre": str(reporte_data["empleado_nombre"]),
+                "area": str(reporte_data["area"]),
+                "cargo": str(reporte_data["cargo"]),
+                "ciudad": str(reporte_data["ciudad"]),
+                "observaciones_gral": obs_gral,
+                "usuario_id": usuario_int,
+            }
+            if lineas:
+                db_erp.execute(insert(_transito_viaticos).values([{**comunes, **l} for l in lineas]))
 
             db_erp.commit()
-            print(f"REPORT_SUCCESS | ID: {reporte_id} | Total: {total_acumulado}")
-            return str(reporte_id)
+            print(f"REPORT_SUCCESS | ID: {reporte_id} | Lineas: {len(lineas)} | Total: {total_acumulado}")
+            return reporte_id
 
         except Exception as e:
             db_erp.rollback()
@@ -205,49 +238,16 @@ class ViaticosService:
         cedula: str,
         desde: Optional[date] = None,
         hasta: Optional[date] = None,
-    ) -> io.BytesIO:
-        """Genera un archivo XLSX con el estado de cuenta"""
+    ) -> str:
+        """Genera el estado de cuenta en un XLSX temporal (memoria constante) y devuelve su ruta"""
         try:
-            # Reutiliza el servicio de consultas
-            data = ViaticosQueryService.obtener_estado_cuenta(db_erp, cedula, desde, hasta)
-
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "Estado de Cuenta"
-
-            header_font = Font(bold=True, color="FFFFFF")
-            header_fill = PatternFill(start_color="1F4E78", end_color="1F4E78", fill_type="solid")
-            header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-            border = Border(left=Side(style="thin"), right=Side(style="thin"), top=Side(style="thin"), bottom=Side(style="thin"))
-
-            headers = ["Fecha Aplicación", "Radicado", "Tipo", "Observaciones", "Consignaciones (Contab.)", "Legalizaciones (Contab.)", "Consignaciones (Firmas)", "Legalizaciones (Firmas)", "Consignaciones (Pend.)", "Legalizaciones (Pend.)", "Saldo"]
-
-            for col, header in enumerate(headers, 1):
-                cell = ws.cell(row=1, column=col, value=header)
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = header_alignment
-                cell.border = border
-
-            for row_idx, item in enumerate(data, 2):
-                ws.cell(row=row_idx, column=1, value=item["fechaaplicacion"]).border = border
-                ws.cell(row=row_idx, column=2, value=item["radicado"]).border = border
-                ws.cell(row=row_idx, column=3, value=item["tipo"]).border = border
-                ws.cell(row=row_idx, column=4, value=item["observaciones"]).border = border
-
-                cols_money = ["consignacion_contabilizado", "legalizacion_contabilizado", "consignacion_firmadas", "legalizacion_firmadas", "consignacion_pendientes", "legalizacion_pendientes", "saldo"]
-                for i, key in enumerate(cols_money, 5):
-                    cell = ws.cell(row=row_idx, column=i, value=float(item[key] or 0))
-                    cell.number_format = '"$"#,##0'
-                    cell.border = border
-
-            for col in range(1, len(headers) + 1):
-                ws.column_dimensions[get_column_letter(col)].width = 20
-
-            output = io.BytesIO()
-            wb.save(output)
-            output.seek(0)
-            return output
+            movimientos = ViaticosQueryService.iterar_estado_cuenta(db_erp, cedula, desde, hasta)
+            filas = (
+                [item["fechaaplicacion"], item["radicado"], item["tipo"], item["observaciones"]]
+                + [float(item[key] or 0) for key in COLUMNAS_MONTO_ESTADO_CUENTA]
+                for item in movimientos
+            )
+            return escribir_xlsx(filas, COLUMNAS_ESTADO_CUENTA, hoja="Estado de Cuenta", bordes=True)
         except Exception as e:
             print(f"ERROR ERP Export XLSX: {e}")
             raise e
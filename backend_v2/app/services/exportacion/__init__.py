@@ -0,0 +1,15 @@
+from .xlsx_service import (
+    FORMATO_MONEDA,
+    MEDIA_TYPE_XLSX,
+    ColumnaXlsx,
+    escribir_xlsx,
+    respuesta_xlsx,
+)
+
+__all__ = [
+    "FORMATO_MONEDA",
+    "MEDIA_TYPE_XLSX",
+    "ColumnaXlsx",
+    "escribir_xlsx",
+    "respuesta_xlsx",
+]
@@ -0,0 +1,125 @@
+"""
+Exportaciones XLSX en modo de memoria constante - Backend V2
+
+El libro se escribe con XlsxWriter `constant_memory`: cada fila se vuelca al
+XML de la hoja en cuanto se completa, así que la memoria no crece con el
+número de filas (openpyxl normal mantiene un objeto Cell por celda hasta el
+save). Las filas llegan de un iterable (cursor de servidor o generador) y el
+archivo se escribe en un temporal que se envía con FileResponse y se borra
+al terminar la respuesta.
+
+La escritura es CPU-bound y la consulta de origen suele ser síncrona (ERP,
+engine sync): `respuesta_xlsx` la ejecuta completa en un hilo para no
+bloquear el event loop.
+"""
+
+import asyncio
+import os
+import tempfile
+from datetime import date
+from typing import Any, Callable, Iterable, NamedTuple, Optional, Sequence
+
+import xlsxwriter
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
+
+MEDIA_TYPE_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+FORMATO_MONEDA = '"$"#,##0'
+FORMATO_FECHA = "yyyy-mm-dd"
+
+_ESTILO_ENCABEZADO = {
+    "bold": True,
+    "font_color": "#FFFFFF",
+    "bg_color": "#1F4E78",
+    "align": "center",
+    "valign": "vcenter",
+    "text_wrap": True,
+    "border": 1,
+}
+# Texto tal cual: un valor que empiece por "=" no se vuelve fórmula ni una URL hipervínculo.
+_OPCIONES_LIBRO = {
+    "constant_memory": True,
+    "strings_to_formulas": False,
+    "strings_to_urls": False,
+    "default_date_format": FORMATO_FECHA,
+}
+
+
+class ColumnaXlsx(NamedTuple):
+    titulo: str
+    ancho: Optional[float] = None
+    formato: Optional[str] = None
+
+
+def escribir_xlsx(
+    filas: Iterable[Sequence[Any]],
+    columnas: Sequence[ColumnaXlsx],
+    hoja: str = "Datos",
+    encabezado_con_estilo: bool = True,
+    bordes: bool = False,
+) -> str:
+    """Escribe las filas en un .xlsx temporal y devuelve su ruta (el llamador la borra).
+
+    Los formatos se crean una vez por columna; las fechas usan FORMATO_FECHA
+    (con borde si `bordes`) salvo que la columna traiga su propio formato.
+    """
+    descriptor, ruta = tempfile.mkstemp(prefix="exportacion_", suffix=".xlsx")
+    os.close(descriptor)
+    try:
+        # Los temporales de filas de constant_memory viven aquí: se borran aunque falle.
+        with tempfile.TemporaryDirectory(prefix="exportacion_") as trabajo:
+            _escribir_libro(ruta, trabajo, filas, columnas, hoja, encabezado_con_estilo, bordes)
+    except BaseException:
+        os.remove(ruta)
+        raise
+    return ruta
+
+
+def _escribir_libro(
+    ruta: str,
+    trabajo: str,
+    filas: Iterable[Sequence[Any]],
+    columnas: Sequence[ColumnaXlsx],
+    hoja: str,
+    encabezado_con_estilo: bool,
+    bordes: bool,
+) -> None:
+    libro = xlsxwriter.Workbook(ruta, {**_OPCIONES_LIBRO, "tmpdir": trabajo})
+    ws = libro.add_worksheet(hoja)
+    borde = {"border": 1} if bordes else {}
+    formatos = [
+        libro.add_format({**borde, "num_format": c.formato}) if c.formato
+        else libro.add_format(borde) if bordes
+        else None
+        for c in columnas
+    ]
+    formato_fecha = libro.add_format({**borde, "num_format": FORMATO_FECHA})
+    fechas = [formato_fecha if not c.formato else f for c, f in zip(columnas, formatos)]
+
+    encabezado = libro.add_format(_ESTILO_ENCABEZADO) if encabezado_con_estilo else None
+    for indice, columna in enumerate(columnas):
+        if columna.ancho:
+            ws.set_column(indice, indice, columna.ancho)
+        ws.write_string(0, indice, columna.titulo, encabezado)
+
+    for fila_idx, fila in enumerate(filas, 1):
+        for indice, valor in enumerate(fila):
+            if valor is None:
+                if formatos[indice] is not None:
+                    ws.write_blank(fila_idx, indice, None, formatos[indice])
+            elif isinstance(valor, date):
+                ws.write_datetime(fila_idx, indice, valor, fechas[indice])
+            else:
+                ws.write(fila_idx, indice, valor, formatos[indice])
+    libro.close()
+
+
+async def respuesta_xlsx(generar: Callable[[], str], nombre_archivo: str) -> FileResponse:
+    """Ejecuta `generar` (que devuelve la ruta del temporal) en un hilo y envía el archivo."""
+    ruta = await asyncio.to_thread(generar)
+    return FileResponse(
+        ruta,
+        media_type=MEDIA_TYPE_XLSX,
+        filename=nombre_archivo,
+        background=BackgroundTask(os.remove, ruta),
+    )
@@ -1,15 +1,47 @@
 import openpyxl
 from io import BytesIO
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 from sqlalchemy import text, and_
 from sqlmodel import select
+from ..exportacion import ColumnaXlsx, escribir_xlsx
 from ...models.inventario.conteo import (
     ConteoInventario, 
     TransitoInventario, 
     ConteoHistorico
 )
 
+COLUMNAS_PLANTILLA_MAESTRA = (
+    "B. Siigo", "Bodega", "Bloque", "Estante", "Nivel", "Codigo",
+    "Descripcion", "Und", "Cant. Sistema", "Observaciones",
+)
+COLUMNAS_PLANTILLA_TRANSITO = ("Codigo / SKU", "Documento", "Cantidad")
+
+_CANTIDAD = "#,##0.00"
+# (campo de ConteoInventario, columna del libro)
+COLUMNAS_EXPORTACION_CONTEO = (
+    ("b_siigo", ColumnaXlsx("B. Siigo", 10)),
+    ("bodega", ColumnaXlsx("Bodega", 12)),
+    ("bloque", ColumnaXlsx("Bloque", 10)),
+    ("estante", ColumnaXlsx("Estante", 10)),
+    ("nivel", ColumnaXlsx("Nivel", 8)),
+    ("codigo", ColumnaXlsx("Codigo", 16)),
+    ("descripcion", ColumnaXlsx("Descripcion", 40)),
+    ("unidad", ColumnaXlsx("Und", 8)),
+    ("cantidad_sistema", ColumnaXlsx("Cant. Sistema", 14, _CANTIDAD)),
+    ("invporlegalizar", ColumnaXlsx("Por Legalizar", 14, _CANTIDAD)),
+    ("cantidad_final", ColumnaXlsx("Cant. Final", 14, _CANTIDAD)),
+    ("cant_c1", ColumnaXlsx("Conteo 1", 12, _CANTIDAD)),
+    ("cant_c2", ColumnaXlsx("Conteo 2", 12, _CANTIDAD)),
+    ("cant_c3", ColumnaXlsx("Conteo 3", 12, _CANTIDAD)),
+    ("cant_c4", ColumnaXlsx("Conteo 4", 12, _CANTIDAD)),
+    ("diferencia_total", ColumnaXlsx("Diferencia", 14, _CANTIDAD)),
+    ("estado", ColumnaXlsx("Estado", 14)),
+    ("conteo", ColumnaXlsx("Conteo", 20)),
+)
+
+
 class ServicioExcelInventario:
     @staticmethod
     async def crear_snapshot(db: AsyncSession):
@@ -206,26 +238,41 @@ class ServicioExcelInventario:
         await db.commit()
 
     @staticmethod
-    def generar_plantilla_maestra() -> BytesIO:
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Maestra_Inventario"
-        ws.append(["B. Siigo", "Bodega", "Bloque", "Estante", "Nivel", "Codigo", "Descripcion", "Und", "Cant. Sistema", "Observaciones"])
-        buf = BytesIO()
-        wb.save(buf)
-        buf.seek(0)
-        return buf
+    def generar_plantilla_maestra() -> str:
+        """Ruta de un .xlsx temporal con el encabezado de la carga maestra."""
+        return escribir_xlsx(
+            [], [ColumnaXlsx(t) for t in COLUMNAS_PLANTILLA_MAESTRA],
+            hoja="Maestra_Inventario", encabezado_con_estilo=False,
+        )
+
+    @staticmethod
+    def generar_plantilla_transito() -> str:
+        """Ruta de un .xlsx temporal con el encabezado de la carga de tránsito."""
+        return escribir_xlsx(
+            [], [ColumnaXlsx(t) for t in COLUMNAS_PLANTILLA_TRANSITO],
+            hoja="Transito_Detallado", encabezado_con_estilo=False,
+        )
 
     @staticmethod
-    def generar_plantilla_transito() -> BytesIO:
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Transito_Detallado"
-        ws.append(["Codigo / SKU", "Documento", "Cantidad"])
-        buf = BytesIO()
-        wb.save(buf)
-        buf.seek(0)
-        return buf
+    def exportar_conteos_xlsx(
+        db: Session, bodega: Optional[str] = None, estado: Optional[str] = None, lote: int = 2000
+    ) -> str:
+        """Escribe los conteos (mismos filtros y orden que /lista) en un .xlsx temporal.
+
+        Usa una sesión síncrona con cursor de servidor: las filas pasan al libro
+        por lotes de `lote` sin cargar la tabla completa en memoria.
+        """
+        campos = [getattr(ConteoInventario, campo) for campo, _ in COLUMNAS_EXPORTACION_CONTEO]
+        stmt = select(*campos)
+        if bodega:
+            stmt = stmt.where(ConteoInventario.bodega == bodega)
+        if estado:
+            stmt = stmt.where(ConteoInventario.estado == estado)
+        stmt = stmt.order_by(ConteoInventario.bodega, ConteoInventario.bloque, ConteoInventario.id)
+        filas = db.execute(stmt.execution_options(stream_results=True, yield_per=lote))
+        return escribir_xlsx(
+            filas, [columna for _, columna in COLUMNAS_EXPORTACION_CONTEO], hoja="Conteo_Inventario"
+        )
 
     @staticmethod
     async def importar_legacy_excel(file_content: bytes, ronda: int, db: AsyncSession) -> Dict[str, Any]:
@@ -0,0 +1,103 @@
+"""
+Armado del mensaje MIME de un correo de la bandeja de salida.
+
+Lo usa el enviador (`email_outbox`) justo antes del envío SMTP. Las imágenes
+CID (p. ej. el logo) se leen de disco una sola vez; la parte MIME se crea
+nueva para cada mensaje porque `attach` no copia y un mismo objeto no puede
+pertenecer a varios mensajes.
+"""
+
+import logging
+import os
+import re
+from email.header import Header
+from email.mime.image import MIMEImage
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from functools import lru_cache
+from typing import List, Optional
+
+from app.config import config
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=16)
+def _leer_imagen(path: str, _mtime: float) -> bytes:
+    """Contenido de una imagen CID; la mtime en la clave invalida si el archivo cambia."""
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _imagen_inline(path: str, cid: str) -> MIMEImage:
+    img = MIMEImage(_leer_imagen(path, os.path.getmtime(path)))
+    # El CID debe ir entre brackets <>
+    img.add_header("Content-ID", f"<{cid}>")
+    img.add_header("Content-Disposition", "inline", filename=os.path.basename(path))
+    return img
+
+
+def construir_mensaje(
+    asunto: str,
+    destinatarios: List[str],
+    contenido_html: str,
+    contenido_texto: Optional[str] = None,
+    attachments: Optional[List[dict]] = None,
+    message_id: Optional[str] = None,
+    in_reply_to: Optional[str] = None
+) -> MIMEMultipart:
+    """Arma el mensaje MIME (related > alternative + imágenes CID)."""
+    # Estructura para imágenes inline (CID):
+    # related
+    #   |-- alternative
+    #   |     |-- plain text
+    #   |     |-- html
+    #   |-- inline images
+
+    msg_root = MIMEMultipart("related")
+    msg_root["Subject"] = Header(asunto, "utf-8")
+
+    # Codificar el remitente de forma segura si contiene nombre descriptivo
+    from_email = config.smtp_from or config.smtp_user
+    if " " in from_email:
+        match = re.match(r'(.*)\s+<(.*)>', from_email)
+        if match:
+            name, addr = match.groups()
+            msg_root["From"] = f"{Header(name, 'utf-8').encode()} <{addr}>"
+        else:
+            msg_root["From"] = from_email
+    else:
+        msg_root["From"] = from_email
+
+    msg_root["To"] = ", ".join(destinatarios)
+
+    # Cabeceras para Hilos (Threading)
+    if message_id:
+        msg_root["Message-ID"] = message_id
+    if in_reply_to:
+        msg_root["In-Reply-To"] = in_reply_to
+        # References suele contener el historial de IDs, pero el raíz es el más importante
+        msg_root["References"] = in_reply_to
+
+    msg_alternative = MIMEMultipart("alternative")
+    msg_root.attach(msg_alternative)
+
+    # Agregar contenido de texto plano (opcional)
+    if contenido_texto:
+        msg_alternative.attach(MIMEText(contenido_texto, "plain"))
+
+    # Agregar contenido HTML
+    msg_alternative.attach(MIMEText(contenido_html, "html"))
+
+    # Agregar adjuntos (como imágenes CID)
+    for attachment in attachments or []:
+        if attachment.get("type") == "image":
+            try:
+                if not os.path.exists(attachment["path"]):
+                    logger.error("No existe el archivo de imagen en: %s", attachment["path"])
+                    continue
+                msg_root.attach(_imagen_inline(attachment["path"], attachment["cid"]))
+            except Exception as img_err:
+                logger.warning("No se pudo adjuntar imagen %s: %s", attachment["path"], img_err)
+
+    return msg_root
@@ -0,0 +1,232 @@
+"""
+Enviador en segundo plano de la bandeja de salida de correos.
+
+`EmailService.enviar_correo` solo inserta en `correos_salientes`; este módulo
+reclama lotes con `FOR UPDATE SKIP LOCKED` (seguro con varios workers), los
+envía reutilizando una conexión SMTP autenticada y reprograma los fallos con
+backoff exponencial hasta `correo_max_intentos`.
+"""
+
+import asyncio
+import logging
+import smtplib
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from app.config import config
+from app.core.config import obtener_configuracion
+from app.models.alerta.correo_saliente import CorreoSaliente
+
+from .email_mensaje import construir_mensaje
+
+logger = logging.getLogger(__name__)
+
+# Tiempo sin uso tras el cual la conexión SMTP se cierra en lugar de reutilizarse.
+SMTP_INACTIVIDAD_MAX_SEGUNDOS = 60
+# Filas en "enviando" más antiguas que esto se consideran de un worker caído.
+RECLAMO_EXPIRADO_MINUTOS = 10
+
+_QUERY_RECLAMAR = text(f"""
+    UPDATE correos_salientes
+    SET estado = 'enviando', bloqueado_en = now(), intentos = intentos + 1
+    WHERE id IN (
+        SELECT id FROM correos_salientes
+        WHERE (estado = 'pendiente' AND proximo_intento_en <= now())
+           OR (estado = 'enviando' AND bloqueado_en < now() - interval '{RECLAMO_EXPIRADO_MINUTOS} minutes')
+        ORDER BY proximo_intento_en, id
+        LIMIT :limite
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, asunto, destinatarios, contenido_html, contenido_texto,
+              adjuntos, message_id, in_reply_to, intentos
+""")
+
+_QUERY_MARCAR_ENVIADOS = text("""
+    UPDATE correos_salientes
+    SET estado = 'enviado', enviado_en = now(), bloqueado_en = NULL, ultimo_error = NULL
+    WHERE id = ANY(:ids)
+""")
+
+_QUERY_MARCAR_FALLIDO = text("""
+    UPDATE correos_salientes
+    SET estado = :estado,
+        ultimo_error = :error,
+        bloqueado_en = NULL,
+        proximo_intento_en = now() + make_interval(secs => :espera)
+    WHERE id = :id
+""")
+
+
+class ConexionSMTP:
+    """Conexión SMTP autenticada que se reutiliza entre correos y lotes."""
+
+    def __init__(self):
+        self._servidor: Optional[smtplib.SMTP] = None
+        self._ultimo_uso = 0.0
+
+    def _conectar(self) -> smtplib.SMTP:
+        if config.smtp_use_ssl:
+            servidor = smtplib.SMTP_SSL(config.smtp_host, config.smtp_port, timeout=30)
+        else:
+            servidor = smtplib.SMTP(config.smtp_host, config.smtp_port, timeout=30)
+            servidor.starttls()
+        servidor.login(config.smtp_user, config.smtp_pass)
+        return servidor
+
+    def obtener(self) -> smtplib.SMTP:
+        if self._servidor is not None:
+            if time.monotonic() - self._ultimo_uso < SMTP_INACTIVIDAD_MAX_SEGUNDOS:
+                return self._servidor
+            self.cerrar()
+        self._servidor = self._conectar()
+        self._ultimo_uso = time.monotonic()
+        return self._servidor
+
+    def enviar(self, mensaje) -> None:
+        """Envía por la conexión vigente; si el servidor la cerró, reconecta una vez."""
+        try:
+            self.obtener().send_message(mensaje)
+        except smtplib.SMTPServerDisconnected:
+            self._servidor = None
+            self.obtener().send_message(mensaje)
+        self._ultimo_uso = time.monotonic()
+
+    def cerrar(self) -> None:
+        if self._servidor is None:
+            return
+        try:
+            self._servidor.quit()
+        except Exception:
+            pass
+        self._servidor = None
+
+
+_conexion = ConexionSMTP()
+_evento_pendientes: Optional[asyncio.Event] = None
+
+
+def notificar_pendientes() -> None:
+    """Despierta al enviador de este worker tras encolar un correo."""
+    if _evento_pendientes is not None:
+        _evento_pendientes.set()
+
+
+def smtp_configurado() -> bool:
+    return bool(config.smtp_host and config.smtp_user and config.smtp_pass)
+
+
+def encolar_en_sesion(
+    db,
+    asunto: str,
+    destinatarios: List[str],
+    contenido_html: str,
+    attachments: Optional[List[dict]] = None,
+) -> bool:
+    """
+    Agrega el correo a la bandeja de salida dentro de la transacción de
+    `db` (sin commit), para encolar en lote junto con otros cambios.
+    Tras el commit, el llamador debe invocar `notificar_pendientes()`.
+    """
+    if not smtp_configurado():
+        return False
+    db.add(CorreoSaliente(
+        asunto=asunto,
+        destinatarios=list(destinatarios),
+        contenido_html=contenido_html,
+        adjuntos=attachments or None,
+    ))
+    return True
+
+
+def calcular_espera_reintento(intentos: int) -> int:
+    base = obtener_configuracion().correo_reintento_base_segundos
+    return min(base * (2 ** max(intentos - 1, 0)), 3600)
+
+
+def _enviar_lote(correos: List[Any]) -> List[Tuple[int, Optional[str]]]:
+    """Envía los correos reclamados por una sola conexión. Retorna (id, error)."""
+    resultados: List[Tuple[int, Optional[str]]] = []
+    for correo in correos:
+        try:
+            mensaje = construir_mensaje(
+                correo.asunto,
+                correo.destinatarios,
+                correo.contenido_html,
+                contenido_texto=correo.contenido_texto,
+                attachments=correo.adjuntos,
+                message_id=correo.message_id,
+                in_reply_to=correo.in_reply_to,
+            )
+            _conexion.enviar(mensaje)
+            resultados.append((correo.id, None))
+        except Exception as e:
+            # Rechazos del mensaje no invalidan la sesión SMTP; el resto sí.
+            if not isinstance(e, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)):
+                _conexion.cerrar()
+            resultados.append((correo.id, str(e)[:1000]))
+    return resultados
+
+
+async def procesar_pendientes(limite: Optional[int] = None) -> Dict[str, int]:
+    """Reclama un lote de la bandeja de salida, lo envía y registra el resultado."""
+    from app.database import AsyncSessionLocal
+
+    ajustes = obtener_configuracion()
+    limite = limite or ajustes.correo_lote_maximo
+
+    async with AsyncSessionLocal() as db:
+        correos = (await db.execute(_QUERY_RECLAMAR, {"limite": limite})).fetchall()
+        await db.commit()
+    if not correos:
+        return {"enviados": 0, "fallidos": 0, "reintentos": 0}
+
+    resultados = await asyncio.to_thread(_enviar_lote, correos)
+
+    intentos_por_id = {c.id: c.intentos for c in correos}
+    enviados = [i for i, error in resultados if error is None]
+    fallos = []
+    for correo_id, error in resultados:
+        if error is None:
+            continue
+        intentos = intentos_por_id[correo_id]
+        agotado = intentos >= ajustes.correo_max_intentos
+        fallos.append({
+            "id": correo_id,
+            "estado": "fallido" if agotado else "pendiente",
+            "error": error,
+            "espera": 0 if agotado else calcular_espera_reintento(intentos),
+        })
+        logger.warning("Envío de correo %s falló (intento %s): %s", correo_id, intentos, error)
+
+    async with AsyncSessionLocal() as db:
+        if enviados:
+            await db.execute(_QUERY_MARCAR_ENVIADOS, {"ids": enviados})
+        if fallos:
+            await db.execute(_QUERY_MARCAR_FALLIDO, fallos)
+        await db.commit()
+
+    definitivos = sum(1 for f in fallos if f["estado"] == "fallido")
+    return {"enviados": len(enviados), "fallidos": definitivos, "reintentos": len(fallos) - definitivos}
+
+
+async def iniciar_loop_envio_correos(intervalo_segundos: int = 5):
+    """Loop asíncrono que drena la bandeja de salida de correos"""
+    global _evento_pendientes
+    _evento_pendientes = asyncio.Event()
+    logger.info(f"Iniciando enviador de correos (cada {intervalo_segundos}s o al encolar)")
+
+    while True:
+        try:
+            resumen = await procesar_pendientes()
+            if resumen["enviados"] + resumen["fallidos"] + resumen["reintentos"] >= obtener_configuracion().correo_lote_maximo:
+                # Lote lleno: probablemente hay más pendientes, seguir sin esperar.
+                continue
+        except Exception as e:
+            logger.error(f"Error en el enviador de correos: {e}")
+        try:
+            await asyncio.wait_for(_evento_pendientes.wait(), timeout=intervalo_segundos)
+        except asyncio.TimeoutError:
+            pass
+        _evento_pendientes.clear()
@@ -1,15 +1,15 @@
+import logging
 import os
-import re
 from typing import List, Optional, Union
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.image import MIMEImage
-from email.header import Header
 from jinja2 import Environment, FileSystemLoader
 from app.config import config
+from app.models.alerta.correo_saliente import CorreoSaliente
+from .email_mensaje import construir_mensaje
+from .email_outbox import encolar_en_sesion, notificar_pendientes, smtp_configurado
 from .email_utils import EmailUtils
 
+logger = logging.getLogger(__name__)
+
 
 class EmailService:
     """Servicio para el envío de correos electrónicos vía SMTP"""
@@ -25,6 +25,9 @@ class EmailService:
     _standardize_ticket_subject = staticmethod(EmailUtils._standardize_ticket_subject)
     _get_ticket_message_id = staticmethod(EmailUtils._get_ticket_message_id)
     _get_attachments = staticmethod(EmailUtils._get_attachments)
+    # Bandeja de salida: el armado MIME y el encolado en lote viven en sus módulos.
+    construir_mensaje = staticmethod(construir_mensaje)
+    encolar_en_sesion = staticmethod(encolar_en_sesion)
 
     @staticmethod
     async def enviar_correo(
@@ -37,95 +40,36 @@ class EmailService:
         in_reply_to: Optional[str] = None
     ) -> bool:
         """
-        Envía un correo electrónico utilizando la configuración SMTP del sistema.
+        Encola un correo en la bandeja de salida (`correos_salientes`).
+        El envío SMTP lo hace `email_outbox` en segundo plano, así que la
+        latencia del request no incluye el handshake SMTP.
         Soporta cabeceras de threading (Message-ID, In-Reply-To).
         """
-        if not config.smtp_host or not config.smtp_user or not config.smtp_pass:
+        if not smtp_configurado():
             print("WARNING: Configuración SMTP incompleta. El correo no será enviado.")
             return False
 
-        try:
-            # Estructura para imágenes inline (CID):
-            # related
-            #   |-- alternative
-            #   |     |-- plain text
-            #   |     |-- html
-            #   |-- inline images
-            
-            msg_root = MIMEMultipart("related")
-            msg_root["Subject"] = Header(asunto, "utf-8")
-            
-            # Codificar el remitente de forma segura si contiene nombre descriptivo
-            from_email = config.smtp_from or config.smtp_user
-            if " " in from_email:
-                match = re.match(r'(.*)\s+<(.*)>', from_email)
-                if match:
-                    name, addr = match.groups()
-                    msg_root["From"] = f"{Header(name, 'utf-8').encode()} <{addr}>"
-                else:
-                    msg_root["From"] = from_email
-            else:
-                msg_root["From"] = from_email
-
-            msg_root["To"] = ", ".join(destinatarios)
-
-            # Cabeceras para Hilos (Threading)
-            if message_id:
-                msg_root["Message-ID"] = message_id
-            if in_reply_to:
-                msg_root["In-Reply-To"] = in_reply_to
-                # References suele contener el historial de IDs, pero el raíz es el más importante
-                msg_root["References"] = in_reply_to
-
-            msg_alternative = MIMEMultipart("alternative")
-            msg_root.attach(msg_alternative)
-
-            # Agregar contenido de texto plano (opcional)
-            if contenido_texto:
-                msg_alternative.attach(MIMEText(contenido_texto, "plain"))
-
-            # Agregar contenido HTML
-            msg_alternative.attach(MIMEText(contenido_html, "html"))
-
-            # Agregar adjuntos (como imágenes CID)
-            if attachments:
-                for attachment in attachments:
-                    if attachment.get("type") == "image":
-                        try:
-                            if not os.path.exists(attachment["path"]):
-                                print(f"ERROR: No existe el archivo de imagen en: {attachment['path']}")
-                                continue
-                                
-                            with open(attachment["path"], 'rb') as f:
-                                img = MIMEImage(f.read())
-                                # El CID debe ir entre brackets <>
-                                cid = attachment["cid"]
-                                img.add_header('Content-ID', f'<{cid}>')
-                                img.add_header('Content-Disposition', 'inline', filename=os.path.basename(attachment["path"]))
-                                msg_root.attach(img)
-                        except Exception as img_err:
-                            print(f"WARNING: No se pudo adjuntar imagen {attachment['path']}: {img_err}")
-
-            # Configurar conexión
-            if config.smtp_use_ssl:
-                server = smtplib.SMTP_SSL(config.smtp_host, config.smtp_port)
-            else:
-                server = smtplib.SMTP(config.smtp_host, config.smtp_port)
-                server.starttls()
-
-            # Autenticación y envío
-            server.login(config.smtp_user, config.smtp_pass)
-            server.send_message(msg_root)
-            server.quit()
-
-            final_url = EmailService.get_frontend_url()
-            print(f"DEBUG: Correo enviado a {destinatarios}. URL Links: {final_url}")
-            return True
+        from app.database import AsyncSessionLocal
 
+        try:
+            async with AsyncSessionLocal() as db:
+                db.add(CorreoSaliente(
+                    asunto=asunto,
+                    destinatarios=list(destinatarios),
+                    contenido_html=contenido_html,
+                    contenido_texto=contenido_texto,
+                    adjuntos=attachments or None,
+                    message_id=message_id,
+                    in_reply_to=in_reply_to,
+                ))
+                await db.commit()
         except Exception as e:
-            print(f"ERROR al enviar correo: {e}")
+            logger.error("Error al encolar correo: %s", e)
             return False
 
+        notificar_pendientes()
+        return True
+
     @staticmethod
     def _get_base_layout(titulo: str, contenido_html: str) -> str:
         return EmailUtils._get_base_layout(titulo, contenido_html)
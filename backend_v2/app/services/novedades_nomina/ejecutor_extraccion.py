@@ -0,0 +1,113 @@
+"""
+Ejecutor central de extractores de nómina.
+
+Los extractores (pdfplumber, openpyxl, pandas) son CPU-bound y retienen el
+GIL, así que un PDF grande procesado en el event loop (o en un hilo) frena
+todo el tráfico del worker. Aquí se despachan a un pool de procesos
+compartido con concurrencia acotada, timeout por trabajo y cancelación: si
+el request se cancela o vence el plazo, el proceso hijo se termina.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from anyio import CapacityLimiter, to_process
+
+from app.core.config import obtener_configuracion
+
+logger = logging.getLogger(__name__)
+
+
+class TiempoExtraccionExcedidoError(TimeoutError):
+    """El extractor superó el tiempo máximo permitido (cola + ejecución).
+
+    main.py la traduce a un 504 para que los routers no tengan que capturarla.
+    """
+
+
+@dataclass
+class _ContadoresExtraccion:
+    completados: int = 0
+    fallidos: int = 0
+    tiempo_excedido: int = 0
+    cancelados: int = 0
+    duracion_total_s: float = 0.0
+    duracion_max_s: float = 0.0
+
+
+_contadores = _ContadoresExtraccion()
+_limitador: Optional[CapacityLimiter] = None
+
+
+def _obtener_limitador() -> CapacityLimiter:
+    # Se crea perezosamente: CapacityLimiter debe nacer dentro del event loop.
+    global _limitador
+    if _limitador is None:
+        _limitador = CapacityLimiter(obtener_configuracion().extraccion_max_procesos)
+    return _limitador
+
+
+async def ejecutar_extractor(
+    extractor_fn: Callable[..., Any],
+    *args: Any,
+    timeout: Optional[float] = None,
+) -> Any:
+    """Ejecuta `extractor_fn(*args)` en el pool de procesos compartido.
+
+    `extractor_fn` debe ser una función de módulo (picklable). Las
+    excepciones del extractor se propagan tal cual; si se vence el plazo se
+    lanza `TiempoExtraccionExcedidoError` (subclase de `TimeoutError`).
+    """
+    limite = timeout if timeout is not None else obtener_configuracion().extraccion_timeout_segundos
+    nombre = getattr(extractor_fn, "__qualname__", repr(extractor_fn))
+    inicio = time.perf_counter()
+    try:
+        resultado = await asyncio.wait_for(
+            to_process.run_sync(
+                extractor_fn,
+                *args,
+                cancellable=True,
+                limiter=_obtener_limitador(),
+            ),
+            timeout=limite,
+        )
+    except asyncio.TimeoutError as exc:
+        _contadores.tiempo_excedido += 1
+        logger.warning("EXTRACCION_TIMEOUT | extractor=%s | limite_s=%s", nombre, limite)
+        raise TiempoExtraccionExcedidoError(
+            f"La extracción excedió el tiempo permitido ({limite}s)"
+        ) from exc
+    except asyncio.CancelledError:
+        _contadores.cancelados += 1
+        raise
+    except Exception:
+        _contadores.fallidos += 1
+        raise
+
+    duracion = time.perf_counter() - inicio
+    _contadores.completados += 1
+    _contadores.duracion_total_s += duracion
+    _contadores.duracion_max_s = max(_contadores.duracion_max_s, duracion)
+    logger.info("EXTRACCION_OK | extractor=%s | duracion_s=%.2f", nombre, duracion)
+    return resultado
+
+
+def obtener_metricas_extraccion() -> dict[str, Any]:
+    """Snapshot de cola, ocupación del pool y contadores de este worker."""
+    estadisticas = _limitador.statistics() if _limitador is not None else None
+    return {
+        "max_procesos": obtener_configuracion().extraccion_max_procesos,
+        "en_ejecucion": estadisticas.borrowed_tokens if estadisticas else 0,
+        "en_cola": estadisticas.tasks_waiting if estadisticas else 0,
+        "completados": _contadores.completados,
+        "fallidos": _contadores.fallidos,
+        "tiempo_excedido": _contadores.tiempo_excedido,
+        "cancelados": _contadores.cancelados,
+        "duracion_promedio_s": round(
+            _contadores.duracion_total_s / _contadores.completados, 3
+        ) if _contadores.completados else 0.0,
+        "duracion_max_s": round(_contadores.duracion_max_s, 3),
+    }
@@ -0,0 +1,151 @@
+"""
+Índice de nombres para resolver nombre -> cédula en archivos de proveedores.
+
+Se construye una vez por snapshot de empleados (índice invertido de tokens
+normalizados + bigramas de cada token del vocabulario) y responde con los
+mismos umbrales que `NominaHelper.buscar_cedula_por_nombre`: 0.8 por token
+(SequenceMatcher) y 0.75 de coincidencia global, sin recorrer toda la planta.
+"""
+
+import re
+from difflib import SequenceMatcher
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+UMBRAL_TOKEN = 0.8
+UMBRAL_NOMBRE = 0.75
+
+_PATRON_TOKEN = re.compile(r"\w+")
+_MAX_INDICES_CACHEADOS = 4
+
+
+def tokenizar(nombre: str) -> FrozenSet[str]:
+    from .nomina_helper import NominaHelper
+
+    return frozenset(_PATRON_TOKEN.findall(NominaHelper.normalizar_nombre(nombre or "")))
+
+
+def _bigramas(token: str) -> Set[str]:
+    t = f"^{token}$"
+    return {t[i:i + 2] for i in range(len(t) - 1)}
+
+
+class IndiceNombres:
+    """Índice nombre -> empleados con coincidencia exacta y difusa por token."""
+
+    def __init__(self, empleados: List[Dict]):
+        self._empleados = empleados
+        self._tokens: List[FrozenSet[str]] = []
+        self._por_token: Dict[str, List[int]] = {}
+        self._por_bigrama: Dict[str, Set[str]] = {}
+        self._similares: Dict[str, Dict[str, float]] = {}
+
+        for i, emp in enumerate(empleados):
+            tokens = tokenizar(emp.get("nombre") or emp.get("nombre_asociado") or "")
+            self._tokens.append(tokens)
+            for token in tokens:
+                self._por_token.setdefault(token, []).append(i)
+        for token in self._por_token:
+            for bigrama in _bigramas(token):
+                self._por_bigrama.setdefault(bigrama, set()).add(token)
+
+    def __len__(self) -> int:
+        return len(self._empleados)
+
+    def _tokens_similares(self, token: str) -> Dict[str, float]:
+        """Tokens del vocabulario con similitud >= UMBRAL_TOKEN (memoizado)."""
+        if token in self._similares:
+            return self._similares[token]
+
+        candidatos: Set[str] = set()
+        for bigrama in _bigramas(token):
+            candidatos |= self._por_bigrama.get(bigrama, set())
+        candidatos.discard(token)
+
+        similares: Dict[str, float] = {}
+        matcher = SequenceMatcher(None, b=token)
+        largo = len(token)
+        for candidato in candidatos:
+            # Cota superior por longitudes: 2*min/(l1+l2) < umbral -> imposible.
+            if 2 * min(largo, len(candidato)) < UMBRAL_TOKEN * (largo + len(candidato)):
+                continue
+            matcher.set_seq1(candidato)
+            if matcher.quick_ratio() < UMBRAL_TOKEN:
+                continue
+            # Mismo orden de argumentos que la comparación original (buscado, empleado).
+            sim = SequenceMatcher(None, token, candidato).ratio()
+            if sim >= UMBRAL_TOKEN:
+                similares[candidato] = sim
+        self._similares[token] = similares
+        return similares
+
+    def buscar(self, nombre: str, limite: int = 5) -> List[Tuple[Dict, float]]:
+        """Candidatos (empleado, ratio) con ratio >= UMBRAL_NOMBRE, del mejor al peor."""
+        tokens_buscado = tokenizar(nombre)
+        if not tokens_buscado or not self._empleados:
+            return []
+
+        similares = {t: self._tokens_similares(t) for t in tokens_buscado}
+        # aciertos[i] = tokens buscados con algún token igual o similar en el
+        # empleado i: cota superior de (exactas + difusas).
+        aciertos: Dict[int, int] = {}
+        for token in tokens_buscado:
+            empleados_token: Set[int] = set(self._por_token.get(token, ()))
+            for similar in similares[token]:
+                empleados_token.update(self._por_token.get(similar, ()))
+            for i in empleados_token:
+                aciertos[i] = aciertos.get(i, 0) + 1
+
+        resultados: List[Tuple[float, int]] = []
+        n_buscado = len(tokens_buscado)
+        for i, cota in aciertos.items():
+            tokens_emp = self._tokens[i]
+            total = max(n_buscado, len(tokens_emp))
+            # Ni emparejando todo lo posible se alcanza el umbral.
+            if min(cota, len(tokens_emp)) < UMBRAL_NOMBRE * total:
+                continue
+
+            exactas = tokens_buscado & tokens_emp
+            pendientes_emp = list(tokens_emp - exactas)
+            difusas = 0
+            # Emparejamiento voraz idéntico al original: cada token buscado toma
+            # el primer token libre del empleado que supere el umbral.
+            for tb in tokens_buscado - exactas:
+                for te in pendientes_emp:
+                    if te in similares[tb]:
+                        difusas += 1
+                        pendientes_emp.remove(te)
+                        break
+
+            ratio = (len(exactas) + difusas) / total
+            if ratio >= UMBRAL_NOMBRE:
+                resultados.append((ratio, i))
+
+        resultados.sort(key=lambda r: (-r[0], r[1]))
+        return [(self._empleados[i], ratio) for ratio, i in resultados[:limite]]
+
+    def resolver(self, nombre: str) -> Optional[str]:
+        """Cédula del mejor candidato (empate: el primero de la lista), o None."""
+        mejores = self.buscar(nombre, limite=1)
+        if not mejores:
+            return None
+        emp = mejores[0][0]
+        return emp.get("nrocedula") or emp.get("cedula")
+
+    # --- Caché por snapshot de empleados -----------------------------------
+
+    _cache: Dict[int, "IndiceNombres"] = {}
+
+    @classmethod
+    def para(cls, empleados: List[Dict]) -> "IndiceNombres":
+        """Índice del snapshot dado; se reutiliza mientras el snapshot no cambie."""
+        huella = hash(tuple(
+            (e.get("nrocedula") or e.get("cedula"), e.get("nombre") or e.get("nombre_asociado"))
+            for e in empleados
+        ))
+        indice = cls._cache.get(huella)
+        if indice is None:
+            indice = cls(empleados)
+            if len(cls._cache) >= _MAX_INDICES_CACHEADOS:
+                cls._cache.pop(next(iter(cls._cache)))
+            cls._cache[huella] = indice
+        return indice
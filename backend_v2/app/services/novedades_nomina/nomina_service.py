@@ -1,12 +1,13 @@
 import logging
-import hashlib
 from typing import List, Dict, Any, Optional
 from sqlmodel import select, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 from ...models.novedades_nomina.nomina import (
-    NominaArchivo, NominaRegistroNormalizado, NominaExcepcion
+    NominaArchivo, NominaRegistroCrudo, NominaRegistroNormalizado, NominaExcepcion
 )
+from ..almacenamiento import BlobGuardado, guardar_bytes, liberar, sha256_de_ruta
 from .excepcion_service import ExcepcionService
+from .ejecutor_extraccion import ejecutar_extractor
 from .nomina_helper import NominaHelper
 
 logger = logging.getLogger(__name__)
@@ -44,6 +45,31 @@ class NominaService:
             estado_default=estado_default
         )
 
+    @staticmethod
+    async def reemplazar_archivo_original(
+        session: AsyncSession, subcategoria: str, mes: int, anio: int, contenido: bytes
+    ) -> BlobGuardado:
+        """
+        Guarda el archivo original en el almacén y retira los archivos previos
+        del mismo periodo/subcategoría: borra sus filas (y registros) y libera
+        sus blobs para que la recolección pueda borrarlos. No hace commit.
+        """
+        previos = (await session.execute(select(NominaArchivo).where(
+            NominaArchivo.subcategoria == subcategoria.strip(),
+            NominaArchivo.mes_fact == mes,
+            NominaArchivo.año_fact == anio,
+        ))).scalars().all()
+        for previo in previos:
+            sha256 = sha256_de_ruta(previo.ruta_almacenamiento)
+            if sha256 is None:
+                # Archivos legados o internos (p. ej. la sincronización de descuentos): no se tocan.
+                continue
+            await session.execute(delete(NominaRegistroNormalizado).where(NominaRegistroNormalizado.archivo_id == previo.id))
+            await session.execute(delete(NominaRegistroCrudo).where(NominaRegistroCrudo.archivo_id == previo.id))
+            await session.execute(delete(NominaArchivo).where(NominaArchivo.id == previo.id))
+            await liberar(session, sha256)
+        return await guardar_bytes(session, contenido)
+
     @staticmethod
     async def crear_archivo_procesado(
         session: AsyncSession,
@@ -83,7 +109,7 @@ class NominaService:
         anio: int
     ) -> Dict[str, Any]:
         """Flujo unificado para procesar archivos de nómina especializados."""
-        # 1. Leer archivos y guardar el primero físicamente
+        # 1. Leer archivos (el primero se guarda en el paso 5)
         archivos_binarios = []
         original_filenames = []
         for f in files:
@@ -91,28 +117,13 @@ class NominaService:
             archivos_binarios.append(content)
             original_filenames.append(getattr(f, "filename", "archivo"))
             
-        import os
-        STORAGE_DIR = "uploads/nomina"
-        os.makedirs(STORAGE_DIR, exist_ok=True)
-        
         ruta_almacenamiento = "memory"
         nombre_archivo = f"{subcategoria.lower().replace(' ', '_')}_{mes}_{anio}.{extension}"
-        
         if archivos_binarios:
-            contenido = archivos_binarios[0]
-            hash_str = hashlib.md5(contenido).hexdigest()
             nombre_archivo = original_filenames[0]
-            ext_real = nombre_archivo.split('.')[-1].lower() if '.' in nombre_archivo else extension
-            
-            ruta_almacenamiento = os.path.join(STORAGE_DIR, f"{hash_str}.{ext_real}")
-            
-            # Guardamos el archivo original intacto para descargas y auditoría
-            with open(ruta_almacenamiento, "wb") as f_out:
-                f_out.write(contenido)
         
-        # 2. Extraer datos usando la función específica en un hilo separado para no bloquear el event loop
-        import asyncio
-        rows, summary, warnings_txt = await asyncio.to_thread(extractor_fn, archivos_binarios)
+        # 2. Extraer datos en el pool de procesos compartido para no bloquear el event loop
+        rows, summary, warnings_txt = await ejecutar_extractor(extractor_fn, archivos_binarios)
         summary.update({"mes": mes, "anio": anio})
 
         # 3. Obtener info ERP y Excepciones
@@ -129,6 +140,13 @@ class NominaService:
         
         try:
             await session.execute(stmt_del)
+
+            # 5. Guardar el archivo original intacto (almacén por SHA-256) para descargas y auditoría
+            if archivos_binarios:
+                blob = await NominaService.reemplazar_archivo_original(
+                    session, subcategoria_clean, mes, anio, archivos_binarios[0]
+                )
+                ruta_almacenamiento = blob.ruta_relativa
             
             # 6. Crear entrada de archivo
             archivo = await NominaService.crear_archivo_procesado(
@@ -3,6 +3,7 @@ from typing import List, Dict, Any
 from sqlmodel import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from ...models.novedades_nomina.nomina import NominaRegistroNormalizado, ControlDescuentoActivo
+from ..exportacion import FORMATO_MONEDA, ColumnaXlsx, escribir_xlsx
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +36,17 @@ SUBCATEGORIAS_EXCLUIDAS = ["GESTION EXCEPCIONES", "COMISIONES"]
 # Subcategorías de planillas regionales (para preservar HORAS/DIAS)
 PLANILLAS_REGIONALES = {"PLANILLAS REGIONALES 1Q", "PLANILLAS REGIONALES 2Q"}
 
+# Columnas del archivo de la tabla maestra (llaves de cada fila generada)
+COLUMNAS_TABLA_MAESTRA = (
+    ColumnaXlsx("CEDULA", 15),
+    ColumnaXlsx("NOMBRE", 40),
+    ColumnaXlsx("EMPRESA", 25),
+    ColumnaXlsx("VALOR QUINCENAL", 18, FORMATO_MONEDA),
+    ColumnaXlsx("HORAS", 10),
+    ColumnaXlsx("DIAS", 10),
+    ColumnaXlsx("CONCEPTO", 35),
+)
+
 
 def _get_subcategorias_requeridas(quincena: str) -> List[str]:
     """Retorna la lista de subcategorías requeridas según la quincena."""
@@ -303,3 +315,13 @@ class TablaMaestraService:
         except Exception as e:
             logger.error(f"Error generando tabla maestra: {str(e)}", exc_info=True)
             raise e
+
+    @staticmethod
+    def exportar_xlsx(filas: List[Dict[str, Any]], quincena: str) -> str:
+        """Escribe las filas de la tabla maestra en un .xlsx temporal y devuelve su ruta."""
+        titulos = [c.titulo for c in COLUMNAS_TABLA_MAESTRA]
+        return escribir_xlsx(
+            ([fila.get(t) for t in titulos] for fila in filas),
+            COLUMNAS_TABLA_MAESTRA,
+            hoja=f"Tabla Maestra {quincena}",
+        )
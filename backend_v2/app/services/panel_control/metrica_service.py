@@ -3,7 +3,6 @@ Servicio de Métricas - Backend V2
 Se encarga de recolectar snapshots de rendimiento y persistirlos.
 """
 
-import asyncio
 import logging
 import os
 from datetime import timedelta
@@ -13,6 +12,7 @@ from app.models.panel_control.metrica import MetricaSistema
 from app.models.auth.usuario import Sesion
 from app.models.ticket.ticket import Ticket as TicketModel
 from app.utils_date import get_bogota_now
+from app.services.panel_control.presencia_service import PresenciaService
 
 logger = logging.getLogger(__name__)
 
@@ -30,12 +30,14 @@ class MetricaService:
                 hace_24h = ahora - timedelta(hours=24)
 
                 # 1. Usuarios en línea
-                res_online = await db.execute(
-                    select(func.count(Sesion.id)).where(
-                        Sesion.ultima_actividad_en >= hace_5_mins
+                online = await PresenciaService.contar_sesiones_en_linea(timedelta(minutes=5))
+                if online is None:
+                    res_online = await db.execute(
+                        select(func.count(Sesion.id)).where(
+                            Sesion.ultima_actividad_en >= hace_5_mins
+                        )
                     )
-                )
-                online = res_online.scalar() or 0
+                    online = res_online.scalar() or 0
 
                 # 2. Usuarios activos 24h
                 res_24h = await db.execute(
@@ -101,11 +103,3 @@ class MetricaService:
             except Exception as e:
                 logger.error(f"Error capturando snapshot de metricas: {e}")
                 await db.rollback()
-
-    @staticmethod
-    async def iniciar_recolector_automatico(intervalo_minutos: int = 15):
-        """Tarea de fondo que ejecuta la captura periódicamente"""
-        logger.info(f"Iniciando recolector de metricas (cada {intervalo_minutos} min)")
-        while True:
-            await MetricaService.capturar_snapshot()
-            await asyncio.sleep(intervalo_minutos * 60)
@@ -0,0 +1,235 @@
+"""
+Servicio de Presencia - Backend V2
+Registra los heartbeats de la Torre de Control en Redis en lugar de
+actualizar `sesiones.ultima_actividad_en` en cada latido.
+
+- `presencia:sesiones` (ZSET): id de sesión -> último latido (epoch).
+- `presencia:usuarios` (ZSET): usuario_id -> último latido (epoch).
+- `presencia:token:<sha256>`: caché token -> "id|usuario_id" de la sesión.
+- `presencia:usuario:<usuario_id>` (SET): sesiones abiertas del usuario; al
+  cerrar la última se retira de `presencia:usuarios`.
+
+"Usuarios en línea" es un ZCOUNT (O(log n)). Una tarea periódica vuelca en
+lote a Postgres los latidos nuevos desde el último volcado. Si Redis no está
+disponible, los métodos retornan None/False y los llamadores usan el
+camino SQL original.
+"""
+
+import hashlib
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+import redis.asyncio as redis
+from sqlalchemy import text
+
+from app.config import config
+
+logger = logging.getLogger(__name__)
+
+CLAVE_SESIONES = "presencia:sesiones"
+CLAVE_USUARIOS = "presencia:usuarios"
+CLAVE_VOLCADO = "presencia:volcado_hasta"
+PREFIJO_TOKEN = "presencia:token:"
+PREFIJO_USUARIO = "presencia:usuario:"
+# Las entradas más viejas que esto ya no cuentan para nada y se podan.
+RETENCION_SEGUNDOS = 24 * 3600
+TTL_TOKEN_SEGUNDOS = 24 * 3600
+# Token sin sesión abierta: se cachea el "no existe" para no reconsultar la DB.
+TTL_TOKEN_INVALIDO_SEGUNDOS = 300
+REINTENTO_REDIS_SEGUNDOS = 30
+# El volcado siguiente re-lee este margen: cubre latidos de otros workers que
+# llegaron a Redis justo después de leer el rango (re-escribirlos es inocuo).
+MARGEN_VOLCADO_SEGUNDOS = 5
+
+_BOGOTA = timezone(timedelta(hours=-5))
+
+_QUERY_SESION_ABIERTA = text("""
+    SELECT id, usuario_id FROM sesiones
+    WHERE token_sesion = :token AND fin_sesion IS NULL
+""")
+
+_QUERY_VOLCAR = text("""
+    UPDATE sesiones AS s
+    SET ultima_actividad_en = d.ts
+    FROM unnest(CAST(:ids AS integer[]), CAST(:ts AS timestamp[])) AS d(id, ts)
+    WHERE s.id = d.id
+      AND (s.ultima_actividad_en IS NULL OR s.ultima_actividad_en < d.ts)
+""")
+
+
+def _clave_token(token_sesion: str) -> str:
+    return PREFIJO_TOKEN + hashlib.sha256(token_sesion.encode("utf-8")).hexdigest()
+
+
+def _clave_usuario(usuario_id: str) -> str:
+    return PREFIJO_USUARIO + usuario_id
+
+
+def _epoch_a_bogota(epoch: float) -> datetime:
+    """Mismo formato que `get_bogota_now()`: hora de Bogotá naive."""
+    return datetime.fromtimestamp(epoch, _BOGOTA).replace(tzinfo=None)
+
+
+class PresenciaService:
+    """Presencia de sesiones en Redis con volcado periódico a Postgres"""
+
+    _redis = None
+    _reintento_en = 0.0
+
+    @classmethod
+    async def _cliente(cls):
+        if cls._redis is not None:
+            return cls._redis
+        if time.monotonic() < cls._reintento_en:
+            return None
+        try:
+            cliente = redis.from_url(config.redis_url, decode_responses=True)
+            await cliente.ping()
+            cls._redis = cliente
+            return cliente
+        except Exception as e:
+            cls._reintento_en = time.monotonic() + REINTENTO_REDIS_SEGUNDOS
+            logger.warning(f"Presencia: Redis no disponible, se usa la base de datos: {e}")
+            return None
+
+    @classmethod
+    def _descartar(cls, error: Exception):
+        logger.warning(f"Presencia: error de Redis, se usa la base de datos: {error}")
+        cls._redis = None
+        cls._reintento_en = time.monotonic() + REINTENTO_REDIS_SEGUNDOS
+
+    @classmethod
+    async def registrar_sesion(cls, token_sesion: str, sesion_id: int, usuario_id: str) -> bool:
+        """Marca presente una sesión recién creada (login)."""
+        cliente = await cls._cliente()
+        if cliente is None:
+            return False
+        try:
+            ahora = time.time()
+            pipe = cliente.pipeline(transaction=False)
+            pipe.set(_clave_token(token_sesion), f"{sesion_id}|{usuario_id}", ex=TTL_TOKEN_SEGUNDOS)
+            pipe.zadd(CLAVE_SESIONES, {str(sesion_id): ahora})
+            pipe.zadd(CLAVE_USUARIOS, {usuario_id: ahora})
+            pipe.sadd(_clave_usuario(usuario_id), str(sesion_id))
+            pipe.expire(_clave_usuario(usuario_id), RETENCION_SEGUNDOS)
+            await pipe.execute()
+            return True
+        except Exception as e:
+            cls._descartar(e)
+            return False
+
+    @classmethod
+    async def registrar_latido(cls, db, token_sesion: str) -> bool:
+        """
+        Registra un heartbeat sin escribir en Postgres.
+        Retorna False si Redis no está disponible (el llamador hace el UPDATE).
+        """
+        cliente = await cls._cliente()
+        if cliente is None:
+            return False
+        try:
+            clave = _clave_token(token_sesion)
+            valor = await cliente.get(clave)
+            if valor is None:
+                fila = (await db.execute(_QUERY_SESION_ABIERTA, {"token": token_sesion})).first()
+                valor = f"{fila.id}|{fila.usuario_id}" if fila else ""
+                await cliente.set(
+                    clave, valor, ex=TTL_TOKEN_SEGUNDOS if fila else TTL_TOKEN_INVALIDO_SEGUNDOS
+                )
+            if not valor:
+                return True  # Sesión cerrada o inexistente: nada que registrar.
+
+            sesion_id, usuario_id = valor.split("|", 1)
+            ahora = time.time()
+            pipe = cliente.pipeline(transaction=False)
+            pipe.zadd(CLAVE_SESIONES, {sesion_id: ahora})
+            pipe.zadd(CLAVE_USUARIOS, {usuario_id: ahora})
+            # Sesiones previas al registro en el SET se incorporan con su latido.
+            pipe.sadd(_clave_usuario(usuario_id), sesion_id)
+            pipe.expire(_clave_usuario(usuario_id), RETENCION_SEGUNDOS)
+            await pipe.execute()
+            return True
+        except Exception as e:
+            cls._descartar(e)
+            return False
+
+    @classmethod
+    async def retirar_sesiones(cls, sesiones: Iterable[tuple], usuario_id: str) -> None:
+        """Quita de la presencia sesiones cerradas: iterable de (id, token_sesion).
+
+        El usuario solo sale de `presencia:usuarios` cuando no le quedan
+        sesiones abiertas (cerrar una pestaña no lo saca de "en línea").
+        """
+        cliente = await cls._cliente()
+        if cliente is None:
+            return
+        try:
+            clave_usuario = _clave_usuario(usuario_id)
+            pipe = cliente.pipeline(transaction=True)
+            for sesion_id, token_sesion in sesiones:
+                pipe.zrem(CLAVE_SESIONES, str(sesion_id))
+                pipe.srem(clave_usuario, str(sesion_id))
+                pipe.set(_clave_token(token_sesion), "", ex=TTL_TOKEN_INVALIDO_SEGUNDOS)
+            pipe.scard(clave_usuario)
+            abiertas = (await pipe.execute())[-1]
+            if not abiertas:
+                await cliente.zrem(CLAVE_USUARIOS, usuario_id)
+        except Exception as e:
+            cls._descartar(e)
+
+    @classmethod
+    async def contar_usuarios_en_linea(cls, ventana: timedelta) -> Optional[int]:
+        """Usuarios distintos con latido dentro de la ventana; None sin Redis."""
+        return await cls._contar(CLAVE_USUARIOS, ventana)
+
+    @classmethod
+    async def contar_sesiones_en_linea(cls, ventana: timedelta) -> Optional[int]:
+        """Sesiones con latido dentro de la ventana; None sin Redis."""
+        return await cls._contar(CLAVE_SESIONES, ventana)
+
+    @classmethod
+    async def _contar(cls, clave: str, ventana: timedelta) -> Optional[int]:
+        cliente = await cls._cliente()
+        if cliente is None:
+            return None
+        try:
+            return await cliente.zcount(clave, time.time() - ventana.total_seconds(), "+inf")
+        except Exception as e:
+            cls._descartar(e)
+            return None
+
+    @classmethod
+    async def volcar_actividad(cls) -> int:
+        """
+        Escribe en `sesiones.ultima_actividad_en`, en una sola sentencia, los
+        latidos recibidos desde el último volcado. Retorna filas candidatas.
+        """
+        from app.database import AsyncSessionLocal
+
+        cliente = await cls._cliente()
+        if cliente is None:
+            return 0
+        try:
+            hasta = time.time()
+            desde = float(await cliente.get(CLAVE_VOLCADO) or 0)
+            latidos = await cliente.zrangebyscore(
+                CLAVE_SESIONES, f"({desde}", hasta, withscores=True
+            )
+            if latidos:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(_QUERY_VOLCAR, {
+                        "ids": [int(sesion_id) for sesion_id, _ in latidos],
+                        "ts": [_epoch_a_bogota(score) for _, score in latidos],
+                    })
+                    await db.commit()
+            pipe = cliente.pipeline(transaction=False)
+            pipe.set(CLAVE_VOLCADO, hasta - MARGEN_VOLCADO_SEGUNDOS)
+            pipe.zremrangebyscore(CLAVE_SESIONES, "-inf", hasta - RETENCION_SEGUNDOS)
+            pipe.zremrangebyscore(CLAVE_USUARIOS, "-inf", hasta - RETENCION_SEGUNDOS)
+            await pipe.execute()
+            return len(latidos)
+        except Exception as e:
+            cls._descartar(e)
+            return 0
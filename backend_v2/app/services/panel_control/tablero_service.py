@@ -0,0 +1,141 @@
+"""
+Consultas del Panel de Control - Backend V2
+Sentencias del tablero y de la torre de control; los endpoints solo cachean
+y arman la respuesta.
+"""
+
+import os
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from sqlalchemy import DateTime, Interval, bindparam, distinct, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.core.agregados import columnas_conteo
+from app.models.auth.usuario import Sesion, Usuario
+from app.models.ticket.ticket import Ticket as TicketModel
+from app.utils_date import get_bogota_now
+
+
+@lru_cache(maxsize=1)
+def consulta_progreso_semanal():
+    """
+    Conteos de las últimas 4 semanas en un viaje. Las semanas salen de
+    generate_series y el LEFT JOIN conserva las que no tienen tickets (ceros);
+    los tickets se acotan antes a la ventana completa. Se construye una vez.
+    """
+    ahora = bindparam("ahora", type_=DateTime)
+    desde = bindparam("desde", type_=DateTime)
+    semana = bindparam("semana", type_=Interval)
+    serie = select(func.generate_series(0, 3).label("i")).subquery("serie")
+    rangos = select(
+        serie.c.i,
+        (ahora - (serie.c.i + 1) * semana).label("inicio"),
+        (ahora - serie.c.i * semana).label("fin"),
+    ).subquery("rangos")
+    # Solo cuentan como completados los cerrados: filtrar por estado en la
+    # rama de cierre no cambia el resultado y permite usar el índice parcial
+    # idx_tickets_cierre_cerrados (sin él, el OR obliga a un Seq Scan).
+    ventana = (
+        select(TicketModel.estado, TicketModel.fecha_cierre, TicketModel.creado_en)
+        .where(
+            TicketModel.creado_en.between(desde, ahora)
+            | ((TicketModel.estado == "Cerrado") & TicketModel.fecha_cierre.between(desde, ahora))
+        )
+        .subquery("ventana")
+    )
+    completado = (ventana.c.estado == "Cerrado") & ventana.c.fecha_cierre.between(
+        rangos.c.inicio, rangos.c.fin
+    )
+    creado = ventana.c.creado_en.between(rangos.c.inicio, rangos.c.fin)
+    return (
+        select(rangos.c.i, *columnas_conteo({"completados": completado, "creados": creado}))
+        .select_from(rangos.outerjoin(ventana, completado | creado))
+        .group_by(rangos.c.i)
+        .order_by(rangos.c.i.desc())
+    )
+
+
+def _sesiones_abiertas_desde(desde: datetime):
+    """Sesiones sin logout con actividad posterior a `desde` (o aún sin latido)."""
+    return (
+        Sesion.fin_sesion.is_(None),
+        or_(Sesion.ultima_actividad_en.is_(None), Sesion.ultima_actividad_en >= desde),
+    )
+
+
+class TableroService:
+    """Consultas de solo lectura del panel de control"""
+
+    @staticmethod
+    async def progreso_semanal(db: AsyncSession) -> List[Dict]:
+        ahora = get_bogota_now()
+        res = await db.execute(
+            consulta_progreso_semanal(),
+            {"ahora": ahora, "desde": ahora - timedelta(weeks=4), "semana": timedelta(weeks=1)},
+        )
+        return [
+            {
+                "semana": f"S{4 - fila.i}",
+                "nombre": f"Semana {4 - fila.i}",
+                "completados": fila.completados,
+                "creados": fila.creados,
+                "pendientes": max(0, fila.creados - fila.completados),
+            }
+            for fila in res.all()
+        ]
+
+    @staticmethod
+    async def contar_usuarios_en_linea(db: AsyncSession, desde: datetime) -> int:
+        """Personas distintas con una sesión abierta y activa desde `desde`."""
+        res = await db.execute(
+            select(func.count(distinct(Sesion.usuario_id))).where(*_sesiones_abiertas_desde(desde))
+        )
+        return res.scalar() or 0
+
+    @staticmethod
+    async def contar_usuarios_activos(db: AsyncSession) -> int:
+        res = await db.execute(select(func.count(Usuario.id)).where(Usuario.esta_activo))
+        return res.scalar() or 0
+
+    @staticmethod
+    async def contar_tickets_abiertos(db: AsyncSession) -> int:
+        res = await db.execute(
+            select(func.count(TicketModel.id)).where(TicketModel.estado != "Cerrado")
+        )
+        return res.scalar() or 0
+
+    @staticmethod
+    async def sesiones_activas(db: AsyncSession, desde: datetime) -> List[Sesion]:
+        """La sesión abierta más reciente de cada usuario (DISTINCT ON usuario_id)."""
+        # Con DISTINCT ON, el primer ORDER BY debe ser la columna del DISTINCT
+        stmt = (
+            select(Sesion)
+            .distinct(Sesion.usuario_id)
+            .where(*_sesiones_abiertas_desde(desde))
+            .order_by(Sesion.usuario_id, Sesion.creado_en.desc())
+        )
+        return (await db.execute(stmt)).scalars().all()
+
+    @staticmethod
+    def uso_memoria() -> Tuple[float, float]:
+        """(usada, total) en MB según /proc/meminfo; ceros si no está disponible."""
+        try:
+            with open("/proc/meminfo", "r") as f:
+                lines = f.readlines()
+            total = int(lines[0].split()[1]) / 1024  # MB
+            # available se prefiere sobre free para saber la memoria real usable
+            available = int([line for line in lines if "MemAvailable" in line][0].split()[1]) / 1024
+            return round(total - available, 1), round(total, 1)
+        except Exception:
+            return 0.0, 0.0
+
+    @staticmethod
+    def carga_cpu() -> float:
+        """Carga promedio del sistema (1 min)."""
+        try:
+            return round(os.getloadavg()[0], 2)
+        except Exception:
+            return 0.0
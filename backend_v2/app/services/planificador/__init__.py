@@ -0,0 +1,6 @@
+"""
+Planificador de tareas periódicas con elección de líder - Backend V2
+"""
+from .planificador import Planificador, TareaProgramada, planificador
+
+__all__ = ["Planificador", "TareaProgramada", "planificador"]
@@ -0,0 +1,240 @@
+"""
+Planificador de tareas periódicas con un solo líder en el clúster.
+
+Cada worker de uvicorn (y cada réplica) arranca el planificador, pero solo
+el que obtiene el advisory lock de sesión `planificador_lider` en Postgres
+ejecuta las tareas registradas. El lock vive en una conexión dedicada: si el
+proceso líder muere o pierde la conexión, Postgres libera el lock y otro
+worker lo toma en su siguiente intento (cada `latido_segundos`). El líder
+verifica su conexión en cada latido y, si falla, cancela sus tareas antes de
+volver a competir, para no quedar con dos líderes.
+
+Cada ejecución queda registrada en `planificador_tareas` (inicio, duración,
+resultado y worker); un líder nuevo retoma el calendario desde ahí en vez de
+repetir lo que el anterior acababa de ejecutar. Las esperas llevan un jitter
+aleatorio para que las tareas no se alineen entre sí.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.core.config import obtener_configuracion
+from app.core.metricas import registrar_tarea
+from app.models.planificador import EjecucionTareaProgramada  # noqa: F401  (registra la tabla para create_all)
+
+logger = logging.getLogger(__name__)
+
+CLAVE_LIDER = "planificador_lider"
+
+_QUERY_TOMAR_LIDERAZGO = text("SELECT pg_try_advisory_lock(hashtext(:clave))")
+_QUERY_SOLTAR_LIDERAZGO = text("SELECT pg_advisory_unlock(hashtext(:clave))")
+_QUERY_LATIDO = text("SELECT 1")
+
+_QUERY_ULTIMOS_INICIOS = text("""
+    SELECT nombre, ultimo_inicio
+    FROM planificador_tareas
+    WHERE nombre = ANY(:nombres)
+""")
+
+_QUERY_REGISTRAR_EJECUCION = text("""
+    INSERT INTO planificador_tareas
+        (nombre, ultimo_inicio, ultimo_fin, duracion_ms, exito, ultimo_error, ejecutado_por, ejecuciones)
+    VALUES (:nombre, :inicio, :fin, :duracion_ms, :exito, :error, :ejecutado_por, 1)
+    ON CONFLICT (nombre) DO UPDATE SET
+        ultimo_inicio = EXCLUDED.ultimo_inicio,
+        ultimo_fin = EXCLUDED.ultimo_fin,
+        duracion_ms = EXCLUDED.duracion_ms,
+        exito = EXCLUDED.exito,
+        ultimo_error = EXCLUDED.ultimo_error,
+        ejecutado_por = EXCLUDED.ejecutado_por,
+        ejecuciones = planificador_tareas.ejecuciones + 1
+""")
+
+
+@dataclass
+class TareaProgramada:
+    """Una tarea periódica: `funcion` es una sola ejecución (no un loop)."""
+
+    nombre: str
+    funcion: Callable[[], Awaitable[Any]]
+    intervalo_segundos: float
+    retraso_inicial_segundos: float = 0
+    jitter_segundos: float = 0
+
+
+class Planificador:
+    """Elige un líder por advisory lock y ejecuta solo allí las tareas registradas."""
+
+    def __init__(
+        self,
+        latido_segundos: float = 15,
+        clave: str = CLAVE_LIDER,
+        motor: Optional[AsyncEngine] = None,
+        identidad: Optional[str] = None,
+    ):
+        self.tareas: Dict[str, TareaProgramada] = {}
+        self.latido_segundos = latido_segundos
+        self.clave = clave
+        self.identidad = identidad or f"{socket.gethostname()}:{os.getpid()}"
+        self.es_lider = False
+        self._motor = motor
+
+    def registrar(
+        self,
+        nombre: str,
+        funcion: Callable[[], Awaitable[Any]],
+        intervalo_segundos: float,
+        retraso_inicial_segundos: float = 0,
+        jitter_segundos: Optional[float] = None,
+    ) -> None:
+        """Registra una tarea. Sin jitter explícito se usa el 10% del intervalo (máx. 5 min)."""
+        if nombre in self.tareas:
+            raise ValueError(f"La tarea '{nombre}' ya está registrada")
+        if jitter_segundos is None:
+            jitter_segundos = min(intervalo_segundos * 0.1, 300)
+        self.tareas[nombre] = TareaProgramada(
+            nombre, funcion, intervalo_segundos, retraso_inicial_segundos, jitter_segundos
+        )
+
+    def _obtener_motor(self) -> AsyncEngine:
+        if self._motor is None:
+            from app.database import async_engine
+
+            self._motor = async_engine
+        return self._motor
+
+    async def iniciar(self) -> None:
+        """Loop asíncrono: compite por el liderazgo y, si lo obtiene, ejecuta las tareas"""
+        logger.info(
+            f"Iniciando planificador ({len(self.tareas)} tareas, worker {self.identidad})"
+        )
+        while True:
+            try:
+                await self._competir()
+            except Exception as e:
+                logger.error(f"Error en el planificador de tareas: {e}")
+            # Jitter para que los seguidores no consulten todos a la vez.
+            await asyncio.sleep(self.latido_segundos * random.uniform(1, 1.5))
+
+    async def _competir(self) -> None:
+        conexion = await self._obtener_motor().connect()
+        liderazgo = False
+        try:
+            # Autocommit: la conexión queda ociosa fuera de transacción mientras se mantiene el lock.
+            await conexion.execution_options(isolation_level="AUTOCOMMIT")
+            liderazgo = bool((await conexion.execute(
+                _QUERY_TOMAR_LIDERAZGO, {"clave": self.clave}
+            )).scalar())
+            if liderazgo:
+                self.es_lider = True
+                logger.info(f"Planificador: worker {self.identidad} asume el liderazgo")
+                await self._liderar(conexion)
+        finally:
+            self.es_lider = False
+            await self._cerrar(conexion, liderazgo)
+
+    async def _cerrar(self, conexion: AsyncConnection, liderazgo: bool) -> None:
+        """Suelta el lock antes de devolver la conexión al pool; si no se puede, la descarta."""
+        try:
+            if liderazgo:
+                await conexion.execute(_QUERY_SOLTAR_LIDERAZGO, {"clave": self.clave})
+                logger.info(f"Planificador: worker {self.identidad} deja el liderazgo")
+            await conexion.close()
+        except BaseException:
+            # Una conexión que quizá conserva el lock no debe volver al pool.
+            await conexion.invalidate()
+            await conexion.close()
+            raise
+
+    async def _liderar(self, conexion: AsyncConnection) -> None:
+        esperas = await self._calendario()
+        tareas = [
+            asyncio.create_task(
+                self._ciclo(tarea, esperas[tarea.nombre]), name=f"planificador:{tarea.nombre}"
+            )
+            for tarea in self.tareas.values()
+        ]
+        try:
+            while True:
+                await asyncio.sleep(self.latido_segundos)
+                # Si la conexión del lock se cayó, Postgres ya lo liberó: dejar de ser líder.
+                await conexion.execute(_QUERY_LATIDO)
+        finally:
+            for tarea in tareas:
+                tarea.cancel()
+            await asyncio.gather(*tareas, return_exceptions=True)
+
+    async def _calendario(self) -> Dict[str, float]:
+        """Segundos hasta la primera ejecución de cada tarea, según el historial."""
+        ultimos = {}
+        try:
+            async with self._obtener_motor().connect() as conexion:
+                filas = (await conexion.execute(
+                    _QUERY_ULTIMOS_INICIOS, {"nombres": list(self.tareas)}
+                )).fetchall()
+            ultimos = {fila.nombre: fila.ultimo_inicio for fila in filas}
+        except Exception as e:
+            logger.warning(f"Planificador: no se pudo leer el historial de tareas: {e}")
+
+        ahora = datetime.now(timezone.utc)
+        esperas = {}
+        for tarea in self.tareas.values():
+            espera = tarea.retraso_inicial_segundos
+            ultimo_inicio = ultimos.get(tarea.nombre)
+            if ultimo_inicio is not None:
+                restante = tarea.intervalo_segundos - (ahora - ultimo_inicio).total_seconds()
+                espera = max(espera, restante)
+            esperas[tarea.nombre] = espera + random.uniform(0, tarea.jitter_segundos)
+        return esperas
+
+    async def _ciclo(self, tarea: TareaProgramada, espera: float) -> None:
+        while True:
+            await asyncio.sleep(max(espera, 0))
+            inicio = time.monotonic()
+            await self.ejecutar(tarea)
+            transcurrido = time.monotonic() - inicio
+            espera = (
+                tarea.intervalo_segundos - transcurrido + random.uniform(0, tarea.jitter_segundos)
+            )
+
+    async def ejecutar(self, tarea: TareaProgramada) -> bool:
+        """Ejecuta una vez la tarea y registra inicio, duración y resultado."""
+        inicio = datetime.now(timezone.utc)
+        cronometro = time.perf_counter()
+        error = None
+        try:
+            await tarea.funcion()
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+            logger.error(f"Error en la tarea programada {tarea.nombre}: {e}", exc_info=True)
+        duracion = time.perf_counter() - cronometro
+        duracion_ms = int(duracion * 1000)
+        registrar_tarea(tarea.nombre, duracion, error is None)
+
+        try:
+            async with self._obtener_motor().begin() as conexion:
+                await conexion.execute(_QUERY_REGISTRAR_EJECUCION, {
+                    "nombre": tarea.nombre,
+                    "inicio": inicio,
+                    "fin": datetime.now(timezone.utc),
+                    "duracion_ms": duracion_ms,
+                    "exito": error is None,
+                    "error": error and error[:2000],
+                    "ejecutado_por": self.identidad[:200],
+                })
+        except Exception as e:
+            logger.warning(f"Planificador: no se pudo registrar la ejecución de {tarea.nombre}: {e}")
+        return error is None
+
+
+planificador = Planificador(latido_segundos=obtener_configuracion().planificador_latido_segundos)
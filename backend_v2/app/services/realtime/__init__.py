@@ -0,0 +1,6 @@
+"""
+Servicios de tiempo real (WebSockets) - Backend V2
+"""
+from .hub import HubTiempoReal, hub
+
+__all__ = ["HubTiempoReal", "hub"]
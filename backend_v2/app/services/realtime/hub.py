@@ -0,0 +1,248 @@
+"""
+Hub de tiempo real compartido por los WebSockets de tickets y notificaciones.
+
+- Un solo cliente Redis (y una sola conexión pub/sub) por worker.
+- Un canal por sala (`rt:ticket:<id>`, `rt:usuario:<id>`): cada worker se
+  suscribe solo a las salas en las que tiene sockets abiertos, así que no
+  recibe ni procesa mensajes ajenos.
+- El payload se serializa una vez al publicar; los workers que lo reciben lo
+  reenvían tal cual, sin `json.loads`.
+- Cada socket tiene su propia cola de salida drenada por una tarea: un
+  cliente lento no retrasa al resto. Si su cola se llena o un envío excede
+  el plazo, el socket se expulsa (backpressure).
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, Optional
+
+import redis.asyncio as redis
+from fastapi import WebSocket
+
+from app.config import config
+from app.core.metricas import WS_CONEXIONES
+
+logger = logging.getLogger(__name__)
+
+PREFIJO_CANAL = "rt:"
+COLA_MAX_MENSAJES = 100
+ENVIO_TIMEOUT_SEGUNDOS = 10
+REINTENTO_REDIS_SEGUNDOS = 30
+
+
+def empaquetar(texto: str) -> bytes:
+    """Antepone el instante de publicación (para medir el lag entre workers)."""
+    return f"{time.time():.6f}|{texto}".encode("utf-8")
+
+
+def desempaquetar(data: bytes) -> tuple[float, str]:
+    marca, _, texto = data.partition(b"|")
+    return float(marca), texto.decode("utf-8")
+
+
+class _SocketCliente:
+    """Socket local con su cola de salida acotada."""
+
+    def __init__(self, hub: "HubTiempoReal", sala: str, websocket: WebSocket):
+        self.hub = hub
+        self.sala = sala
+        self.websocket = websocket
+        self.cola: asyncio.Queue = asyncio.Queue(maxsize=COLA_MAX_MENSAJES)
+        self.tarea = asyncio.create_task(self._drenar())
+
+    def encolar(self, texto: str) -> bool:
+        try:
+            self.cola.put_nowait(texto)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def _drenar(self):
+        try:
+            while True:
+                texto = await self.cola.get()
+                await asyncio.wait_for(self.websocket.send_text(texto), timeout=ENVIO_TIMEOUT_SEGUNDOS)
+                self.hub._entregados += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            self.hub._expulsar(self, "envío fallido o lento")
+
+
+class HubTiempoReal:
+    """Enrutador de mensajes WebSocket por sala, coordinado entre workers vía Redis."""
+
+    def __init__(self, redis_url: Optional[str] = None):
+        self.redis_url = redis_url
+        self._salas: Dict[str, Dict[WebSocket, _SocketCliente]] = {}
+        self._redis = None
+        self._pubsub = None
+        self._tarea_escucha: Optional[asyncio.Task] = None
+        self._redis_reintento_en = 0.0
+        self._lock = asyncio.Lock()
+        self._publicados = 0
+        self._entregados = 0
+        self._expulsados = 0
+        self._lag_total_ms = 0.0
+        self._lag_max_ms = 0.0
+        self._lag_muestras = 0
+
+    # --- Redis -------------------------------------------------------------
+
+    async def _asegurar_redis(self) -> bool:
+        if self._redis is not None:
+            return True
+        if not self.redis_url or time.monotonic() < self._redis_reintento_en:
+            return False
+        async with self._lock:
+            if self._redis is not None:
+                return True
+            try:
+                cliente = redis.from_url(self.redis_url)
+                await cliente.ping()
+                self._pubsub = cliente.pubsub()
+                self._redis = cliente
+                # Re-suscribir las salas abiertas tras una reconexión.
+                if self._salas:
+                    await self._pubsub.subscribe(*(self._canal(s) for s in self._salas))
+                    self._iniciar_escucha()
+                logger.info(f"Hub tiempo real: conectado a Redis ({self.redis_url})")
+                return True
+            except Exception as e:
+                self._redis_reintento_en = time.monotonic() + REINTENTO_REDIS_SEGUNDOS
+                logger.warning(f"Hub tiempo real: Redis no disponible, operando en modo local: {e}")
+                return False
+
+    def _iniciar_escucha(self):
+        if self._tarea_escucha is None or self._tarea_escucha.done():
+            self._tarea_escucha = asyncio.create_task(self._escuchar())
+
+    async def _escuchar(self):
+        """Reenvía a los sockets locales los mensajes de las salas suscritas"""
+        try:
+            async for mensaje in self._pubsub.listen():
+                if mensaje["type"] != "message":
+                    continue
+                try:
+                    sala = mensaje["channel"].decode("utf-8")[len(PREFIJO_CANAL):]
+                    publicado_en, texto = desempaquetar(mensaje["data"])
+                    self._registrar_lag((time.time() - publicado_en) * 1000)
+                    self._entregar_local(sala, texto)
+                except Exception as e:
+                    logger.error(f"Hub tiempo real: mensaje inválido de Redis: {e}")
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Hub tiempo real: error en listener de Redis: {e}")
+            await self._descartar_redis()
+
+    async def _descartar_redis(self):
+        cliente, self._redis, self._pubsub = self._redis, None, None
+        self._redis_reintento_en = time.monotonic() + 5
+        if cliente is not None:
+            try:
+                await cliente.aclose()
+            except Exception:
+                pass
+
+    @staticmethod
+    def _canal(sala: str) -> str:
+        return f"{PREFIJO_CANAL}{sala}"
+
+    # --- Conexiones ----------------------------------------------------------
+
+    async def conectar(self, websocket: WebSocket, sala: str):
+        """Acepta el socket y lo registra en la sala; suscribe la sala si es el primero."""
+        await websocket.accept()
+        primera = sala not in self._salas
+        self._salas.setdefault(sala, {})[websocket] = _SocketCliente(self, sala, websocket)
+        WS_CONEXIONES.inc()
+        if primera and await self._asegurar_redis():
+            try:
+                await self._pubsub.subscribe(self._canal(sala))
+                self._iniciar_escucha()
+            except Exception as e:
+                logger.error(f"Hub tiempo real: no se pudo suscribir {sala}: {e}")
+                await self._descartar_redis()
+
+    def desconectar(self, websocket: WebSocket, sala: str):
+        """Quita el socket de la sala; si la sala queda vacía deja de escucharla."""
+        clientes = self._salas.get(sala)
+        if not clientes or websocket not in clientes:
+            return
+        clientes.pop(websocket).tarea.cancel()
+        WS_CONEXIONES.dec()
+        if not clientes:
+            del self._salas[sala]
+            if self._pubsub is not None:
+                asyncio.create_task(self._desuscribir(sala))
+
+    async def _desuscribir(self, sala: str):
+        if sala in self._salas or self._pubsub is None:
+            return
+        try:
+            await self._pubsub.unsubscribe(self._canal(sala))
+        except Exception as e:
+            logger.warning(f"Hub tiempo real: no se pudo desuscribir {sala}: {e}")
+
+    def _expulsar(self, cliente: _SocketCliente, motivo: str):
+        if self._salas.get(cliente.sala, {}).get(cliente.websocket) is not cliente:
+            return
+        self._expulsados += 1
+        logger.warning(f"Hub tiempo real: socket expulsado de {cliente.sala} ({motivo})")
+        self.desconectar(cliente.websocket, cliente.sala)
+        asyncio.create_task(self._cerrar_socket(cliente.websocket))
+
+    @staticmethod
+    async def _cerrar_socket(websocket: WebSocket):
+        try:
+            await websocket.close(code=1013)
+        except Exception:
+            pass
+
+    # --- Publicación -------------------------------------------------------
+
+    async def publicar(self, sala: str, mensaje: dict):
+        """Serializa una vez y publica en el canal de la sala (o entrega local sin Redis)."""
+        texto = json.dumps(mensaje, default=str)
+        self._publicados += 1
+        if await self._asegurar_redis():
+            try:
+                await self._redis.publish(self._canal(sala), empaquetar(texto))
+                return
+            except Exception as e:
+                logger.error(f"Hub tiempo real: error publicando en Redis: {e}")
+                await self._descartar_redis()
+        self._entregar_local(sala, texto)
+
+    def _entregar_local(self, sala: str, texto: str):
+        for cliente in list(self._salas.get(sala, {}).values()):
+            if not cliente.encolar(texto):
+                self._expulsar(cliente, "cola de salida llena")
+
+    # --- Métricas ----------------------------------------------------------
+
+    def _registrar_lag(self, lag_ms: float):
+        self._lag_muestras += 1
+        self._lag_total_ms += lag_ms
+        self._lag_max_ms = max(self._lag_max_ms, lag_ms)
+
+    def obtener_metricas(self) -> dict:
+        clientes = [c for sala in self._salas.values() for c in sala.values()]
+        return {
+            "redis_conectado": self._redis is not None,
+            "salas": len(self._salas),
+            "sockets": len(clientes),
+            "mensajes_en_cola": sum(c.cola.qsize() for c in clientes),
+            "publicados": self._publicados,
+            "entregados": self._entregados,
+            "expulsados": self._expulsados,
+            "lag_promedio_ms": round(self._lag_total_ms / self._lag_muestras, 2) if self._lag_muestras else 0.0,
+            "lag_max_ms": round(self._lag_max_ms, 2),
+        }
+
+
+# Instancia global del hub (una por worker)
+hub = HubTiempoReal(config.redis_url)
@@ -1,14 +1,48 @@
 import base64
-from pathlib import Path
-from datetime import datetime
+import binascii
+import unicodedata
+from typing import Optional
+
+from fastapi import UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.ticket.ticket import AdjuntoTicket, AdjuntoCrear, HistorialTicket
 from app.core.config import obtener_configuracion
+from app.services.almacenamiento import (
+    ArchivoBlobInvalido,
+    BlobDemasiadoGrande,
+    guardar_bytes,
+    guardar_stream,
+)
 
 
 config = obtener_configuracion()
 
 
+class AdjuntoInvalido(ValueError):
+    """El adjunto no tiene un nombre o contenido aceptable."""
+
+
+class AdjuntoDemasiadoGrande(AdjuntoInvalido):
+    """El adjunto supera el tamaño máximo de almacenamiento."""
+
+
+def _limite_bytes() -> int:
+    return config.storage_max_size_mb * 1024 * 1024
+
+
+def _nombre_seguro(nombre: Optional[str]) -> str:
+    """Nombre base sin rutas ni caracteres reservados (el que verá la descarga)."""
+    nombre_base = (nombre or "").replace("\\", "/").split("/")[-1]
+    nombre_base = unicodedata.normalize("NFC", nombre_base).strip(" .")
+    nombre_base = "".join(
+        caracter for caracter in nombre_base
+        if caracter.isprintable() and caracter not in '<>:"/\\|?*'
+    )
+    if not nombre_base or len(nombre_base.encode("utf-8")) > 180:
+        raise AdjuntoInvalido("El nombre del archivo no es válido")
+    return nombre_base
+
+
 class AttachmentService:
     @staticmethod
     async def registrar_historial_interno(
@@ -22,55 +56,104 @@ class AttachmentService:
         db.add(log)
 
     @classmethod
-    async def subir_adjunto(
-        cls, db: AsyncSession, ticket_id: str, adjunto: AdjuntoCrear
+    async def _registrar_adjunto(
+        cls,
+        db: AsyncSession,
+        ticket_id: str,
+        nombre_archivo: str,
+        file_rel_path: str,
+        tamano_bytes: int,
+        tipo_mime: Optional[str],
     ) -> AdjuntoTicket:
-        """
-        Sube un archivo adjunto a un ticket, guardándolo en el sistema de archivos local.
-        (Almacenamiento escalable mediante volúmenes de Docker)
-        """
-        # 1. Preparar directorios (Estructura: storage/attachments/YYYY/MM/TicketID/filename)
-        now = datetime.now()
-        rel_path = f"{now.year}/{now.month:02d}/{ticket_id}"
-        abs_dir = Path(config.storage_path) / rel_path
-        abs_dir.mkdir(parents=True, exist_ok=True)
-
-        full_abs_path = abs_dir / adjunto.nombre_archivo
-        file_rel_path = f"{rel_path}/{adjunto.nombre_archivo}"
-
-        # 2. Decodificar y Guardar archivo
-        try:
-            # Eliminar prefijo data:image/png;base64, si existe
-            header = "base64,"
-            b64_str = adjunto.contenido_base64
-            if header in b64_str:
-                b64_str = b64_str.split(header)[1]
-            
-            file_data = base64.b64decode(b64_str)
-            tamano_bytes = len(file_data)
-
-            with open(full_abs_path, "wb") as f:
-                f.write(file_data)
-        except Exception as e:
-            raise Exception(f"Error al guardar archivo físico: {str(e)}")
-
-        # 3. Registrar en Base de Datos
         nuevo_adjunto = AdjuntoTicket(
             ticket_id=ticket_id,
-            nombre_archivo=adjunto.nombre_archivo,
-            ruta_archivo=file_rel_path, # Guardamos ruta relativa para portabilidad
+            nombre_archivo=nombre_archivo,
+            ruta_archivo=file_rel_path, # Ruta del blob, relativa a storage_path
             tamano_bytes=tamano_bytes,
-            tipo_mime=adjunto.tipo_mime,
+            tipo_mime=(tipo_mime or None) and tipo_mime[:100],
         )
         db.add(nuevo_adjunto)
-        
+
         await cls.registrar_historial_interno(
             db,
             ticket_id,
             "Archivo Adjunto",
-            f"Se adjunto el archivo físico: {adjunto.nombre_archivo}",
+            f"Se adjunto el archivo físico: {nombre_archivo}",
         )
-        
+
         await db.commit()
         await db.refresh(nuevo_adjunto)
         return nuevo_adjunto
+
+    @classmethod
+    async def subir_adjunto_archivo(
+        cls,
+        db: AsyncSession,
+        ticket_id: str,
+        archivo: UploadFile,
+        maximo_bytes: Optional[int] = None,
+    ) -> AdjuntoTicket:
+        """
+        Guarda un adjunto recibido por multipart leyéndolo por bloques:
+        cada bloque se escribe en un hilo (no bloquea el event loop) y el
+        límite de tamaño se verifica mientras se copia, sin cargar el archivo
+        completo en memoria. El contenido va al almacén por SHA-256: el mismo
+        archivo adjuntado en varios tickets ocupa disco una sola vez.
+        """
+        maximo_bytes = maximo_bytes or _limite_bytes()
+        nombre = _nombre_seguro(archivo.filename)
+        try:
+            blob = await guardar_stream(db, archivo, maximo_bytes)
+        except BlobDemasiadoGrande as e:
+            raise AdjuntoDemasiadoGrande(str(e)) from e
+        except ArchivoBlobInvalido as e:
+            raise AdjuntoInvalido(str(e)) from e
+        finally:
+            await archivo.close()
+
+        return await cls._registrar_adjunto(
+            db, ticket_id, nombre, blob.ruta_relativa, blob.tamano_bytes, archivo.content_type
+        )
+
+    @classmethod
+    async def subir_adjunto(
+        cls, db: AsyncSession, ticket_id: str, adjunto: AdjuntoCrear
+    ) -> AdjuntoTicket:
+        """
+        [LEGADO] Sube un adjunto enviado como Base64 dentro del JSON.
+        Los clientes nuevos deben usar la carga multipart (`subir_adjunto_archivo`):
+        aquí el archivo completo pasa por memoria (JSON + decodificado).
+        El tamaño se valida antes de decodificar y la escritura va en un hilo.
+        """
+        nombre = _nombre_seguro(adjunto.nombre_archivo)
+        if not adjunto.contenido_base64:
+            raise AdjuntoInvalido("El adjunto no tiene contenido")
+
+        # Eliminar prefijo data:image/png;base64, si existe
+        header = "base64,"
+        b64_str = adjunto.contenido_base64
+        if header in b64_str:
+            b64_str = b64_str.split(header)[1]
+
+        # Cota superior del tamaño decodificado, sin decodificar.
+        if len(b64_str) * 3 // 4 > _limite_bytes() + 2:
+            raise AdjuntoDemasiadoGrande(
+                f"El archivo supera el límite de {_limite_bytes()} bytes"
+            )
+        try:
+            file_data = base64.b64decode(b64_str)
+        except (binascii.Error, ValueError) as e:
+            raise AdjuntoInvalido("El contenido Base64 no es válido") from e
+        if len(file_data) > _limite_bytes():
+            raise AdjuntoDemasiadoGrande(
+                f"El archivo supera el límite de {_limite_bytes()} bytes"
+            )
+
+        try:
+            blob = await guardar_bytes(db, file_data)
+        except Exception as e:
+            raise Exception(f"Error al guardar archivo físico: {str(e)}")
+
+        return await cls._registrar_adjunto(
+            db, ticket_id, nombre, blob.ruta_relativa, blob.tamano_bytes, adjunto.tipo_mime
+        )
@@ -1,4 +1,3 @@
-import json
 from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
@@ -7,6 +6,7 @@ from sqlalchemy.orm import joinedload, selectinload
 
 from app.models.ticket import Ticket
 from app.models.auth.usuario import Usuario
+from app.services.auth.asignaciones_service import tiene_area, tiene_especialidad
 
 class TicketListService:
     """Servicio especializado en el listado y filtrado de tickets"""
@@ -63,17 +63,12 @@ class TicketListService:
 
         if usuario_peticion:
             if usuario_peticion.rol in ["admin_sistemas", "admin_mejoramiento"]:
-                specs = json.loads(usuario_peticion.especialidades or "[]")
-                areas = json.loads(usuario_peticion.areas_asignadas or "[]")
-                filtros_visibilidad = [
+                query = query.where(or_(
                     Ticket.asignado_a == usuario_peticion.nombre,
                     Ticket.creador_id == usuario_peticion.id,
-                ]
-                if specs:
-                    filtros_visibilidad.append(Ticket.categoria_id.in_(specs))
-                if areas:
-                    filtros_visibilidad.append(Ticket.area_creador.in_(areas))
-                query = query.where(or_(*filtros_visibilidad))
+                    tiene_especialidad(usuario_peticion.id, Ticket.categoria_id),
+                    tiene_area(usuario_peticion.id, Ticket.area_creador),
+                ))
             elif usuario_peticion.rol == "analyst" and not creador_id:
                 query = query.where(or_(Ticket.asignado_a == usuario_peticion.nombre, Ticket.creador_id == usuario_peticion.id))
 
@@ -6,6 +6,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 from app.models.ticket.ticket import Ticket
 from app.utils_date import get_bogota_now
+from app.services.cache import cache
 from .servicio import ServicioTicket
 
 class ServicioMantenimientoTicket:
@@ -48,5 +49,6 @@ class ServicioMantenimientoTicket:
             
         if conteo > 0:
             await db.commit()
+            await cache.invalidar("tickets")
             
         return conteo
@@ -32,6 +32,7 @@ from .comment_service import CommentService
 from ..notifications.email_service import EmailService
 from ...models.ticket.ticket import CategoriaTicket
 from ...utils_cache import global_cache
+from ..cache import cache
 from .ws_manager import manager
 
 
@@ -41,6 +42,7 @@ class ServicioTicket:
     # Delegación de estadísticas
     obtener_estadisticas_resumen = StatService.obtener_estadisticas_resumen
     obtener_estadisticas_avanzadas = StatService.obtener_estadisticas_avanzadas
+    obtener_rendimiento_analistas = StatService.obtener_rendimiento_analistas
 
     # Delegación de utilidades
     obtener_analista_menos_cargado = TicketUtils.obtener_analista_menos_cargado
@@ -49,6 +51,7 @@ class ServicioTicket:
     # Delegación de categorías y adjuntos
     listar_categorias = CategoryService.listar_categorias
     subir_adjunto = AttachmentService.subir_adjunto
+    subir_adjunto_archivo = AttachmentService.subir_adjunto_archivo
     
     # Delegación de listado
     listar_tickets = TicketListService.listar_tickets
@@ -199,6 +202,7 @@ class ServicioTicket:
                 )
 
             await db.commit()
+            await cache.invalidar("tickets")
 
             # Notificación de Asignación al Analista (Nueva prioridad)
             try:
@@ -371,6 +375,7 @@ class ServicioTicket:
                     print(f"WARNING: No se pudo enviar notificación de cambio de estado: {mail_err}")
 
         await db.commit()
+        await cache.invalidar("tickets")
         
         # Notificaciones nativas
         try:
@@ -1,37 +1,31 @@
-from typing import Dict, Any
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Any, List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import func as sa_func
 from sqlmodel import select
+from app.core.agregados import Conteos, columnas_conteo, contar
 from app.models.ticket.ticket import Ticket
 
 
+ESTADOS_RESUELTOS = ("Resuelto", "Cerrado")
+ESTADOS_CARGA_ACTIVA = ("Abierto", "Asignado", "En Proceso", "Pendiente Info", "Escalado")
+
+
 class StatService:
     @staticmethod
     async def obtener_estadisticas_resumen(db: AsyncSession) -> Dict[str, Any]:
         """Obtiene estadisticas resumidas de tickets (Async)"""
-        total = (await db.execute(select(sa_func.count(Ticket.id)))).scalar() or 0
-        pendiente = (
-            await db.execute(
-                select(sa_func.count(Ticket.id)).where(Ticket.estado == "Pendiente")
-            )
-        ).scalar() or 0
-        en_proceso = (
-            await db.execute(
-                select(sa_func.count(Ticket.id)).where(Ticket.estado == "Proceso")
-            )
-        ).scalar() or 0
-        cerrados = (
-            await db.execute(
-                select(sa_func.count(Ticket.id)).where(Ticket.estado == "Cerrado")
-            )
-        ).scalar() or 0
-        escalados = (
-            await db.execute(
-                select(sa_func.count(Ticket.id)).where(
-                    Ticket.estado == "Cerrado", Ticket.sub_estado == "Escalado"
-                )
-            )
-        ).scalar() or 0
+        conteos = await contar(db, Conteos(Ticket, {
+            "total": None,
+            "pendiente": Ticket.estado == "Pendiente",
+            "en_proceso": Ticket.estado == "Proceso",
+            "cerrados": Ticket.estado == "Cerrado",
+            "escalados": (Ticket.estado == "Cerrado") & (Ticket.sub_estado == "Escalado"),
+        }))
+        total = conteos["total"]
+        pendiente = conteos["pendiente"]
+        en_proceso = conteos["en_proceso"]
+        cerrados = conteos["cerrados"]
 
         return {
             "total": total,
@@ -39,7 +33,7 @@ class StatService:
             "en_proceso": en_proceso,
             "pendientes": pendiente + en_proceso,
             "cerrados": cerrados,
-            "escalados": escalados,
+            "escalados": conteos["escalados"],
             "completion_rate": round((cerrados / total * 100) if total > 0 else 0, 1),
             "total_tickets": total,
         }
@@ -80,3 +74,65 @@ class StatService:
             "priority_distribution": {p[0]: p[1] for p in prioridades},
             "sla_limit_hours": sla_limit_hours,
         }
+
+    @staticmethod
+    def consulta_rendimiento_analistas(
+        fecha_desde: Optional[date] = None,
+        fecha_hasta: Optional[date] = None,
+        area: Optional[str] = None,
+    ):
+        """Sentencia del ranking (también la usa scripts/explain_indices_tickets.py)."""
+        resuelto = Ticket.estado.in_(ESTADOS_RESUELTOS) & Ticket.resuelto_en.is_not(None)
+        consulta = (
+            select(
+                Ticket.asignado_a,
+                *columnas_conteo({
+                    "total_hist": None,
+                    "cerrados": resuelto,
+                    "carga_activa": Ticket.estado.in_(ESTADOS_CARGA_ACTIVA),
+                    "en_proceso": Ticket.estado == "En Proceso",
+                }),
+                sa_func.avg(
+                    sa_func.extract("epoch", Ticket.resuelto_en - Ticket.creado_en)
+                ).filter(resuelto).label("segundos_promedio"),
+            )
+            .where(Ticket.asignado_a.is_not(None))
+            .group_by(Ticket.asignado_a)
+        )
+        if fecha_desde:
+            consulta = consulta.where(Ticket.creado_en >= datetime.combine(fecha_desde, time.min))
+        if fecha_hasta:
+            consulta = consulta.where(
+                Ticket.creado_en < datetime.combine(fecha_hasta + timedelta(days=1), time.min)
+            )
+        if area:
+            consulta = consulta.where(Ticket.area_creador == area)
+        return consulta
+
+    @staticmethod
+    async def obtener_rendimiento_analistas(
+        db: AsyncSession,
+        fecha_desde: Optional[date] = None,
+        fecha_hasta: Optional[date] = None,
+        area: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Ranking de analistas en una sola consulta agrupada por `asignado_a`.
+        Los filtros opcionales (rango de creación y área del solicitante) van
+        en el WHERE, así el costo no crece con el número de analistas.
+        """
+        consulta = StatService.consulta_rendimiento_analistas(fecha_desde, fecha_hasta, area)
+        ranking = [
+            {
+                "name": fila.asignado_a,
+                "total": fila.carga_activa,
+                "cerrados": fila.cerrados,
+                "en_proceso": fila.en_proceso,
+                "avg_time": round(float(fila.segundos_promedio) / 3600, 1)
+                if fila.segundos_promedio is not None else 0,
+                "performance_score": round(fila.cerrados / fila.total_hist * 100, 1),
+            }
+            for fila in (await db.execute(consulta)).all()
+        ]
+        ranking.sort(key=lambda x: x["total"], reverse=True)
+        return ranking
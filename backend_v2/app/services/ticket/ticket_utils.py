@@ -1,10 +1,12 @@
-import json
 from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import func as sa_func
 from sqlmodel import select
 from app.models.ticket.ticket import Ticket, HistorialTicket
 from app.models.auth.usuario import Usuario
+from app.services.auth.asignaciones_service import tiene_area, tiene_especialidad
+
+ROLES_ANALISTA = ("analyst", "admin_sistemas", "admin_mejoramiento")
 
 
 class TicketUtils:
@@ -31,81 +33,45 @@ class TicketUtils:
     async def obtener_analista_menos_cargado(
         db: AsyncSession, categoria_id: str = None, area_solicitante: str = None
     ) -> Optional[str]:
-        """Busca al analista con menos tickets activos usando cascada de prioridad (Async)"""
+        """Busca al analista con menos tickets activos usando cascada de prioridad (Async)
+
+        Cascada: analistas con la especialidad (y el área, para soporte_mejora),
+        luego analistas con la especialidad, luego admins. Cada nivel es una sola
+        consulta que filtra por EXISTS y ordena por la carga activa.
+        """
         try:
-            # 1. Obtener todos los usuarios activos con roles válidos
-            result = await db.execute(
-                select(Usuario).where(
-                    Usuario.rol.in_(["analyst", "admin_sistemas", "admin_mejoramiento", "admin"]),
-                    Usuario.esta_activo,
+            carga = (
+                select(sa_func.count(Ticket.id))
+                .where(
+                    Ticket.asignado_a == Usuario.nombre,
+                    Ticket.estado.in_(["Pendiente", "Proceso"]),
                 )
+                .correlate(Usuario)
+                .scalar_subquery()
+            )
+            menos_cargado = (
+                select(Usuario.nombre)
+                .where(Usuario.esta_activo)
+                .order_by(carga, Usuario.nombre)
+                .limit(1)
             )
-            todos = result.scalars().all()
-
-            if not todos:
-                return None
-
-            # 2. Separar por prioridad de rol
-            analistas = [u for u in todos if u.rol in ("analyst", "admin_sistemas", "admin_mejoramiento")]
-            admins = [u for u in todos if u.rol == "admin"]
-
-            # 3. Filtrar analistas por especialidad
-            con_especialidad = []
-            for a in analistas:
-                try:
-                    especialidades = json.loads(a.especialidades or "[]")
-                except Exception:
-                    especialidades = []
-
-                if not especialidades:
-                    continue
-
-                if categoria_id and categoria_id in especialidades:
-                    con_especialidad.append(a)
-
-            # 4. Aplicar filtro de área (solo para soporte_mejora)
-            candidatos = con_especialidad
-            if (
-                categoria_id == "soporte_mejora"
-                and area_solicitante
-                and con_especialidad
-            ):
-                con_area = []
-                for a in con_especialidad:
-                    try:
-                        areas = json.loads(a.areas_asignadas or "[]")
-                    except Exception:
-                        areas = []
-
-                    if areas and area_solicitante in areas:
-                        con_area.append(a)
-
-                if con_area:
-                    candidatos = con_area
-                else:
-                    candidatos = con_especialidad
-
-            # 5. Fallback a admin si no hay candidatos
-            if not candidatos:
-                candidatos = admins
-
-            if not candidatos:
-                return None
 
-            # 6. Contar tickets activos y retornar el de menor carga
-            conteo_carga = []
-            for a in candidatos:
-                result_count = await db.execute(
-                    select(sa_func.count(Ticket.id)).where(
-                        Ticket.asignado_a == a.nombre,
-                        Ticket.estado.in_(["Pendiente", "Proceso"]),
-                    )
+            niveles = []
+            if categoria_id:
+                analistas = menos_cargado.where(
+                    Usuario.rol.in_(ROLES_ANALISTA),
+                    tiene_especialidad(Usuario.id, categoria_id),
                 )
-                carga = result_count.scalar() or 0
-                conteo_carga.append((a.nombre, carga))
+                if categoria_id == "soporte_mejora" and area_solicitante:
+                    niveles.append(analistas.where(tiene_area(Usuario.id, area_solicitante)))
+                niveles.append(analistas)
+            niveles.append(menos_cargado.where(Usuario.rol == "admin"))
 
-            conteo_carga.sort(key=lambda x: x[1])
-            return conteo_carga[0][0]
+            for consulta in niveles:
+                nombre = (await db.execute(consulta)).scalar()
+                if nombre:
+                    return nombre
+            return None
         except Exception as e:
             print(f"Error en ruteo de asignación: {e}")
             return None
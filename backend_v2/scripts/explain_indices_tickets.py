@@ -0,0 +1,232 @@
+"""
+Verifica con EXPLAIN (ANALYZE, BUFFERS) que las consultas de listado,
+estadisticas y BI de tickets usan los indices de
+app/core/migrations/indices_tickets.py.
+
+Siembra tickets sinteticos (con comentarios, historial y adjuntos) dentro de
+una transaccion que se revierte al final, ejecuta ANALYZE y revisa cada plan:
+si un Seq Scan sobre tickets o sus tablas hijas lee mas filas que el umbral,
+el script termina con codigo 1.
+
+    python scripts/explain_indices_tickets.py --tickets 50000 --umbral 1000
+    python scripts/explain_indices_tickets.py --sin-semilla   # datos reales
+
+Las consultas del panel y del ranking se construyen con las mismas funciones
+que usa la app y se compilan con su dialecto: lo que se revisa es la
+sentencia real, no una copia a mano.
+
+Las consultas marcadas `barrido=True` leen la tabla completa por diseno
+(extraccion BI, ranking historico sin filtros y tiempos de resolucion sobre
+todos los cerrados): se imprimen pero no cuentan como fallo.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import date, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import text
+from app.database import async_engine
+from app.core.migrations.indices_tickets import (
+    ESTADOS_ABIERTOS, ESTADOS_PENDIENTES_PANEL, crear_indices_tickets,
+)
+from app.services.panel_control.tablero_service import consulta_progreso_semanal
+from app.services.ticket.stats_service import StatService
+from app.utils_date import get_bogota_now
+
+TABLAS_VIGILADAS = {
+    "tickets", "comentarios_ticket", "historial_ticket", "adjuntos_ticket",
+    "solicitudes_desarrollo", "control_cambios", "solicitudes_activo",
+}
+
+
+def _progreso_semanal():
+    ahora = get_bogota_now()
+    return consulta_progreso_semanal(), {
+        "ahora": ahora, "desde": ahora - timedelta(weeks=4), "semana": timedelta(weeks=1),
+    }
+
+
+def _ranking(**filtros):
+    return lambda: (StatService.consulta_rendimiento_analistas(**filtros), {})
+
+
+# (nombre, sql o funcion -> (sentencia de la app, parametros), barrido)
+CONSULTAS = [
+    ("listado por estado (list_service)", """
+        SELECT t.*, u.correo_verificado FROM tickets t
+        LEFT JOIN usuarios u ON t.creador_id = u.id
+        WHERE t.estado = 'Asignado' ORDER BY t.creado_en DESC LIMIT 100
+    """, False),
+    ("mis tickets (list_service creador_id)", """
+        SELECT * FROM tickets WHERE creador_id = 'EXPLAIN-USR-7'
+        ORDER BY creado_en DESC LIMIT 100
+    """, False),
+    ("bandeja del analista (list_service asignado_a)", """
+        SELECT * FROM tickets WHERE asignado_a = 'Analista 11' AND estado = 'En Proceso'
+        ORDER BY creado_en DESC LIMIT 100
+    """, False),
+    ("tickets por categoria (list_service categoria_id)", """
+        SELECT * FROM tickets WHERE categoria_id = 'EXPLAIN-CAT-2'
+        ORDER BY creado_en DESC LIMIT 100
+    """, False),
+    ("abiertos del analista (panel)", f"""
+        SELECT id FROM tickets WHERE asignado_a = 'Analista 11' AND estado IN {ESTADOS_ABIERTOS}
+        ORDER BY creado_en DESC
+    """, False),
+    ("actividades pendientes (panel_control)", f"""
+        SELECT * FROM tickets WHERE estado IN {ESTADOS_PENDIENTES_PANEL}
+        ORDER BY creado_en DESC LIMIT 10
+    """, False),
+    ("progreso semanal (panel_control)", _progreso_semanal, False),
+    ("ranking ultimos 30 dias (stats_service)",
+     _ranking(fecha_desde=date.today() - timedelta(days=30)), False),
+    ("cierre automatico (mantenimiento_service)", """
+        SELECT id FROM tickets WHERE estado = 'Resuelto'
+        AND resuelto_en <= now() - interval '24 hours'
+    """, False),
+    ("detalle: comentarios", """
+        SELECT * FROM comentarios_ticket WHERE ticket_id = 'EXPLAIN-4242' ORDER BY creado_en
+    """, False),
+    ("detalle: historial", """
+        SELECT * FROM historial_ticket WHERE ticket_id = 'EXPLAIN-4242' ORDER BY creado_en
+    """, False),
+    ("detalle: adjuntos", """
+        SELECT id, nombre_archivo FROM adjuntos_ticket WHERE ticket_id = 'EXPLAIN-4242'
+    """, False),
+    ("ranking historico sin filtros (stats_service)", _ranking(), True),
+    ("estadisticas avanzadas (stats_service)", """
+        SELECT * FROM tickets WHERE estado = 'Cerrado' AND sub_estado = 'Resuelto'
+    """, True),
+    ("extraccion BI (bi_service)", "SELECT * FROM tickets", True),
+]
+
+# Distribucion realista: la mayoria de tickets ya estan cerrados.
+SEMILLA = """
+    INSERT INTO tickets (id, categoria_id, asunto, descripcion, prioridad, estado, sub_estado,
+                         creador_id, area_creador, asignado_a, creado_en, fecha_cierre, resuelto_en)
+    SELECT 'EXPLAIN-' || g,
+           'EXPLAIN-CAT-' || (g % 8),
+           'Ticket ' || g, 'Generado para EXPLAIN', 'Media',
+           CASE WHEN g % 100 < 85 THEN 'Cerrado'
+                WHEN g % 100 < 88 THEN 'Resuelto'
+                WHEN g % 100 < 91 THEN 'Asignado'
+                WHEN g % 100 < 94 THEN 'En Proceso'
+                WHEN g % 100 < 96 THEN 'Nuevo'
+                WHEN g % 100 < 98 THEN 'Pendiente Info'
+                ELSE 'Escalado' END,
+           CASE WHEN g % 3 = 0 THEN 'Escalado' ELSE 'Resuelto' END,
+           'EXPLAIN-USR-' || (g % 2000),
+           'Area ' || (g % 25),
+           'Analista ' || (g % 60),
+           now() - (g % 1095) * interval '1 day' - (g % 24) * interval '1 hour',
+           CASE WHEN g % 100 < 85 THEN now() - (g % 1095) * interval '1 day' + interval '2 days' END,
+           CASE WHEN g % 100 < 88 THEN now() - (g % 1095) * interval '1 day' + interval '1 day' END
+    FROM generate_series(1, :n) AS g
+"""
+SEMILLA_HIJAS = [
+    """
+    INSERT INTO comentarios_ticket (ticket_id, comentario, es_interno, leido, creado_en)
+    SELECT 'EXPLAIN-' || (g % :n + 1), 'Comentario ' || g, false, true,
+           now() - (g % 1095) * interval '1 day'
+    FROM generate_series(1, :n * 3) AS g
+    """,
+    """
+    INSERT INTO historial_ticket (ticket_id, accion, detalle, creado_en)
+    SELECT 'EXPLAIN-' || (g % :n + 1), 'Cambio de estado', 'Generado para EXPLAIN',
+           now() - (g % 1095) * interval '1 day'
+    FROM generate_series(1, :n * 4) AS g
+    """,
+    """
+    INSERT INTO adjuntos_ticket (ticket_id, nombre_archivo, tamano_bytes, creado_en)
+    SELECT 'EXPLAIN-' || (g * 2), 'adjunto_' || g || '.pdf', 1024, now()
+    FROM generate_series(1, :n / 2) AS g
+    """,
+]
+
+
+def barridos(nodo, encontrados=None):
+    """Seq Scans sobre tablas vigiladas: (tabla, filas leidas)."""
+    if encontrados is None:
+        encontrados = []
+    if nodo.get("Node Type") == "Seq Scan" and nodo.get("Relation Name") in TABLAS_VIGILADAS:
+        lazos = nodo.get("Actual Loops", 1) or 1
+        leidas = (nodo.get("Actual Rows", 0) + nodo.get("Rows Removed by Filter", 0)) * lazos
+        encontrados.append((nodo["Relation Name"], leidas))
+    for hijo in nodo.get("Plans", []):
+        barridos(hijo, encontrados)
+    return encontrados
+
+
+def compilar(conn, consulta):
+    """(sql, parametros) listos para exec_driver_sql con el dialecto de la conexion."""
+    if isinstance(consulta, str):
+        return consulta, ()
+    sentencia, valores = consulta()
+    compilado = sentencia.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    parametros = {**compilado.params, **valores}
+    return str(compilado), tuple(parametros[nombre] for nombre in compilado.positiontup)
+
+
+async def sembrar(conn, n):
+    await conn.execute(text("""
+        INSERT INTO categorias_ticket (id, nombre, tipo_formulario)
+        SELECT 'EXPLAIN-CAT-' || g, 'Categoria EXPLAIN ' || g, 'soporte'
+        FROM generate_series(0, 7) AS g
+    """))
+    await conn.execute(text(SEMILLA), {"n": n})
+    for sentencia in SEMILLA_HIJAS:
+        await conn.execute(text(sentencia), {"n": n})
+    for tabla in ("tickets", "comentarios_ticket", "historial_ticket", "adjuntos_ticket"):
+        await conn.execute(text(f"ANALYZE {tabla}"))
+
+
+async def verificar(tickets, umbral, con_semilla):
+    await crear_indices_tickets(async_engine)
+    fallos = []
+    async with async_engine.connect() as conn:
+        transaccion = await conn.begin()
+        try:
+            if con_semilla:
+                await sembrar(conn, tickets)
+                print(f"Sembrados {tickets} tickets (se revierten al terminar).")
+            for nombre, consulta, barrido in CONSULTAS:
+                sql, parametros = compilar(conn, consulta)
+                plan = (await conn.exec_driver_sql(
+                    f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", parametros
+                )).scalar()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                raiz = plan[0]["Plan"]
+                lecturas = barridos(raiz)
+                excedidos = [(t, f) for t, f in lecturas if f > umbral]
+                buffers = raiz.get("Shared Hit Blocks", 0) + raiz.get("Shared Read Blocks", 0)
+                if excedidos and not barrido:
+                    estado = "FALLA"
+                    fallos.append((nombre, excedidos))
+                else:
+                    estado = "barrido" if excedidos else "ok"
+                detalle = ", ".join(f"Seq Scan {t}: {f} filas" for t, f in lecturas) or "solo indices"
+                print(f"[{estado:>7}] {nombre:<50} {plan[0]['Execution Time']:>8.2f} ms "
+                      f"{buffers:>7} buffers  {detalle}")
+        finally:
+            await transaccion.rollback()
+
+    if fallos:
+        print(f"\n{len(fallos)} consulta(s) con Seq Scan por encima de {umbral} filas:")
+        for nombre, excedidos in fallos:
+            print(f"  - {nombre}: {excedidos}")
+        return False
+    print(f"\nSin Seq Scans por encima de {umbral} filas.")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tickets", type=int, default=50000, help="Tickets a sembrar")
+    parser.add_argument("--umbral", type=int, default=1000, help="Filas maximas por Seq Scan")
+    parser.add_argument("--sin-semilla", action="store_true", help="Usar los datos existentes")
+    args = parser.parse_args()
+    ok = asyncio.run(verificar(args.tickets, args.umbral, not args.sin_semilla))
+    sys.exit(0 if ok else 1)
@@ -98,6 +98,7 @@ export const API_ENDPOINTS = {
   TICKET_UPDATE: (id: string) => `/soporte/${id}`,
   TICKET_CREATE_COMMENT: (id: string) => `/soporte/${id}/comentarios`,
   TICKET_GET_COMMENTS: (id: string) => `/soporte/${id}/comentarios`,
+  TICKET_UPLOAD_ATTACHMENT: (id: string) => `/soporte/${id}/adjuntos/archivo`,
   TICKET_STATS_SUMMARY: '/soporte/estadisticas/resumen',
   TICKET_STATS_PERFORMANCE: '/soporte/estadisticas/rendimiento',
   TICKET_STATS_ADVANCED: '/soporte/estadisticas/avanzadas',
@@ -1,6 +1,6 @@
 import { useState, useEffect, useCallback } from 'react';
 import axios from 'axios';
-import { API_CONFIG } from '../config/api';
+import { API_CONFIG, API_ENDPOINTS } from '../config/api';
 import { useAppContext } from '../context/AppContext';
 import { useNotifications } from '../components/notifications/NotificationsContext';
 
@@ -337,29 +337,14 @@ export const useTicketDetail = (ticketId: string | undefined) => {
         if (!ticketId) return;
         setIsSaving(true);
         try {
-            const reader = new FileReader();
-            const base64Promise = new Promise<string>((resolve, reject) => {
-                reader.onload = () => {
-                    const base64String = (reader.result as string).split(',')[1];
-                    resolve(base64String);
-                };
-                reader.onerror = reject;
-                reader.readAsDataURL(file);
-            });
-
-            const base64 = await base64Promise;
-            
-            const attachmentData = {
-                ticket_id: ticketId,
-                nombre_archivo: file.name,
-                tipo_mime: file.type,
-                contenido_base64: base64
-            };
+            // Carga multipart: el archivo viaja tal cual, sin Base64 en JSON
+            const formData = new FormData();
+            formData.append('archivo', file);
 
             const token = localStorage.getItem('token');
             const headers = token ? { Authorization: `Bearer ${token}` } : {};
 
-            await axios.post(`${API_BASE_URL}/soporte/${ticketId}/adjuntos`, attachmentData, { headers });
+            await axios.post(`${API_BASE_URL}${API_ENDPOINTS.TICKET_UPLOAD_ATTACHMENT(ticketId)}`, formData, { headers });
             
             const res = await axios.get(`${API_BASE_URL}/soporte/${ticketId}/adjuntos`, { headers });
             setAttachments(res.data);
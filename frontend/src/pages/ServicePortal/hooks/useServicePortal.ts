@@ -132,18 +132,6 @@ export const useServicePortal = () => {
         }
     }, [user?.cedula, user?.id, fetchTickets, state.refreshKey]);
 
-    const fileToBase64 = (file: File): Promise<string> => {
-        return new Promise((resolve, reject) => {
-            const reader = new FileReader();
-            reader.readAsDataURL(file);
-            reader.onload = () => {
-                const base64String = (reader.result as string).split(',')[1];
-                resolve(base64String);
-            };
-            reader.onerror = error => reject(error);
-        });
-    };
-
     const handleSubmit = async (e: React.FormEvent<HTMLFormElement>) => {
         e.preventDefault();
         if (!selectedCategory || !user) return;
@@ -233,14 +221,10 @@ export const useServicePortal = () => {
             if (selectedFiles.length > 0) {
                 for (const file of selectedFiles) {
                     try {
-                        const base64 = await fileToBase64(file);
-                        // No hay un endpoint específico en API_ENDPOINTS para adjuntos, usamos la ruta estandarizada
-                        await axios.post(`${API_BASE_URL}/soporte/${createdTicketId}/adjuntos`, {
-                            ticket_id: createdTicketId,
-                            nombre_archivo: file.name,
-                            contenido_base64: base64,
-                            tipo_mime: file.type
-                        });
+                        // Carga multipart: el archivo viaja tal cual, sin Base64 en JSON
+                        const formData = new FormData();
+                        formData.append('archivo', file);
+                        await axios.post(`${API_BASE_URL}${API_ENDPOINTS.TICKET_UPLOAD_ATTACHMENT(createdTicketId)}`, formData);
                     } catch (fileErr) {
                         console.error(`Error subiendo archivo ${file.name}:`, fileErr);
                     }
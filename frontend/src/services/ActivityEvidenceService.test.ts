@@ -18,6 +18,9 @@ describe('ActivityEvidenceService', () => {
         const internal = `actividades/42/${'a'.repeat(32)}_informe final.pdf`;
         expect(isInternalActivityEvidence(internal)).toBe(true);
         expect(getActivityEvidenceName(internal)).toBe('informe final.pdf');
+        const blob = `actividades/42/${'b'.repeat(64)}_informe final.pdf`;
+        expect(isInternalActivityEvidence(blob)).toBe(true);
+        expect(getActivityEvidenceName(blob)).toBe('informe final.pdf');
         expect(isSafeExternalEvidenceUrl('https://sharepoint.example/informe')).toBe(true);
         expect(isSafeExternalEvidenceUrl('javascript:alert(1)')).toBe(false);
     });
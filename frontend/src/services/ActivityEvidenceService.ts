@@ -2,7 +2,8 @@ import { API_CONFIG, API_ENDPOINTS } from '../config/api';
 import { AuthService } from './AuthService';
 
 
-const INTERNAL_EVIDENCE_PATTERN = /^actividades\/(\d+)\/([0-9a-f]{32})_(.+)$/;
+// <uuid>_nombre (legado) o <sha256>_nombre (almacén por contenido)
+const INTERNAL_EVIDENCE_PATTERN = /^actividades\/(\d+)\/([0-9a-f]{32}|[0-9a-f]{64})_(.+)$/;
 
 export function isInternalActivityEvidence(archivoUrl: string): boolean {
     return INTERNAL_EVIDENCE_PATTERN.test(archivoUrl);
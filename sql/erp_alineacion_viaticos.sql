@@ -8,6 +8,7 @@
 -- 1. ELIMINAR TABLAS EXISTENTES (en orden por FK)
 DROP TABLE IF EXISTS transito_viaticos;
 DROP TABLE IF EXISTS legalizaciones_transito;
+DROP SEQUENCE IF EXISTS legalizaciones_transito_web_seq;
 
 -- 2. TABLA DE CABECERA (legalizaciones_transito)
 -- Espejo exacto de: legalizacion
@@ -64,3 +65,8 @@ CREATE INDEX idx_lt_empleado ON legalizaciones_transito(empleado);
 CREATE INDEX idx_lt_reporte ON legalizaciones_transito(reporte_id);
 CREATE INDEX idx_tv_reporte ON transito_viaticos(reporte_id);
 CREATE INDEX idx_tv_legalizacion ON transito_viaticos(legalizacion);
+
+-- 5. CONSECUTIVO WEB-LXXXX
+-- ViaticosService.enviar_reporte toma el número con nextval: envíos simultáneos
+-- nunca comparten consecutivo. Para bases existentes: erp_secuencia_viaticos.sql
+CREATE SEQUENCE legalizaciones_transito_web_seq;
@@ -0,0 +1,28 @@
+-- =========================================================================
+-- SECUENCIA DEL CONSECUTIVO WEB-LXXXX (legalizaciones_transito)
+-- Propósito: Reemplazar el MAX(reporte_id) + 1 por una secuencia, para que dos
+--            envíos simultáneos no obtengan el mismo número.
+-- Idempotente: arranca después del mayor consecutivo WEB-L ya usado.
+-- =========================================================================
+
+BEGIN;
+
+CREATE SEQUENCE IF NOT EXISTS legalizaciones_transito_web_seq;
+
+-- Evita que un envío en curso tome un número con el MAX anterior mientras se ajusta
+LOCK TABLE legalizaciones_transito IN SHARE ROW EXCLUSIVE MODE;
+
+SELECT setval(
+    'legalizaciones_transito_web_seq',
+    GREATEST(
+        COALESCE((
+            SELECT max(NULLIF(regexp_replace(reporte_id, '\D', '', 'g'), '')::bigint)
+            FROM legalizaciones_transito
+            WHERE reporte_id LIKE 'WEB-L%'
+        ), 0),
+        (SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM legalizaciones_transito_web_seq)
+    ) + 1,
+    false
+);
+
+COMMIT;
@@ -0,0 +1,141 @@
+"""
+Benchmark del XLSX de estado de cuenta: openpyxl en memoria vs XlsxWriter constant_memory.
+
+Cada modo corre en un subproceso propio para que el pico de memoria
+residente (VmHWM) sea el de esa exportación y no el del otro modo.
+
+    python testing/backend/benchmark_exportacion_xlsx.py --filas 500000
+"""
+
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "backend_v2"))
+
+MODOS = ("memoria", "memoria_constante")
+
+
+def _movimientos(filas: int):
+    inicio = date(2020, 1, 1)
+    saldo = 0
+    for n in range(filas):
+        valor = 1000 + n % 997
+        saldo += valor if n % 2 else -valor
+        yield {
+            "fechaaplicacion": inicio + timedelta(days=n % 2000),
+            "radicado": f"RAD-{n:07d}",
+            "tipo": "CONSIGNACION" if n % 2 else "LEGALIZACION",
+            "observaciones": f"Movimiento de prueba {n}",
+            "consignacion_contabilizado": valor if n % 2 else 0,
+            "legalizacion_contabilizado": 0 if n % 2 else valor,
+            "consignacion_firmadas": 0,
+            "legalizacion_firmadas": 0,
+            "consignacion_pendientes": 0,
+            "legalizacion_pendientes": 0,
+            "saldo": saldo,
+        }
+
+
+def _exportar_en_memoria(filas: int) -> int:
+    """La implementación anterior: Workbook normal, una Cell con estilo por celda, BytesIO."""
+    from openpyxl import Workbook
+    from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+    from openpyxl.utils import get_column_letter
+
+    from app.services.erp.viaticos_service import COLUMNAS_ESTADO_CUENTA, COLUMNAS_MONTO_ESTADO_CUENTA
+
+    data = list(_movimientos(filas))
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Estado de Cuenta"
+    border = Border(left=Side(style="thin"), right=Side(style="thin"), top=Side(style="thin"), bottom=Side(style="thin"))
+    for col, columna in enumerate(COLUMNAS_ESTADO_CUENTA, 1):
+        cell = ws.cell(row=1, column=col, value=columna.titulo)
+        cell.font = Font(bold=True, color="FFFFFF")
+        cell.fill = PatternFill(start_color="1F4E78", end_color="1F4E78", fill_type="solid")
+        cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
+        cell.border = border
+    for row_idx, item in enumerate(data, 2):
+        for col, key in enumerate(("fechaaplicacion", "radicado", "tipo", "observaciones"), 1):
+            ws.cell(row=row_idx, column=col, value=item[key]).border = border
+        for col, key in enumerate(COLUMNAS_MONTO_ESTADO_CUENTA, 5):
+            cell = ws.cell(row=row_idx, column=col, value=float(item[key] or 0))
+            cell.number_format = '"$"#,##0'
+            cell.border = border
+    for col in range(1, len(COLUMNAS_ESTADO_CUENTA) + 1):
+        ws.column_dimensions[get_column_letter(col)].width = 20
+    salida = io.BytesIO()
+    wb.save(salida)
+    return len(salida.getvalue())
+
+
+def _exportar_memoria_constante(filas: int) -> int:
+    """La implementación actual, con el cursor del ERP reemplazado por el generador."""
+    from unittest.mock import patch
+
+    from app.services.erp.viaticos_query_service import ViaticosQueryService
+    from app.services.erp.viaticos_service import ViaticosService
+
+    with patch.object(ViaticosQueryService, "iterar_estado_cuenta", return_value=_movimientos(filas)):
+        ruta = ViaticosService.exportar_estado_cuenta_xlsx(None, "0")
+    try:
+        return os.path.getsize(ruta)
+    finally:
+        os.remove(ruta)
+
+
+def _pico_rss_mb() -> float:
+    with open("/proc/self/status") as status:
+        for linea in status:
+            if linea.startswith("VmHWM:"):
+                return int(linea.split()[1]) / 1024
+    return 0.0
+
+
+def _medir(modo: str, filas: int) -> dict:
+    base = _pico_rss_mb()
+    inicio = time.perf_counter()
+    tamano = (_exportar_en_memoria if modo == "memoria" else _exportar_memoria_constante)(filas)
+    return {
+        "modo": modo,
+        "filas": filas,
+        "segundos": round(time.perf_counter() - inicio, 1),
+        "pico_rss_mb": round(_pico_rss_mb(), 1),
+        "rss_base_mb": round(base, 1),
+        "archivo_mb": round(tamano / 2**20, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--filas", type=int, default=500_000)
+    parser.add_argument("--modo", choices=MODOS)
+    args = parser.parse_args()
+
+    if args.modo:
+        # Importa dependencias antes de medir la base del proceso hijo.
+        import app.services.erp.viaticos_service  # noqa: F401
+        print(json.dumps(_medir(args.modo, args.filas)))
+        return
+
+    for modo in MODOS:
+        salida = subprocess.run(
+            [sys.executable, __file__, "--modo", modo, "--filas", str(args.filas)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        r = json.loads(salida.strip().splitlines()[-1])
+        print(
+            f"{r['modo']:>17}: {r['filas']} filas en {r['segundos']} s, "
+            f"pico RSS {r['pico_rss_mb']} MB (base {r['rss_base_mb']} MB), archivo {r['archivo_mb']} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -148,6 +148,20 @@ async def db_session():
         yield session
     await engine.dispose()
 
+@pytest.fixture
+def presupuesto_consultas():
+    """
+    Presupuesto de consultas SQL para un bloque del test:
+
+        with presupuesto_consultas(3, max_repeticiones=1):
+            cliente.get("/ruta")
+
+    Falla si el bloque ejecuta más consultas que las declaradas o repite la
+    misma consulta más veces que `max_repeticiones` (regresiones a N+1).
+    """
+    from app.core.consultas_sql import presupuesto_consultas as _presupuesto
+    return _presupuesto
+
 # Configuración centralizada
 BASE_URL = os.getenv("TEST_BASE_URL", "http://127.0.0.1:8000/api/v2")
 
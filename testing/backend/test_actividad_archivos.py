@@ -18,6 +18,11 @@ from app.services.desarrollos.actividad_archivo_service import (
 )
 
 
+def db_blobs():
+    """Sesión falsa: el almacén por contenido solo ejecuta el upsert de referencias."""
+    return SimpleNamespace(execute=AsyncMock())
+
+
 def crear_upload(nombre: str, contenido: bytes, tipo_mime: str) -> UploadFile:
     return UploadFile(
         filename=nombre,
@@ -30,7 +35,9 @@ def crear_upload(nombre: str, contenido: bytes, tipo_mime: str) -> UploadFile:
 async def test_guarda_pdf_y_lo_resuelve_dentro_de_la_actividad(tmp_path):
     archivo = crear_upload("Evidencia final.pdf", b"%PDF-1.7\ncontenido", "application/pdf")
 
+    db = db_blobs()
     guardado = await guardar_archivo_actividad(
+        db,
         actividad_id=42,
         archivo=archivo,
         almacenamiento_raiz=tmp_path,
@@ -38,6 +45,7 @@ async def test_guarda_pdf_y_lo_resuelve_dentro_de_la_actividad(tmp_path):
     )
 
     assert guardado.ruta_relativa.startswith("actividades/42/")
+    assert db.execute.await_count == 1  # una referencia al blob
     assert guardado.nombre_descarga == "Evidencia final.pdf"
     assert guardado.tamano_bytes == len(b"%PDF-1.7\ncontenido")
     ruta, nombre, tipo_mime = resolver_archivo_actividad(
@@ -64,6 +72,7 @@ async def test_rechaza_tipo_firma_o_tamano_invalido(
 
     with pytest.raises(ArchivoActividadInvalido):
         await guardar_archivo_actividad(
+            db_blobs(),
             actividad_id=7,
             archivo=archivo,
             almacenamiento_raiz=tmp_path,
@@ -76,7 +85,7 @@ async def test_rechaza_tipo_firma_o_tamano_invalido(
 @pytest.mark.asyncio
 async def test_impide_resolver_archivo_de_otra_actividad(tmp_path):
     archivo = crear_upload("evidencia.pdf", b"%PDF-1.7\ncontenido", "application/pdf")
-    guardado = await guardar_archivo_actividad(7, archivo, tmp_path, 1024)
+    guardado = await guardar_archivo_actividad(db_blobs(), 7, archivo, tmp_path, 1024)
 
     with pytest.raises(ArchivoActividadInvalido):
         resolver_archivo_actividad(8, guardado.ruta_relativa, tmp_path)
@@ -174,7 +183,7 @@ async def test_endpoints_http_cubren_carga_descarga_y_eliminacion(tmp_path, monk
         def __init__(self):
             self.rollbacks = 0
 
-        async def execute(self, _consulta):
+        async def execute(self, _consulta, _parametros=None):
             return Resultado()
 
         async def commit(self):
@@ -0,0 +1,184 @@
+"""Pruebas de la carga de adjuntos de tickets (multipart en streaming y Base64 legado)."""
+
+import base64
+import importlib
+from io import BytesIO
+
+import httpx
+import pytest
+from fastapi import FastAPI, UploadFile
+from starlette.datastructures import Headers
+
+from app.models.ticket.ticket import AdjuntoCrear, AdjuntoTicket, HistorialTicket
+from app.services.almacenamiento import blob_service
+from app.services.ticket import attachment_service as modulo
+from app.services.ticket.attachment_service import (
+    AdjuntoDemasiadoGrande,
+    AdjuntoInvalido,
+    AttachmentService,
+)
+
+
+class DbFalsa:
+    def __init__(self, ticket_existe=True):
+        self.agregados = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.referencias = []
+        self.ticket_existe = ticket_existe
+
+    def add(self, objeto):
+        self.agregados.append(objeto)
+
+    async def execute(self, _consulta, parametros=None):
+        self.referencias.append(parametros["sha256"])
+
+    async def scalar(self, _consulta):
+        return "TKT-1" if self.ticket_existe else None
+
+    async def commit(self):
+        self.commits += 1
+
+    async def refresh(self, objeto):
+        objeto.id = len(self.agregados)
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+class UploadContado(UploadFile):
+    """Registra el tamaño de cada lectura para verificar la copia por bloques."""
+
+    lecturas: list
+
+    async def read(self, size=-1):
+        bloque = await super().read(size)
+        self.lecturas.append(len(bloque))
+        return bloque
+
+
+def crear_upload(nombre, contenido, tipo_mime="application/pdf"):
+    archivo = UploadContado(
+        filename=nombre,
+        file=BytesIO(contenido),
+        headers=Headers({"content-type": tipo_mime}),
+    )
+    archivo.lecturas = []
+    return archivo
+
+
+@pytest.fixture
+def almacenamiento(tmp_path, monkeypatch):
+    monkeypatch.setattr(modulo.config, "storage_path", str(tmp_path))
+    monkeypatch.setattr(modulo.config, "storage_max_size_mb", 1)
+    return tmp_path
+
+
+@pytest.mark.asyncio
+async def test_multipart_se_copia_por_bloques_y_registra_el_adjunto(almacenamiento, monkeypatch):
+    monkeypatch.setattr(blob_service, "CHUNK_SIZE", 1000)
+    contenido = b"%PDF-1.7\n" + b"x" * 4500
+    archivo = crear_upload("../../etc/informe final.pdf", contenido)
+    db = DbFalsa()
+
+    adjunto = await AttachmentService.subir_adjunto_archivo(db, "TKT-1", archivo)
+
+    assert max(archivo.lecturas) == 1000
+    assert adjunto.nombre_archivo == "informe final.pdf"
+    assert adjunto.tamano_bytes == len(contenido)
+    assert adjunto.tipo_mime == "application/pdf"
+    ruta = almacenamiento / adjunto.ruta_archivo
+    assert ruta.read_bytes() == contenido
+    assert ruta.resolve().is_relative_to(almacenamiento.resolve())
+    assert ruta == blob_service.ruta_blob(db.referencias[0], almacenamiento)
+    assert any(isinstance(o, HistorialTicket) for o in db.agregados)
+    assert db.commits == 1
+
+
+@pytest.mark.asyncio
+async def test_multipart_excedido_o_vacio_no_deja_archivos(almacenamiento):
+    db = DbFalsa()
+
+    with pytest.raises(AdjuntoDemasiadoGrande):
+        await AttachmentService.subir_adjunto_archivo(
+            db, "TKT-1", crear_upload("grande.pdf", b"x" * 2048), maximo_bytes=1024
+        )
+    with pytest.raises(AdjuntoInvalido):
+        await AttachmentService.subir_adjunto_archivo(db, "TKT-1", crear_upload("vacio.pdf", b""))
+
+    assert not [p for p in almacenamiento.rglob("*") if p.is_file()]
+    assert db.commits == 0
+
+
+@pytest.mark.asyncio
+async def test_base64_legado_valida_tamano_antes_de_decodificar(almacenamiento, monkeypatch):
+    db = DbFalsa()
+    grande = base64.b64encode(b"x" * (1024 * 1024 + 10)).decode()
+
+    def no_decodificar(*_args, **_kwargs):
+        raise AssertionError("no debe decodificar un adjunto que excede el límite")
+
+    with monkeypatch.context() as parche, pytest.raises(AdjuntoDemasiadoGrande):
+        parche.setattr(modulo.base64, "b64decode", no_decodificar)
+        await AttachmentService.subir_adjunto(
+            db, "TKT-1", AdjuntoCrear(ticket_id="TKT-1", nombre_archivo="g.pdf", contenido_base64=grande)
+        )
+
+    adjunto = await AttachmentService.subir_adjunto(
+        db,
+        "TKT-1",
+        AdjuntoCrear(
+            ticket_id="TKT-1",
+            nombre_archivo="nota.txt",
+            contenido_base64="data:text/plain;base64," + base64.b64encode(b"hola").decode(),
+            tipo_mime="text/plain",
+        ),
+    )
+    assert (almacenamiento / adjunto.ruta_archivo).read_bytes() == b"hola"
+    assert adjunto.tamano_bytes == 4
+
+
+@pytest.mark.asyncio
+async def test_endpoint_multipart_limita_el_cuerpo_antes_del_parser(almacenamiento):
+    # `app.api.tickets` re-exporta la instancia `router`: se importa el módulo explícitamente.
+    modulo_router = importlib.import_module("app.api.tickets.router")
+    from app.core.middleware.limite_carga_actividad import LimiteCargaActividadMiddleware
+    from app.database import obtener_db
+
+    db = DbFalsa()
+    app = FastAPI()
+    app.add_middleware(LimiteCargaActividadMiddleware, max_body_size=(1024 * 1024) + 65536)
+    app.include_router(modulo_router.router, prefix="/api/v2/soporte")
+    app.dependency_overrides[obtener_db] = lambda: db
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        excedida = await client.post(
+            "/api/v2/soporte/TKT-1/adjuntos/archivo",
+            files={"archivo": ("grande.pdf", b"x" * (1024 * 1024 + 70000), "application/pdf")},
+        )
+        assert excedida.status_code == 413
+        assert db.commits == 0
+
+        subida = await client.post(
+            "/api/v2/soporte/TKT-1/adjuntos/archivo",
+            files={"archivo": ("captura.png", b"\x89PNG\r\n\x1a\ncontenido", "image/png")},
+        )
+        assert subida.status_code == 200
+        assert subida.json()["nombre_archivo"] == "captura.png"
+        assert subida.json()["tamano_bytes"] == 17
+        assert db.rollbacks == 1  # transacción liberada antes de recibir el archivo
+
+        sin_archivo = await client.post(
+            "/api/v2/soporte/TKT-1/adjuntos/archivo", data={"otro": "campo"}
+        )
+        assert sin_archivo.status_code == 400
+
+        db.ticket_existe = False
+        inexistente = await client.post(
+            "/api/v2/soporte/TKT-X/adjuntos/archivo",
+            files={"archivo": ("a.txt", b"a", "text/plain")},
+        )
+        assert inexistente.status_code == 404
+
+    assert isinstance(db.agregados[0], AdjuntoTicket)
@@ -0,0 +1,176 @@
+"""Pruebas del almacén de archivos por SHA-256 (deduplicación, recolección y descargas)."""
+
+import hashlib
+import os
+from functools import partial
+import time
+from io import BytesIO
+from uuid import uuid4
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from sqlalchemy import select, text
+
+from app.services.almacenamiento import (
+    guardar_bytes,
+    guardar_stream,
+    liberar,
+    recolectar_huerfanos,
+    respuesta_archivo,
+    ruta_blob,
+    sha256_de_ruta,
+)
+from app.models.novedades_nomina.nomina import NominaArchivo, NominaRegistroNormalizado
+from app.services.novedades_nomina import nomina_service
+from app.services.novedades_nomina.nomina_service import NominaService
+
+
+class LectorBytes:
+    def __init__(self, contenido):
+        self._archivo = BytesIO(contenido)
+
+    async def read(self, size=-1):
+        return self._archivo.read(size)
+
+
+async def _referencias(db, sha256):
+    return (await db.execute(
+        text("SELECT referencias FROM blobs_archivo WHERE sha256 = :sha"), {"sha": sha256}
+    )).scalar()
+
+
+@pytest.mark.asyncio
+async def test_mismo_contenido_se_guarda_una_vez_y_se_recolecta_sin_referencias(db_session, tmp_path):
+    contenido = f"evidencia {uuid4()}".encode()
+    sha256 = hashlib.sha256(contenido).hexdigest()
+
+    primero = await guardar_stream(db_session, LectorBytes(contenido), 1024, raiz=tmp_path)
+    segundo = await guardar_bytes(db_session, contenido, raiz=tmp_path)
+    await db_session.commit()
+
+    assert (primero.sha256, primero.nuevo, segundo.nuevo) == (sha256, True, False)
+    assert sha256_de_ruta(primero.ruta_relativa) == sha256
+    assert ruta_blob(sha256, tmp_path).read_bytes() == contenido
+    assert [p.name for p in tmp_path.rglob("*") if p.is_file()] == [sha256]
+    assert await _referencias(db_session, sha256) == 2
+
+    await liberar(db_session, sha256)
+    await db_session.commit()
+    await recolectar_huerfanos(db_session, gracia_minutos=0, raiz=tmp_path)
+    assert ruta_blob(sha256, tmp_path).exists()
+    assert await _referencias(db_session, sha256) == 1
+
+    await liberar(db_session, sha256)
+    await db_session.commit()
+    await recolectar_huerfanos(db_session, gracia_minutos=0, raiz=tmp_path)
+    assert not ruta_blob(sha256, tmp_path).exists()
+    assert await _referencias(db_session, sha256) is None
+
+
+@pytest.mark.asyncio
+async def test_reemplazar_archivo_de_nomina_libera_el_blob_anterior(db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(nomina_service, "guardar_bytes", partial(guardar_bytes, raiz=tmp_path))
+    subcategoria = f"TEST-BLOB-{uuid4().hex[:8]}"
+
+    async def cargar(contenido):
+        blob = await NominaService.reemplazar_archivo_original(db_session, subcategoria, 1, 2026, contenido)
+        archivo = NominaArchivo(
+            nombre_archivo="prueba.xlsx", hash_archivo=blob.sha256, tamaño_bytes=blob.tamano_bytes,
+            tipo_archivo="xlsx", ruta_almacenamiento=blob.ruta_relativa, mes_fact=1, año_fact=2026,
+            categoria="PRUEBAS", subcategoria=subcategoria, estado="Procesado",
+        )
+        db_session.add(archivo)
+        await db_session.flush()
+        db_session.add(NominaRegistroNormalizado(
+            archivo_id=archivo.id, mes_fact=1, año_fact=2026, cedula="1", valor=1, empresa="", concepto="",
+            categoria_final="PRUEBAS", subcategoria_final=subcategoria, fila_origen=1,
+        ))
+        await db_session.flush()
+        return blob.sha256
+
+    try:
+        anterior = await cargar(f"nomina {uuid4()}".encode())
+        actual = await cargar(f"nomina {uuid4()}".encode())
+        assert await _referencias(db_session, anterior) == 0
+        assert await _referencias(db_session, actual) == 1
+
+        # Volver a cargar el mismo contenido no suma referencias.
+        contenido = ruta_blob(actual, tmp_path).read_bytes()
+        assert await cargar(contenido) == actual
+        assert await _referencias(db_session, actual) == 1
+
+        archivos = (await db_session.execute(
+            select(NominaArchivo.hash_archivo).where(NominaArchivo.subcategoria == subcategoria)
+        )).scalars().all()
+        assert archivos == [actual]
+    finally:
+        await db_session.rollback()
+
+
+@pytest.mark.asyncio
+async def test_recoleccion_registra_blobs_sueltos_en_vez_de_borrarlos(db_session, tmp_path):
+    contenido = f"suelto {uuid4()}".encode()
+    sha256 = hashlib.sha256(contenido).hexdigest()
+    ruta = ruta_blob(sha256, tmp_path)
+    ruta.parent.mkdir(parents=True)
+    ruta.write_bytes(contenido)
+    temporal = tmp_path / "blobs" / "tmp" / "abandonado.tmp"
+    temporal.parent.mkdir(parents=True)
+    temporal.write_bytes(b"x")
+    hace_una_hora = time.time() - 3600
+    for archivo in (ruta, temporal):
+        os.utime(archivo, (hace_una_hora, hace_una_hora))
+
+    resultado = await recolectar_huerfanos(db_session, gracia_minutos=30, raiz=tmp_path)
+
+    assert resultado["sueltos_registrados"] == 1
+    assert resultado["temporales_eliminados"] == 1
+    assert ruta.exists() and not temporal.exists()
+    assert await _referencias(db_session, sha256) == 0
+    await db_session.execute(text("DELETE FROM blobs_archivo WHERE sha256 = :sha"), {"sha": sha256})
+    await db_session.commit()
+
+
+@pytest.mark.asyncio
+async def test_descarga_responde_304_rangos_y_416(tmp_path):
+    contenido = bytes(range(256)) * 4
+    sha256 = hashlib.sha256(contenido).hexdigest()
+    ruta = tmp_path / "blob"
+    ruta.write_bytes(contenido)
+
+    app = FastAPI()
+
+    @app.get("/archivo")
+    async def descargar(request: Request):
+        return await respuesta_archivo(request, ruta, "reporte año.pdf", "application/pdf", sha256)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        completa = await client.get("/archivo")
+        assert completa.status_code == 200
+        assert completa.content == contenido
+        assert completa.headers["etag"] == f'"{sha256}"'
+        assert "filename*=utf-8''reporte%20a%C3%B1o.pdf" in completa.headers["content-disposition"]
+
+        cacheada = await client.get("/archivo", headers={"If-None-Match": completa.headers["etag"]})
+        assert cacheada.status_code == 304
+        assert cacheada.content == b""
+
+        parcial = await client.get("/archivo", headers={"Range": "bytes=100-199"})
+        assert parcial.status_code == 206
+        assert parcial.content == contenido[100:200]
+        assert parcial.headers["content-range"] == f"bytes 100-199/{len(contenido)}"
+
+        sufijo = await client.get("/archivo", headers={"Range": "bytes=-10"})
+        assert sufijo.content == contenido[-10:]
+
+        otra_version = await client.get(
+            "/archivo", headers={"Range": "bytes=0-9", "If-Range": '"otro"'}
+        )
+        assert otra_version.status_code == 200
+        assert len(otra_version.content) == len(contenido)
+
+        fuera = await client.get("/archivo", headers={"Range": "bytes=5000-"})
+        assert fuera.status_code == 416
+        assert fuera.headers["content-range"] == f"bytes */{len(contenido)}"
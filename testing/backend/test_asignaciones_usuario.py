@@ -0,0 +1,148 @@
+"""
+Especialidades y áreas en tablas relacionales (usuario_especialidad / usuario_area).
+
+Cubre el backfill desde el JSON legado, el dual-write del endpoint de admin
+y los filtros SQL de visibilidad de tickets y de asignación automática.
+"""
+
+import json
+
+import pytest
+from sqlalchemy import delete, insert, text
+from sqlmodel import select
+
+from app.core.migrations.asignaciones_usuario_migration import reconciliar_asignaciones_usuario
+from app.models.auth.usuario import Usuario, UsuarioArea, UsuarioEspecialidad
+from app.models.ticket.ticket import CategoriaTicket, Ticket
+from app.services.auth.asignaciones_service import guardar_asignaciones, lista_json
+from app.services.ticket.list_service import TicketListService
+from app.services.ticket.ticket_utils import TicketUtils
+
+PREFIJO = "TEST-ASG"
+CATEGORIA = "TEST-ASG-CAT"
+OTRA_CATEGORIA = "TEST-ASG-OTRA"
+
+
+def _usuario(sufijo, rol="analyst", especialidades=(), areas=()):
+    return Usuario(
+        id=f"{PREFIJO}-{sufijo}",
+        cedula=f"{PREFIJO}-{sufijo}",
+        hash_contrasena="x",
+        nombre=f"{PREFIJO} {sufijo}",
+        rol=rol,
+        especialidades=json.dumps(list(especialidades)),
+        areas_asignadas=json.dumps(list(areas)),
+    )
+
+
+async def _limpiar(db):
+    await db.execute(delete(Ticket).where(Ticket.id.like(f"{PREFIJO}-%")))
+    await db.execute(delete(CategoriaTicket).where(CategoriaTicket.id.in_([CATEGORIA, OTRA_CATEGORIA])))
+    await db.execute(delete(Usuario).where(Usuario.id.like(f"{PREFIJO}-%")))
+    await db.commit()
+
+
+@pytest.fixture
+async def db(db_session):
+    await _limpiar(db_session)
+    yield db_session
+    await _limpiar(db_session)
+
+
+async def _filas(db, modelo, columna, usuario_id):
+    res = await db.execute(select(getattr(modelo, columna)).where(modelo.usuario_id == usuario_id))
+    return set(res.scalars().all())
+
+
+def test_lista_json_tolera_valores_legados():
+    assert lista_json('["a", " b ", "a", "", 3]') == ["a", "b"]
+    assert lista_json("no es json") == []
+    assert lista_json('{"a": 1}') == []
+    assert lista_json(None) == []
+
+
+@pytest.mark.asyncio
+async def test_backfill_reconcilia_desde_json(db):
+    db.add(_usuario("A", especialidades=[CATEGORIA, "redes"], areas=["Compras"]))
+    await db.commit()
+    await db.execute(insert(UsuarioEspecialidad), [{"usuario_id": f"{PREFIJO}-A", "especialidad": "obsoleta"}])
+    await db.commit()
+
+    async with db.bind.begin() as conn:
+        await reconciliar_asignaciones_usuario(conn)
+        await reconciliar_asignaciones_usuario(conn)
+
+    assert await _filas(db, UsuarioEspecialidad, "especialidad", f"{PREFIJO}-A") == {CATEGORIA, "redes"}
+    assert await _filas(db, UsuarioArea, "area", f"{PREFIJO}-A") == {"Compras"}
+
+
+@pytest.mark.asyncio
+async def test_guardar_asignaciones_escribe_tablas_y_json(db):
+    usuario = _usuario("B", especialidades=["vieja"])
+    db.add(usuario)
+    await db.flush()
+    await guardar_asignaciones(db, usuario, [CATEGORIA, CATEGORIA, "redes"], None)
+    await db.commit()
+
+    assert await _filas(db, UsuarioEspecialidad, "especialidad", usuario.id) == {CATEGORIA, "redes"}
+    assert json.loads(usuario.especialidades) == [CATEGORIA, "redes"]
+    # Áreas sin cambios (None)
+    assert await _filas(db, UsuarioArea, "area", usuario.id) == set()
+    assert usuario.areas_asignadas == "[]"
+
+
+async def _sembrar_tickets(db):
+    db.add_all([
+        CategoriaTicket(id=CATEGORIA, nombre="Asignaciones", tipo_formulario="soporte"),
+        CategoriaTicket(id=OTRA_CATEGORIA, nombre="Otra", tipo_formulario="soporte"),
+    ])
+    await db.flush()
+    await db.execute(insert(Ticket), [
+        {"id": f"{PREFIJO}-T1", "categoria_id": CATEGORIA, "creador_id": "X", "area_creador": "Ventas"},
+        {"id": f"{PREFIJO}-T2", "categoria_id": OTRA_CATEGORIA, "creador_id": "X", "area_creador": "Compras"},
+        {"id": f"{PREFIJO}-T3", "categoria_id": OTRA_CATEGORIA, "creador_id": "X", "area_creador": "Ventas"},
+        {"id": f"{PREFIJO}-T4", "categoria_id": OTRA_CATEGORIA, "creador_id": f"{PREFIJO}-ADM",
+         "area_creador": "Ventas"},
+        {"id": f"{PREFIJO}-T5", "categoria_id": OTRA_CATEGORIA, "creador_id": "X",
+         "area_creador": "Ventas", "asignado_a": f"{PREFIJO} ADM"},
+    ])
+
+
+@pytest.mark.asyncio
+async def test_visibilidad_por_especialidad_y_area_en_sql(db):
+    await _sembrar_tickets(db)
+    admin = _usuario("ADM", rol="admin_sistemas")
+    db.add(admin)
+    await db.flush()
+    await guardar_asignaciones(db, admin, [CATEGORIA], ["Compras"])
+    await db.commit()
+
+    tickets = await TicketListService.listar_tickets(db, limit=1000, usuario_peticion=admin)
+    visibles = {t.id for t in tickets if t.id.startswith(PREFIJO)}
+    assert visibles == {f"{PREFIJO}-T1", f"{PREFIJO}-T2", f"{PREFIJO}-T4", f"{PREFIJO}-T5"}
+
+
+@pytest.mark.asyncio
+async def test_asignacion_prefiere_area_y_menor_carga(db):
+    await _sembrar_tickets(db)
+    usuarios = [
+        _usuario("CARGADO", especialidades=["soporte_mejora"], areas=["Compras"]),
+        _usuario("LIBRE", especialidades=["soporte_mejora"], areas=["Compras"]),
+        _usuario("SIN-AREA", especialidades=["soporte_mejora"]),
+    ]
+    db.add_all(usuarios)
+    await db.flush()
+    for u in usuarios:
+        await guardar_asignaciones(db, u, lista_json(u.especialidades), lista_json(u.areas_asignadas))
+    await db.execute(text(
+        "UPDATE tickets SET asignado_a = :nombre, estado = 'Pendiente' WHERE id LIKE :patron"
+    ), {"nombre": f"{PREFIJO} CARGADO", "patron": f"{PREFIJO}-T%"})
+    await db.commit()
+
+    assert await TicketUtils.obtener_analista_menos_cargado(
+        db, "soporte_mejora", "Compras"
+    ) == f"{PREFIJO} LIBRE"
+    # Área sin analistas: cae a todos los de la especialidad.
+    assert await TicketUtils.obtener_analista_menos_cargado(
+        db, "soporte_mejora", "Bodega"
+    ) in {f"{PREFIJO} LIBRE", f"{PREFIJO} SIN-AREA"}
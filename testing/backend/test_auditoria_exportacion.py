@@ -0,0 +1,137 @@
+"""
+Exportación en streaming y listado por cursor (keyset) de auditoría.
+
+Los eventos se siembran en un schema aparte dentro de una transacción que se
+revierte. La exportación de 1M de filas debe mantener acotada la memoria
+residente del proceso: solo vive un lote a la vez.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.config import config
+from app.services.auditoria.servicio import (
+    COLUMNAS_EXPORTACION,
+    ServicioAuditoria,
+    codificar_cursor,
+    decodificar_cursor,
+)
+
+SCHEMA_PRUEBA = "test_auditoria_exportacion"
+FILAS_EXPORTACION = 1_000_000
+MAXIMO_CRECIMIENTO_RSS = 64 * 1024 * 1024
+
+
+def _rss_bytes() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * 4096
+
+
+async def _sembrar(conn, filas: int, base: datetime) -> None:
+    # Cada 3 filas comparten timestamp: el keyset debe desempatar por id.
+    await conn.execute(text("""
+        INSERT INTO auditoria_acciones_usuario
+            (timestamp, usuario_id, usuario_nombre, modulo, accion, ruta, resultado, metadatos)
+        SELECT CAST(:base AS timestamptz) - (g / 3) * interval '1 second',
+               'u' || (g % 50), 'Usuario, "' || (g % 50) || '"',
+               CASE WHEN g % 4 = 0 THEN 'tickets' ELSE 'viaticos' END,
+               'consultar', '/api/v2/tickets/' || g, 'exito',
+               jsonb_build_object('n', g)
+        FROM generate_series(1, :filas) AS g
+    """), {"base": base, "filas": filas})
+
+
+@pytest.fixture
+async def db_schema_prueba():
+    """Sesión con search_path en un schema propio; todo se revierte al final."""
+    motor = create_async_engine(config.database_url, poolclass=NullPool)
+    async with motor.connect() as conn:
+        await conn.execute(text(f"CREATE SCHEMA {SCHEMA_PRUEBA}"))
+        await conn.execute(text(
+            f"CREATE TABLE {SCHEMA_PRUEBA}.auditoria_acciones_usuario "
+            "(LIKE public.auditoria_acciones_usuario INCLUDING DEFAULTS)"
+        ))
+        await conn.execute(text(
+            f"CREATE INDEX ON {SCHEMA_PRUEBA}.auditoria_acciones_usuario (timestamp DESC, id DESC)"
+        ))
+        await conn.execute(text(f"SET LOCAL search_path TO {SCHEMA_PRUEBA}, pg_catalog"))
+        yield AsyncSession(bind=conn)
+        await conn.rollback()
+    await motor.dispose()
+
+
+def test_cursor_opaco_ida_y_vuelta():
+    momento = datetime(2026, 5, 1, 10, 30, 15, 123456, tzinfo=timezone.utc)
+    assert decodificar_cursor(codificar_cursor(momento, 42)) == (momento, 42)
+    for invalido in ("no-es-un-cursor", codificar_cursor(momento, 42)[:-3], "W10"):
+        with pytest.raises(ValueError):
+            decodificar_cursor(invalido)
+
+
+@pytest.mark.asyncio
+async def test_listado_por_cursor_recorre_todo_sin_repetir(db_schema_prueba):
+    db = db_schema_prueba
+    await _sembrar(db, 100, datetime.now(timezone.utc))
+    esperados = (await db.execute(text("""
+        SELECT id FROM auditoria_acciones_usuario WHERE modulo = 'viaticos'
+        ORDER BY timestamp DESC, id DESC
+    """))).scalars().all()
+
+    vistos, cursor, paginas = [], None, 0
+    while True:
+        items, cursor = await ServicioAuditoria.listar_eventos_cursor(
+            db, cursor=cursor, limite=10, modulo="viaticos"
+        )
+        vistos.extend(evento.id for evento in items)
+        paginas += 1
+        if cursor is None:
+            break
+    assert vistos == esperados
+    assert paginas == -(-len(esperados) // 10)
+
+
+@pytest.mark.asyncio
+async def test_exportacion_ndjson_aplica_filtros(db_schema_prueba):
+    db = db_schema_prueba
+    base = datetime.now(timezone.utc)
+    await _sembrar(db, 30, base)
+    bloques = [b async for b in ServicioAuditoria.exportar_eventos(
+        db, "ndjson", lote=7, modulo="tickets", fecha_desde=base - timedelta(seconds=6)
+    )]
+    eventos = [json.loads(linea) for linea in b"".join(bloques).decode().splitlines()]
+    assert eventos and all(e["modulo"] == "tickets" for e in eventos)
+    assert set(eventos[0]) == set(COLUMNAS_EXPORTACION)
+    assert eventos[0]["metadatos"]["n"] % 4 == 0
+    claves = [(e["timestamp"], e["id"]) for e in eventos]
+    assert claves == sorted(claves, reverse=True)
+
+
+@pytest.mark.asyncio
+async def test_exportacion_csv_un_millon_de_filas_con_memoria_acotada(db_schema_prueba):
+    db = db_schema_prueba
+    await _sembrar(db, FILAS_EXPORTACION, datetime.now(timezone.utc))
+
+    inicial = _rss_bytes()
+    pico = inicial
+    filas = bytes_exportados = 0
+    encabezado = None
+    async for bloque in ServicioAuditoria.exportar_eventos(db, "csv"):
+        texto = bloque.decode("utf-8")
+        if encabezado is None:
+            encabezado = next(csv.reader(io.StringIO(texto)))
+        filas += texto.count("\n")
+        bytes_exportados += len(bloque)
+        pico = max(pico, _rss_bytes())
+
+    assert encabezado == list(COLUMNAS_EXPORTACION)
+    assert filas == FILAS_EXPORTACION + 1
+    # La exportación pesa varias veces el margen de memoria permitido.
+    assert bytes_exportados > 2 * MAXIMO_CRECIMIENTO_RSS
+    assert pico - inicial < MAXIMO_CRECIMIENTO_RSS, (pico - inicial) / 2**20
@@ -0,0 +1,210 @@
+"""
+Particiones mensuales de auditoria_acciones_usuario.
+
+- Cada consulta de ServicioAuditoriaEstadisticas se vuelve a ejecutar con
+  EXPLAIN (mismos parámetros) y solo debe tocar las particiones del rango.
+- La conversión de la tabla previa sin particiones, la copia por lotes del
+  histórico se prueban en un schema aparte dentro de una transacción que se
+  revierte.
+- La retención (volcado .csv.gz + DROP) confirma una transacción por
+  partición, así que usa su propio schema y lo elimina al terminar.
+"""
+
+import gzip
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.config import config
+from app.core.migrations.auditoria_acciones_migration import crear_tabla_auditoria_acciones, tipo_tabla
+from app.services.auditoria.particiones_service import (
+    PARTICION_DEFAULT,
+    TABLA,
+    TABLA_LEGADO,
+    aplicar_retencion,
+    copiar_lote_legado,
+    crear_particiones,
+    inicio_mes,
+    listar_particiones,
+    mes_actual,
+    nombre_particion,
+    sumar_meses,
+)
+from app.services.auditoria.servicio_estadisticas import ServicioAuditoriaEstadisticas
+
+SCHEMA_PRUEBA = "test_auditoria_particiones"
+SCHEMA_RETENCION = "test_auditoria_retencion"
+
+# Tabla tal como la creaba la migración anterior (sin particiones).
+DDL_LEGADO = f"""
+    CREATE TABLE {TABLA} (
+        id SERIAL PRIMARY KEY,
+        timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        usuario_id VARCHAR(50) NOT NULL,
+        usuario_nombre VARCHAR(255),
+        rol VARCHAR(50),
+        modulo VARCHAR(80) NOT NULL,
+        accion VARCHAR(50) NOT NULL,
+        entidad_tipo VARCHAR(80),
+        entidad_id VARCHAR(100),
+        metodo_http VARCHAR(10),
+        ruta VARCHAR(255),
+        codigo_respuesta SMALLINT,
+        resultado VARCHAR(20) NOT NULL DEFAULT 'exito',
+        direccion_ip VARCHAR(45),
+        agente_usuario TEXT,
+        correlacion_id VARCHAR(36),
+        datos_anteriores JSONB,
+        datos_nuevos JSONB,
+        metadatos JSONB
+    )
+"""
+
+
+def test_calendario_de_particiones():
+    assert sumar_meses(date(2026, 11, 1), 3) == date(2027, 2, 1)
+    assert sumar_meses(date(2026, 1, 1), -1) == date(2025, 12, 1)
+    assert nombre_particion(date(2026, 3, 1)) == f"{TABLA}_p2026_03"
+
+
+@pytest.mark.asyncio
+async def test_estadisticas_podan_particiones(db_session):
+    async with db_session.bind.begin() as conn:
+        await crear_tabla_auditoria_acciones(conn)
+        # Particiones de un año hacia atrás para que haya qué podar.
+        await crear_particiones(conn, desde=sumar_meses(mes_actual(), -12))
+
+    hasta = datetime.now(timezone.utc)
+    desde = hasta - timedelta(days=7)
+    meses_del_rango = {nombre_particion(date(d.year, d.month, 1)) for d in (desde, hasta)}
+
+    sentencias = []
+
+    def capturar(_conn, _cursor, sentencia, parametros, _contexto, _many):
+        if TABLA in sentencia:
+            sentencias.append((sentencia, parametros))
+
+    # Un evento en el rango para que también corra la consulta de últimos eventos.
+    await db_session.execute(text(
+        f"INSERT INTO {TABLA} (usuario_id, modulo, accion, timestamp) VALUES ('poda', 'tickets', 'crear', :ts)"
+    ), {"ts": hasta - timedelta(hours=1)})
+    motor_sync = db_session.bind.sync_engine
+    event.listen(motor_sync, "before_cursor_execute", capturar)
+    try:
+        await ServicioAuditoriaEstadisticas.obtener_estadisticas(db_session, desde, hasta)
+    finally:
+        event.remove(motor_sync, "before_cursor_execute", capturar)
+        await db_session.rollback()
+    assert any("LATERAL" in sentencia for sentencia, _ in sentencias)
+
+    async with db_session.bind.connect() as conn:
+        todas = {nombre for nombre, _ in await listar_particiones(conn)} | {PARTICION_DEFAULT}
+        for sentencia, parametros in sentencias:
+            plan = "\n".join(
+                (await conn.exec_driver_sql(f"EXPLAIN {sentencia}", parametros)).scalars().all()
+            )
+            tocadas = {nombre for nombre in todas if f" {nombre} " in plan or f" {nombre}\n" in plan}
+            assert tocadas and tocadas <= meses_del_rango, (sentencia, tocadas)
+
+
+@pytest.fixture
+async def conn_schema_prueba():
+    """Conexión con search_path en un schema vacío; todo se revierte al final."""
+    motor = create_async_engine(config.database_url, poolclass=NullPool)
+    async with motor.connect() as conn:
+        await conn.execute(text(f"CREATE SCHEMA {SCHEMA_PRUEBA}"))
+        await conn.execute(text(f"SET LOCAL search_path TO {SCHEMA_PRUEBA}"))
+        yield conn
+        await conn.rollback()
+    await motor.dispose()
+
+
+@pytest.mark.asyncio
+async def test_conversion_copia_por_lotes_y_retencion(conn_schema_prueba, tmp_path):
+    conn = conn_schema_prueba
+    ahora = datetime.now(timezone.utc)
+    antiguo = ahora - timedelta(days=31 * 30)
+    await conn.execute(text(DDL_LEGADO))
+    await conn.execute(text(f"""
+        INSERT INTO {TABLA} (usuario_id, modulo, accion, timestamp)
+        SELECT 'u' || g, 'tickets', 'crear', CAST(:ahora AS timestamptz) - g * interval '9 days'
+        FROM generate_series(1, 20) AS g
+    """), {"ahora": ahora})
+    await conn.execute(text(
+        f"INSERT INTO {TABLA} (usuario_id, modulo, accion, timestamp) VALUES ('viejo', 'auth', 'login', :ts)"
+    ), {"ts": antiguo})
+
+    await crear_tabla_auditoria_acciones(conn)
+    assert await tipo_tabla(conn, TABLA) == "p"
+    assert await tipo_tabla(conn, TABLA_LEGADO) == "r"
+
+    # Durante la copia la tabla nueva ya acepta inserciones.
+    await conn.execute(text(f"INSERT INTO {TABLA} (usuario_id, modulo, accion) VALUES ('nuevo', 'm', 'crear')"))
+    lotes = []
+    while copiadas := await copiar_lote_legado(conn, lote=6):
+        lotes.append(copiadas)
+    assert lotes == [6, 6, 6, 3]
+    assert (await conn.execute(text(f"SELECT count(*) FROM {TABLA}"))).scalar() == 22
+    assert (await conn.execute(text(f"SELECT count(*) FROM {PARTICION_DEFAULT}"))).scalar() == 0
+    ids = (await conn.execute(text(f"SELECT count(DISTINCT id) FROM {TABLA}"))).scalar()
+    assert ids == 22
+
+    # El legado se copia completo, aunque haya filas fuera de la retención.
+    assert (await conn.execute(text(f"SELECT count(*) FROM {TABLA} WHERE usuario_id = 'viejo'"))).scalar() == 1
+
+
+@pytest.fixture
+async def motor_schema_retencion():
+    """Motor cuyas conexiones usan un schema aparte; la retención confirma por partición."""
+    motor = create_async_engine(
+        config.database_url,
+        poolclass=NullPool,
+        connect_args={"server_settings": {"search_path": SCHEMA_RETENCION}},
+    )
+    async with motor.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA_RETENCION} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {SCHEMA_RETENCION}"))
+    try:
+        yield motor
+    finally:
+        async with motor.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA_RETENCION} CASCADE"))
+        await motor.dispose()
+
+
+@pytest.mark.asyncio
+async def test_retencion_vuelca_y_elimina_por_particion(motor_schema_retencion, tmp_path):
+    motor = motor_schema_retencion
+    ahora = datetime.now(timezone.utc)
+    antiguo = ahora - timedelta(days=31 * 30)
+    async with motor.begin() as conn:
+        await crear_tabla_auditoria_acciones(conn)
+        await crear_particiones(conn, desde=inicio_mes(antiguo))
+        await conn.execute(text(f"""
+            INSERT INTO {TABLA} (usuario_id, modulo, accion, timestamp)
+            VALUES ('viejo', 'auth', 'login', :antiguo), ('nuevo', 'tickets', 'crear', :ahora)
+        """), {"antiguo": antiguo, "ahora": ahora})
+
+    # Sin directorio de volcado la retención no elimina nada.
+    assert await aplicar_retencion(motor, meses_retencion=24) == []
+
+    eliminadas = await aplicar_retencion(motor, meses_retencion=24, directorio_volcado=str(tmp_path))
+    mes_antiguo = nombre_particion(inicio_mes(antiguo))
+    assert mes_antiguo in eliminadas
+    # Todas las vencidas se eliminan y el mes de corte se conserva.
+    assert eliminadas == [
+        nombre_particion(sumar_meses(inicio_mes(antiguo), i)) for i in range(len(eliminadas))
+    ]
+    assert nombre_particion(sumar_meses(mes_actual(), -24)) not in eliminadas
+    assert not list(tmp_path.glob("*.parcial"))
+    with gzip.open(tmp_path / f"{mes_antiguo}.csv.gz", "rt") as volcado:
+        lineas = volcado.read().splitlines()
+    assert lineas[0].startswith("id,timestamp,usuario_id")
+    assert any(",viejo," in linea for linea in lineas[1:])
+    async with motor.connect() as conn:
+        assert (await conn.execute(text("SELECT to_regclass(:n)"), {"n": mes_antiguo})).scalar() is None
+        usuarios = (await conn.execute(text(f"SELECT usuario_id FROM {TABLA}"))).scalars().all()
+    assert usuarios == ["nuevo"]
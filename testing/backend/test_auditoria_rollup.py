@@ -0,0 +1,134 @@
+"""
+Rollup por hora de auditoría vs. agregación sobre eventos crudos.
+
+Sobre datos sembrados en un schema aparte (transacción que se revierte):
+las estadísticas leídas del rollup (horas cerradas) + eventos crudos (bordes
+y hora en curso) deben coincidir con las calculadas solo desde los crudos,
+también después de llegar filas tardías a horas ya procesadas.
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.config import config
+from app.core.migrations.auditoria_acciones_migration import crear_tabla_auditoria_acciones
+from app.services.auditoria.rollup_service import (
+    horas_desfasadas,
+    procesar_horas_cerradas,
+    reconciliar_horas_tardias,
+)
+from app.services.auditoria.servicio_estadisticas import ServicioAuditoriaEstadisticas
+
+SCHEMA_PRUEBA = "test_auditoria_rollup"
+TABLAS_ROLLUP = ("auditoria_rollup_hora", "auditoria_rollup_ruta_hora", "auditoria_rollup_estado")
+
+INSERTAR = text("""
+    INSERT INTO auditoria_acciones_usuario
+        (timestamp, usuario_id, usuario_nombre, modulo, accion, ruta, codigo_respuesta,
+         resultado, agente_usuario)
+    VALUES (:timestamp, :usuario_id, :usuario_nombre, :modulo, :accion, :ruta,
+            :codigo_respuesta, :resultado, :agente_usuario)
+""")
+
+
+def _eventos(azar, cantidad, desde, hasta):
+    segundos = int((hasta - desde).total_seconds())
+    eventos = []
+    for _ in range(cantidad):
+        usuario = azar.randint(1, 8)
+        eventos.append({
+            "timestamp": desde + timedelta(seconds=azar.randint(0, segundos)),
+            "usuario_id": f"u{usuario}",
+            "usuario_nombre": f"Usuario {usuario}",
+            "modulo": azar.choice(["tickets", "viaticos", "auth", "reserva_salas"]),
+            "accion": azar.choice(["crear", "consultar", "login"]),
+            "ruta": azar.choice(["/api/v2/auth/login", "/api/v2/tickets", "/api/v2/viaticos/enviar", None]),
+            "codigo_respuesta": azar.choice([200, 401, 403, 409, 422, 500, None]),
+            "resultado": azar.choice(["exito", "exito", "fallo", "denegado"]),
+            "agente_usuario": azar.choice(["Mozilla iPhone", "python-requests", "Mozilla Windows", None]),
+        })
+    return eventos
+
+
+def _normalizar(estadisticas):
+    """Ordena las listas: los empates de los top-N no tienen orden definido."""
+    claves = {
+        "por_modulo": "modulo", "tipos_fallos": "tipo", "top_usuarios": "usuario_id",
+        "por_hora": "rango", "por_dispositivo": "dispositivo",
+    }
+    normalizado = dict(estadisticas)
+    for campo, clave in claves.items():
+        normalizado[campo] = sorted(estadisticas[campo], key=lambda item: item[clave])
+    normalizado["top_rutas"] = sorted(estadisticas["top_rutas"], key=lambda r: (r["ruta"], r["accion"]))
+    normalizado.pop("modulo_mas_activo")
+    return normalizado
+
+
+async def _comparar(db, desde, hasta):
+    rollup = await ServicioAuditoriaEstadisticas.obtener_estadisticas(db, desde, hasta)
+    crudo = await ServicioAuditoriaEstadisticas.obtener_estadisticas(db, desde, hasta, usar_rollup=False)
+    return _normalizar(rollup), _normalizar(crudo)
+
+
+@pytest.fixture
+async def conn_schema_prueba():
+    """Conexión con search_path en un schema vacío; todo se revierte al final."""
+    motor = create_async_engine(config.database_url, poolclass=NullPool)
+    async with motor.connect() as conn:
+        await conn.execute(text(f"CREATE SCHEMA {SCHEMA_PRUEBA}"))
+        for tabla in TABLAS_ROLLUP:
+            await conn.execute(text(
+                f"CREATE TABLE {SCHEMA_PRUEBA}.{tabla} (LIKE public.{tabla} INCLUDING ALL)"
+            ))
+        await conn.execute(text(f"SET LOCAL search_path TO {SCHEMA_PRUEBA}, pg_catalog"))
+        await crear_tabla_auditoria_acciones(conn)
+        yield conn
+        await conn.rollback()
+    await motor.dispose()
+
+
+@pytest.mark.asyncio
+async def test_rollup_coincide_con_agregacion_cruda(conn_schema_prueba):
+    conn = conn_schema_prueba
+    db = AsyncSession(bind=conn)
+    azar = random.Random(46)
+    ahora = datetime.now(timezone.utc)
+    await conn.execute(INSERTAR, _eventos(azar, 600, ahora - timedelta(hours=60), ahora))
+
+    lotes = 1
+    while await procesar_horas_cerradas(conn, gracia_minutos=0, max_horas=24):
+        lotes += 1
+    assert lotes == 3
+    marca = (await conn.execute(text("SELECT procesado_hasta FROM auditoria_rollup_estado"))).scalar()
+    assert marca == (await conn.execute(text("SELECT date_trunc('hour', now())"))).scalar()
+
+    # Rango de varios días con bordes fuera de hora exacta y un rango del mismo día.
+    rangos = [(ahora - timedelta(days=2, minutes=-17), ahora), (ahora - timedelta(hours=5, minutes=10), ahora)]
+    for desde, hasta in rangos:
+        con_rollup, crudo = await _comparar(db, desde, hasta)
+        assert crudo["total_eventos"] > 0
+        assert con_rollup == crudo
+
+    # Filas tardías en una hora ya procesada: el rollup queda corto hasta reconciliar.
+    hora_tardia = marca - timedelta(hours=3)
+    await conn.execute(INSERTAR, _eventos(azar, 5, hora_tardia, hora_tardia + timedelta(minutes=59)))
+    assert await horas_desfasadas(conn, marca - timedelta(hours=48), marca) == [hora_tardia]
+    con_rollup, crudo = await _comparar(db, *rangos[0])
+    assert con_rollup["total_eventos"] == crudo["total_eventos"] - 5
+
+    assert await reconciliar_horas_tardias(conn, ventana_horas=48) == [hora_tardia]
+    con_rollup, crudo = await _comparar(db, *rangos[0])
+    assert con_rollup == crudo
+
+    # Cada hora se procesa una sola vez: otra pasada no agrega nada.
+    assert await procesar_horas_cerradas(conn, gracia_minutos=0) is False
+    agregados = (await conn.execute(text("SELECT sum(total) FROM auditoria_rollup_hora"))).scalar()
+    crudos = (await conn.execute(text(
+        "SELECT count(*) FROM auditoria_acciones_usuario WHERE timestamp < :marca"
+    ), {"marca": marca})).scalar()
+    assert agregados == crudos
@@ -6,7 +6,8 @@ Tests del rate limiter (F1.1 + F1.2):
   conexion viene de un proxy en trusted_proxy_ips.
 - Lockout per-cuenta: tras N fallos se activa lockout en Redis.
 - * rejected en trusted_proxy_ips al startup.
-- Storage del limiter es Redis (no MemoryStorage).
+- Storage del limiter es Redis async (limits.aio, no MemoryStorage).
+- LimiterAsync: conteo con await, 429 al exceder y 503 (StorageError) sin storage.
 
 NO requiere Docker para tests unitarios. Para tests de storage (Redis)
 usa una conexion real a Redis si esta disponible.
@@ -281,30 +282,30 @@ class TestTrustedProxyValidation:
 
 
 class TestLimiterStorageURI:
-    """El limiter exportado usa Redis como storage (no MemoryStorage)."""
+    """El limiter exportado usa Redis async como storage (no MemoryStorage)."""
 
     def test_storage_uri_configurado(self):
         from app.core.rate_limiter import limiter
-        from limits.storage import RedisStorage
-        assert isinstance(limiter._storage, RedisStorage), (
-            f"Esperaba RedisStorage, obtuve {type(limiter._storage)}"
+        from limits.aio.storage import RedisStorage
+        assert isinstance(limiter.storage_async, RedisStorage), (
+            f"Esperaba RedisStorage, obtuve {type(limiter.storage_async)}"
         )
 
     def test_storage_uri_es_el_de_config(self):
         """El storage URI configurado en Limiter es el mismo que el de Settings.
 
-        No usamos `str(limiter._storage)` porque RedisStorage no expone la URI
+        No usamos `str(limiter.storage_async)` porque RedisStorage no expone la URI
         en su repr. En su lugar, comprobamos que el storage existe y es del
         tipo esperado (la URI ya se paso al constructor). Si RedisStorage
         cambia su repr en el futuro, este test sigue siendo valido.
         """
         from app.core.rate_limiter import limiter
         from app.core.config import obtener_configuracion
-        from limits.storage import RedisStorage
+        from limits.aio.storage import RedisStorage
         settings = obtener_configuracion()
         # La URI se paso al constructor; verificamos que el storage es RedisStorage
         # y que la URI de settings es la esperada (no vacia).
-        assert isinstance(limiter._storage, RedisStorage)
+        assert isinstance(limiter.storage_async, RedisStorage)
         assert settings.redis_url
         assert settings.redis_url.startswith("redis://")
 
@@ -337,3 +338,133 @@ class TestPathBodyPreCacheSet:
         assert "/api/v2/auth/forgot-password" in PATHS_CON_BODY_PARA_RATE_LIMIT
         assert "/api/v2/auth/reset-password" in PATHS_CON_BODY_PARA_RATE_LIMIT
         assert "/api/v2/auth/registro" in PATHS_CON_BODY_PARA_RATE_LIMIT
+
+
+def _limiter_en_memoria():
+    from app.core.rate_limiter import LimiterAsync, _login_key_func
+    return LimiterAsync(
+        key_func=_login_key_func, default_limits=[], headers_enabled=False,
+        storage_uri="memory://", config_filename="",
+    )
+
+
+class TestLimiterAsync:
+    """El decorador hace await sobre limits.aio (no bloquea el event loop)."""
+
+    @pytest.mark.asyncio
+    async def test_excede_limite_lanza_429_por_cedula(self):
+        limiter = _limiter_en_memoria()
+
+        @limiter.limit("2/minute")
+        async def endpoint(request: Request):
+            return "ok"
+
+        for _ in range(2):
+            assert await endpoint(_build_request(body=b"username=55&password=x")) == "ok"
+        with pytest.raises(RateLimitExceeded):
+            await endpoint(_build_request(body=b"username=55&password=x"))
+        # Otra cedula tiene su propio contador.
+        assert await endpoint(_build_request(body=b"username=56&password=x")) == "ok"
+
+    @pytest.mark.asyncio
+    async def test_storage_caido_es_fail_closed(self):
+        from limits.errors import StorageError
+        limiter = _limiter_en_memoria()
+
+        async def caido(*args, **kwargs):
+            raise StorageError(ConnectionError("redis caido"))
+
+        limiter.estrategia_async.hit = caido
+
+        @limiter.limit("5/minute")
+        async def endpoint(request: Request):
+            return "ok"
+
+        with pytest.raises(StorageError):
+            await endpoint(_build_request(body=b"username=57&password=x"))
+
+    @pytest.mark.asyncio
+    async def test_misma_clave_y_alcance_que_slowapi(self):
+        """El decorador propio cuenta con la misma clave que el de SlowAPI
+        instalado: los contadores existentes en Redis siguen valiendo."""
+        from slowapi import Limiter
+        from app.core.rate_limiter import _login_key_func
+        referencia = Limiter(
+            key_func=_login_key_func, headers_enabled=False,
+            storage_uri="memory://", config_filename="",
+        )
+        limiter = _limiter_en_memoria()
+
+        async def endpoint(request: Request):
+            return "ok"
+
+        request_ref = _build_request(body=b"username=58&password=x")
+        request_async = _build_request(body=b"username=58&password=x")
+        await referencia.limit("3/minute")(endpoint)(request_ref)
+        await limiter.limit("3/minute")(endpoint)(request_async)
+        assert request_async.state.view_rate_limit == request_ref.state.view_rate_limit
+
+    def test_endpoint_sync_rechazado(self):
+        limiter = _limiter_en_memoria()
+        with pytest.raises(TypeError):
+            @limiter.limit("5/minute")
+            def endpoint(request: Request):
+                return "ok"
+
+
+class TestLockoutAsync:
+    """Lockout per-cuenta sobre el storage async."""
+
+    @pytest.mark.asyncio
+    async def test_lockout_tras_umbral_y_desbloqueo(self):
+        import app.core.rate_limiter as rl
+
+        limiter = _limiter_en_memoria()
+        with patch.object(rl, "limiter", limiter):
+            umbral = rl._settings.lockout_umbral_fallos
+            for _ in range(umbral - 1):
+                await rl._registrar_fallo_cedula("999")
+            assert await rl._verificar_lockout_cedula("999") is None
+
+            await rl._registrar_fallo_cedula("999")
+            restante = await rl._verificar_lockout_cedula("999")
+            assert 0 < restante <= rl._settings.lockout_duracion_minutos * 60
+
+            assert await rl.desbloquear_cedula("999") >= 1
+            assert await rl._verificar_lockout_cedula("999") is None
+
+    @pytest.mark.asyncio
+    async def test_desbloqueo_en_redis_usa_scan(self):
+        """Con Redis las claves de login se buscan con SCAN (KEYS bloquea Redis)."""
+        import app.core.rate_limiter as rl
+
+        class ClienteFalso:
+            def __init__(self):
+                self.patrones, self.borradas = [], []
+
+            async def scan_iter(self, match=None, count=None):
+                self.patrones.append(match)
+                for clave in ("LIMITS:LIMITER/login:999/x", "LIMITS:LIMITER/login:999/y"):
+                    yield clave
+
+            async def delete(self, claves):
+                self.borradas = sorted(claves)
+                return len(claves)
+
+        storage = MagicMock()
+        storage.storage = ClienteFalso()
+        storage.prefixed_key = lambda clave: f"LIMITS:{clave}"
+        with patch.object(rl.limiter, "storage_async", storage):
+            assert await rl.desbloquear_cedula(" 999 ") == 4
+        assert storage.storage.patrones == ["LIMITS:*login*:999*"]
+        assert "LIMITS:lockout:999" in storage.storage.borradas
+
+    @pytest.mark.asyncio
+    async def test_lockout_storage_caido_no_rompe_login(self):
+        import app.core.rate_limiter as rl
+
+        storage = MagicMock()
+        storage.get_expiry = MagicMock(side_effect=ConnectionError("caido"))
+        with patch.object(rl.limiter, "storage_async", storage):
+            assert await rl._verificar_lockout_cedula("999") is None
+            await rl._registrar_fallo_cedula("999")
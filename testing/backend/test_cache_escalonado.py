@@ -0,0 +1,219 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.cache import CacheEscalonado
+
+
+class _RedisFalso:
+    """Subconjunto en memoria de redis.asyncio usado por la caché."""
+
+    def __init__(self):
+        self.kv = {}
+        self.conjuntos = {}
+        self.publicados = []
+
+    async def get(self, clave):
+        return self.kv.get(clave)
+
+    async def set(self, clave, valor, ex=None, nx=False):
+        if nx and clave in self.kv:
+            return None
+        self.kv[clave] = valor
+        return True
+
+    async def sadd(self, clave, miembro):
+        self.conjuntos.setdefault(clave, set()).add(miembro)
+
+    async def expire(self, clave, segundos):
+        pass
+
+    async def delete(self, *claves):
+        for clave in claves:
+            self.kv.pop(clave, None)
+            self.conjuntos.pop(clave, None)
+
+    async def sunion(self, *claves):
+        return set().union(*(self.conjuntos.get(c, set()) for c in claves))
+
+    async def publish(self, canal, mensaje):
+        self.publicados.append((canal, mensaje))
+
+    def pipeline(self, transaction=False):
+        redis_falso = self
+
+        class _Pipe:
+            def __init__(self):
+                self.llamadas = []
+
+            def __getattr__(self, nombre):
+                return lambda *a, **k: self.llamadas.append(getattr(redis_falso, nombre)(*a, **k))
+
+            async def execute(self):
+                return [await c for c in self.llamadas]
+
+        return _Pipe()
+
+
+def _con_redis(redis_falso, **kwargs):
+    cache = CacheEscalonado(redis_url="redis://falso", **kwargs)
+
+    async def _asegurar():
+        cache._redis = redis_falso
+        return True
+
+    cache._asegurar_redis = _asegurar
+    return cache
+
+
+class _Contador:
+    def __init__(self, valor=None, demora=0.0):
+        self.llamadas = 0
+        self.valor = valor
+        self.demora = demora
+
+    async def __call__(self):
+        self.llamadas += 1
+        if self.demora:
+            await asyncio.sleep(self.demora)
+        return self.valor if self.valor is not None else {"n": self.llamadas}
+
+
+@pytest.mark.asyncio
+async def test_misses_concurrentes_cargan_una_sola_vez():
+    cache = CacheEscalonado()
+    cargador = _Contador(demora=0.05)
+
+    resultados = await asyncio.gather(*(cache.obtener_o_cargar("k", cargador) for _ in range(50)))
+
+    assert cargador.llamadas == 1
+    assert all(r == {"n": 1} for r in resultados)
+    metricas = cache.obtener_metricas()
+    assert metricas["cargas"] == 1
+    assert metricas["esperas"] == 49
+
+
+@pytest.mark.asyncio
+async def test_lru_acotado_y_expiracion(monkeypatch):
+    cache = CacheEscalonado(max_entradas=2)
+    await cache.obtener_o_cargar("a", _Contador("A"))
+    await cache.obtener_o_cargar("b", _Contador("B"))
+    await cache.obtener_o_cargar("a", _Contador("nunca"))  # "a" pasa a ser la más reciente
+    await cache.obtener_o_cargar("c", _Contador("C"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.obtener_metricas()["desalojos"] == 1
+
+    cache.set("corta", 1, ttl=1)
+    ahora = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: ahora + 2)
+    assert cache.get("corta") is None
+
+
+@pytest.mark.asyncio
+async def test_error_de_carga_no_se_cachea():
+    cache = CacheEscalonado()
+
+    async def falla():
+        raise RuntimeError("db caída")
+
+    with pytest.raises(RuntimeError):
+        await cache.obtener_o_cargar("k", falla)
+    assert await cache.obtener_o_cargar("k", _Contador("ok")) == "ok"
+
+
+@pytest.mark.asyncio
+async def test_invalidar_por_etiqueta_y_durante_la_carga():
+    cache = CacheEscalonado()
+    await cache.obtener_o_cargar("tickets_resumen", _Contador("v1"), etiquetas=("tickets",))
+    await cache.obtener_o_cargar("solid", _Contador("s1"), etiquetas=("catalogo_solid",))
+
+    await cache.invalidar("tickets")
+
+    assert cache.get("tickets_resumen") is None
+    assert cache.get("solid") == "s1"
+
+    # Una carga que empezó antes de la invalidación no deja el valor viejo cacheado.
+    lenta = _Contador("viejo", demora=0.05)
+    tarea = asyncio.create_task(cache.obtener_o_cargar("tickets_resumen", lenta, etiquetas=("tickets",)))
+    await asyncio.sleep(0.01)
+    await cache.invalidar("tickets")
+    assert await tarea == "viejo"
+    assert cache.get("tickets_resumen") is None
+
+
+@pytest.mark.asyncio
+async def test_nivel_redis_compartido_entre_workers():
+    redis_falso = _RedisFalso()
+    worker_a, worker_b = _con_redis(redis_falso), _con_redis(redis_falso)
+    cargador_b = _Contador("no-debe-usarse")
+
+    await worker_a.obtener_o_cargar("panel", _Contador([{"prioridad": "Alta", "cantidad": 3}]), etiquetas=("tickets",))
+    valor = await worker_b.obtener_o_cargar("panel", cargador_b, etiquetas=("tickets",))
+
+    assert valor == [{"prioridad": "Alta", "cantidad": 3}]
+    assert cargador_b.llamadas == 0
+    assert worker_b.obtener_metricas()["aciertos_redis"] == 1
+
+    await worker_a.invalidar("tickets")
+    assert "cache:v:panel" not in redis_falso.kv
+    assert redis_falso.publicados == [("cache:invalidaciones", '["tickets"]')]
+    # Lo que haría el listener pub/sub del worker B al recibir el aviso.
+    worker_b._invalidar_local(["tickets"])
+    assert await worker_b.obtener_o_cargar("panel", cargador_b, etiquetas=("tickets",)) == "no-debe-usarse"
+
+
+@pytest.mark.asyncio
+async def test_cancelar_al_primer_llamador_no_aborta_a_los_demas():
+    cache = CacheEscalonado()
+    cargador = _Contador("valor", demora=0.05)
+
+    primero = asyncio.create_task(cache.obtener_o_cargar("k", cargador))
+    await asyncio.sleep(0)
+    esperando = [asyncio.create_task(cache.obtener_o_cargar("k", cargador)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    primero.cancel()
+
+    assert await asyncio.gather(*esperando) == ["valor"] * 3
+    with pytest.raises(asyncio.CancelledError):
+        await primero
+    assert cargador.llamadas == 1
+    assert cache.get("k") == "valor"
+
+
+@pytest.mark.asyncio
+async def test_mismo_tipo_desde_cualquier_nivel():
+    from datetime import date
+
+    redis_falso = _RedisFalso()
+    worker_a, worker_b = _con_redis(redis_falso), _con_redis(redis_falso)
+    original = {"fecha": date(2026, 3, 1), "ids": (1, 2)}
+
+    cargado = await worker_a.obtener_o_cargar("k", _Contador(original))
+    local = await worker_a.obtener_o_cargar("k", _Contador("nunca"))
+    desde_redis = await worker_b.obtener_o_cargar("k", _Contador("nunca"))
+
+    assert cargado == local == desde_redis == {"fecha": "2026-03-01", "ids": [1, 2]}
+
+
+@pytest.mark.asyncio
+async def test_candado_se_libera_si_la_carga_falla_o_se_invalida():
+    redis_falso = _RedisFalso()
+    cache = _con_redis(redis_falso)
+
+    async def falla():
+        raise RuntimeError("db caída")
+
+    with pytest.raises(RuntimeError):
+        await cache.obtener_o_cargar("k", falla)
+    assert "cache:candado:k" not in redis_falso.kv
+
+    lenta = _Contador("viejo", demora=0.05)
+    tarea = asyncio.create_task(cache.obtener_o_cargar("k", lenta, etiquetas=("tickets",)))
+    await asyncio.sleep(0.01)
+    assert "cache:candado:k" in redis_falso.kv
+    await cache.invalidar("tickets")
+    assert await tarea == "viejo"
+    assert "cache:candado:k" not in redis_falso.kv and "cache:v:k" not in redis_falso.kv
@@ -0,0 +1,111 @@
+"""Pruebas del verificador de compromisos por vencer (consulta única y anti-join)."""
+
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import delete, event, text
+
+from app.config import config
+from app.models.alerta.notificacion import NotificacionUsuario
+from app.models.auth.usuario import Usuario
+from app.models.desarrollo.actividad import Actividad
+from app.models.desarrollo.desarrollo import Desarrollo
+from app.services.desarrollo.compromiso_notificacion import verificar_y_notificar_compromisos
+
+TEST_DESARROLLO_ID = "TEST-COMPROMISOS"
+HOY = date(2026, 3, 10)
+USUARIOS = ("USR-COMP-ASIG", "USR-COMP-RESP", "USR-COMP-SINCORREO")
+
+
+async def _limpiar(db):
+    await db.execute(delete(NotificacionUsuario).where(NotificacionUsuario.usuario_id.in_(USUARIOS)))
+    await db.execute(delete(Actividad).where(Actividad.desarrollo_id == TEST_DESARROLLO_ID))
+    await db.execute(delete(Desarrollo).where(Desarrollo.id == TEST_DESARROLLO_ID))
+    await db.execute(delete(Usuario).where(Usuario.id.in_(USUARIOS)))
+    await db.execute(text("DELETE FROM correos_salientes WHERE asunto LIKE 'Aviso de Vencimiento de Compromiso: TEST-COMP%'"))
+    await db.commit()
+
+
+@pytest.fixture
+async def escenario(db_session, monkeypatch):
+    monkeypatch.setattr(config, "smtp_host", "smtp.test")
+    monkeypatch.setattr(config, "smtp_user", "portal@test.com")
+    monkeypatch.setattr(config, "smtp_pass", "secreto")
+    await _limpiar(db_session)
+    db_session.add_all([
+        Usuario(id="USR-COMP-ASIG", cedula="USR-COMP-ASIG", hash_contrasena="x", nombre="Asignado", correo="asignado@test.com"),
+        Usuario(id="USR-COMP-RESP", cedula="USR-COMP-RESP", hash_contrasena="x", nombre="Responsable", correo="responsable@test.com"),
+        Usuario(id="USR-COMP-SINCORREO", cedula="USR-COMP-SINCORREO", hash_contrasena="x", nombre="Sin correo"),
+        Desarrollo(id=TEST_DESARROLLO_ID, nombre="Proyecto compromisos", creado_por_id="USR-COMP-RESP"),
+    ])
+    await db_session.flush()
+
+    def actividad(titulo, dias, cumplido=False, asignado="USR-COMP-ASIG", responsable="USR-COMP-RESP"):
+        return Actividad(
+            desarrollo_id=TEST_DESARROLLO_ID,
+            titulo=f"TEST-COMP {titulo}",
+            estado="Pendiente",
+            porcentaje_avance=0,
+            asignado_a_id=asignado,
+            responsable_id=responsable,
+            compromiso="Entregar informe",
+            compromiso_fecha=HOY + timedelta(days=dias),
+            compromiso_cumplido=cumplido,
+        )
+
+    db_session.add_all([
+        actividad("hoy", 0),
+        actividad("en tres dias", 3, asignado="USR-COMP-SINCORREO"),
+        actividad("mismo usuario", 1, asignado="USR-COMP-RESP"),
+        actividad("lejana", 10),
+        actividad("vencida", -1),
+        actividad("cumplida", 2, cumplido=True),
+    ])
+    await db_session.commit()
+    yield db_session
+    await _limpiar(db_session)
+
+
+@pytest.mark.asyncio
+async def test_notifica_solo_vencimientos_de_0_a_3_dias_una_vez(escenario):
+    db = escenario
+    sentencias = []
+    motor = db.bind.sync_engine
+
+    def contar(_conn, _cursor, statement, *_args):
+        sentencias.append(statement)
+
+    event.listen(motor, "before_cursor_execute", contar)
+    try:
+        resumen = await verificar_y_notificar_compromisos(db, hoy=HOY)
+    finally:
+        event.remove(motor, "before_cursor_execute", contar)
+
+    # "hoy" -> asignado + responsable; "en tres dias" -> sin correo + responsable;
+    # "mismo usuario" -> responsable una sola vez.
+    assert resumen == {"notificaciones": 5, "correos": 4}
+    # Una consulta para las notificaciones y un INSERT en lote para los correos.
+    assert len([s for s in sentencias if "notificaciones_usuario" in s]) == 1
+    assert len([s for s in sentencias if "correos_salientes" in s]) == 1
+
+    notificaciones = (await db.execute(text("""
+        SELECT usuario_id, referencia_id, tipo_evento, mensaje FROM notificaciones_usuario
+        WHERE usuario_id = ANY(:usuarios) ORDER BY referencia_id, usuario_id
+    """), {"usuarios": list(USUARIOS)})).fetchall()
+    por_tipo = {(n.usuario_id, n.tipo_evento) for n in notificaciones}
+    assert por_tipo == {
+        ("USR-COMP-ASIG", "compromiso_vence_0d"),
+        ("USR-COMP-RESP", "compromiso_vence_0d"),
+        ("USR-COMP-RESP", "compromiso_vence_1d"),
+        ("USR-COMP-RESP", "compromiso_vence_3d"),
+        ("USR-COMP-SINCORREO", "compromiso_vence_3d"),
+    }
+    mensajes = {n.mensaje for n in notificaciones}
+    assert "Tu compromiso en la actividad 'TEST-COMP hoy' vence hoy." in mensajes
+    assert "Tu compromiso en la actividad 'TEST-COMP en tres dias' vence en 3 días (13/03/2026)." in mensajes
+
+    # La segunda corrida del mismo día no repite avisos.
+    assert await verificar_y_notificar_compromisos(db, hoy=HOY) == {"notificaciones": 0, "correos": 0}
+    # Al día siguiente cambian los umbrales: "en tres dias" (2 usuarios) y "mismo usuario".
+    siguiente = await verificar_y_notificar_compromisos(db, hoy=HOY + timedelta(days=1))
+    assert siguiente["notificaciones"] == 3
@@ -0,0 +1,217 @@
+"""
+Conteos con FILTER (app.core.agregados) frente a las implementaciones previas.
+
+Para cada tablero se compara el payload con una copia del cálculo anterior
+(un COUNT por indicador / por semana) y se mide viajes a la base y latencia.
+Con `-s` imprime la tabla del benchmark:
+
+    pytest testing/backend/test_conteos_agregados.py -s
+"""
+
+import importlib
+import time
+import warnings
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import delete, func, insert
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.sql.compiler import FROM_LINTING, WARN_LINTING
+from sqlmodel import select
+
+from app.api.panel_control.router import obtener_metricas, obtener_progreso_semanal
+from app.core.agregados import Conteos, consulta_conteos, contar
+from app.core.consultas_sql import medir_consultas
+from app.models.desarrollo.desarrollo import Desarrollo
+from app.models.ticket.ticket import CategoriaTicket, Ticket
+from app.services.cache import cache
+from app.services.ticket.stats_service import StatService
+from app.utils_date import get_bogota_now
+
+# El paquete reexporta el APIRouter con el mismo nombre que el módulo.
+panel_router = importlib.import_module("app.api.panel_control.router")
+
+PREFIJO = "TEST-AGR"
+CATEGORIA = "TEST-AGR-CAT"
+TICKETS_SEMBRADOS = 400
+REPETICIONES = 20
+ESTADOS_TICKET = ("Pendiente", "Proceso", "Cerrado", "Abierto", "En Proceso", "Escalado", "Resuelto")
+ESTADOS_DESARROLLO = ("En Progreso", "Activo", "Completado", "Terminado", "Pendiente")
+
+
+# --- Implementaciones previas (referencia) ---------------------------------
+
+async def _resumen_legado(db):
+    async def contar_donde(*condiciones):
+        return (await db.execute(select(func.count(Ticket.id)).where(*condiciones))).scalar() or 0
+
+    total = (await db.execute(select(func.count(Ticket.id)))).scalar() or 0
+    pendiente = await contar_donde(Ticket.estado == "Pendiente")
+    en_proceso = await contar_donde(Ticket.estado == "Proceso")
+    cerrados = await contar_donde(Ticket.estado == "Cerrado")
+    escalados = await contar_donde(Ticket.estado == "Cerrado", Ticket.sub_estado == "Escalado")
+    return {
+        "total": total,
+        "nuevos": pendiente,
+        "en_proceso": en_proceso,
+        "pendientes": pendiente + en_proceso,
+        "cerrados": cerrados,
+        "escalados": escalados,
+        "completion_rate": round((cerrados / total * 100) if total > 0 else 0, 1),
+        "total_tickets": total,
+    }
+
+
+async def _metricas_legado(db):
+    async def contar_donde(modelo, *condiciones):
+        return (await db.execute(select(func.count(modelo.id)).where(*condiciones))).scalar() or 0
+
+    total_desarrollos = await contar_donde(Desarrollo)
+    activos = await contar_donde(
+        Desarrollo, Desarrollo.estado_general.in_(["En Progreso", "Activo", "activo", "En curso", "En proceso"])
+    )
+    total_tickets = await contar_donde(Ticket)
+    pendientes = await contar_donde(
+        Ticket, Ticket.estado.in_(["Abierto", "Asignado", "En Proceso", "Pendiente Info", "Escalado"])
+    )
+    completados = await contar_donde(
+        Desarrollo, Desarrollo.estado_general.in_(["Completado", "Terminado", "completado"])
+    )
+    return {
+        "total_desarrollos": total_desarrollos,
+        "desarrollos_activos": activos,
+        "total_tickets": total_tickets,
+        "tickets_pendientes": pendientes,
+        "porcentaje_completado": round((completados / total_desarrollos * 100) if total_desarrollos > 0 else 0, 1),
+        "desarrollos_completados": completados,
+    }
+
+
+async def _progreso_legado(db):
+    hoy = get_bogota_now()
+    semanas = []
+    for i in range(4):
+        inicio = hoy - timedelta(weeks=i + 1)
+        fin = hoy - timedelta(weeks=i)
+        completados = (await db.execute(select(func.count(Ticket.id)).where(
+            Ticket.estado == "Cerrado", Ticket.fecha_cierre.between(inicio, fin)
+        ))).scalar() or 0
+        creados = (await db.execute(select(func.count(Ticket.id)).where(
+            Ticket.creado_en.between(inicio, fin)
+        ))).scalar() or 0
+        semanas.insert(0, {
+            "semana": f"S{4 - i}",
+            "nombre": f"Semana {4 - i}",
+            "completados": completados,
+            "creados": creados,
+            "pendientes": max(0, creados - completados),
+        })
+    return semanas
+
+
+# --- Datos -----------------------------------------------------------------
+
+async def _limpiar(db):
+    await db.execute(delete(Ticket).where(Ticket.id.like(f"{PREFIJO}-%")))
+    await db.execute(delete(CategoriaTicket).where(CategoriaTicket.id == CATEGORIA))
+    await db.execute(delete(Desarrollo).where(Desarrollo.id.like(f"{PREFIJO}-%")))
+    await db.commit()
+
+
+@pytest.fixture
+async def datos(db_session, monkeypatch):
+    async def sin_cache(_clave, cargador, **_kwargs):
+        return await cargador()
+
+    monkeypatch.setattr(cache, "obtener_o_cargar", sin_cache)
+    # Los cargadores del panel abren su propia sesión; aquí, sobre el motor de la prueba.
+    monkeypatch.setattr(panel_router, "AsyncSessionLocal", async_sessionmaker(db_session.bind, expire_on_commit=False))
+    await _limpiar(db_session)
+    db_session.add(CategoriaTicket(id=CATEGORIA, nombre="Agregados", tipo_formulario="soporte"))
+    db_session.add_all([
+        Desarrollo(id=f"{PREFIJO}-{i}", nombre=f"Desarrollo {i}", estado_general=ESTADOS_DESARROLLO[i % 5])
+        for i in range(25)
+    ])
+    await db_session.flush()
+    # Medio día de desfase para no caer en los bordes de semana.
+    ahora = get_bogota_now() - timedelta(hours=12)
+    tickets = []
+    for i in range(TICKETS_SEMBRADOS):
+        estado = ESTADOS_TICKET[i % len(ESTADOS_TICKET)]
+        creado = ahora - timedelta(days=i % 40)
+        tickets.append({
+            "id": f"{PREFIJO}-{i}",
+            "categoria_id": CATEGORIA,
+            "creador_id": "TEST-AGR-CREADOR",
+            "estado": estado,
+            "sub_estado": "Escalado" if i % 3 == 0 else "Resuelto",
+            "creado_en": creado,
+            "fecha_cierre": creado + timedelta(days=2) if estado == "Cerrado" else None,
+        })
+    await db_session.execute(insert(Ticket), tickets)
+    await db_session.commit()
+    yield db_session
+    await _limpiar(db_session)
+
+
+async def _medir(llamada):
+    with medir_consultas() as registro:
+        resultado = await llamada()
+    inicio = time.perf_counter()
+    for _ in range(REPETICIONES):
+        await llamada()
+    return resultado, registro.consultas, (time.perf_counter() - inicio) * 1000 / REPETICIONES
+
+
+def test_consulta_conteos_combina_tablas_en_un_select():
+    sql = str(consulta_conteos(
+        Conteos(Ticket, {"total": None, "cerrados": Ticket.estado == "Cerrado"}),
+        Conteos(Desarrollo, {"desarrollos": None}),
+    ))
+    assert sql.count("SELECT") == 3
+    assert "count(*) FILTER (WHERE tickets.estado = :estado_1) AS cerrados" in sql
+
+
+def test_consulta_conteos_une_subconsultas_sin_producto_cartesiano():
+    consulta = consulta_conteos(
+        Conteos(Ticket, {"total": None}),
+        Conteos(Desarrollo, {"desarrollos": None}),
+        Conteos(CategoriaTicket, {"categorias": None}),
+    )
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        sql = str(consulta.compile(dialect=postgresql.dialect(), linting=FROM_LINTING | WARN_LINTING))
+    assert sql.count("ON true") == 2
+
+
+@pytest.mark.asyncio
+async def test_contar_devuelve_ceros_sin_filas(db_session):
+    conteos = await contar(db_session, Conteos(Ticket, {"ninguno": None}, filtro=Ticket.id == "NO-EXISTE"))
+    assert conteos == {"ninguno": 0}
+
+
+@pytest.mark.asyncio
+async def test_tableros_iguales_a_la_version_anterior_en_un_viaje(datos):
+    db = datos
+    casos = [
+        ("ticket estadisticas/resumen", _resumen_legado, StatService.obtener_estadisticas_resumen),
+        ("panel metricas", _metricas_legado, lambda _db: obtener_metricas()),
+        ("panel progreso-semanal", _progreso_legado, lambda _db: obtener_progreso_semanal()),
+    ]
+    filas = []
+    for nombre, legado, nuevo in casos:
+        esperado, viajes_antes, ms_antes = await _medir(lambda: legado(db))
+        obtenido, viajes_despues, ms_despues = await _medir(lambda: nuevo(db))
+        assert obtenido == esperado, nombre
+        assert viajes_despues == 1, nombre
+        filas.append((nombre, viajes_antes, viajes_despues, ms_antes, ms_despues))
+
+    assert [f[1] for f in filas] == [5, 5, 8]
+    semanas = await obtener_progreso_semanal()
+    assert sum(s["creados"] for s in semanas) > 0
+
+    print(f"\nBenchmark ({TICKETS_SEMBRADOS} tickets sembrados, promedio de {REPETICIONES} corridas)")
+    print(f"{'tablero':<28}{'viajes antes':>14}{'después':>9}{'ms antes':>10}{'ms después':>12}")
+    for nombre, viajes_antes, viajes_despues, ms_antes, ms_despues in filas:
+        print(f"{nombre:<28}{viajes_antes:>14}{viajes_despues:>9}{ms_antes:>10.2f}{ms_despues:>12.2f}")
@@ -179,7 +179,7 @@ async def test_preview_grancoop_sanea_error_y_usa_proceso_cancelable():
     app.dependency_overrides[obtener_erp_db_opcional] = erp_pruebas
     try:
         with patch(
-            "app.api.novedades_nomina.routers.cooperativas_grancoop.to_process.run_sync",
+            "app.services.novedades_nomina.ejecutor_extraccion.to_process.run_sync",
             new=AsyncMock(side_effect=ValueError("detalle interno sensible")),
         ) as ejecutar:
             async with AsyncClient(
@@ -0,0 +1,157 @@
+import threading
+from datetime import date, datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy import text
+
+from app.services.erp.directorio_empleados_service import (
+    DirectorioEmpleadosService,
+    calcular_cambios,
+    normalizar_fila_erp,
+)
+from app.services.erp.empleados_service import EmpleadosService
+
+
+def _fila(cedula, nombre="ANA", estado="Activo", fecharetiro=None, **extra):
+    base = dict(
+        nrocedula=cedula,
+        nombre=nombre,
+        estado=estado,
+        empresa="REFRIDCOL",
+        centrocosto="100",
+        area="TI",
+        cargo="ANALISTA",
+        ciudadcontratacion="BOGOTA",
+        fecharetiro=fecharetiro,
+    )
+    base.update(extra)
+    return SimpleNamespace(**base)
+
+
+class _ErpFalso:
+    def __init__(self, filas):
+        self.filas = filas
+        self.consultas = 0
+
+    def execute(self, *_args, **_kwargs):
+        self.consultas += 1
+        return SimpleNamespace(fetchall=lambda: list(self.filas))
+
+
+def test_calcular_cambios_solo_devuelve_diferencias():
+    existente = normalizar_fila_erp(_fila("1"))
+    modificado = normalizar_fila_erp(_fila("2"))
+    huellas = {"1": existente["huella"], "2": modificado["huella"], "3": "x" * 32}
+
+    cambios, eliminadas, total = calcular_cambios(
+        [_fila(" 1 "), _fila("2", estado="Retirado"), _fila("4")], huellas
+    )
+
+    assert total == 3
+    assert sorted(c["cedula"] for c in cambios) == ["2", "4"]
+    assert eliminadas == ["3"]
+
+
+def test_normalizar_fila_acepta_fecharetiro_como_datetime_o_texto():
+    assert normalizar_fila_erp(_fila("1", fecharetiro=datetime(2025, 3, 1, 8))).get("fecharetiro") == date(2025, 3, 1)
+    assert normalizar_fila_erp(_fila("1", fecharetiro="2025-03-01 00:00")).get("fecharetiro") == date(2025, 3, 1)
+    assert normalizar_fila_erp(_fila("1", fecharetiro="sin fecha")).get("fecharetiro") is None
+
+
+def test_consultar_bulk_usa_erp_si_la_replica_no_esta_vigente():
+    db_erp = MagicMock()
+    db_erp.execute.return_value.fetchall.return_value = [
+        SimpleNamespace(nrocedula="10 ", nombre="LUIS", estado=None, empresa=None, ciudadcontratacion=None)
+    ]
+    with patch.object(DirectorioEmpleadosService, "consultar_bulk", return_value=None):
+        mapa = EmpleadosService.consultar_empleados_bulk(db_erp, ["10"])
+
+    assert mapa == {"10": {"nombre": "LUIS", "estado": "Desconocido", "empresa": "", "ciudadcontratacion": ""}}
+    db_erp.execute.assert_called_once()
+
+
+def test_consultar_bulk_no_toca_el_erp_si_la_replica_esta_vigente():
+    db_erp = MagicMock()
+    replica = {"10": {"nombre": "LUIS", "estado": "Activo", "empresa": "X", "ciudadcontratacion": ""}}
+    with patch.object(DirectorioEmpleadosService, "consultar_bulk", return_value=replica):
+        assert EmpleadosService.consultar_empleados_bulk(db_erp, ["10"]) == replica
+
+    db_erp.execute.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_alertas_consultan_la_replica_fuera_del_event_loop():
+    from app.api.lineas_corporativas.alertas_router import obtener_alertas_empleados
+
+    hilos = []
+
+    def consultar_bulk(cedulas):
+        hilos.append(threading.current_thread())
+        return {"10": {"estado": "Retirado", "fecharetiro": date(2025, 3, 1)}}
+
+    db_local = AsyncMock()
+    db_local.execute.return_value.scalars = MagicMock()
+    db_local.execute.return_value.scalars.return_value.all.return_value = ["10"]
+    with patch.object(DirectorioEmpleadosService, "consultar_bulk", side_effect=consultar_bulk):
+        respuesta = await obtener_alertas_empleados(None, db_local)
+
+    assert hilos and hilos[0] is not threading.main_thread()
+    assert respuesta["alertas"]["10"]["clase"] == "CRITICAL"
+
+
+@pytest.fixture
+def db_local_directorio():
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        db.execute(text("SELECT 1 FROM erp_directorio_sincronizacion LIMIT 1"))
+    except Exception:
+        db.close()
+        pytest.skip("Base de datos local no disponible")
+    respaldo_estado = db.execute(text("SELECT * FROM erp_directorio_sincronizacion")).mappings().all()
+    respaldo_filas = db.execute(text("SELECT * FROM erp_directorio_empleados")).mappings().all()
+    db.execute(text("DELETE FROM erp_directorio_empleados"))
+    db.execute(text("DELETE FROM erp_directorio_sincronizacion"))
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.rollback()
+        db.execute(text("DELETE FROM erp_directorio_empleados"))
+        db.execute(text("DELETE FROM erp_directorio_sincronizacion"))
+        for tabla, filas in (
+            ("erp_directorio_empleados", respaldo_filas),
+            ("erp_directorio_sincronizacion", respaldo_estado),
+        ):
+            for fila in filas:
+                columnas = ", ".join(fila.keys())
+                valores = ", ".join(f":{c}" for c in fila.keys())
+                db.execute(text(f"INSERT INTO {tabla} ({columnas}) VALUES ({valores})"), dict(fila))
+        db.commit()
+        db.close()
+
+
+def test_sincronizacion_incremental_y_consulta_desde_replica(db_local_directorio):
+    db = db_local_directorio
+    assert DirectorioEmpleadosService.consultar_bulk(["T-DIR-1"], db) is None
+
+    erp = _ErpFalso([_fila("T-DIR-1"), _fila("T-DIR-2", estado="Retirado", fecharetiro=date(2025, 1, 31))])
+    primera = DirectorioEmpleadosService.sincronizar(erp, db)
+    assert primera["filas_actualizadas"] == 2
+
+    segunda = DirectorioEmpleadosService.sincronizar(erp, db)
+    assert segunda["filas_actualizadas"] == 0
+    assert segunda["filas_eliminadas"] == 0
+
+    erp.filas = [_fila("T-DIR-1", cargo="LIDER")]
+    tercera = DirectorioEmpleadosService.sincronizar(erp, db)
+    assert (tercera["filas_actualizadas"], tercera["filas_eliminadas"]) == (1, 1)
+
+    mapa = DirectorioEmpleadosService.consultar_bulk(["T-DIR-1", "T-DIR-2"], db)
+    assert list(mapa) == ["T-DIR-1"]
+    assert mapa["T-DIR-1"]["cargo"] == "LIDER"
+    assert [e["nrocedula"] for e in DirectorioEmpleadosService.obtener_activos(db)] == ["T-DIR-1"]
+    assert DirectorioEmpleadosService.obtener_estado(db)["vigente"] is True
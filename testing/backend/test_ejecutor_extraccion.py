@@ -0,0 +1,65 @@
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.services.novedades_nomina.ejecutor_extraccion import (
+    TiempoExtraccionExcedidoError,
+    ejecutar_extractor,
+    obtener_metricas_extraccion,
+)
+
+
+@pytest.mark.asyncio
+async def test_ejecuta_extractor_en_proceso_y_registra_metricas():
+    antes = obtener_metricas_extraccion()["completados"]
+
+    resultado = await ejecutar_extractor(sorted, [3, 1, 2], timeout=30)
+
+    metricas = obtener_metricas_extraccion()
+    assert resultado == [1, 2, 3]
+    assert metricas["completados"] == antes + 1
+    assert metricas["en_cola"] == 0
+    assert metricas["en_ejecucion"] == 0
+
+
+@pytest.mark.asyncio
+async def test_propaga_error_del_extractor():
+    antes = obtener_metricas_extraccion()["fallidos"]
+
+    with pytest.raises(ValueError):
+        await ejecutar_extractor(int, "no-numerico", timeout=30)
+
+    assert obtener_metricas_extraccion()["fallidos"] == antes + 1
+
+
+@pytest.mark.asyncio
+async def test_timeout_cancela_el_trabajo_y_es_timeout_error():
+    antes = obtener_metricas_extraccion()["tiempo_excedido"]
+    inicio = time.perf_counter()
+
+    with pytest.raises(TimeoutError) as exc_info:
+        await ejecutar_extractor(time.sleep, 30, timeout=0.5)
+
+    assert isinstance(exc_info.value, TiempoExtraccionExcedidoError)
+    assert time.perf_counter() - inicio < 10
+    metricas = obtener_metricas_extraccion()
+    assert metricas["tiempo_excedido"] == antes + 1
+    assert metricas["en_ejecucion"] == 0
+
+
+def test_timeout_sin_capturar_en_el_router_responde_504():
+    from app.main import _tiempo_extraccion_excedido_handler, app as app_principal
+
+    assert app_principal.exception_handlers[TiempoExtraccionExcedidoError] is _tiempo_extraccion_excedido_handler
+    app = FastAPI()
+    app.add_exception_handler(TiempoExtraccionExcedidoError, _tiempo_extraccion_excedido_handler)
+
+    @app.post("/preview")
+    async def preview():
+        raise TiempoExtraccionExcedidoError("La extracción excedió el tiempo permitido (1s)")
+
+    respuesta = TestClient(app).post("/preview")
+    assert respuesta.status_code == 504
+    assert "tiempo permitido" in respuesta.json()["detail"]
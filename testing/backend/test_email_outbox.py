@@ -0,0 +1,115 @@
+import smtplib
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+import app.database
+from app.config import config
+from app.services.notifications import email_outbox
+from app.services.notifications.email_mensaje import construir_mensaje
+from app.services.notifications.email_outbox import calcular_espera_reintento, procesar_pendientes
+from app.services.notifications.email_service import EmailService
+
+ASUNTO = "TEST-OUTBOX"
+
+
+@pytest.fixture
+async def bandeja_limpia(monkeypatch):
+    monkeypatch.setattr(config, "smtp_host", "smtp.test")
+    monkeypatch.setattr(config, "smtp_port", 465)
+    monkeypatch.setattr(config, "smtp_user", "portal@test.com")
+    monkeypatch.setattr(config, "smtp_pass", "secreto")
+    monkeypatch.setattr(config, "smtp_use_ssl", True)
+    # NullPool: cada test corre en su propio event loop (ver conftest.db_session).
+    engine = create_async_engine(config.database_url, poolclass=NullPool)
+    sesiones = async_sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr(app.database, "AsyncSessionLocal", sesiones)
+    try:
+        async with sesiones() as db:
+            await db.execute(text("DELETE FROM correos_salientes"))
+            await db.commit()
+    except Exception:
+        await engine.dispose()
+        pytest.skip("Base de datos local no disponible")
+    email_outbox._conexion.cerrar()
+    yield sesiones
+    email_outbox._conexion.cerrar()
+    async with sesiones() as db:
+        await db.execute(text("DELETE FROM correos_salientes"))
+        await db.commit()
+    await engine.dispose()
+
+
+async def _estados(sesiones):
+    async with sesiones() as db:
+        filas = await db.execute(
+            text("SELECT estado, intentos, ultimo_error FROM correos_salientes ORDER BY id")
+        )
+        return filas.fetchall()
+
+
+def test_backoff_exponencial_acotado():
+    assert calcular_espera_reintento(1) == 30
+    assert calcular_espera_reintento(3) == 120
+    assert calcular_espera_reintento(20) == 3600
+
+
+def test_cada_mensaje_lleva_su_propia_parte_de_imagen(monkeypatch):
+    monkeypatch.setattr(config, "smtp_from", "portal@test.com")
+    adjuntos = EmailService._get_attachments()
+    if not adjuntos:
+        pytest.skip("Sin logo en resources/images")
+    primero, segundo = (construir_mensaje("Asunto", ["x@test.com"], "<p>Hola</p>", attachments=adjuntos) for _ in range(2))
+    imagen_a, imagen_b = (m.get_payload()[1] for m in (primero, segundo))
+
+    assert imagen_a is not imagen_b
+    assert imagen_a.get_payload() == imagen_b.get_payload()
+    assert imagen_a["Content-ID"] == "<logo_refridcol>"
+
+
+@pytest.mark.asyncio
+async def test_encolar_no_abre_smtp_y_el_lote_reutiliza_una_conexion(bandeja_limpia):
+    with patch("smtplib.SMTP_SSL") as mock_ssl:
+        for i in range(3):
+            assert await EmailService.enviar_correo(
+                f"{ASUNTO} {i}", [f"u{i}@test.com"], "<p>Hola</p>",
+                attachments=EmailService._get_attachments(),
+            )
+        mock_ssl.assert_not_called()
+
+        resumen = await procesar_pendientes()
+
+    assert resumen == {"enviados": 3, "fallidos": 0, "reintentos": 0}
+    assert mock_ssl.call_count == 1
+    servidor = mock_ssl.return_value
+    servidor.login.assert_called_once()
+    assert servidor.send_message.call_count == 3
+    assert [fila.estado for fila in await _estados(bandeja_limpia)] == ["enviado"] * 3
+
+
+@pytest.mark.asyncio
+async def test_fallo_reprograma_con_backoff_y_marca_fallido_al_agotar(bandeja_limpia, monkeypatch):
+    monkeypatch.setattr(email_outbox.obtener_configuracion(), "correo_max_intentos", 2)
+    servidor = MagicMock()
+    servidor.send_message.side_effect = smtplib.SMTPRecipientsRefused({"x@test.com": (550, b"no")})
+
+    with patch("smtplib.SMTP_SSL", return_value=servidor):
+        await EmailService.enviar_correo(ASUNTO, ["x@test.com"], "<p>Hola</p>")
+
+        primero = await procesar_pendientes()
+        assert primero == {"enviados": 0, "fallidos": 0, "reintentos": 1}
+        # El backoff lo deja fuera de la siguiente ventana de reclamo.
+        assert (await procesar_pendientes())["reintentos"] == 0
+
+        async with bandeja_limpia() as db:
+            await db.execute(text("UPDATE correos_salientes SET proximo_intento_en = now()"))
+            await db.commit()
+        segundo = await procesar_pendientes()
+
+    assert segundo == {"enviados": 0, "fallidos": 1, "reintentos": 0}
+    estado, intentos, error = (await _estados(bandeja_limpia))[0]
+    assert (estado, intentos) == ("fallido", 2)
+    assert "550" in error
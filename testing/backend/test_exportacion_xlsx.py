@@ -0,0 +1,186 @@
+"""
+Exportaciones XLSX en memoria constante (XlsxWriter constant_memory).
+
+Se verifica el libro generado leyéndolo de vuelta con openpyxl, que el
+temporal se borra tras enviar la respuesta (y si la generación falla) y que
+la memoria residente no crece con el número de filas.
+"""
+
+import os
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from openpyxl import load_workbook
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from app.api.viaticos import router as viaticos_router
+from app.config import config
+from app.services.erp.viaticos_query_service import ViaticosQueryService
+from app.services.exportacion import FORMATO_MONEDA, ColumnaXlsx, escribir_xlsx
+from app.services.inventario.excel_servicio import COLUMNAS_EXPORTACION_CONTEO, ServicioExcelInventario
+
+SCHEMA_PRUEBA = "test_exportacion_xlsx"
+FILAS_MEMORIA = 200_000
+MAXIMO_CRECIMIENTO_RSS = 32 * 1024 * 1024
+
+
+def _rss_bytes() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * 4096
+
+
+@pytest.fixture
+def tmp_exportacion(tmp_path, monkeypatch):
+    """Los temporales de la exportación van a un directorio vacío propio."""
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+    return tmp_path
+
+
+def test_libro_con_encabezado_formatos_y_valores(tmp_exportacion):
+    columnas = [
+        ColumnaXlsx("Fecha", 12),
+        ColumnaXlsx("Radicado"),
+        ColumnaXlsx("Valor", 18, FORMATO_MONEDA),
+    ]
+    filas = [
+        (date(2026, 3, 1), "=HYPERLINK(\"x\")", Decimal("1500.50")),
+        (None, "https://ejemplo.com", None),
+    ]
+    ruta = escribir_xlsx(iter(filas), columnas, hoja="Estado", bordes=True)
+
+    ws = load_workbook(ruta)["Estado"]
+    assert [c.value for c in ws[1]] == ["Fecha", "Radicado", "Valor"]
+    assert ws["A1"].font.b and ws["A1"].fill.fgColor.rgb.endswith("1F4E78")
+    assert ws["A2"].value.date() == date(2026, 3, 1) and ws["A2"].number_format == "yyyy-mm-dd"
+    # El texto no se convierte en fórmula ni en hipervínculo.
+    assert ws["B2"].value == "=HYPERLINK(\"x\")" and ws["B2"].data_type == "s"
+    assert ws["B3"].hyperlink is None
+    assert ws["C2"].value == 1500.5 and ws["C2"].number_format == FORMATO_MONEDA
+    assert ws["C3"].value is None and ws["C3"].border.left.style == "thin"
+    assert ws.column_dimensions["A"].width == pytest.approx(12, abs=1)
+    assert ws.max_row == 3
+    os.remove(ruta)
+
+
+def test_error_al_generar_no_deja_temporales(tmp_exportacion):
+    def filas():
+        yield ("a",)
+        raise RuntimeError("cursor cerrado")
+
+    with pytest.raises(RuntimeError):
+        escribir_xlsx(filas(), [ColumnaXlsx("A")])
+    assert list(tmp_exportacion.iterdir()) == []
+
+
+def test_plantillas_inventario_conservan_encabezados(tmp_exportacion):
+    ruta = ServicioExcelInventario.generar_plantilla_transito()
+    ws = load_workbook(ruta).active
+    assert ws.title == "Transito_Detallado"
+    assert [c.value for c in ws[1]] == ["Codigo / SKU", "Documento", "Cantidad"]
+    assert not ws["A1"].font.b
+    os.remove(ruta)
+
+
+def test_estado_cuenta_se_envia_y_el_temporal_se_borra(tmp_exportacion):
+    movimientos = [
+        {
+            "fechaaplicacion": date(2026, 1, n), "radicado": f"R-{n}", "tipo": "CONSIGNACION",
+            "observaciones": None, "consignacion_contabilizado": Decimal(1000 * n),
+            "legalizacion_contabilizado": 0, "consignacion_firmadas": 0, "legalizacion_firmadas": 0,
+            "consignacion_pendientes": None, "legalizacion_pendientes": 0, "saldo": Decimal(1000 * n),
+        }
+        for n in range(1, 4)
+    ]
+    app = FastAPI()
+    app.include_router(viaticos_router.router)
+    with patch.object(viaticos_router, "SessionErp"), patch.object(
+        ViaticosQueryService, "iterar_estado_cuenta", return_value=iter(movimientos)
+    ) as iterar:
+        respuesta = TestClient(app).get("/viaticos/estado-cuenta/xlsx", params={"cedula": "123"})
+
+    assert respuesta.status_code == 200
+    assert respuesta.headers["content-disposition"].startswith('attachment; filename="Estado_Cuenta_123_')
+    assert iterar.call_args.args[1:] == ("123", None, None)
+    assert list(tmp_exportacion.iterdir()) == []
+
+    ruta = tmp_exportacion / "descarga.xlsx"
+    ruta.write_bytes(respuesta.content)
+    ws = load_workbook(ruta)["Estado de Cuenta"]
+    assert ws.max_row == 4
+    assert [c.value for c in ws[4]][1:] == ["R-3", "CONSIGNACION", None, 3000, 0, 0, 0, 0, 0, 3000]
+
+
+@pytest.fixture
+def db_inventario():
+    """Sesión síncrona con search_path en un schema propio; todo se revierte al final."""
+    motor = create_engine(
+        config.database_url.replace("postgresql+asyncpg://", "postgresql://", 1),
+        poolclass=NullPool,
+        connect_args={"options": "-c client_encoding=utf8"},
+    )
+    try:
+        conn = motor.connect()
+    except Exception:
+        pytest.skip("Base de datos local no disponible")
+    conn.execute(text(f"CREATE SCHEMA {SCHEMA_PRUEBA}"))
+    conn.execute(text(
+        f"CREATE TABLE {SCHEMA_PRUEBA}.conteoinventario (LIKE public.conteoinventario INCLUDING ALL)"
+    ))
+    conn.execute(text(f"SET LOCAL search_path TO {SCHEMA_PRUEBA}, pg_catalog"))
+    db = Session(bind=conn, join_transaction_mode="create_savepoint")
+    try:
+        yield db
+    finally:
+        db.close()
+        conn.rollback()
+        conn.close()
+        motor.dispose()
+
+
+def test_exportar_conteos_aplica_filtros_y_orden_de_lista(db_inventario, tmp_exportacion):
+    db_inventario.execute(text("""
+        INSERT INTO conteoinventario (id, bodega, bloque, estante, nivel, codigo, descripcion,
+            unidad, cantidad_sistema, cant_c1, cant_c2, cant_c3, cant_c4, invporlegalizar,
+            cantidad_final, diferencia, diferencia_total, estado, conteo)
+        SELECT g, CASE WHEN g % 2 = 0 THEN 'B01' ELSE 'B02' END, 'BL' || (10 - g), 'E1', 'N1',
+               'COD-' || g, 'Producto ' || g, 'UND', g * 1.5, 0, 0, 0, 0, 0, g * 1.5, 0, -g * 1.5,
+               CASE WHEN g % 3 = 0 THEN 'CONCILIADO' ELSE 'PENDIENTE' END, 'CONTEO 2026'
+        FROM generate_series(1, 9) AS g
+    """))
+
+    ruta = ServicioExcelInventario.exportar_conteos_xlsx(db_inventario, bodega="B01", estado="PENDIENTE", lote=1)
+
+    ws = load_workbook(ruta)["Conteo_Inventario"]
+    titulos = [columna.titulo for _, columna in COLUMNAS_EXPORTACION_CONTEO]
+    assert [c.value for c in ws[1]] == titulos
+    filas = [dict(zip(titulos, (c.value for c in fila))) for fila in ws.iter_rows(min_row=2)]
+    # B01 son los pares; sin el 6 (conciliado) y en orden de bloque: BL2, BL6, BL8.
+    assert [f["Codigo"] for f in filas] == ["COD-8", "COD-4", "COD-2"]
+    assert filas[0]["Cant. Sistema"] == 12 and filas[0]["Estado"] == "PENDIENTE"
+    os.remove(ruta)
+
+
+def test_memoria_no_crece_con_las_filas(tmp_exportacion):
+    columnas = [ColumnaXlsx("Fecha"), ColumnaXlsx("Texto"), ColumnaXlsx("Valor", formato=FORMATO_MONEDA)]
+    filas = ((date(2026, 1, 1 + n % 28), f"Movimiento {n}", n * 10.5) for n in range(FILAS_MEMORIA))
+
+    inicial = _rss_bytes()
+    pico = [inicial]
+
+    def midiendo(origen):
+        for n, fila in enumerate(origen):
+            if n % 10_000 == 0:
+                pico[0] = max(pico[0], _rss_bytes())
+            yield fila
+
+    ruta = escribir_xlsx(midiendo(filas), columnas, bordes=True)
+    pico[0] = max(pico[0], _rss_bytes())
+
+    assert pico[0] - inicial < MAXIMO_CRECIMIENTO_RSS, (pico[0] - inicial) / 2**20
+    os.remove(ruta)
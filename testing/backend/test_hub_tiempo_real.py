@@ -0,0 +1,95 @@
+import asyncio
+import importlib
+
+import pytest
+
+from app.services.realtime.hub import HubTiempoReal, desempaquetar, empaquetar
+from app.services.ticket.ws_manager import TicketConnectionManager
+
+# `app.services.realtime.hub` como módulo (el paquete re-exporta la instancia `hub`).
+modulo_hub = importlib.import_module("app.services.realtime.hub")
+
+
+class _SocketFalso:
+    def __init__(self, demora: float = 0.0, falla: bool = False):
+        self.demora = demora
+        self.falla = falla
+        self.recibidos = []
+        self.cerrado_con = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, texto):
+        if self.falla:
+            raise RuntimeError("socket cerrado")
+        if self.demora:
+            await asyncio.sleep(self.demora)
+        self.recibidos.append(texto)
+
+    async def close(self, code=1000):
+        self.cerrado_con = code
+
+
+async def _esperar(condicion, timeout=2.0):
+    limite = asyncio.get_running_loop().time() + timeout
+    while not condicion():
+        assert asyncio.get_running_loop().time() < limite
+        await asyncio.sleep(0.01)
+
+
+def test_empaquetado_preserva_el_json_sin_deserializarlo():
+    marca, texto = desempaquetar(empaquetar('{"a": "x|y"}'))
+    assert texto == '{"a": "x|y"}'
+    assert marca > 0
+
+
+@pytest.mark.asyncio
+async def test_cliente_lento_no_retrasa_a_los_demas():
+    hub = HubTiempoReal(redis_url=None)
+    manager = TicketConnectionManager(hub)
+    lento, rapido = _SocketFalso(demora=1.0), _SocketFalso()
+    await manager.connect(lento, "TKT-1")
+    await manager.connect(rapido, "TKT-1")
+
+    await manager.broadcast_to_ticket("TKT-1", {"tipo": "comentario", "n": 1})
+
+    await _esperar(lambda: rapido.recibidos, timeout=0.5)
+    assert rapido.recibidos == ['{"tipo": "comentario", "n": 1}']
+    assert lento.recibidos == []
+    manager.disconnect(lento, "TKT-1")
+    manager.disconnect(rapido, "TKT-1")
+
+
+@pytest.mark.asyncio
+async def test_solo_recibe_la_sala_destino():
+    hub = HubTiempoReal(redis_url=None)
+    a, b = _SocketFalso(), _SocketFalso()
+    await hub.conectar(a, "ticket:A")
+    await hub.conectar(b, "ticket:B")
+
+    await hub.publicar("ticket:A", {"x": 1})
+
+    await _esperar(lambda: a.recibidos)
+    await asyncio.sleep(0.05)
+    assert b.recibidos == []
+
+
+@pytest.mark.asyncio
+async def test_expulsa_socket_muerto_y_cola_llena(monkeypatch):
+    monkeypatch.setattr(modulo_hub, "COLA_MAX_MENSAJES", 2)
+    hub = HubTiempoReal(redis_url=None)
+    muerto, atascado = _SocketFalso(falla=True), _SocketFalso(demora=10)
+    await hub.conectar(muerto, "usuario:U1")
+    await hub.conectar(atascado, "usuario:U2")
+
+    await hub.publicar("usuario:U1", {"n": 1})
+    for i in range(4):
+        await hub.publicar("usuario:U2", {"n": i})
+
+    await _esperar(lambda: muerto.cerrado_con and atascado.cerrado_con)
+    metricas = hub.obtener_metricas()
+    assert metricas["expulsados"] == 2
+    assert metricas["sockets"] == 0
+    assert metricas["salas"] == 0
+    assert metricas["publicados"] == 5
@@ -0,0 +1,91 @@
+import random
+import re
+import time
+from difflib import SequenceMatcher
+
+from app.services.novedades_nomina.indice_nombres import IndiceNombres
+from app.services.novedades_nomina.nomina_helper import NominaHelper
+
+NOMBRES = ["SEBASTIAN", "JUAN", "CAMILO", "ANDREA", "LUISA", "MARIA", "JOSE", "DIANA", "OSCAR", "KAROL"]
+APELLIDOS = ["GARCIA", "PEREZ", "VILLAFAÑE", "RODRIGUEZ", "GOMEZ", "MARTINEZ", "LOPEZ", "FRANCO",
+             "AGUDELO", "BOBADILLA", "PRADA", "SANDOVAL", "RAMIREZ", "CASTRO", "ROJAS"]
+
+
+def _referencia(nombre_buscado, lista_empleados):
+    """Algoritmo lineal original (una pasada con SequenceMatcher por empleado)."""
+    norm = NominaHelper.normalizar_nombre(nombre_buscado)
+    tokens_buscado = set(re.findall(r'\w+', norm))
+    mejor, max_ratio = None, 0.0
+    for emp in lista_empleados:
+        tokens_emp = set(re.findall(r'\w+', NominaHelper.normalizar_nombre(emp["nombre"])))
+        exactas = tokens_buscado & tokens_emp
+        pendientes = list(tokens_emp - exactas)
+        difusas = 0
+        for tb in tokens_buscado - exactas:
+            for te in pendientes:
+                if SequenceMatcher(None, tb, te).ratio() >= 0.8:
+                    difusas += 1
+                    pendientes.remove(te)
+                    break
+        ratio = (len(exactas) + difusas) / max(len(tokens_buscado), len(tokens_emp))
+        if ratio >= 0.75 and ratio > max_ratio:
+            max_ratio, mejor = ratio, emp
+    return mejor["nrocedula"] if mejor else None
+
+
+def _planta(n, semilla=7):
+    rnd = random.Random(semilla)
+    return [
+        {
+            "nrocedula": str(10_000_000 + i),
+            "nombre": " ".join(rnd.sample(APELLIDOS, 2) + rnd.sample(NOMBRES, rnd.choice([1, 2]))),
+        }
+        for i in range(n)
+    ]
+
+
+def _con_errores(nombre, rnd):
+    tokens = nombre.split()
+    rnd.shuffle(tokens)
+    i = rnd.randrange(len(tokens))
+    t = tokens[i]
+    if len(t) > 4:
+        j = rnd.randrange(1, len(t) - 1)
+        tokens[i] = t[:j] + "X" + t[j + 1:]
+    return " ".join(tokens)
+
+
+def test_mismo_resultado_que_el_algoritmo_lineal():
+    empleados = _planta(400)
+    indice = IndiceNombres(empleados)
+    rnd = random.Random(11)
+    consultas = [_con_errores(e["nombre"], rnd) for e in rnd.sample(empleados, 80)]
+    consultas += ["VILLAFANE GARCUA SEBASTIAN", "NADIE CONOCIDO", "", "Ñ"]
+
+    for consulta in consultas:
+        assert indice.resolver(consulta) == _referencia(consulta, empleados), consulta
+
+
+def test_buscar_ordena_candidatos_por_ratio():
+    empleados = [
+        {"nrocedula": "1", "nombre": "SEBASTIAN VILLAFAÑE GARCIA"},
+        {"nrocedula": "2", "nombre": "SEBASTIAN VILLAFAÑE GARCIA ROJAS"},
+    ]
+    candidatos = IndiceNombres(empleados).buscar("VILLAFANE GARCIA SEBASTIAN")
+
+    assert [(e["nrocedula"], r) for e, r in candidatos] == [("1", 1.0), ("2", 0.75)]
+
+
+def test_indice_se_reutiliza_por_snapshot_y_resuelve_rapido():
+    empleados = _planta(5000, semilla=3)
+    indice = IndiceNombres.para(empleados)
+    assert IndiceNombres.para(list(empleados)) is indice
+
+    rnd = random.Random(5)
+    consultas = [_con_errores(e["nombre"], rnd) for e in rnd.sample(empleados, 200)]
+    inicio = time.perf_counter()
+    for consulta in consultas:
+        indice.resolver(consulta)
+    promedio_ms = (time.perf_counter() - inicio) * 1000 / len(consultas)
+    # Holgado para CI; en local ronda 2 ms por consulta con este vocabulario reducido.
+    assert promedio_ms < 20
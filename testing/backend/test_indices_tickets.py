@@ -0,0 +1,57 @@
+"""
+Migración de índices de tickets (app.core.migrations.indices_tickets).
+
+Verifica que los índices quedan válidos, que la migración es idempotente y
+que cede el turno si otro worker tiene el advisory lock.
+"""
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.config import config
+from app.core.migrations.indices_tickets import CLAVE_LOCK, INDICES_TICKETS, crear_indices_tickets
+
+NOMBRES = [nombre for nombre, _ in INDICES_TICKETS]
+
+
+@pytest.fixture
+async def motor():
+    engine = create_async_engine(config.database_url, poolclass=NullPool)
+    yield engine
+    await engine.dispose()
+
+
+async def _estado_indices(engine):
+    async with engine.connect() as conn:
+        filas = await conn.execute(text("""
+            SELECT c.relname, i.indisvalid FROM pg_class c
+            JOIN pg_index i ON i.indexrelid = c.oid
+            WHERE c.relname = ANY(:nombres)
+        """), {"nombres": NOMBRES})
+        return dict(filas.all())
+
+
+@pytest.mark.asyncio
+async def test_crea_indices_validos_e_idempotente(motor):
+    await crear_indices_tickets(motor)
+    await crear_indices_tickets(motor)
+    estado = await _estado_indices(motor)
+    assert set(estado) == set(NOMBRES)
+    assert all(estado.values())
+
+
+@pytest.mark.asyncio
+async def test_omite_si_otro_worker_tiene_el_lock(motor):
+    async with motor.connect() as conn:
+        await conn.execute(text("DROP INDEX IF EXISTS idx_tickets_categoria"))
+        await conn.commit()
+        await conn.execute(text("SELECT pg_advisory_lock(hashtext(:clave))"), {"clave": CLAVE_LOCK})
+        try:
+            await crear_indices_tickets(motor)
+            assert "idx_tickets_categoria" not in await _estado_indices(motor)
+        finally:
+            await conn.execute(text("SELECT pg_advisory_unlock(hashtext(:clave))"), {"clave": CLAVE_LOCK})
+    await crear_indices_tickets(motor)
+    assert (await _estado_indices(motor))["idx_tickets_categoria"] is True
@@ -0,0 +1,86 @@
+"""Pruebas de las métricas Prometheus: middleware HTTP, token de /metrics y pools."""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from app.core import metricas
+from app.core.config import obtener_configuracion
+from app.core.middleware.metricas_http import MetricasHttpMiddleware
+
+
+def _valor(nombre, **etiquetas):
+    return REGISTRY.get_sample_value(nombre, etiquetas) or 0.0
+
+
+def test_middleware_etiqueta_por_plantilla_de_ruta():
+    app = FastAPI()
+
+    @app.get("/tickets/{ticket_id}")
+    async def detalle(ticket_id: str):
+        return {"id": ticket_id}
+
+    app.add_middleware(MetricasHttpMiddleware)
+    cliente = TestClient(app)
+    ok_antes = _valor("http_requests_total", method="GET", route="/tickets/{ticket_id}", status="200")
+    sin_ruta_antes = _valor("http_requests_total", method="GET", route=metricas.RUTA_DESCONOCIDA, status="404")
+    latencias_antes = _valor("http_request_duration_seconds_count", method="GET", route="/tickets/{ticket_id}")
+
+    cliente.get("/tickets/T-1")
+    cliente.get("/tickets/T-2")
+    cliente.get("/no-existe/123")
+
+    # Dos URL distintas caen en la misma serie; las rutas desconocidas no crean series nuevas.
+    assert _valor("http_requests_total", method="GET", route="/tickets/{ticket_id}", status="200") == ok_antes + 2
+    assert _valor("http_requests_total", method="GET", route=metricas.RUTA_DESCONOCIDA, status="404") == sin_ruta_antes + 1
+    assert _valor("http_request_duration_seconds_count", method="GET", route="/tickets/{ticket_id}") == latencias_antes + 2
+    assert _valor("http_requests_in_progress", method="GET") == 0
+
+
+def test_token_de_metricas(monkeypatch):
+    configuracion = obtener_configuracion()
+    monkeypatch.setattr(configuracion, "metricas_token", "")
+    assert metricas.token_valido(None)
+
+    monkeypatch.setattr(configuracion, "metricas_token", "secreto")
+    assert metricas.token_valido("Bearer secreto")
+    assert not metricas.token_valido("Bearer otro")
+    assert not metricas.token_valido(None)
+
+
+@pytest.mark.asyncio
+async def test_exposicion_incluye_metricas_propias():
+    respuesta = await metricas.respuesta_metricas()
+    cuerpo = respuesta.body.decode()
+
+    assert respuesta.media_type.startswith("text/plain")
+    assert "http_requests_total" in cuerpo
+    assert "redis_up" in cuerpo
+
+
+def test_pool_registra_espera_uso_ocupacion_y_timeouts():
+    motor = create_engine(
+        "sqlite://", poolclass=QueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05
+    )
+    metricas.instrumentar_pool(motor, "prueba")
+    metricas.instrumentar_pool(motor, "prueba")  # idempotente
+    esperas_antes = _valor("db_pool_checkout_wait_seconds_count", pool="prueba")
+    usos_antes = _valor("db_pool_connection_hold_seconds_count", pool="prueba")
+    timeouts_antes = _valor("db_pool_checkout_timeouts_total", pool="prueba")
+
+    with motor.connect() as conexion:
+        conexion.execute(text("SELECT 1"))
+        assert _valor("db_pool_checked_out_connections", pool="prueba") == 1
+        with pytest.raises(PoolTimeoutError):
+            motor.connect()
+
+    assert _valor("db_pool_checked_out_connections", pool="prueba") == 0
+    assert _valor("db_pool_size", pool="prueba") == 1
+    assert _valor("db_pool_checkout_wait_seconds_count", pool="prueba") == esperas_antes + 2
+    assert _valor("db_pool_connection_hold_seconds_count", pool="prueba") == usos_antes + 1
+    assert _valor("db_pool_checkout_timeouts_total", pool="prueba") == timeouts_antes + 1
+    motor.dispose()
@@ -0,0 +1,118 @@
+"""Pruebas del planificador de tareas periódicas con elección de líder (Postgres)."""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.database import ASYNC_DATABASE_URL
+from app.services.planificador import Planificador
+
+
+@pytest_asyncio.fixture
+async def motor():
+    motor = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
+    yield motor
+    await motor.dispose()
+
+
+async def _esperar(condicion, timeout=5.0):
+    limite = asyncio.get_running_loop().time() + timeout
+    while not condicion():
+        if asyncio.get_running_loop().time() > limite:
+            raise AssertionError("La condición no se cumplió a tiempo")
+        await asyncio.sleep(0.05)
+
+
+async def _borrar_registros(motor, nombres):
+    async with motor.begin() as conexion:
+        await conexion.execute(
+            text("DELETE FROM planificador_tareas WHERE nombre = ANY(:nombres)"),
+            {"nombres": nombres},
+        )
+
+
+@pytest.mark.asyncio
+async def test_solo_el_lider_ejecuta_y_otro_worker_toma_el_relevo(motor):
+    clave = f"prueba_lider_{uuid4().hex}"
+    nombre = f"tarea_{uuid4().hex}"
+    ejecuciones = {"a": 0, "b": 0}
+
+    def crear(identidad):
+        planificador = Planificador(latido_segundos=0.2, clave=clave, motor=motor, identidad=identidad)
+
+        async def tarea():
+            ejecuciones[identidad] += 1
+
+        planificador.registrar(nombre, tarea, intervalo_segundos=0.1, jitter_segundos=0)
+        return planificador
+
+    a, b = crear("a"), crear("b")
+    tarea_a = asyncio.create_task(a.iniciar())
+    await _esperar(lambda: a.es_lider)
+    tarea_b = asyncio.create_task(b.iniciar())
+    try:
+        await _esperar(lambda: ejecuciones["a"] >= 3)
+        await asyncio.sleep(0.5)
+        assert not b.es_lider
+        assert ejecuciones["b"] == 0
+
+        # El líder "muere": su conexión se cierra y Postgres libera el lock.
+        tarea_a.cancel()
+        await asyncio.gather(tarea_a, return_exceptions=True)
+        await _esperar(lambda: b.es_lider and ejecuciones["b"] >= 1)
+
+        async with motor.connect() as conexion:
+            fila = (await conexion.execute(
+                text("SELECT ejecutado_por, exito, ejecuciones FROM planificador_tareas WHERE nombre = :n"),
+                {"n": nombre},
+            )).one()
+        assert fila.exito is True
+        assert fila.ejecuciones >= 4
+    finally:
+        tarea_b.cancel()
+        await asyncio.gather(tarea_a, tarea_b, return_exceptions=True)
+        await _borrar_registros(motor, [nombre])
+
+
+@pytest.mark.asyncio
+async def test_registra_fallos_y_retoma_el_calendario_del_lider_anterior(motor):
+    nombre_falla = f"falla_{uuid4().hex}"
+    nombre_reciente = f"reciente_{uuid4().hex}"
+    planificador = Planificador(motor=motor, identidad="worker-prueba")
+
+    async def fallar():
+        raise RuntimeError("ERP no disponible")
+
+    planificador.registrar(nombre_falla, fallar, intervalo_segundos=60, retraso_inicial_segundos=5)
+    planificador.registrar(nombre_reciente, fallar, intervalo_segundos=600, jitter_segundos=0)
+    with pytest.raises(ValueError):
+        planificador.registrar(nombre_falla, fallar, intervalo_segundos=1)
+
+    try:
+        assert await planificador.ejecutar(planificador.tareas[nombre_falla]) is False
+        async with motor.begin() as conexion:
+            fila = (await conexion.execute(
+                text("SELECT exito, ultimo_error, ejecutado_por FROM planificador_tareas WHERE nombre = :n"),
+                {"n": nombre_falla},
+            )).one()
+            assert (fila.exito, fila.ultimo_error, fila.ejecutado_por) == (
+                False, "ERP no disponible", "worker-prueba"
+            )
+            await conexion.execute(
+                text("INSERT INTO planificador_tareas (nombre, ultimo_inicio, ejecuciones) VALUES (:n, :inicio, 1)"),
+                {"n": nombre_reciente, "inicio": datetime.now(timezone.utc) - timedelta(seconds=500)},
+            )
+
+        esperas = await planificador._calendario()
+        # Ejecutada hace 500 s con intervalo de 600 s: faltan ~100 s, no se repite ya.
+        assert 95 <= esperas[nombre_reciente] <= 100
+        # La que acaba de correr espera el intervalo completo (más el jitter del 10%).
+        assert 55 <= esperas[nombre_falla] <= 66
+    finally:
+        await _borrar_registros(motor, [nombre_falla, nombre_reciente])
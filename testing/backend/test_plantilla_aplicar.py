@@ -0,0 +1,87 @@
+"""
+Tests de aplicación de plantillas WBS en lote.
+"""
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import delete, event, select
+
+from app.models.desarrollo.actividad import Actividad
+from app.models.desarrollo.desarrollo import Desarrollo
+from app.models.desarrollo.plantilla_actividad import PlantillaActividad
+from app.services.desarrollos.plantilla_service import aplicar_plantilla, ordenar_por_niveles
+
+
+def _nodo(id, parent_id=None, titulo=None):
+    return SimpleNamespace(id=id, parent_id=parent_id, titulo=titulo or f"N{id}")
+
+
+def test_orden_por_niveles_pone_padres_primero_y_omite_huerfanos():
+    nodos = [_nodo(5, 2), _nodo(1), _nodo(2, 1), _nodo(3, 1), _nodo(4, 3), _nodo(9, 99)]
+
+    orden = [n.id for n in ordenar_por_niveles(nodos)]
+
+    assert orden == [1, 2, 3, 5, 4]
+
+
+@pytest.mark.asyncio
+async def test_aplicar_plantilla_grande_en_pocas_sentencias(db_session):
+    desarrollo_id = f"TEST-PLANT-{uuid.uuid4().hex[:8]}"
+    nombre = f"Plantilla test {uuid.uuid4().hex[:8]}"
+    db_session.add(Desarrollo(id=desarrollo_id, nombre="Desarrollo plantilla", creado_por_id="USR-REAL"))
+
+    # Árbol de 300 nodos: raíz, 19 fases y 280 tareas repartidas.
+    raiz = PlantillaActividad(nombre_plantilla=nombre, titulo="Raíz")
+    db_session.add(raiz)
+    await db_session.flush()
+    raiz_id = raiz.id
+    fases = [PlantillaActividad(nombre_plantilla=nombre, titulo=f"Fase {i}", parent_id=raiz_id) for i in range(19)]
+    db_session.add_all(fases)
+    await db_session.flush()
+    db_session.add_all([
+        PlantillaActividad(nombre_plantilla=nombre, titulo=f"Tarea {i}", parent_id=fases[i % 19].id)
+        for i in range(280)
+    ])
+    await db_session.commit()
+
+    try:
+        nodos = (await db_session.execute(
+            select(PlantillaActividad).where(PlantillaActividad.nombre_plantilla == nombre)
+        )).scalars().all()
+
+        sentencias = []
+        motor = db_session.bind.sync_engine
+        contar = lambda *a, **k: sentencias.append(1)
+        event.listen(motor, "before_cursor_execute", contar)
+        try:
+            creadas = await aplicar_plantilla(db_session, desarrollo_id, nodos)
+            await db_session.commit()
+        finally:
+            event.remove(motor, "before_cursor_execute", contar)
+
+        assert creadas == 300
+        # Reserva de ids + INSERT en lote + recálculo del desarrollo (no 300 flushes).
+        assert len(sentencias) < 10
+
+        actividades = (await db_session.execute(
+            select(Actividad).where(Actividad.desarrollo_id == desarrollo_id)
+        )).scalars().all()
+        por_titulo = {a.titulo: a for a in actividades}
+        assert len(actividades) == 300
+        assert por_titulo["Raíz"].parent_id is None
+        assert por_titulo["Fase 3"].parent_id == por_titulo["Raíz"].id
+        assert por_titulo["Tarea 22"].parent_id == por_titulo["Fase 3"].id
+        assert all(a.estado == "Pendiente" and a.anulada is False for a in actividades)
+    finally:
+        await db_session.rollback()
+        await db_session.execute(delete(Actividad).where(Actividad.desarrollo_id == desarrollo_id))
+        await db_session.execute(delete(Desarrollo).where(Desarrollo.id == desarrollo_id))
+        hijos = delete(PlantillaActividad).where(
+            PlantillaActividad.nombre_plantilla == nombre, PlantillaActividad.parent_id.isnot(None)
+        )
+        # Tareas, luego fases, luego la raíz (FK parent_id).
+        await db_session.execute(hijos.where(PlantillaActividad.parent_id != raiz_id))
+        await db_session.execute(hijos)
+        await db_session.execute(delete(PlantillaActividad).where(PlantillaActividad.nombre_plantilla == nombre))
+        await db_session.commit()
@@ -0,0 +1,188 @@
+import time
+import uuid
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+import app.database
+from app.config import config
+from app.services.panel_control.presencia_service import CLAVE_SESIONES, PresenciaService
+
+
+class _RedisFalso:
+    """Subconjunto en memoria de redis.asyncio usado por PresenciaService."""
+
+    def __init__(self):
+        self.kv = {}
+        self.zsets = {}
+        self.sets = {}
+
+    async def ping(self):
+        return True
+
+    async def get(self, clave):
+        return self.kv.get(clave)
+
+    async def set(self, clave, valor, ex=None):
+        self.kv[clave] = str(valor)
+
+    async def zadd(self, clave, mapa):
+        self.zsets.setdefault(clave, {}).update(mapa)
+
+    async def zrem(self, clave, miembro):
+        self.zsets.get(clave, {}).pop(miembro, None)
+
+    async def sadd(self, clave, miembro):
+        self.sets.setdefault(clave, set()).add(miembro)
+
+    async def srem(self, clave, miembro):
+        self.sets.get(clave, set()).discard(miembro)
+
+    async def scard(self, clave):
+        return len(self.sets.get(clave, set()))
+
+    async def expire(self, clave, segundos):
+        return clave in self.sets
+
+    @staticmethod
+    def _en_rango(score, minimo, maximo):
+        minimo, maximo = str(minimo), str(maximo)
+        if minimo.startswith("("):
+            ok_min = score > float(minimo[1:])
+        else:
+            ok_min = minimo == "-inf" or score >= float(minimo)
+        return ok_min and (maximo == "+inf" or score <= float(maximo))
+
+    async def zcount(self, clave, minimo, maximo):
+        return sum(1 for s in self.zsets.get(clave, {}).values() if self._en_rango(s, minimo, maximo))
+
+    async def zrangebyscore(self, clave, minimo, maximo, withscores=False):
+        filas = sorted(
+            ((m, s) for m, s in self.zsets.get(clave, {}).items() if self._en_rango(s, minimo, maximo)),
+            key=lambda x: x[1],
+        )
+        return filas if withscores else [m for m, _ in filas]
+
+    async def zremrangebyscore(self, clave, minimo, maximo):
+        zset = self.zsets.get(clave, {})
+        for m in [m for m, s in zset.items() if self._en_rango(s, minimo, maximo)]:
+            del zset[m]
+
+    def pipeline(self, transaction=False):
+        redis_falso = self
+
+        class _Pipe:
+            def __init__(self):
+                self.llamadas = []
+
+            def __getattr__(self, nombre):
+                return lambda *a, **k: self.llamadas.append(getattr(redis_falso, nombre)(*a, **k))
+
+            async def execute(self):
+                return [await c for c in self.llamadas]
+
+        return _Pipe()
+
+
+@pytest.fixture
+def redis_falso(monkeypatch):
+    falso = _RedisFalso()
+    monkeypatch.setattr(PresenciaService, "_redis", falso)
+    return falso
+
+
+def _db_con_sesion(sesion_id, usuario_id):
+    db = MagicMock()
+    resultado = MagicMock()
+    resultado.first.return_value = SimpleNamespace(id=sesion_id, usuario_id=usuario_id)
+    db.execute = AsyncMock(return_value=resultado)
+    return db
+
+
+@pytest.mark.asyncio
+async def test_latidos_no_escriben_en_la_base_y_cuentan_en_linea(redis_falso):
+    db = _db_con_sesion(7, "USR-1")
+
+    for _ in range(3):
+        assert await PresenciaService.registrar_latido(db, "token-a")
+
+    # Solo la primera vez resuelve token -> sesión (SELECT); nunca UPDATE.
+    assert db.execute.await_count == 1
+    assert await PresenciaService.contar_usuarios_en_linea(timedelta(hours=1)) == 1
+    assert await PresenciaService.contar_sesiones_en_linea(timedelta(minutes=5)) == 1
+
+
+@pytest.mark.asyncio
+async def test_logout_retira_presencia_e_ignora_latidos_posteriores(redis_falso):
+    db = _db_con_sesion(8, "USR-2")
+    await PresenciaService.registrar_latido(db, "token-b")
+
+    await PresenciaService.retirar_sesiones([(8, "token-b")], "USR-2")
+    await PresenciaService.registrar_latido(db, "token-b")
+
+    assert await PresenciaService.contar_usuarios_en_linea(timedelta(hours=1)) == 0
+    assert await PresenciaService.contar_sesiones_en_linea(timedelta(hours=1)) == 0
+
+
+@pytest.mark.asyncio
+async def test_usuario_sigue_en_linea_hasta_cerrar_su_ultima_sesion(redis_falso):
+    await PresenciaService.registrar_sesion("token-d", 9, "USR-3")
+    await PresenciaService.registrar_latido(_db_con_sesion(10, "USR-3"), "token-e")
+
+    await PresenciaService.retirar_sesiones([(9, "token-d")], "USR-3")
+    assert await PresenciaService.contar_usuarios_en_linea(timedelta(hours=1)) == 1
+    assert await PresenciaService.contar_sesiones_en_linea(timedelta(hours=1)) == 1
+
+    await PresenciaService.retirar_sesiones([(10, "token-e")], "USR-3")
+    assert await PresenciaService.contar_usuarios_en_linea(timedelta(hours=1)) == 0
+
+
+@pytest.mark.asyncio
+async def test_sin_redis_el_llamador_usa_la_base(monkeypatch):
+    monkeypatch.setattr(PresenciaService, "_redis", None)
+    monkeypatch.setattr(PresenciaService, "_reintento_en", time.monotonic() + 60)
+
+    assert await PresenciaService.registrar_latido(MagicMock(), "token-c") is False
+    assert await PresenciaService.contar_usuarios_en_linea(timedelta(hours=1)) is None
+
+
+@pytest.mark.asyncio
+async def test_volcado_en_lote_actualiza_ultima_actividad(redis_falso, monkeypatch):
+    engine = create_async_engine(config.database_url, poolclass=NullPool)
+    sesiones = async_sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr(app.database, "AsyncSessionLocal", sesiones)
+    token = f"test-presencia-{uuid.uuid4()}"
+    try:
+        async with sesiones() as db:
+            sesion_id = (await db.execute(text("""
+                INSERT INTO sesiones (usuario_id, token_sesion, expira_en, ultima_actividad_en, tipo_sesion)
+                VALUES ('USR-PRESENCIA', :token, now() + interval '1 hour', '2000-01-01', 'web')
+                RETURNING id
+            """), {"token": token})).scalar_one()
+            await db.commit()
+    except Exception:
+        await engine.dispose()
+        pytest.skip("Base de datos local no disponible")
+
+    try:
+        await redis_falso.zadd(CLAVE_SESIONES, {str(sesion_id): time.time()})
+        assert await PresenciaService.volcar_actividad() == 1
+        # El segundo volcado no re-escribe latidos ya volcados (salvo el margen).
+        await redis_falso.set("presencia:volcado_hasta", time.time())
+        assert await PresenciaService.volcar_actividad() == 0
+
+        async with sesiones() as db:
+            ultima = (await db.execute(
+                text("SELECT ultima_actividad_en FROM sesiones WHERE id = :id"), {"id": sesion_id}
+            )).scalar_one()
+        assert ultima.year >= 2026
+    finally:
+        async with sesiones() as db:
+            await db.execute(text("DELETE FROM sesiones WHERE token_sesion = :token"), {"token": token})
+            await db.commit()
+        await engine.dispose()
@@ -0,0 +1,100 @@
+"""Pruebas del registro de consultas SQL por request y del detector de N+1."""
+
+import logging
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from app.core import consultas_sql
+from app.core.config import obtener_configuracion
+from app.core.consultas_sql import PresupuestoConsultasExcedido, huella
+from app.core.middleware.consultas_sql import ConsultasSqlMiddleware
+
+
+def test_huella_agrupa_consultas_que_solo_difieren_en_valores():
+    assert huella("SELECT * FROM t WHERE id = 5 AND nombre = 'ana'") == huella(
+        "SELECT *  FROM t\n WHERE id = 77 AND nombre = 'o''brien'"
+    )
+    assert huella("SELECT * FROM t WHERE id IN ($1, $2, $3)") == "SELECT * FROM t WHERE id IN (?...)"
+    assert huella("SELECT CAST(:hoy AS date)::text") == "SELECT CAST(? AS date)::text"
+
+
+def _crear_app(motor):
+    app = FastAPI()
+
+    def conexion():
+        with motor.connect() as c:
+            yield c
+
+    @app.get("/items/{n}")
+    def por_fila(n: int, c=Depends(conexion)):
+        # Una consulta por elemento: el patrón que se quiere detectar.
+        return [c.execute(text("SELECT :i"), {"i": i}).scalar() for i in range(n)]
+
+    app.add_middleware(ConsultasSqlMiddleware)
+    return app
+
+
+@pytest.fixture
+def motor():
+    motor = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    yield motor
+    motor.dispose()
+
+
+def test_middleware_expone_headers_y_registra_n_mas_1(motor, monkeypatch, caplog):
+    configuracion = obtener_configuracion()
+    monkeypatch.setattr(configuracion, "entorno", "desarrollo")
+    monkeypatch.setattr(configuracion, "sql_presupuesto_por_request", 50)
+    monkeypatch.setattr(configuracion, "sql_umbral_repeticiones", 5)
+    cliente = TestClient(_crear_app(motor))
+
+    with caplog.at_level(logging.WARNING, logger=consultas_sql.__name__):
+        pocas = cliente.get("/items/2")
+        muchas = cliente.get("/items/6")
+
+    assert pocas.headers["x-sql-consultas"] == "2"
+    assert muchas.headers["x-sql-consultas"] == "6"
+    assert muchas.headers["x-sql-max-repeticiones"] == "6"
+    assert float(muchas.headers["x-sql-tiempo-ms"]) >= 0
+    advertencias = [r.getMessage() for r in caplog.records]
+    assert len(advertencias) == 1
+    assert '"ruta": "/items/{n}"' in advertencias[0]
+    assert '"consultas": 6' in advertencias[0]
+
+
+def test_middleware_no_expone_headers_en_produccion(motor, monkeypatch):
+    monkeypatch.setattr(obtener_configuracion(), "entorno", "produccion")
+    respuesta = TestClient(_crear_app(motor)).get("/items/1")
+
+    assert respuesta.status_code == 200
+    assert "x-sql-consultas" not in respuesta.headers
+
+
+def test_fixture_falla_al_exceder_el_presupuesto(motor, presupuesto_consultas):
+    cliente = TestClient(_crear_app(motor))
+
+    with presupuesto_consultas(3) as registro:
+        cliente.get("/items/3")
+    assert registro.consultas == 3
+
+    with pytest.raises(PresupuestoConsultasExcedido, match="Presupuesto de 3 consultas excedido"):
+        with presupuesto_consultas(3):
+            cliente.get("/items/4")
+
+    with pytest.raises(PresupuestoConsultasExcedido, match="Posible N\\+1"):
+        with presupuesto_consultas(10, max_repeticiones=2):
+            cliente.get("/items/3")
+
+
+def test_sentencias_fallidas_no_dejan_inicios_en_la_conexion(motor):
+    consultas_sql.instalar()
+    with motor.connect() as conexion:
+        for _ in range(3):
+            with pytest.raises(Exception):
+                conexion.execute(text("SELECT * FROM tabla_inexistente"))
+        conexion.execute(text("SELECT 1"))
+        assert conexion.info.get("consultas_sql_inicio") == []
@@ -0,0 +1,140 @@
+"""El ranking de analistas agrupado debe coincidir con el cálculo anterior (4 consultas por analista)."""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, insert
+from sqlalchemy import func as sa_func
+from sqlmodel import select
+
+from app.models.ticket.ticket import CategoriaTicket, Ticket
+from app.services.ticket.stats_service import StatService
+
+PREFIJO = "TEST-REND"
+CATEGORIA = "TEST-REND-CAT"
+ANALISTAS = [f"{PREFIJO} Analista {letra}" for letra in "ABC"]
+BASE = datetime(2026, 2, 1, 8, 0)
+
+
+async def _rendimiento_legado(db, analistas):
+    """Copia de la implementación previa del endpoint, como referencia."""
+    ranking = []
+    for nombre in analistas:
+        data_resueltos = (await db.execute(
+            select(Ticket.creado_en, Ticket.resuelto_en).where(
+                Ticket.asignado_a == nombre,
+                Ticket.estado.in_(["Resuelto", "Cerrado"]),
+                Ticket.resuelto_en.is_not(None),
+            )
+        )).all()
+        resueltos_analista = len(data_resueltos)
+        avg_h = 0
+        if data_resueltos:
+            tiempos = [
+                (t.resuelto_en - t.creado_en).total_seconds() / 3600
+                for t in data_resueltos
+                if t.resuelto_en and t.creado_en
+            ]
+            avg_h = round(sum(tiempos) / len(tiempos), 1) if tiempos else 0
+        carga_activa = (await db.execute(
+            select(sa_func.count(Ticket.id)).where(
+                Ticket.asignado_a == nombre,
+                Ticket.estado.in_(["Abierto", "Asignado", "En Proceso", "Pendiente Info", "Escalado"]),
+            )
+        )).scalar() or 0
+        en_proceso = (await db.execute(
+            select(sa_func.count(Ticket.id)).where(Ticket.asignado_a == nombre, Ticket.estado == "En Proceso")
+        )).scalar() or 0
+        total_hist = (await db.execute(
+            select(sa_func.count(Ticket.id)).where(Ticket.asignado_a == nombre)
+        )).scalar() or 1
+        ranking.append({
+            "name": nombre,
+            "total": carga_activa,
+            "cerrados": resueltos_analista,
+            "en_proceso": en_proceso,
+            "avg_time": avg_h,
+            "performance_score": round(resueltos_analista / total_hist * 100, 1),
+        })
+    return ranking
+
+
+async def _limpiar(db):
+    await db.execute(delete(Ticket).where(Ticket.id.like(f"{PREFIJO}-%")))
+    await db.execute(delete(CategoriaTicket).where(CategoriaTicket.id == CATEGORIA))
+    await db.commit()
+
+
+@pytest.fixture
+async def tickets(db_session):
+    await _limpiar(db_session)
+    db_session.add(CategoriaTicket(id=CATEGORIA, nombre="Rendimiento", tipo_formulario="soporte"))
+    await db_session.flush()
+    filas = [
+        # (analista, estado, horas hasta resolver, días desde BASE, área)
+        (0, "Resuelto", 5, 0, "Contabilidad"),
+        (0, "Cerrado", 30, 1, "Contabilidad"),
+        (0, "Cerrado", None, 2, "Compras"),
+        (0, "En Proceso", None, 3, "Compras"),
+        (0, "Asignado", None, 10, "Contabilidad"),
+        (1, "Resuelto", 2.25, 0, "Compras"),
+        (1, "Escalado", None, 5, "Compras"),
+        (1, "Pendiente", None, 6, "Compras"),
+        (2, "Abierto", None, 1, "Talento Humano"),
+        (2, "En Proceso", None, 12, "Talento Humano"),
+    ]
+    valores = []
+    for i, (analista, estado, horas, dias, area) in enumerate(filas):
+        creado = BASE + timedelta(days=dias)
+        valores.append({
+            "id": f"{PREFIJO}-{i}",
+            "categoria_id": CATEGORIA,
+            "creador_id": "TEST-REND-CREADOR",
+            "estado": estado,
+            "area_creador": area,
+            "asignado_a": ANALISTAS[analista],
+            "creado_en": creado,
+            "resuelto_en": creado + timedelta(hours=horas) if horas is not None else None,
+        })
+    await db_session.execute(insert(Ticket), valores)
+    await db_session.commit()
+    yield db_session
+    await _limpiar(db_session)
+
+
+def _solo_prueba(ranking):
+    return sorted((r for r in ranking if r["name"].startswith(PREFIJO)), key=lambda r: r["name"])
+
+
+@pytest.mark.asyncio
+async def test_coincide_con_la_implementacion_anterior_en_una_consulta(tickets, presupuesto_consultas):
+    with presupuesto_consultas(1):
+        ranking = await StatService.obtener_rendimiento_analistas(tickets)
+
+    esperado = await _rendimiento_legado(tickets, ANALISTAS)
+    assert _solo_prueba(ranking) == sorted(esperado, key=lambda r: r["name"])
+    assert [r["total"] for r in ranking] == sorted((r["total"] for r in ranking), reverse=True)
+    analista_a = _solo_prueba(ranking)[0]
+    assert analista_a == {
+        "name": ANALISTAS[0], "total": 2, "cerrados": 2, "en_proceso": 1,
+        "avg_time": 17.5, "performance_score": 40.0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_filtros_de_fecha_y_area(tickets):
+    por_area = _solo_prueba(await StatService.obtener_rendimiento_analistas(tickets, area="Compras"))
+    assert [(r["name"], r["total"], r["cerrados"]) for r in por_area] == [
+        (ANALISTAS[0], 1, 0),
+        (ANALISTAS[1], 1, 1),
+    ]
+
+    por_fecha = _solo_prueba(await StatService.obtener_rendimiento_analistas(
+        tickets, fecha_desde=date(2026, 2, 2), fecha_hasta=date(2026, 2, 6)
+    ))
+    # Incluye el día final completo (creado el 6/feb a las 8:00).
+    assert [(r["name"], r["total"] + r["cerrados"]) for r in por_fecha] == [
+        (ANALISTAS[0], 2),
+        (ANALISTAS[1], 1),
+        (ANALISTAS[2], 1),
+    ]
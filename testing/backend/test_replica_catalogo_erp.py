@@ -0,0 +1,197 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi import Response
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from app.api.erp.requisiciones_router import obtener_catalogo
+from app.api.viaticos.router import buscar_ots
+from app.config import config
+from app.services.erp.catalogo_replica_service import (
+    CAMPOS_CATALOGO,
+    REPLICA_CATALOGO,
+    REPLICA_OTS,
+    REPLICAS,
+    CatalogoReplicaService,
+    calcular_cambios,
+    encabezados_origen,
+    normalizar_ot_erp,
+)
+
+SCHEMA_PRUEBA = "test_replica_catalogo_erp"
+TABLAS = ("erp_catalogo_productos", "erp_ots_viaticos", "erp_catalogos_sincronizacion")
+
+
+def _producto(referencia, descripcion="TUBO COBRE 1/2", **extra):
+    base = {c: None for c in CAMPOS_CATALOGO}
+    base.update(referencia=referencia, descripcion=descripcion, unidadmedida="UND")
+    base.update(extra)
+    return SimpleNamespace(**base)
+
+
+def _ot(numero, cc="100", scc="10", cliente="CLIENTE A", especialidad="REFRIGERACION"):
+    return SimpleNamespace(
+        numero=numero, centrocosto=cc, subcentrocosto=scc,
+        especialidad=especialidad, cliente=cliente, ciudad="CALI",
+    )
+
+
+class _ErpFalso:
+    """Responde a la consulta de cada réplica con sus filas."""
+
+    def __init__(self, productos, ots):
+        self.filas = {REPLICAS[REPLICA_CATALOGO][3]: productos, REPLICAS[REPLICA_OTS][3]: ots}
+        self.consultas = 0
+
+    def execute(self, query, *_args, **_kwargs):
+        self.consultas += 1
+        return SimpleNamespace(fetchall=lambda: list(self.filas[query]))
+
+    def rollback(self):
+        pass
+
+
+def test_calcular_cambios_de_ots_descarta_filas_sin_numero():
+    existente = normalizar_ot_erp(_ot("OT-1"))
+    registros = [normalizar_ot_erp(f) for f in (
+        _ot(" OT-1 "), _ot("OT-1", scc="20"), _ot(None), _ot("OT-2", cliente="OTRO")
+    )]
+
+    cambios, eliminadas, total = calcular_cambios(
+        registros, "clave", {existente["clave"]: existente["huella"], "OT-9|100|10": "x" * 32}
+    )
+
+    assert total == 3
+    assert sorted(c["clave"] for c in cambios) == ["OT-1|100|20", "OT-2|100|10"]
+    assert eliminadas == ["OT-9|100|10"]
+
+
+def test_encabezados_origen_indican_frescura_y_cursor():
+    filas = [{"referencia": "A"}, {"referencia": "B"}]
+    assert encabezados_origen(42, filas, 2, "referencia") == {
+        "X-Datos-Origen": "replica",
+        "X-Datos-Antiguedad-Segundos": "42",
+        "X-Siguiente-Cursor": "B",
+    }
+    # Página incompleta: no hay más resultados.
+    assert "X-Siguiente-Cursor" not in encabezados_origen(None, filas, 3, "referencia")
+    assert encabezados_origen(None)["X-Datos-Origen"] == "erp"
+
+
+@pytest.fixture
+def db_local_replica():
+    """Sesión local con search_path en un schema propio; todo se revierte al final."""
+    motor = create_engine(
+        config.database_url.replace("postgresql+asyncpg://", "postgresql://", 1),
+        poolclass=NullPool,
+        connect_args={"options": "-c client_encoding=utf8"},
+    )
+    try:
+        conn = motor.connect()
+    except Exception:
+        pytest.skip("Base de datos local no disponible")
+    conn.execute(text(f"CREATE SCHEMA {SCHEMA_PRUEBA}"))
+    for tabla in TABLAS:
+        conn.execute(text(
+            f"CREATE TABLE {SCHEMA_PRUEBA}.{tabla} (LIKE public.{tabla} INCLUDING ALL)"
+        ))
+    conn.execute(text(f"SET LOCAL search_path TO {SCHEMA_PRUEBA}, pg_catalog"))
+    db = Session(bind=conn, join_transaction_mode="create_savepoint")
+    try:
+        yield db
+    finally:
+        db.close()
+        conn.rollback()
+        conn.close()
+        motor.dispose()
+
+
+def test_sincronizacion_incremental_y_busqueda_desde_replica(db_local_replica):
+    db = db_local_replica
+    assert CatalogoReplicaService.buscar_catalogo("tubo", db_local=db) is None
+
+    productos = [_producto(f"REF-{n:03d}") for n in range(25)] + [_producto("VAL-1", "VALVULA")]
+    ots = [_ot("OT-1"), _ot("OT-1", scc="20"), _ot("OT-2", cliente="CLIENTE B")]
+    erp = _ErpFalso(productos, ots)
+    primera = CatalogoReplicaService.sincronizar(erp, db)
+    assert primera[REPLICA_CATALOGO]["filas_actualizadas"] == 26
+    assert primera[REPLICA_OTS]["filas_actualizadas"] == 3
+
+    segunda = CatalogoReplicaService.sincronizar(erp, db)
+    assert all(r["filas_actualizadas"] == r["filas_eliminadas"] == 0 for r in segunda.values())
+
+    erp.filas[REPLICAS[REPLICA_CATALOGO][3]] = productos[1:-1] + [_producto("VAL-1", "VALVULA BOLA")]
+    tercera = CatalogoReplicaService.sincronizar(erp, db)
+    assert (tercera[REPLICA_CATALOGO]["filas_actualizadas"], tercera[REPLICA_CATALOGO]["filas_eliminadas"]) == (1, 1)
+
+    # Paginación por llave: recorre todo sin repetir ni saltar.
+    vistas, despues = [], None
+    while True:
+        filas, antiguedad = CatalogoReplicaService.buscar_catalogo("ref-", limit=10, despues=despues, db_local=db)
+        vistas += [f["referencia"] for f in filas]
+        cursor = encabezados_origen(antiguedad, filas, 10, "referencia").get("X-Siguiente-Cursor")
+        if cursor is None:
+            break
+        despues = cursor
+    assert vistas == [f"REF-{n:03d}" for n in range(1, 25)]
+    assert antiguedad == 0
+
+    filas, _ = CatalogoReplicaService.buscar_catalogo("bola", db_local=db)
+    assert [f["referencia"] for f in filas] == ["VAL-1"]
+
+    ots_encontradas, _ = CatalogoReplicaService.buscar_ots("CLIENTE", db_local=db)
+    assert [o["numero"] for o in ots_encontradas] == ["OT-1", "OT-2"]
+    combinaciones, _ = CatalogoReplicaService.obtener_combinaciones_ot("OT-1", db_local=db)
+    assert [(c["centrocosto"], c["subcentrocosto"]) for c in combinaciones] == [("100", "10"), ("100", "20")]
+
+    # Réplica vencida: el llamador debe volver al ERP.
+    db.execute(text(
+        "UPDATE erp_catalogos_sincronizacion SET ultima_sincronizacion = now() - interval '1 day'"
+    ))
+    assert CatalogoReplicaService.buscar_catalogo("ref-", db_local=db) is None
+    assert CatalogoReplicaService.buscar_ots("OT", db_local=db) is None
+
+
+def test_endpoints_usan_replica_vigente_sin_tocar_el_erp():
+    db_erp = MagicMock()
+    respuesta = Response()
+    productos = [{"referencia": "REF-1", "descripcion": "TUBO"}]
+    with patch.object(CatalogoReplicaService, "buscar_catalogo", return_value=(productos, 120)):
+        assert obtener_catalogo(respuesta, "tubo", 1, 0, None, db_erp) == productos
+
+    db_erp.execute.assert_not_called()
+    assert respuesta.headers["x-datos-origen"] == "replica"
+    assert respuesta.headers["x-datos-antiguedad-segundos"] == "120"
+    assert respuesta.headers["x-siguiente-cursor"] == "REF-1"
+
+
+def test_endpoints_vuelven_al_erp_si_la_replica_esta_vencida():
+    db_erp = MagicMock()
+    db_erp.execute.return_value.all.return_value = [
+        SimpleNamespace(_mapping={"numero": "OT-7", "especialidad": None, "cliente": "X", "ciudad": None})
+    ]
+    respuesta = Response()
+    with patch.object(CatalogoReplicaService, "buscar_ots", return_value=None):
+        ots = buscar_ots(respuesta, "OT", None, db_erp)
+
+    assert [o.numero for o in ots] == ["OT-7"]
+    db_erp.execute.assert_called_once()
+    assert respuesta.headers["x-datos-origen"] == "erp"
+    assert "x-siguiente-cursor" not in respuesta.headers
+
+
+@pytest.mark.parametrize("despues, offset", [(None, 40), ("REF-1", 0)])
+def test_fallback_erp_del_catalogo_ordena_por_el_cursor(despues, offset):
+    db_erp = MagicMock()
+    db_erp.execute.return_value.mappings.return_value.all.return_value = [{"referencia": "REF-2"}]
+    respuesta = Response()
+    with patch.object(CatalogoReplicaService, "buscar_catalogo", return_value=None):
+        obtener_catalogo(respuesta, None, 1, offset, despues, db_erp)
+
+    sql = str(db_erp.execute.call_args.args[0])
+    assert "ORDER BY referencia LIMIT :limit" in sql
+    assert ("OFFSET :offset" in sql) == (despues is None)
+    assert respuesta.headers["x-siguiente-cursor"] == "REF-2"
@@ -16,37 +16,23 @@ def test_ticket_message_id_generation(email_service):
     # Verificar consistencia
     assert msg_id == email_service._get_ticket_message_id(ticket_id)
 
-@pytest.mark.asyncio
-@patch("smtplib.SMTP_SSL")
-@patch("smtplib.SMTP")
-async def test_enviar_correo_headers(mock_smtp, mock_smtp_ssl, email_service):
-    """Verifica que enviar_correo inyecte las cabeceras de threading."""
-    # Configurar mock para que no falle al crear la instancia
-    mock_smtp.return_value = MagicMock()
-    mock_smtp_ssl.return_value = MagicMock()
-    
-    # Decidir cuál interceptar basándonos en la configuración de la prueba
-    from app.config import config
-    instance = mock_smtp_ssl.return_value if config.smtp_use_ssl else mock_smtp.return_value
-    
+def test_construir_mensaje_headers(email_service):
+    """Verifica que el mensaje encolado lleve las cabeceras de threading."""
     destinatarios = ["test@example.com"]
     asunto = "Asunto de Prueba"
     contenido_html = "<p>Hola</p>"
     message_id = "<msg-1@test.com>"
     in_reply_to = "<msg-0@test.com>"
-    
-    await email_service.enviar_correo(
-        asunto=asunto,
-        destinatarios=destinatarios,
-        contenido_html=contenido_html,
-        message_id=message_id,
-        in_reply_to=in_reply_to
-    )
-    
-    # Obtener el mensaje enviado
-    args, kwargs = instance.send_message.call_args
-    msg = args[0]
-    
+
+    with patch("app.services.notifications.email_service.config.smtp_from", "portal@test.com"):
+        msg = email_service.construir_mensaje(
+            asunto=asunto,
+            destinatarios=destinatarios,
+            contenido_html=contenido_html,
+            message_id=message_id,
+            in_reply_to=in_reply_to
+        )
+
     assert msg["Message-ID"] == message_id
     assert msg["In-Reply-To"] == in_reply_to
     assert msg["References"] == in_reply_to
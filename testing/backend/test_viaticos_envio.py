@@ -0,0 +1,179 @@
+"""
+Envío concurrente de reportes de viáticos a las tablas de tránsito del ERP.
+
+Las tablas se crean con sql/erp_alineacion_viaticos.sql en un schema aparte
+del Postgres local (se elimina al final). Varios hilos envían a la vez: los
+consecutivos WEB-LXXXX no se repiten y un envío que falla no deja cabecera
+ni líneas sueltas, con secuencia y sin ella (advisory lock).
+"""
+
+import threading
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.config import config
+from app.services.erp.viaticos_service import SECUENCIA_REPORTE_WEB, ViaticosService
+
+SCHEMA_PRUEBA = "test_viaticos_envio"
+SCRIPT_TABLAS = Path(__file__).resolve().parents[2] / "sql" / "erp_alineacion_viaticos.sql"
+ENVIOS = 24
+LINEAS_POR_REPORTE = 15
+# Simula un rechazo del ERP a mitad de la inserción de líneas (ya pasó la validación)
+VALOR_RECHAZADO = 999_999_999
+
+
+def _reporte(envio: int) -> dict:
+    gastos = [
+        {
+            "categoria": "ALIMENTACION",
+            "fecha": f"2026-03-{linea % 28 + 1:02d}",
+            "ot": f"OT-{envio}",
+            "cc": "CC01",
+            "scc": "SCC01",
+            "valorConFactura": 1000 * (linea + 1),
+            "valorSinFactura": 0,
+            "adjuntos": [{"nombre": "factura.pdf"}] if linea == 0 else [],
+        }
+        for linea in range(LINEAS_POR_REPORTE)
+    ]
+    if envio % 6 == 5:
+        gastos[-1]["valorSinFactura"] = VALOR_RECHAZADO
+    return {
+        "empleado_cedula": str(1000 + envio),
+        "empleado_nombre": f"Empleado {envio}",
+        "area": "TI",
+        "cargo": "Analista",
+        "ciudad": "Cali",
+        "usuario_id": str(1000 + envio),
+        "gastos": gastos,
+    }
+
+
+@pytest.fixture
+def erp_prueba():
+    url = config.database_url.replace("postgresql+asyncpg://", "postgresql://", 1)
+    motor = create_engine(
+        url,
+        pool_size=ENVIOS,
+        connect_args={"options": f"-c client_encoding=utf8 -c search_path={SCHEMA_PRUEBA},pg_catalog"},
+    )
+    with motor.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA_PRUEBA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA_PRUEBA}"))
+        conn.exec_driver_sql(SCRIPT_TABLAS.read_text(encoding="utf-8"))
+        conn.execute(text(
+            "ALTER TABLE transito_viaticos ADD CONSTRAINT chk_prueba_valor "
+            f"CHECK (valorsinfactura < {VALOR_RECHAZADO})"
+        ))
+    yield motor
+    with motor.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA {SCHEMA_PRUEBA} CASCADE"))
+    motor.dispose()
+
+
+def _enviar_en_paralelo(motor):
+    Sesion = sessionmaker(bind=motor)
+    barrera = threading.Barrier(ENVIOS)
+    resultados = {}
+
+    def enviar(envio):
+        with Sesion() as db_erp:
+            barrera.wait()
+            try:
+                resultados[envio] = ViaticosService.enviar_reporte(db_erp, _reporte(envio))
+            except Exception as e:
+                resultados[envio] = e
+
+    hilos = [threading.Thread(target=enviar, args=(n,)) for n in range(ENVIOS)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return resultados
+
+
+@pytest.mark.parametrize("con_secuencia", [True, False], ids=["secuencia", "advisory_lock"])
+def test_envios_concurrentes_sin_duplicados_ni_reportes_parciales(erp_prueba, con_secuencia):
+    if not con_secuencia:
+        with erp_prueba.begin() as conn:
+            conn.execute(text(f"DROP SEQUENCE {SECUENCIA_REPORTE_WEB}"))
+
+    resultados = _enviar_en_paralelo(erp_prueba)
+
+    fallidos = {n for n, r in resultados.items() if isinstance(r, Exception)}
+    assert fallidos == {n for n in range(ENVIOS) if n % 6 == 5}
+    consecutivos = [r for n, r in resultados.items() if n not in fallidos]
+    assert len(set(consecutivos)) == len(consecutivos)
+    assert all(c.startswith("WEB-L") for c in consecutivos)
+
+    with erp_prueba.connect() as conn:
+        cabeceras = conn.execute(text("""
+            SELECT lt.reporte_id, lt.empleado, lt.valortotal, lt.anexo, count(tv.codigo) AS lineas,
+                   bool_and(tv.legalizacion = lt.codigo AND tv.reporte_id = lt.reporte_id) AS enlazadas
+            FROM legalizaciones_transito lt
+            LEFT JOIN transito_viaticos tv ON tv.legalizacion = lt.codigo
+            GROUP BY lt.codigo
+        """)).mappings().all()
+        huerfanas = conn.execute(text("""
+            SELECT count(*) FROM transito_viaticos tv
+            WHERE NOT EXISTS (SELECT 1 FROM legalizaciones_transito lt WHERE lt.reporte_id = tv.reporte_id)
+        """)).scalar()
+
+    assert sorted(c["reporte_id"] for c in cabeceras) == sorted(consecutivos)
+    total_lineas = sum(1000 * (linea + 1) for linea in range(LINEAS_POR_REPORTE))
+    for cabecera in cabeceras:
+        assert cabecera["lineas"] == LINEAS_POR_REPORTE and cabecera["enlazadas"]
+        assert cabecera["valortotal"] == total_lineas and cabecera["anexo"] == 1
+    assert {int(c["empleado"]) - 1000 for c in cabeceras} == set(range(ENVIOS)) - fallidos
+    assert huerfanas == 0
+
+    if not con_secuencia:
+        # Sin secuencia el número sale del MAX bajo lock: denso y sin huecos.
+        numeros = sorted(int(c[len("WEB-L"):]) for c in consecutivos)
+        assert numeros == list(range(1, len(consecutivos) + 1))
+
+
+def test_lineas_invalidas_se_rechazan_antes_de_escribir(erp_prueba):
+    reporte = _reporte(0)
+    reporte["gastos"][3]["fecha"] = "no-es-fecha"
+    with sessionmaker(bind=erp_prueba)() as db_erp:
+        with pytest.raises(ValueError, match="Línea 4"):
+            ViaticosService.enviar_reporte(db_erp, reporte)
+        reporte = _reporte(0)
+        reporte["gastos"][0]["ot"] = " "
+        with pytest.raises(ValueError, match="Línea 1: faltan ot"):
+            ViaticosService.enviar_reporte(db_erp, reporte)
+        with pytest.raises(ValueError, match="no tiene líneas"):
+            ViaticosService.enviar_reporte(db_erp, {**reporte, "gastos": []})
+        consecutivo = db_erp.execute(
+            text("SELECT last_value, is_called FROM legalizaciones_transito_web_seq")
+        ).one()
+    # La validación ocurre antes de pedir número: la secuencia sigue intacta.
+    assert tuple(consecutivo) == (1, False)
+
+
+def test_linea_sin_ot_con_cc_y_scc_manuales_y_borradores_incompletos(erp_prueba):
+    reporte = _reporte(0)
+    reporte["gastos"] = reporte["gastos"][:2]
+    reporte["gastos"][0].update(ot="", cc="1234", scc="01")
+    borrador_vacio = {**_reporte(1), "estado": "BORRADOR", "gastos": []}
+    borrador_incompleto = {**_reporte(2), "estado": "BORRADOR"}
+    borrador_incompleto["gastos"] = [{**borrador_incompleto["gastos"][0], "categoria": None, "ot": "", "cc": ""}]
+    with sessionmaker(bind=erp_prueba)() as db_erp:
+        ids = [
+            ViaticosService.enviar_reporte(db_erp, r)
+            for r in (reporte, borrador_vacio, borrador_incompleto)
+        ]
+        lineas = dict(db_erp.execute(text(
+            "SELECT reporte_id, count(*) FROM transito_viaticos GROUP BY reporte_id"
+        )).all())
+
+        # En el borrador se siguen validando fecha y valores.
+        borrador_incompleto["gastos"][0]["valorConFactura"] = -1
+        with pytest.raises(ValueError, match="Línea 1: los valores no pueden ser negativos"):
+            ViaticosService.enviar_reporte(db_erp, borrador_incompleto)
+
+    assert lineas == {ids[0]: 2, ids[2]: 1}